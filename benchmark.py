@@ -0,0 +1,2221 @@
+#!/usr/bin/env python3
+"""
+mosaic-H NTRIP Client Benchmarks
+
+Mikrobenchmarks für die Hot-Paths von ntrip_client.py, ohne Hardware und ohne Caster.
+Szenarien mit Caster laufen gegen lokale Ersatz-Caster (StandInCaster).
+Verwendung: python3 benchmark.py {coalesce,commands,control,failover,forward,gga,nmea,reconnect,rewrite,rtcm,sbf,scheduler,sourcetable,stream,supervisor,all} [--seconds 2] [--json]
+                   [--save results.json] [--compare baseline.json]
+"""
+
+import _thread
+import argparse
+import asyncio
+import binascii
+import collections
+import json
+import math
+import multiprocessing
+import os
+import platform
+import pty
+import random
+import re
+import resource
+import select
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tty
+
+import serial
+
+import ntrip_client
+
+
+def nmea_sentence(body):
+    """NMEA Satz mit korrekter Checksumme bauen"""
+    checksum = 0
+    for char in body.encode('ascii'):
+        checksum ^= char
+    return f"${body}*{checksum:02X}\r\n".encode('ascii')
+
+
+def sbf_frame(block_id, body):
+    """SBF Block ($@ Sync, CRC-CCITT, ID, Länge) um die Felder ab TOW bauen, auf 4 Byte aufgefüllt"""
+    length = 8 + len(body)
+    length += (-length) % 4
+    body = struct.pack('<HH', block_id, length) + body.ljust(length - 8, b'\0')
+    return b'$@' + struct.pack('<H', binascii.crc_hqx(body, 0)) + body
+
+
+def sbf_block(block_id, payload_len, rng):
+    """SBF Block mit Zufallsdaten bauen"""
+    return sbf_frame(block_id, bytes(rng.getrandbits(8) for _ in range(payload_len)))
+
+
+def pvt_geodetic_block(tow, lat, lon, height=560.4, undulation=47.1, mode=4, nr_sv=24, corr_age=1.2, ref=1234):
+    """PVTGeodetic Rev 2 (4007) wie vom mosaic-H: Position in Grad, Höhe ellipsoidisch"""
+    return sbf_frame(4007 | (2 << 13), struct.pack(
+        '<IHBBdddfffffdfBBBBHHIBBHHHHB',
+        tow, 2350, mode, 0, math.radians(lat), math.radians(lon), height, undulation,
+        0.01, -0.02, 0.0, -2e10, 0.12, 0.5, 0, 0, nr_sv, 0, ref, round(corr_age * 100),
+        0, 0, 1, 0, 12, 1, 2, 0))
+
+
+def dop_block(tow, hdop=0.7):
+    """DOP (4001) mit PDOP/TDOP/HDOP/VDOP in 0.01"""
+    return sbf_frame(4001, struct.pack('<IHBBHHHHff', tow, 2350, 24, 0, 130, 90, round(hdop * 100), 110, 1.5, 2.5))
+
+
+def receiver_status_block(tow, cpu_load=35, temperature=48):
+    """ReceiverStatus Rev 1 (4014) ohne AGC Unterblöcke"""
+    return sbf_frame(4014 | (1 << 13), struct.pack('<IHBBIIIBBBB', tow, 2350, cpu_load, 0, 86400, 0, 0,
+                                                    0, 4, 0, temperature + 100))
+
+
+def diff_corr_in_block(tow, frame):
+    """DiffCorrIn (5919) mit einem RTCM3 Frame (Mode 2, Quelle COM2)"""
+    return sbf_frame(5919, struct.pack('<IHBB', tow, 2350, 2, 1) + frame)
+
+
+def mixed_uart_stream(seconds, rate_hz=20, gga_rate_hz=1, seed=1):
+    """Gemischter UART Stream: NMEA (GGA/GSA/RMC), SBF Blöcke und $R Antworten"""
+    rng = random.Random(seed)
+    out = bytearray()
+    gga_every = max(1, round(rate_hz / gga_rate_hz))
+    for i in range(int(seconds * rate_hz)):
+        t = i / rate_hz
+        hh, mm, ss = int(t // 3600) % 24, int(t // 60) % 60, t % 60
+        if i % gga_every == 0:
+            out += nmea_sentence(
+                f"GPGGA,{hh:02d}{mm:02d}{ss:05.2f},4807.{i % 10000:04d},N,01131.0000,E,4,12,0.8,512.3,M,47.1,M,1.0,0000"
+            )
+        out += nmea_sentence("GNGSA,A,3,01,02,03,04,05,06,07,08,09,10,11,12,1.4,0.8,1.1")
+        out += nmea_sentence(f"GPRMC,{hh:02d}{mm:02d}{ss:05.2f},A,4807.0000,N,01131.0000,E,0.0,0.0,161026,,,D")
+        out += pvt_geodetic_block(round(t * 1000) + 345600000, 48.1166 + i * 1e-7, 11.5166)
+        out += sbf_block(5919, rng.randrange(16, 400), rng)
+        if i % 50 == 0:
+            out += b"$R: getCOMSettings, COM2\r\n  COMSettings, COM2, baud115200, bits8, No, bit1, none\r\nCOM2>"
+    return bytes(out)
+
+
+def rtcm_frame(payload):
+    """RTCM3 Frame (Präambel, Länge, CRC-24Q) um einen Payload bauen"""
+    header = bytes((0xD3, (len(payload) >> 8) & 0x03, len(payload) & 0xFF))
+    body = header + payload
+    return body + ntrip_client.crc24q(body).to_bytes(3, 'big')
+
+
+def rtcm_payload(msg_type, size, rng):
+    """Payload mit Nachrichtentyp (12 Bit) und Zufallsdaten"""
+    rest = bytes(rng.getrandbits(8) for _ in range(size - 1))
+    return bytes((msg_type >> 4, ((msg_type & 0x0F) << 4) | (rest[0] & 0x0F))) + rest[1:]
+
+
+# Typische VRS Epoche: Stationsdaten + MSM7 für vier Konstellationen (Größen für rtcm_stream)
+RTCM_EPOCH = ((1005, 19), (1033, 40), (1077, 420), (1087, 330), (1097, 380), (1127, 360), (1230, 8))
+
+
+def msm_epoch_field(msg_type, gps_tod_ms):
+    """Epochenzeit-Feld (30 Bit) einer MSM Nachricht für eine GPS Tageszeit in ms"""
+    system = ntrip_client.RTCM_MSM_SYSTEMS.get(msg_type // 10)
+    if system == 'GLONASS':
+        # Wochentag 0 + ms des Tages in Moskauer Zeit
+        return (gps_tod_ms - ntrip_client.GPS_LEAP_SECONDS * 1000 + 3 * 3600000) % ntrip_client.DAY_MS
+    if system == 'BeiDou':
+        return (gps_tod_ms - 14000) % ntrip_client.DAY_MS
+    return gps_tod_ms
+
+
+def rtcm_epoch_frames(gps_tod_ms, rng, station=0):
+    """Eine VRS Epoche: Stationsnachrichten und MSM7 mit gültiger Epochenzeit (GPS Tageszeit in ms)
+
+    Alle MSM Nachrichten bis auf die letzte tragen das Multiple Message Bit.
+    """
+    frames = []
+    last_msm = max(msg_type for msg_type, _ in RTCM_EPOCH if 1071 <= msg_type <= 1137)
+    for msg_type, size in RTCM_EPOCH:
+        if ntrip_client.rtcm_system(msg_type) and 1071 <= msg_type <= 1137:
+            msg = msm7_message(msg_type, rng, gps_tod_ms, station, multiple=msg_type != last_msm)
+            frames.append(ntrip_client.msm_encode(msg))
+        else:
+            # Typ (12 Bit) und Station (12 Bit), Rest zufällig
+            header = ((msg_type << 12) | station).to_bytes(3, 'big')
+            frames.append(rtcm_frame(header + bytes(rng.getrandbits(8) for _ in range(size - 3))))
+    return frames
+
+
+def gps_tod_ms(period_ms=1000):
+    """Aktuelle GPS Tageszeit in ms, auf die Epochenperiode abgerundet"""
+    tod = int((time.time() + ntrip_client.GPS_LEAP_SECONDS) * 1000) % ntrip_client.DAY_MS
+    return tod - tod % period_ms
+
+
+def rtcm_stream(epochs, seed=3):
+    """RTCM3 Stream aus synthetischen VRS Epochen"""
+    rng = random.Random(seed)
+    out = bytearray()
+    for _ in range(epochs):
+        for msg_type, size in RTCM_EPOCH:
+            out += rtcm_frame(rtcm_payload(msg_type, max(4, size + rng.randrange(-8, 8)), rng))
+    return bytes(out)
+
+
+class StandInCaster:
+    """Lokaler Ersatz-Caster: NTRIP v1 Handshake, danach RTCM Epochen im Takt
+
+    Die MSM Nachrichten tragen die aktuelle GPS Zeit als Epochenzeit.
+    stall() hält den Datenstrom an (Verbindung bleibt offen, wie ein hängender
+    Caster), resume() setzt ihn fort. Mit backlog=True (bzw. stall(backlog=True))
+    werden die Epochen während des Stalls gesammelt und beim resume() als
+    Burst gesendet. drop() trennt alle Verbindungen wie ein Caster-Neustart.
+    Mit segments > 1 wird jede Epoche wie bei realen Castern in zufällig
+    geschnittenen TCP Segmenten mit segment_gap Sekunden Abstand gesendet;
+    epoch_sent hält pro Epochenzeit den Zeitpunkt des letzten Segments.
+    Empfangene GGA Sätze werden gezählt. Mit vrs=True beginnt der Stream
+    einer Verbindung wie bei einem VRS Caster erst nach der ersten GGA.
+    Mit sourcetable (Text) beantwortet der Caster "GET /" mit der Tabelle,
+    bei passendem If-None-Match mit 304; requests zählt die Anfragen pro Pfad.
+    degrade() lässt die bestehenden Verbindungen weiter Bytes senden, aber
+    ohne frische Korrekturen: 'station' nur Stationsnachrichten, 'freeze'
+    immer dieselbe Epoche (wie ein hängender VRS). Neue Verbindungen sind
+    nicht betroffen, restore() beendet den Zustand. Mit close_after schließt
+    der Caster jede Verbindung nach so vielen Epochen (0 = direkt nach dem
+    Handshake), wie ein Caster, der den Client immer wieder abweist.
+    """
+
+    EPOCH_DELAY = 0.05
+
+    def __init__(self, rate_hz=1.0, seed=3, bind='127.0.0.1', backlog=False, segments=1, segment_gap=0.0, vrs=False,
+                 sourcetable=None, close_after=None):
+        self.rate_hz = rate_hz
+        self.close_after = close_after
+        self.vrs = vrs
+        self.sourcetable = sourcetable.encode('ascii') if sourcetable else None
+        self.etag = f'"{binascii.crc32(self.sourcetable):08x}"' if sourcetable else None
+        self.requests = collections.Counter()
+        self.seed = seed
+        self.backlog = backlog
+        self.segments = segments
+        self.segment_gap = segment_gap
+        self.epoch_sent = {}
+        self.server = socket.create_server((bind, 0))
+        self.port = self.server.getsockname()[1]
+        self.gga_received = 0
+        self.clients = 0
+        self._conns = set()
+        self._stall_backlog = backlog
+        self._degraded = {}
+        self._running = threading.Event()
+        self._streaming = threading.Event()
+        self._streaming.set()
+
+    def start(self):
+        self._running.set()
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running.clear()
+        self.server.close()
+
+    def stall(self, backlog=None):
+        self._stall_backlog = self.backlog if backlog is None else backlog
+        self._streaming.clear()
+
+    def resume(self):
+        self._streaming.set()
+
+    def degrade(self, mode):
+        """Bestehende Verbindungen ohne frische Korrekturen weitersenden lassen ('station' oder 'freeze')"""
+        self._degraded = {conn: mode for conn in self._conns}
+
+    def restore(self):
+        self._degraded = {}
+
+    def drop(self):
+        """Alle Verbindungen hart trennen (der Client muss neu verbinden)"""
+        for conn in list(self._conns):
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _accept(self):
+        while self._running.is_set():
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            self.clients += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        rng = random.Random(self.seed)
+        self._conns.add(conn)
+        try:
+            request = b''
+            while b'\r\n\r\n' not in request:
+                data = conn.recv(1024)
+                if not data:
+                    return
+                request += data
+            path = request.split(b' ', 2)[1].decode('ascii') if request.count(b' ') >= 2 else ''
+            self.requests[path] += 1
+            if path == '/' and self.sourcetable is not None:
+                if f"If-None-Match: {self.etag}".encode('ascii') in request:
+                    conn.sendall(b"HTTP/1.1 304 Not Modified\r\nNtrip-Version: Ntrip/2.0\r\n\r\n")
+                elif b'Ntrip-Version' in request:
+                    conn.sendall(b"HTTP/1.1 200 OK\r\nNtrip-Version: Ntrip/2.0\r\nContent-Type: gnss/sourcetable\r\n"
+                                 + f"ETag: {self.etag}\r\n\r\n".encode('ascii') + self.sourcetable)
+                else:
+                    conn.sendall(b"SOURCETABLE 200 OK\r\nContent-Type: text/plain\r\n\r\n" + self.sourcetable)
+                return
+            conn.sendall(b"ICY 200 OK\r\n\r\n")
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            period = 1.0 / self.rate_hz
+            period_ms = max(1, round(period * 1000))
+            # Epochen kurz nach der GPS Epoche senden (wie ein Caster mit geringer Verarbeitungszeit)
+            gps_now = time.time() + ntrip_client.GPS_LEAP_SECONDS
+            next_epoch = time.monotonic() + (-gps_now % period) + self.EPOCH_DELAY
+            held = []
+            frozen = None
+            waiting = self.vrs
+            sent = 0
+            while self._running.is_set():
+                if self.close_after is not None and sent >= self.close_after:
+                    return
+                # GGA vom Client lesen bis zur nächsten Epoche
+                timeout = max(0.0, next_epoch - time.monotonic())
+                readable, _, _ = select.select([conn], [], [], timeout)
+                if readable:
+                    data = conn.recv(4096)
+                    if not data:
+                        return
+                    self.gga_received += data.count(b'GGA')
+                    waiting = waiting and b'GGA' not in data
+                    continue
+                tod = gps_tod_ms(period_ms)
+                degraded = self._degraded.get(conn)
+                if degraded != 'freeze':
+                    frozen = None
+                elif frozen is None:
+                    frozen = tod
+                else:
+                    tod = frozen
+                frames = rtcm_epoch_frames(tod, rng)
+                if degraded == 'station':
+                    frames = [frame for frame in frames if ntrip_client.rtcm_epoch_tod_ms(frame) is None]
+                epoch = b''.join(frames)
+                if waiting:
+                    pass
+                elif self._streaming.is_set():
+                    data = b''.join(held) + epoch
+                    held = []
+                    cuts = sorted(rng.sample(range(1, len(data)), self.segments - 1))
+                    for start, end in zip([0] + cuts, cuts + [len(data)]):
+                        if start:
+                            time.sleep(self.segment_gap)
+                        conn.sendall(data[start:end])
+                    if not degraded:
+                        self.epoch_sent[tod] = time.monotonic()
+                    sent += 1
+                elif self._stall_backlog:
+                    held.append(epoch)
+                next_epoch += period
+        except OSError:
+            pass
+        finally:
+            self._conns.discard(conn)
+            conn.close()
+
+
+class RecordingUART:
+    """UART Ersatz für die StreamEngine: liefert GGA, verwirft geschriebene Daten"""
+
+    GGA = nmea_sentence("GPGGA,120000.00,4807.0000,N,01131.0000,E,4,12,0.8,512.3,M,47.1,M,1.0,0000").decode('ascii')
+
+    def read_nmea(self, timeout=1.0, debug=False):
+        time.sleep(min(timeout, 0.2))
+        return self.GGA
+
+    def send_data(self, data):
+        return True
+
+    def send_buffers(self, buffers):
+        return True
+
+    def pending_output(self):
+        return 0
+
+
+class ThrottledUART(RecordingUART):
+    """UART Ersatz mit Leitungsrate: Writes blockieren nbytes / rate Sekunden
+
+    Protokolliert pro geschriebener MSM Nachricht (Zeitpunkt, GPS Epochenzeit).
+    """
+
+    def __init__(self, baudrate=115200):
+        self.rate = baudrate / 10
+        self.written = []
+
+    def send_buffers(self, buffers):
+        total = 0
+        for frame in buffers:
+            total += len(frame)
+            epoch = ntrip_client.rtcm_epoch_tod_ms(frame)
+            if epoch is not None and ntrip_client.rtcm_message_type(frame) == 1077:
+                self.written.append((time.monotonic() + total / self.rate, epoch))
+        time.sleep(total / self.rate)
+        return True
+
+    def send_data(self, data):
+        return self.send_buffers(ntrip_client.RTCM3Framer().feed(data))
+
+
+class FakeMosaic:
+    """mosaic-H Ersatz am pty: ASCII Kommandos mit Prompt, Verarbeitungszeit und Leitungslatenz
+
+    Kommandos werden nacheinander verarbeitet (je delay Sekunden), Eingaben
+    und Antworten erreichen die Gegenseite erst nach latency Sekunden
+    (USB-Seriell Adapter). set-Kommandos werden gespeichert und von den
+    passenden get-Kommandos zurückgegeben (Passwörter wie beim Empfänger nur
+    verschlüsselt). Mit gga_rate > 0 laufen GGA Sätze zwischen den (atomaren)
+    Antworten. device ist der Pfad für serial.Serial. RTCM3 Frames in der
+    Eingabe werden wie im auto-Modus des Empfängers übersprungen und mit
+    Ankunftszeit in rtcm_received protokolliert, vollständige Epochen (Multiple
+    Message Bit 0) mit ihrer Epochenzeit in epochs_received. Die Ankunftszeit
+    enthält die Übertragungsdauer mit der Baudrate, rx_bytes zählt die Eingabe.
+    Die erste GGA kommt nach first_gga Sekunden (Standard: eine GGA Periode).
+    """
+
+    PROMPT = b"COM2>"
+    GGA = nmea_sentence("GPGGA,120000.00,4807.0000,N,01131.0000,E,4,12,0.8,512.3,M,47.1,M,1.0,0000")
+    LINE_END = re.compile(rb'\r\n|\r|\n')
+
+    def __init__(self, delay=0.01, latency=0.004, gga_rate=1.0, baudrate=115200, serial_number='3901234',
+                 first_gga=None):
+        self.delay = delay
+        self.first_gga = first_gga
+        self.serial_number = serial_number
+        self.latency = latency
+        self.gga_rate = gga_rate
+        self.rate = baudrate / 10
+        self.settings = {}
+        self.commands = []
+        self.rtcm_received = []  # (Ankunftszeit, Nachrichtentyp)
+        self.epochs_received = []  # (Ankunftszeit, GPS Tageszeit ms der Epoche)
+        self.rx_bytes = 0
+        self.master, slave = pty.openpty()
+        tty.setraw(self.master)
+        tty.setraw(slave)
+        self.device = os.ttyname(slave)
+        self._slave = slave
+        self._running = threading.Event()
+
+    def start(self):
+        self._running.set()
+        threading.Thread(target=self._serve, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running.clear()
+
+    def reply(self, line):
+        """Antwort (ohne Prompt) auf eine Kommandozeile"""
+        self.commands.append(line)
+        name, _, args = line.partition(',')
+        name = name.strip()
+        key = name[3:].lower()
+        if not name or name.upper() == 'SSSSSSSSSS':
+            return b''
+        if name.lower() == 'login':
+            return b"$R! LogIn\r\nUser logged in.\r\n"
+        if name.lower() == 'lstinternalfile' and args.strip().lower() == 'identification':
+            return (f"$R; {line}\r\n---->\r\n$-- BLOCK 1 / 1\r\n  Product: mosaic-H\r\n"
+                    f"  SerialNumber: {self.serial_number}\r\n  Firmware: 4.14.10\r\n").encode('ascii')
+        if name.lower()[:3] not in ('set', 'get', 'exe'):
+            return b"$R? ASCII commands: Invalid command!\r\n"
+        fields = [field.strip() for field in args.split(',')] if args else []
+        if name.lower().startswith('set'):
+            if key == 'ntripsettings' and len(fields) > 5:
+                # Passwort nur verschlüsselt zurückgeben
+                fields[5] = 'x' + format(sum(fields[5].encode()) * 7919, 'x')
+            current = self.settings.get((key, fields[0].lower() if fields else ''), [])
+            # Ausgelassene Argumente behalten ihren Wert
+            fields = [value or (current[i] if i < len(current) else '') for i, value in enumerate(fields)]
+            self.settings[(key, fields[0].lower() if fields else '')] = fields
+        elif name.lower().startswith('get'):
+            fields = self.settings.get((key, fields[0].lower() if fields else ''), fields)
+        body = ', '.join([name[3:]] + fields)
+        return f"$R: {line}\r\n  {body}\r\n".encode('ascii')
+
+    def _serve(self):
+        pending = b''
+        outgoing = []  # (Sendezeitpunkt, Daten), zeitlich sortiert
+        busy_until = 0.0
+        rx_free = 0.0
+        if not self.gga_rate:
+            next_gga = math.inf
+        else:
+            next_gga = time.monotonic() + (1 / self.gga_rate if self.first_gga is None else self.first_gga)
+        while self._running.is_set():
+            now = time.monotonic()
+            if outgoing and outgoing[0][0] <= now:
+                data = outgoing.pop(0)[1]
+                os.write(self.master, data)
+                time.sleep(len(data) / self.rate)
+                continue
+            if now >= next_gga:
+                # GGA nur zwischen zwei Antworten (Antworten sind atomar)
+                if not outgoing or busy_until <= now:
+                    os.write(self.master, self.GGA)
+                next_gga += 1 / self.gga_rate
+            wake = min(next_gga, outgoing[0][0]) if outgoing else next_gga
+            readable, _, _ = select.select([self.master], [], [], min(max(0.0, wake - now), 0.05))
+            if not readable:
+                continue
+            try:
+                chunk = os.read(self.master, 4096)
+            except OSError:
+                return
+            pending += chunk
+            self.rx_bytes += len(chunk)
+            # Empfang mit der Baudrate des UART: Bytes kommen frühestens nach ihrer Übertragungszeit an
+            rx_free = max(time.monotonic(), rx_free) + len(chunk) / self.rate
+            arrived = rx_free + self.latency
+            pending = self._skip_rtcm(pending, arrived)
+            while pending[:1] != b'\xd3':
+                end = self.LINE_END.search(pending)
+                if end is None:
+                    break
+                line, pending = pending[:end.start()], pending[end.end():]
+                reply = self.reply(line.decode('ascii', errors='replace').strip())
+                busy_until = max(arrived, busy_until) + self.delay
+                # Leere Zeile / Kommentar: nur der Prompt
+                outgoing.append((busy_until + self.latency, (reply or b'\r\n') + self.PROMPT))
+                outgoing.sort(key=lambda item: item[0])
+                pending = self._skip_rtcm(pending, arrived)
+
+    def _skip_rtcm(self, pending, arrived):
+        """Vollständige RTCM3 Frames am Anfang der Eingabe entfernen (Kommandos kommen nie mitten im Frame)"""
+        while pending[:1] == b'\xd3' and len(pending) >= 3:
+            size = (((pending[1] & 0x03) << 8) | pending[2]) + 6
+            if len(pending) < size:
+                break
+            frame = pending[:size]
+            self.rtcm_received.append((arrived, ntrip_client.rtcm_message_type(frame)))
+            if ntrip_client.rtcm_epoch_end(frame):
+                self.epochs_received.append((arrived, ntrip_client.rtcm_epoch_tod_ms(frame)))
+            pending = pending[size:]
+        return pending
+
+
+def chunked(data, seed=2, min_size=32, max_size=1024):
+    """Stream in zufällig große Chunks teilen (wie serial.read(in_waiting))"""
+    rng = random.Random(seed)
+    chunks, pos = [], 0
+    while pos < len(data):
+        size = rng.randint(min_size, max_size)
+        chunks.append(data[pos:pos + size])
+        pos += size
+    return chunks
+
+
+def legacy_read_nmea(chunks):
+    """Ursprünglicher read_nmea() Algorithmus (wachsender str-Puffer, Split pro Chunk)"""
+    found = 0
+    buffer = ""
+    for raw in chunks:
+        buffer += raw.decode('ascii', errors='ignore')
+        for line in buffer.split('\n'):
+            if '$GPGGA' in line or '$GNGGA' in line:
+                if '*' in line:
+                    found += 1
+                    buffer = ""  # read_nmea() kehrt zurück und verwirft den Puffer
+                    break
+    return found
+
+
+def framer_read_nmea(chunks):
+    """Inkrementeller NMEAFramer"""
+    framer = ntrip_client.NMEAFramer()
+    found = 0
+    for raw in chunks:
+        if framer.feed(raw):
+            found += 1
+    return found
+
+
+def demux_read_nmea(chunks):
+    """UARTDemux vor dem NMEAFramer (Stream-Modus mit Kontroll-Port)"""
+    framer = ntrip_client.NMEAFramer()
+    demux = ntrip_client.UARTDemux(on_nmea=framer.feed)
+    for raw in chunks:
+        demux.feed(raw)
+    return framer.gga_count
+
+
+def run_timed(func, arg, min_seconds):
+    """Funktion wiederholt ausführen bis min_seconds erreicht sind"""
+    runs, result = 0, None
+    start = time.perf_counter()
+    while True:
+        result = func(arg)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return result, elapsed / runs
+
+
+def bench_nmea(args):
+    """NMEA Framer gegen den bisherigen read_nmea() Scan"""
+    stream = mixed_uart_stream(args.stream_seconds, args.rate, args.gga_rate)
+    chunks = chunked(stream)
+    results = {
+        'stream_bytes': len(stream),
+        'chunks': len(chunks),
+        'rate_hz': args.rate,
+        'gga_rate_hz': args.gga_rate,
+    }
+
+    for name, func in (('legacy', legacy_read_nmea), ('framer', framer_read_nmea), ('demux', demux_read_nmea)):
+        found, per_run = run_timed(func, chunks, args.seconds)
+        results[name] = {
+            'gga_found': found,
+            'seconds_per_run': per_run,
+            'mbytes_per_s': len(stream) / per_run / 1e6,
+            'us_per_chunk': per_run / len(chunks) * 1e6,
+        }
+    return results
+
+
+def bench_rtcm(args):
+    """RTCM3 Framer mit CRC-24Q über 4096-Byte recv() Chunks"""
+    stream = rtcm_stream(args.epochs)
+    chunks = chunked(stream, min_size=4096, max_size=4096)
+
+    def frame_all(chunks):
+        framer = ntrip_client.RTCM3Framer()
+        count = 0
+        for chunk in chunks:
+            count += len(framer.feed(chunk))
+        return count
+
+    frames, per_run = run_timed(frame_all, chunks, args.seconds)
+    return {
+        'stream_bytes': len(stream),
+        'frames': frames,
+        'frames_per_s': frames / per_run,
+        'mbytes_per_s': len(stream) / per_run / 1e6,
+        'us_per_frame': per_run / frames * 1e6,
+    }
+
+
+def bench_failover(args):
+    """Hot-Standby: primären Ersatz-Caster anhalten, UART Lücke bei Failover/Failback messen"""
+    period = 1.0 / args.epoch_rate
+    primary = StandInCaster(args.epoch_rate, seed=3).start()
+    standby = StandInCaster(args.epoch_rate, seed=4).start()
+    framer = ntrip_client.RTCM3Framer()
+    upstreams = [
+        ntrip_client.CasterUpstream('127.0.0.1', caster.port, 'user', 'pass', 'BENCH', framer=framer_)
+        for caster, framer_ in ((primary, framer), (standby, ntrip_client.RTCM3Framer()))
+    ]
+    engine = ntrip_client.StreamEngine(RecordingUART(), framer=framer, zero_copy=True,
+                                       gga_interval=1, failback_hold=args.failback_hold, reconnect_delay=1)
+    writes = []
+    engine.on_forward = lambda nbytes, latency: writes.append((time.monotonic(), engine.active.name))
+
+    async def scenario():
+        task = asyncio.create_task(engine._run_failover(upstreams))
+        await asyncio.sleep(3 * period + 1)
+        stalled_at = time.monotonic()
+        primary.stall()
+        await asyncio.sleep(4 * period + args.failover_age)
+        resumed_at = time.monotonic()
+        primary.resume()
+        await asyncio.sleep(args.failback_hold + 3 * period + 1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return stalled_at, resumed_at
+
+    engine.failover_age = args.failover_age
+    stalled_at, resumed_at = asyncio.run(scenario())
+    engine.close()
+    primary.stop()
+    standby.stop()
+
+    def first_write(after, name):
+        return next((t for t, active in writes if t >= after and active == name), None)
+
+    def max_gap(start, end):
+        times = [start] + [t for t, _ in writes if start <= t <= end]
+        return max(b - a for a, b in zip(times, times[1:])) if len(times) > 1 else None
+
+    failover_at = first_write(stalled_at, upstreams[1].name)
+    failback_at = first_write(resumed_at, upstreams[0].name)
+    failover_gap = max_gap(stalled_at - period, resumed_at)
+    return {
+        'epoch_rate_hz': args.epoch_rate,
+        'failover_age_s': args.failover_age,
+        'failback_hold_s': args.failback_hold,
+        'failovers': engine.failovers,
+        'uart_writes': len(writes),
+        'gga_primary': primary.gga_received,
+        'gga_standby': standby.gga_received,
+        'failover': {
+            'switch_after_s': failover_at - stalled_at if failover_at else None,
+            'max_uart_gap_s': failover_gap,
+            'gap_epoch_periods': failover_gap / period if failover_gap else None,
+        },
+        'failback': {
+            'switch_after_s': failback_at - resumed_at if failback_at else None,
+            'max_uart_gap_s': max_gap(resumed_at, writes[-1][0]) if writes else None,
+        },
+    }
+
+
+def bench_reconnect(args):
+    """Hot-Standby mit einem Caster, der jede Verbindung sofort wieder schließt
+
+    Jeder Abbruch muss den Empfangspuffer an den Pool zurückgeben. Sonst sind
+    nach queue_size Reconnects alle Puffer verloren, auch der Reader des
+    gesunden Standby blockiert und die Weiterleitung steht.
+    """
+    period = 1.0 / args.epoch_rate
+    closing = StandInCaster(args.epoch_rate, seed=3, close_after=0).start()
+    healthy = StandInCaster(args.epoch_rate, seed=4).start()
+    framer = ntrip_client.RTCM3Framer()
+    upstreams = [
+        ntrip_client.CasterUpstream('127.0.0.1', caster.port, 'user', 'pass', 'BENCH', framer=framer_)
+        for caster, framer_ in ((closing, framer), (healthy, ntrip_client.RTCM3Framer()))
+    ]
+    engine = ntrip_client.StreamEngine(RecordingUART(), framer=framer, zero_copy=True, queue_size=args.queue_size,
+                                       gga_interval=1, reconnect_delay=0.02, reconnect_max_delay=0.05)
+    reconnects = 3 * args.queue_size
+
+    async def scenario():
+        task = asyncio.create_task(engine._run_failover(upstreams))
+        deadline = time.monotonic() + reconnects * 0.5 + 10
+        while closing.clients < reconnects and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        forwarded = engine.bytes_forwarded
+        await asyncio.sleep(3 * period + 0.5)
+        free = engine._free_buffers.qsize()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return forwarded, free
+
+    forwarded, free = asyncio.run(scenario())
+    engine.close()
+    closing.stop()
+    healthy.stop()
+    return {
+        'epoch_rate_hz': args.epoch_rate,
+        'buffer_pool': args.queue_size,
+        'closed_connections': closing.clients,
+        'free_buffers': free,
+        'bytes_forwarded': engine.bytes_forwarded,
+        # Muss nach den Reconnects weiter wachsen (Standby liefert)
+        'bytes_after_reconnects': engine.bytes_forwarded - forwarded,
+    }
+
+
+class CountingUART(RecordingUART):
+    """UART Ersatz, der jeden Write protokolliert: (Zeitpunkt, Bytes, abgeschlossene Epochen)"""
+
+    def __init__(self):
+        self.writes = []
+
+    def send_buffers(self, buffers):
+        nbytes = 0
+        epochs = []
+        for frame in buffers:
+            nbytes += len(frame)
+            if ntrip_client.rtcm_epoch_end(frame):
+                epochs.append(ntrip_client.rtcm_epoch_tod_ms(frame))
+        self.writes.append((time.monotonic(), nbytes, epochs))
+        return True
+
+    def send_data(self, data):
+        return self.send_buffers(ntrip_client.RTCM3Framer().feed(data))
+
+
+def _quantiles(values, p99=False):
+    """p50/p95(/p99)/max einer Liste in ms"""
+    if not values:
+        return None
+    values = sorted(values)
+    result = {
+        'p50_ms': values[len(values) // 2] * 1000,
+        'p95_ms': values[min(len(values) - 1, int(len(values) * 0.95))] * 1000,
+    }
+    if p99:
+        result['p99_ms'] = values[min(len(values) - 1, int(len(values) * 0.99))] * 1000
+    result['max_ms'] = values[-1] * 1000
+    return result
+
+
+def bench_coalesce(args):
+    """UART Writes pro Epoche: ein Write pro Empfang gegen Zusammenfassen je Epoche (UART_COALESCE_MS)
+
+    Der Ersatz-Caster sendet jede Epoche in --segments TCP Segmenten mit
+    --segment-gap Abstand. Gezählt werden UART Writes (ein writev Syscall je
+    Write) und die daraus folgenden USB Transfers bzw. Full-Speed Pakete
+    (64 Bytes). Die Latenz wird ab Empfang des ersten Chunks (zusätzliche
+    Wartezeit) und ab dem letzten Segment der Epoche beim Caster gemessen.
+    """
+    period = 1.0 / args.epoch_rate
+    duration = max(args.seconds, 10 * period)
+    results = {'epoch_rate_hz': args.epoch_rate, 'segments': args.segments,
+               'segment_gap_ms': args.segment_gap * 1000, 'usb_transfer_size': args.usb_transfer_size}
+    for name, coalesce in (('per_chunk', 0.0), ('coalesce', args.coalesce / 1000)):
+        caster = StandInCaster(args.epoch_rate, segments=args.segments, segment_gap=args.segment_gap).start()
+        client = ntrip_client.NTRIPClient('127.0.0.1', caster.port, 'user', 'pass', 'BENCH')
+        client.connect()
+        uart = CountingUART()
+        engine = ntrip_client.StreamEngine(uart, framer=ntrip_client.RTCM3Framer(), zero_copy=True,
+                                           coalesce=coalesce)
+        forward = []
+        engine.on_forward = lambda nbytes, latency: forward.append(latency)
+
+        async def scenario():
+            task = asyncio.create_task(engine._run(client))
+            await asyncio.sleep(duration + period / 2)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(scenario())
+        engine.close()
+        client.close()
+        caster.stop()
+
+        epochs = sum(len(epochs) for _, _, epochs in uart.writes)
+        epoch_latency = [t - caster.epoch_sent[tod] for t, _, done in uart.writes for tod in done
+                         if tod in caster.epoch_sent]
+        sizes = [nbytes for _, nbytes, _ in uart.writes]
+        results[name] = {
+            'epochs': epochs,
+            'writes_per_epoch': len(sizes) / epochs if epochs else None,
+            'usb_transfers_per_epoch': sum(-(-n // args.usb_transfer_size) for n in sizes) / epochs if epochs else None,
+            'usb_packets_per_epoch': sum(-(-n // 64) for n in sizes) / epochs if epochs else None,
+            'bytes_per_write': sum(sizes) / len(sizes) if sizes else None,
+            'added_latency': _quantiles(forward),
+            'epoch_complete_latency': _quantiles(epoch_latency),
+        }
+    return results
+
+
+def legacy_send_command(ser, command):
+    """Ursprüngliches MosaicUARTInterface.send_command(): 0.3 s Pause, danach Polling in 0.1 s Schritten"""
+    if ser.in_waiting:
+        ser.reset_input_buffer()
+    ser.write((command.strip() + "\r\n").encode('ascii'))
+    ser.flush()
+    time.sleep(0.3)
+    response = ""
+    start_time = time.time()
+    while time.time() - start_time < 3:
+        if ser.in_waiting:
+            chunk = ser.read(ser.in_waiting).decode('ascii', errors='ignore')
+            response += chunk
+            if '\n' in chunk:
+                time.sleep(0.1)
+                if ser.in_waiting == 0:
+                    break
+        time.sleep(0.1)
+    return response
+
+
+def legacy_diagnose_command(ser, command, timeout=2):
+    """Ursprüngliches MosaicDiagnose.send_command() + print_command() Pause"""
+    ser.reset_input_buffer()
+    ser.write(f"{command}\r\n".encode('ascii'))
+    lines = []
+    start_time = time.time()
+    while time.time() - start_time < timeout:
+        if ser.in_waiting:
+            line = ser.readline().decode('ascii', errors='ignore').strip()
+            if line:
+                lines.append(line)
+                if line.startswith("COM") and ">" in line:
+                    break
+        else:
+            time.sleep(0.1)
+    time.sleep(0.3)
+    return '\n'.join(lines)
+
+
+# Kommandofolge von configure_mosaic_ntrip() mit den ursprünglichen festen Pausen danach
+CONFIG_SEQUENCE = (
+    ("getCOMSettings,COM2", 0), ("setDataInOut,COM2,,+NMEA", 0.5), ("setNMEAOutput,Stream1,COM2,GGA,sec1", 0.5),
+    ("setNTRIPSettings,NTR1,Client,caster.example,2101,user,pass,MOUNT", 0.5), ("getNTRIPSettings,NTR1", 0),
+    ("exeWriteSettings", 1),
+)
+
+
+def bench_commands(args):
+    """Config-Modus und Diagnose gegen einen mosaic-H Ersatz am pty: feste Pausen gegen MosaicCommandEngine
+
+    Der Ersatz verarbeitet jedes Kommando in --command-delay Sekunden, die
+    Leitung (USB-Seriell) verzögert jede Richtung um --link-latency. Die
+    bisherige Diagnose wartet pro Befehl auf den Timeout, da der Prompt ohne
+    Zeilenende kommt - sie wird deshalb nur für die ersten Befehle gemessen
+    und hochgerechnet.
+    """
+    import diagnose_mosaic
+    diagnose = [command for _, entries in diagnose_mosaic.MosaicDiagnose.DIAGNOSTICS for command, _ in entries]
+    config = {
+        'connection': 'NTR1', 'mode': 'Client', 'caster': 'caster.example', 'port': 2101, 'username': 'user',
+        'password': 'pass', 'mountpoint': 'MOUNT', 'version': 'v2', 'send_gga': 'auto',
+    }
+    results = {'command_delay_ms': args.command_delay * 1000, 'link_latency_ms': args.link_latency * 1000,
+               'diagnose_commands': len(diagnose)}
+
+    def run(func):
+        fake = FakeMosaic(args.command_delay, args.link_latency).start()
+        ser = serial.Serial(fake.device, 115200, timeout=2)
+        try:
+            start = time.monotonic()
+            value = func(ser)
+            return time.monotonic() - start, value
+        finally:
+            ser.close()
+            fake.stop()
+
+    def legacy_config(ser):
+        for command, pause in CONFIG_SEQUENCE:
+            legacy_send_command(ser, command)
+            time.sleep(pause)
+        return True
+
+    def engine_config(ser):
+        uart = ntrip_client.MosaicUARTInterface(ser.port)
+        uart.serial = ser
+        return ntrip_client.configure_mosaic_ntrip(uart, config, force=True)
+
+    def diff_config(ser):
+        # Erster Lauf (Snapshot anlegen), danach Neustart mit unveränderter Konfiguration
+        uart = ntrip_client.MosaicUARTInterface(ser.port)
+        uart.serial = ser
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ntrip_client.MosaicConfigCache(directory)
+            ntrip_client.configure_mosaic_ntrip(uart, config, cache=cache)
+            start = time.monotonic()
+            ntrip_client.configure_mosaic_ntrip(uart, config, cache=cache)
+            return time.monotonic() - start
+
+    sample = diagnose[:args.legacy_samples]
+    legacy_diag, _ = run(lambda ser: [legacy_diagnose_command(ser, command) for command in sample])
+    engine_diag, replies = run(lambda ser: ntrip_client.MosaicCommandEngine(ser).execute(diagnose))
+    sequential_diag, _ = run(lambda ser: ntrip_client.MosaicCommandEngine(ser, window=1).execute(diagnose))
+    legacy_cfg, _ = run(legacy_config)
+    engine_cfg, ok = run(engine_config)
+    diff_cfg, rerun_cfg = run(diff_config)
+    results['config'] = {'legacy_s': legacy_cfg, 'engine_s': engine_cfg, 'ok': ok,
+                         'diff_first_and_rerun_s': diff_cfg, 'diff_rerun_cached_s': rerun_cfg}
+    results['diagnose'] = {
+        'legacy_s_extrapolated': legacy_diag / len(sample) * len(diagnose),
+        'engine_sequential_s': sequential_diag,
+        'engine_s': engine_diag,
+        'replies_ok': sum(reply.ok for reply in replies),
+    }
+    return results
+
+
+def bench_control(args):
+    """Diagnose über den Kontroll-Port während der RTCM Weiterleitung
+
+    Die StreamEngine leitet die Epochen des Ersatz-Casters an einen mosaic-H
+    Ersatz am pty weiter, der Kontroll-Port hängt am selben UART. Nach einer
+    ruhigen Phase läuft die Diagnose aus diagnose_mosaic.py wiederholt über
+    socket:// - bisher musste der Container dafür gestoppt werden. Gemessen
+    werden Antworten, Diagnosedauer und die Abstände der am Empfänger
+    ankommenden Epochen mit und ohne laufende Kommandos.
+    """
+    import diagnose_mosaic
+    diagnose = [command for _, entries in diagnose_mosaic.MosaicDiagnose.DIAGNOSTICS for command, _ in entries]
+    period = 1.0 / args.epoch_rate
+    quiet = max(args.seconds, 5 * period)
+    rounds = max(1, args.control_rounds)
+
+    caster = StandInCaster(args.epoch_rate).start()
+    fake = FakeMosaic(args.command_delay, args.link_latency).start()
+    uart = ntrip_client.MosaicUARTInterface(fake.device)
+    uart.connect()
+    client = ntrip_client.NTRIPClient('127.0.0.1', caster.port, 'user', 'pass', 'BENCH')
+    client.connect()
+    engine = ntrip_client.StreamEngine(uart, framer=ntrip_client.RTCM3Framer(), zero_copy=True)
+    control = ntrip_client.MosaicControlServer(uart, 0)
+    control.start()
+
+    def diagnostics():
+        port = serial.serial_for_url(f"socket://127.0.0.1:{control.port}", timeout=2)
+        try:
+            commands = ntrip_client.MosaicCommandEngine(port)
+            prompt = commands.sync()
+            runs = []
+            for _ in range(rounds):
+                start = time.monotonic()
+                replies = commands.execute(diagnose)
+                runs.append((time.monotonic() - start, sum(reply.ok for reply in replies)))
+            # Kommando auf den Stream-Port wird abgelehnt
+            blocked = commands.command("setDataInOut,COM2,,SBF")
+            return prompt, runs, blocked
+        finally:
+            port.close()
+
+    async def scenario():
+        task = asyncio.create_task(engine._run(client))
+        await asyncio.sleep(quiet)
+        start = time.monotonic()
+        outcome = await asyncio.get_running_loop().run_in_executor(None, diagnostics)
+        end = time.monotonic()
+        await asyncio.sleep(period)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return outcome, start, end
+
+    (prompt, runs, blocked), start, end = asyncio.run(scenario())
+    control.stop()
+    engine.close()
+    client.close()
+    caster.stop()
+    fake.stop()
+
+    # Epochen am Empfänger: Ankunft der letzten MSM Nachricht (1230 folgt auf die MSM)
+    epochs = [t for t, msg_type in fake.rtcm_received if msg_type == 1230]
+
+    def gaps(first, last):
+        times = [t for t in epochs if first <= t <= last]
+        return [b - a for a, b in zip(times, times[1:])]
+
+    quiet_gaps, busy_gaps = gaps(0.0, start), gaps(start, end + period)
+    expected = (end - start) / period
+    return {
+        'epoch_rate_hz': args.epoch_rate,
+        'diagnose_commands': len(diagnose),
+        'prompt': prompt,
+        'diagnose_s': _quantiles([elapsed for elapsed, _ in runs]),
+        'replies_ok': f"{sum(ok for _, ok in runs)}/{len(diagnose) * rounds}",
+        'port_command_rejected': blocked.kind == '?',
+        'commands_via_control': control.commands,
+        'control_timeouts': control.timeouts,
+        'epochs_during_commands': f"{sum(start <= t <= end for t in epochs)} (erwartet ~{expected:.0f})",
+        'epoch_gap_quiet': _quantiles(quiet_gaps),
+        'epoch_gap_commands': _quantiles(busy_gaps),
+        'gga_updates': uart.nmea.gga_count,
+        'uart_rx_bytes': dict(uart.demux.bytes),
+    }
+
+
+def bench_scheduler(args):
+    """Burst nach Caster-Stall über einen 115200 Baud UART: mit und ohne RTCMScheduler
+
+    Gemessen wird, wie alt die Epochen beim Schreiben sind und wann die zum
+    Ende des Stalls aktuelle Epoche das mosaic-H erreicht.
+    """
+    period = 1.0 / args.epoch_rate
+    results = {'stall_s': args.stall, 'epoch_rate_hz': args.epoch_rate, 'baudrate': args.baudrate}
+    for name, max_age in (('fifo', None), ('scheduler', args.max_age)):
+        caster = StandInCaster(args.epoch_rate, backlog=True).start()
+        client = ntrip_client.NTRIPClient('127.0.0.1', caster.port, 'user', 'pass', 'BENCH')
+        client.connect()
+        uart = ThrottledUART(args.baudrate)
+        framer = ntrip_client.RTCM3Framer()
+        scheduler = ntrip_client.RTCMScheduler(args.baudrate, max_age) if max_age else None
+        engine = ntrip_client.StreamEngine(uart, framer=framer, zero_copy=True, scheduler=scheduler)
+
+        async def scenario():
+            task = asyncio.create_task(engine._run(client))
+            await asyncio.sleep(2 * period + 0.5)
+            caster.stall()
+            await asyncio.sleep(args.stall)
+            resumed_at = time.monotonic()
+            caster.resume()
+            await asyncio.sleep(args.stall + 2 * period)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return resumed_at
+
+        resumed_at = asyncio.run(scenario())
+        newest = max((epoch for t, epoch in uart.written if t < resumed_at + period), default=None)
+        burst = [(t, epoch) for t, epoch in uart.written if resumed_at <= t < resumed_at + period]
+
+        def age(t, epoch):
+            # Epochenalter beim Eintreffen am Empfänger (GPS Zeit beim Write - Epochenzeit)
+            gps_now = (time.time() - (time.monotonic() - t) + ntrip_client.GPS_LEAP_SECONDS) * 1000
+            return ((gps_now - epoch) % ntrip_client.DAY_MS) / 1000
+
+        fresh_at = next((t for t, epoch in uart.written if t >= resumed_at and epoch == newest), None)
+        results[name] = {
+            'epochs_written_in_burst': len(burst),
+            'first_epoch_age_s': age(*burst[0]) if burst else None,
+            'newest_epoch_after_s': fresh_at - resumed_at if fresh_at else None,
+            'stale_epochs_written': sum(1 for t, epoch in uart.written if age(t, epoch) > args.max_age),
+            'dropped': dict(scheduler.dropped) if scheduler else None,
+        }
+        engine.close()
+        client.close()
+        caster.stop()
+    return results
+
+
+STREAM_EVENTS = ('drop', 'stall', 'burst', 'station', 'freeze')
+
+
+def parse_scenario(text):
+    """Szenario 'drop:8,stall:14+3,burst:20+3' → [(Zeitpunkt s, Art, Dauer s)]
+
+    drop trennt die Verbindung, stall hält den Stream für die Dauer an,
+    burst ebenso, sendet die angehaltenen Epochen danach aber auf einmal.
+    station und freeze senden für die Dauer weiter Bytes, aber nur
+    Stationsnachrichten bzw. immer dieselbe Epoche (StandInCaster.degrade).
+    """
+    events = []
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        kind, _, when = item.partition(':')
+        at, _, duration = when.partition('+')
+        kind = kind.strip().lower()
+        if kind not in STREAM_EVENTS:
+            raise ValueError(f"Unbekanntes Ereignis '{kind}' (erlaubt: {', '.join(STREAM_EVENTS)})")
+        events.append((float(at), kind, float(duration or 0)))
+    return sorted(events)
+
+
+def _stream_peer(args, events, conn):
+    """Ersatz-Caster und mosaic-H Ersatz im eigenen Prozess, Szenario ab dem Startzeitpunkt abspielen"""
+    caster = StandInCaster(args.epoch_rate, segments=args.segments, segment_gap=args.segment_gap,
+                           vrs=args.vrs).start()
+    fake = FakeMosaic(args.command_delay, args.link_latency, gga_rate=args.gga_rate, baudrate=args.baudrate,
+                      first_gga=args.first_gga).start()
+    conn.send((caster.port, fake.device))
+    start = conn.recv()
+    timeline = []  # (geplant s, Art, Beginn, Ende)
+    for at, kind, duration in events:
+        time.sleep(max(0.0, start + at - time.monotonic()))
+        begin = time.monotonic()
+        if kind == 'drop':
+            caster.drop()
+        elif kind in ('station', 'freeze'):
+            caster.degrade(kind)
+            time.sleep(duration)
+            caster.restore()
+        else:
+            caster.stall(backlog=(kind == 'burst'))
+            time.sleep(duration)
+            caster.resume()
+        timeline.append((at, kind, begin, time.monotonic()))
+    conn.recv()
+    caster.stop()
+    fake.stop()
+    conn.send({
+        'epoch_sent': caster.epoch_sent,
+        'epochs_received': fake.epochs_received,
+        'rx_bytes': fake.rx_bytes,
+        'timeline': timeline,
+        'gga_received': caster.gga_received,
+        'clients': caster.clients,
+        # Zuordnung monotonic → Unix Zeit für das Epochenalter
+        'clock_offset': time.time() - time.monotonic(),
+    })
+
+
+def bench_stream(args):
+    """Ende-zu-Ende Stream wie im Container: Ersatz-Caster → Client → mosaic-H Ersatz am pty
+
+    Caster und Empfänger laufen in einem eigenen Prozess, damit die CPU-Zeit
+    nur den Client enthält. Der Client läuft mit der Reconnect-Schleife aus
+    main() (STREAM_ENGINE async oder legacy), das Szenario (--scenario) trennt
+    Verbindungen, hält den Caster an oder lässt ihn ohne frische Korrekturen
+    weitersenden (Watchdog: --correction-max-age). Gemessen werden Durchsatz, Latenz
+    (letztes Segment am Caster → Epoche am Empfänger), Epochenalter, CPU-Zeit,
+    Time-to-first-correction und die Erholungszeit nach jedem Ereignis.
+
+    Mit --fast-start läuft der Start wie in main() mit StartupState: der
+    Caster wird parallel zum Öffnen des UART verbunden und erhält sofort eine
+    gespeicherte GGA (Datei im temporären Verzeichnis, vorab befüllt). Mit
+    --vrs sendet der Ersatz-Caster erst nach der ersten GGA.
+    """
+    period = 1.0 / args.epoch_rate
+    events = [event for event in parse_scenario(args.scenario) if event[0] < args.duration]
+    coalesce = args.coalesce / 1000
+    ctx = multiprocessing.get_context('fork')
+    conn, peer_conn = ctx.Pipe()
+    peer = ctx.Process(target=_stream_peer, args=(args, events, peer_conn), daemon=True)
+    peer.start()
+    port, device = conn.recv()
+
+    state_dir = tempfile.TemporaryDirectory()
+    state_path = os.path.join(state_dir.name, 'ntrip_state.json')
+    if args.fast_start:
+        ntrip_client.StartupState(state_path, store_interval=0).live_gga(FakeMosaic.GGA.decode('ascii'))
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.monotonic()
+    conn.send(start)
+    startup = ntrip_client.StartupState(state_path if args.fast_start else None)
+    startup.start = start
+    client = preconnect = None
+    if args.fast_start:
+        client = ntrip_client.NTRIPClient('127.0.0.1', port, 'user', 'pass', 'BENCH', resolver=startup)
+        preconnect = ntrip_client.preconnect_caster(client, startup.cached_gga(), startup)
+    uart = ntrip_client.MosaicUARTInterface(device, args.baudrate)
+    uart.connect()
+    framer = ntrip_client.RTCM3Framer()
+    engine = None
+    if args.engine == 'async':
+        scheduler = ntrip_client.RTCMScheduler(args.baudrate, args.max_age) if args.max_age > 0 else None
+        engine = ntrip_client.StreamEngine(uart, framer=framer, zero_copy=True, reconnect_delay=args.reconnect_delay,
+                                           scheduler=scheduler, coalesce=coalesce,
+                                           reconnect_max_delay=args.reconnect_max_delay, stall_epochs=args.stall_epochs,
+                                           correction_max_age=args.correction_max_age)
+        engine.startup = startup
+    backoff = ntrip_client.ReconnectBackoff(args.reconnect_delay, args.reconnect_max_delay)
+    cadence = ntrip_client.RTCMCadence(args.stall_epochs)
+    watchdog = ntrip_client.CorrectionWatchdog(args.correction_max_age) if args.correction_max_age > 0 else None
+
+    # Ende der Messung wie Strg+C: run()/stream_mode() kehren mit True zurück
+    timer = threading.Timer(args.duration, _thread.interrupt_main)
+    timer.start()
+    connects = []
+    try:
+        while True:
+            if preconnect is not None:
+                connected, preconnect = preconnect.result(), None
+                connected_at = startup.times.get('caster_connected', 0) + start
+            else:
+                client = ntrip_client.NTRIPClient('127.0.0.1', port, 'user', 'pass', 'BENCH')
+                connected = client.connect()
+                connected_at = time.monotonic()
+            if connected:
+                connects.append(connected_at)
+                if engine:
+                    result = engine.run(client)
+                else:
+                    result = ntrip_client.stream_mode(client, uart, framer, coalesce=coalesce, cadence=cadence,
+                                                      startup=startup, watchdog=watchdog)
+                if result:
+                    break
+                backoff.connection_ended(time.monotonic() - connects[-1])
+            client.close()
+            if engine:
+                engine.reconnects += 1
+            time.sleep(backoff.next_delay())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        timer.cancel()
+        if client:
+            client.close()
+        state_dir.cleanup()
+    wall = time.monotonic() - start
+    usage_end = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = (usage_end.ru_utime - usage.ru_utime) + (usage_end.ru_stime - usage.ru_stime)
+    if engine:
+        engine.close(wait=True)
+    gga_updates = uart.nmea.gga_count
+    uart.close()
+    conn.send('stop')
+    peer_result = conn.recv()
+    peer.join(5)
+
+    # Erste Ankunft pro Epoche (nach Reconnects kann eine Epoche doppelt kommen)
+    arrivals = {}
+    for t, tod in peer_result['epochs_received']:
+        arrivals.setdefault(tod, t)
+    sent = peer_result['epoch_sent']
+    times = sorted(arrivals.values())
+    latency = [t - sent[tod] for tod, t in arrivals.items() if tod in sent]
+
+    def age(t, tod):
+        # Epochenalter am Empfänger (GPS Zeit bei Ankunft - Epochenzeit)
+        gps_ms = (t + peer_result['clock_offset'] + ntrip_client.GPS_LEAP_SECONDS) * 1000
+        return ((gps_ms - tod) % ntrip_client.DAY_MS) / 1000
+
+    results = {
+        'engine': args.engine,
+        'scenario': args.scenario or '-',
+        'duration_s': wall,
+        'epoch_rate_hz': args.epoch_rate,
+        'baudrate': args.baudrate,
+        'throughput': {
+            'rx_bytes_per_s': peer_result['rx_bytes'] / wall,
+            'epochs_sent': len(sent),
+            'epochs_received': len(arrivals),
+            'epochs_expected': int(wall * args.epoch_rate),
+        },
+        'latency': _quantiles(latency, p99=True),
+        'epoch_age': _quantiles([age(t, tod) for tod, t in arrivals.items()], p99=True),
+        'cpu': {
+            'cpu_s': cpu,
+            'cpu_percent': cpu / wall * 100,
+            'cpu_us_per_kbyte': cpu / (peer_result['rx_bytes'] / 1000) * 1e6 if peer_result['rx_bytes'] else None,
+        },
+        'startup': {
+            'fast_start': args.fast_start,
+            'vrs': args.vrs,
+            'connect_s': connects[0] - start if connects else None,
+            'first_rtcm_byte_s': startup.times.get('first_rtcm_byte'),
+            'first_uart_write_s': startup.times.get('first_uart_write'),
+            'ttfc_s': times[0] - start if times else None,
+        },
+        'connections': {
+            'caster_clients': peer_result['clients'],
+            'reconnects': len(connects) - 1 if connects else 0,
+            'gga_received': peer_result['gga_received'],
+            'gga_updates': gga_updates,
+            'outages': engine.outages.count if engine else None,
+            'watchdog_triggers': dict(engine.watchdog_triggers) if engine else None,
+            'last_failover_reason': engine.last_failover_reason if engine else None,
+        },
+    }
+    for at, kind, begin, end in peer_result['timeline']:
+        # Erholung: erste Epoche nach der Trennung bzw. Degradierung, nach dem Ende des Stalls;
+        # bei freeze ist die erste Epoche noch frisch, gezählt wird ab der ersten ausgebliebenen
+        ref = end if kind in ('stall', 'burst') else begin + period if kind == 'freeze' else begin
+        first = next((t for t in times if t > ref), None)
+        last = max((t for t in times if t <= begin), default=None)
+        first_tod = next((tod for tod, t in arrivals.items() if t == first), None)
+        results[f"{kind}@{at:g}s"] = {
+            'duration_s': end - begin,
+            'recovery_s': first - ref if first else None,
+            'gap_s': first - last if first and last else None,
+            'first_epoch_age_s': age(first, first_tod) if first else None,
+            'epochs_in_period': sum(1 for t in times if ref < t <= ref + period),
+        }
+    return results
+
+
+def _supervisor_peer(args, conn):
+    """Ersatz-Caster und ein mosaic-H Ersatz pro Pipeline im eigenen Prozess"""
+    caster = StandInCaster(args.epoch_rate).start()
+    fakes = [FakeMosaic(gga_rate=args.gga_rate, baudrate=args.baudrate).start() for _ in range(args.pipelines)]
+    conn.send((caster.port, [fake.device for fake in fakes]))
+    conn.recv()
+    caster.stop()
+    for fake in fakes:
+        fake.stop()
+    conn.send({
+        'epoch_sent': caster.epoch_sent,
+        'epochs_received': [fake.epochs_received for fake in fakes],
+        'clients': caster.clients,
+        'gga_received': caster.gga_received,
+    })
+
+
+def _proc_usage(pid):
+    """CPU-Sekunden (utime + stime) und RSS in MB eines Prozesses aus /proc"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open(f'/proc/{pid}/status') as f:
+            rss = next((int(line.split()[1]) for line in f if line.startswith('VmRSS:')), 0)
+    except OSError:
+        return None, None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK'), rss / 1024
+
+
+def _supervisor_run(args, share):
+    """Ein Supervisor-Lauf mit args.pipelines Pipelines, nach der Hälfte wird eine Pipeline hart beendet"""
+    ctx = multiprocessing.get_context('fork')
+    conn, peer_conn = ctx.Pipe()
+    peer = ctx.Process(target=_supervisor_peer, args=(args, peer_conn), daemon=True)
+    peer.start()
+    port, devices = conn.recv()
+
+    state_dir = tempfile.TemporaryDirectory()
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        metrics_port = probe.getsockname()[1]
+    defaults = {
+        'NTRIP_CASTER': '127.0.0.1', 'NTRIP_PORT': str(port), 'NTRIP_USERNAME': 'user',
+        'NTRIP_PASSWORD': 'pass', 'NTRIP_MOUNTPOINT': 'BENCH', 'UART_BAUDRATE': str(args.baudrate),
+        'NTRIP_STATE_FILE': os.path.join(state_dir.name, 'ntrip_state.json'), 'LOG_FILE': '',
+        'LOG_LEVEL': 'WARNING', 'CORRECTION_MAX_AGE': str(args.correction_max_age),
+    }
+    pipelines = [{'name': f'p{i + 1:02d}', 'share': True, 'env': {'UART_DEVICE': device}}
+                 for i, device in enumerate(devices)]
+    # Geteilt wird nur mit bekannten Positionen: letzte GGA wie nach einem früheren Lauf vorab speichern
+    for spec in pipelines:
+        path = ntrip_client.pipeline_path(defaults['NTRIP_STATE_FILE'], spec['name'])
+        ntrip_client.StartupState(path, store_interval=0).live_gga(FakeMosaic.GGA.decode('ascii'))
+    supervisor = ntrip_client.PipelineSupervisor(defaults, pipelines, metrics_port=metrics_port, share=share,
+                                                 share_port=metrics_port + len(pipelines) + 1)
+    victim = supervisor.workers[-1]
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.monotonic()
+    supervisor.start()
+    killed_at = None
+    samples = None
+    per_pipeline = []
+    try:
+        while time.monotonic() - start < args.duration:
+            now = time.monotonic()
+            if killed_at is None and now - start >= args.duration / 2 and victim.running:
+                # Absturz einer Pipeline (SIGKILL): die anderen dürfen davon nichts merken
+                victim.process.kill()
+                killed_at = now
+            if samples is None and now - start >= args.duration * 0.4:
+                samples = supervisor.collect_metrics()
+            supervisor.poll()
+            time.sleep(0.5)
+        per_pipeline = [_proc_usage(worker.process.pid) for worker in supervisor.workers if worker.running]
+    finally:
+        supervisor.stop()
+    wall = time.monotonic() - start
+    usage_end = resource.getrusage(resource.RUSAGE_SELF)
+    children_end = resource.getrusage(resource.RUSAGE_CHILDREN)
+    conn.send('stop')
+    peer_result = conn.recv()
+    peer.join(5)
+    state_dir.cleanup()
+
+    cpu = (children_end.ru_utime - children.ru_utime) + (children_end.ru_stime - children.ru_stime)
+    own = (usage_end.ru_utime - usage.ru_utime) + (usage_end.ru_stime - usage.ru_stime)
+    sent = peer_result['epoch_sent']
+    received, latency, others_gap = [], [], 0.0
+    recovery = None
+    for worker, epochs in zip(supervisor.workers, peer_result['epochs_received']):
+        arrivals = {}
+        for t, tod in epochs:
+            arrivals.setdefault(tod, t)
+        received.append(len(arrivals))
+        latency.extend(t - sent[tod] for tod, t in arrivals.items() if tod in sent)
+        times = sorted(arrivals.values())
+        if worker is victim:
+            recovery = next((t - killed_at for t in times if killed_at and t > killed_at), None)
+        elif killed_at and times:
+            window = [t for t in times if killed_at - 2 <= t <= killed_at + 10]
+            others_gap = max([others_gap] + [b - a for a, b in zip(window, window[1:])])
+    rss = sorted(mb for _, mb in per_pipeline if mb)
+    names = {labels.get('pipeline') for _, _, _, values in samples or [] for labels, _ in values}
+    return {
+        'caster_clients': peer_result['clients'],
+        'shared_pipelines': sum(1 for worker in supervisor.workers if worker.upstream),
+        'gga_received': peer_result['gga_received'],
+        'epochs_expected': int(wall * args.epoch_rate),
+        'epochs_received_min': min(received) if received else 0,
+        'epochs_received_p50': sorted(received)[len(received) // 2] if received else 0,
+        'latency_p50_ms': (_quantiles(latency) or {}).get('p50_ms'),
+        'latency_p95_ms': (_quantiles(latency) or {}).get('p95_ms'),
+        'cpu_percent_total': cpu / wall * 100,
+        'cpu_percent_per_pipeline': cpu / wall * 100 / len(supervisor.workers),
+        'supervisor_cpu_percent': own / wall * 100,
+        'rss_mb_per_pipeline': rss[len(rss) // 2] if rss else None,
+        'rss_mb_total': sum(rss),
+        'restart_recovery_s': recovery,
+        'restarts': victim.restarts,
+        'others_max_gap_s': others_gap,
+        'metrics_families': len(samples or []),
+        'metrics_pipelines': len(names - {None}),
+    }
+
+
+def bench_supervisor(args):
+    """Supervisor mit --pipelines Pipelines gegen einen Ersatz-Caster, mit und ohne gemeinsame Verbindung
+
+    Jede Pipeline ist ein eigener Prozess (main() im Stream-Modus) an einem
+    eigenen mosaic-H Ersatz; Caster und Empfänger laufen in einem weiteren
+    Prozess. Gemessen werden Caster-Verbindungen, Epochen pro Pipeline,
+    Latenz (Caster → Empfänger, mit gemeinsamer Verbindung ein Hop mehr),
+    CPU und RSS der Pipelines sowie die Erholung nach dem harten Beenden
+    einer Pipeline (SIGKILL) und die größte Lücke der übrigen Pipelines.
+    """
+    return {
+        'pipelines': args.pipelines,
+        'duration_s': args.duration,
+        'shared': _supervisor_run(args, share=True),
+        'separate': _supervisor_run(args, share=False),
+    }
+
+
+def gga_sentence(lat, lon, t=0, quality=4):
+    """GGA Satz (str) für eine Position nördlich/östlich von 0° zur Tageszeit t Sekunden"""
+    hh, mm, ss = (t // 3600) % 24, (t // 60) % 60, t % 60
+    lat_nmea = f"{int(lat):02d}{(lat % 1) * 60:07.4f}"
+    lon_nmea = f"{int(lon):03d}{(lon % 1) * 60:07.4f}"
+    return nmea_sentence(f"GPGGA,{hh:02d}{mm:02d}{ss:02d}.00,{lat_nmea},N,{lon_nmea},E,{quality},24,0.7,"
+                         f"513.3,M,47.1,M,1.2,1234").decode('ascii')
+
+
+def drive_trajectory(seed=5):
+    """GGA Sätze (1 Hz) einer Fahrt: Stand, Fahrt mit 15 und 30 m/s, RTK float, Stand mit Rauschen
+
+    Returns:
+        Liste von (Zeit s, GGA, (lat, lon), Fix-Qualität)
+    """
+    rng = random.Random(seed)
+    phases = [(302, 0.0, 4), (121, 15.0, 4), (33, 15.0, 5), (62, 30.0, 4), (601, 0.0, 4)]
+    lat, lon = 48.1166, 11.5166
+    out, t = [], 0
+    for seconds, speed, quality in phases:
+        for _ in range(seconds):
+            lat += speed / 111320
+            # Rauschen der Position (RTK fixed ~1 cm, float ~30 cm)
+            noise = 0.01 if quality == 4 else 0.3
+            nlat = lat + rng.gauss(0, noise) / 111320
+            nlon = lon + rng.gauss(0, noise) / (111320 * math.cos(math.radians(lat)))
+            out.append((t, gga_sentence(nlat, nlon, t, quality), (lat, lon), quality))
+            t += 1
+    return out
+
+
+def bench_gga(args):
+    """GGA Uploads für VRS: festes Intervall gegen GGAScheduler auf einer simulierten Fahrt
+
+    Gemessen werden Uploads und Uplink-Bytes, der Abstand zwischen Fahrzeug
+    und zuletzt hochgeladener Position (Abstand zur VRS) sowie die Zeit vom
+    Wechsel der Fix-Qualität bis zum Upload.
+    """
+    track = drive_trajectory()
+    results = {'track_s': len(track), 'distance_m': track[-1][2][0] * 111320 - track[0][2][0] * 111320}
+    variants = (
+        ('fixed', ntrip_client.GGAScheduler.fixed(5)),
+        ('adaptive', ntrip_client.GGAScheduler(5, args.gga_min_interval, args.gga_max_interval,
+                                               args.gga_recenter_distance)),
+    )
+    for name, scheduler in variants:
+        uploads, uplink, offsets, reactions = 0, 0, [], []
+        uploaded = None
+        quality_change = None
+        last_quality = None
+        start = time.perf_counter()
+        for t, gga, position, quality in track:
+            if last_quality is not None and quality != last_quality:
+                quality_change = t
+            last_quality = quality
+            reason = scheduler.check(gga, t)
+            if reason:
+                scheduler.sent(gga, t, reason)
+                uploads += 1
+                uplink += len(gga)
+                uploaded = position
+                if quality_change is not None:
+                    reactions.append(t - quality_change)
+                    quality_change = None
+            offsets.append(math.hypot((position[0] - uploaded[0]) * 111320, (position[1] - uploaded[1]) * 111320))
+        elapsed = time.perf_counter() - start
+        offsets.sort()
+        results[name] = {
+            'uploads': uploads,
+            'uplink_bytes_per_h': uplink / len(track) * 3600,
+            'vrs_offset_m_p50': offsets[len(offsets) // 2],
+            'vrs_offset_m_p95': offsets[int(len(offsets) * 0.95)],
+            'vrs_offset_m_max': offsets[-1],
+            'quality_reaction_s_max': max(reactions) if reactions else None,
+            'reasons': dict(scheduler.uploads),
+            'us_per_gga': elapsed / len(track) * 1e6,
+        }
+    return results
+
+
+def synthetic_sourcetable(count, seed=6):
+    """Sourcetable mit count Mountpoints, zufällig über Mitteleuropa verteilt
+
+    Etwa 85% Einzelstationen mit RTCM 3.2, der Rest RTCM 2.3/CMRx oder
+    Netzwerk-Mountpoints (VRS), die MountpointSelector nicht auswählen darf.
+    """
+    rng = random.Random(seed)
+    lines = ["CAS;127.0.0.1;2101;BENCH;Benchmark;0;DEU;50.00;10.00;0.0.0.0;0;"]
+    for i in range(count):
+        lat, lon = rng.uniform(43.0, 56.0), rng.uniform(4.0, 20.0)
+        fmt = 'RTCM 3.2' if rng.random() < 0.9 else rng.choice(('RTCM 2.3', 'CMRx'))
+        solution = '1' if rng.random() < 0.05 else '0'
+        lines.append(';'.join([
+            'STR', f"ST{i:05d}", f"Station {i}", fmt, '1004(1),1005(10),1077(1),1087(1),1097(1)', '2',
+            rng.choice(('GPS+GLO+GAL+BDS', 'GPS+GLO', 'GPS+GLO+GAL')), 'BENCH', 'DEU', f"{lat:.2f}", f"{lon:.2f}",
+            solution, solution, 'sNTRIP', 'none', 'B', 'N', '9600', '',
+        ]))
+    return '\r\n'.join(lines) + '\r\nENDSOURCETABLE\r\n'
+
+
+def bench_sourcetable(args):
+    """Sourcetable: Abruf, Cache, räumlicher Index und Mountpoint-Wechsel gegen einen Ersatz-Caster
+
+    Der Ersatz-Caster liefert eine synthetische Sourcetable (--stations
+    Einträge). Gemessen werden Abruf und Parsen, die bedingte Aktualisierung
+    (304), das Laden aus dem Platten-Cache, nearest() gegen eine lineare
+    Suche (Ergebnisse müssen übereinstimmen), eine Fahrt München → Hamburg
+    mit festem bzw. gewähltem Mountpoint und der Reconnect der StreamEngine
+    auf den neuen Mountpoint.
+    """
+    text = synthetic_sourcetable(args.stations)
+    caster = StandInCaster(sourcetable=text).start()
+    results = {'stations': args.stations, 'sourcetable_bytes': len(text)}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'sourcetable.json')
+        client = ntrip_client.NTRIPClient('127.0.0.1', caster.port, 'user', 'pass', '', 'v2')
+        sourcetable = ntrip_client.Sourcetable(client, path)
+        start = time.perf_counter()
+        sourcetable.refresh()
+        fetch = time.perf_counter() - start
+        start = time.perf_counter()
+        sourcetable.refresh()
+        conditional = time.perf_counter() - start
+        cached = ntrip_client.Sourcetable(client, path)
+        start = time.perf_counter()
+        cached.load()
+        load = time.perf_counter() - start
+        entries = list(cached.index.entries.values())
+        start = time.perf_counter()
+        ntrip_client.MountpointIndex(entries)
+        build = time.perf_counter() - start
+        results['fetch'] = {
+            'fetch_parse_index_ms': fetch * 1000,
+            'conditional_refresh_ms': conditional * 1000,
+            'not_modified': sourcetable.not_modified,
+            'cache_bytes': os.path.getsize(path),
+            'cache_load_ms': load * 1000,
+            'index_build_ms': build * 1000,
+        }
+
+    index = sourcetable.index
+    selector = ntrip_client.MountpointSelector(sourcetable, None)
+    compatible = [entry for entry in entries if entry['lat'] is not None and selector.compatible(entry)]
+    selector.nearest(50.0, 10.0)  # Index der kompatiblen Einträge vorab aufbauen
+    rng = random.Random(7)
+    indexed, linear, mismatches = [], [], 0
+    for _ in range(args.queries):
+        lat, lon = rng.uniform(44.0, 55.0), rng.uniform(5.0, 19.0)
+        start = time.perf_counter()
+        entry, distance = selector.nearest(lat, lon)
+        indexed.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        best = min(compatible, key=lambda e: ntrip_client.great_circle_distance(lat, lon, e['lat'], e['lon']))
+        linear.append(time.perf_counter() - start)
+        if ntrip_client.great_circle_distance(lat, lon, best['lat'], best['lon']) < distance - 1e-6:
+            mismatches += 1
+    results['nearest'] = {
+        'queries': args.queries,
+        'indexed': _quantiles(indexed, p99=True),
+        'linear': _quantiles(linear, p99=True),
+        'mismatches': mismatches,
+    }
+
+    # Fahrt München → Hamburg mit 30 m/s, GGA jede Sekunde
+    (lat0, lon0), (lat1, lon1) = (48.14, 11.58), (53.55, 9.99)
+    seconds = int(ntrip_client.great_circle_distance(lat0, lon0, lat1, lon1) / 30)
+    first, _ = selector.nearest(lat0, lon0)
+    selector = ntrip_client.MountpointSelector(sourcetable, first['mountpoint'], args.max_baseline * 1000,
+                                               args.hysteresis * 1000)
+    fixed, chosen = [], []
+    checks = []
+    for t in range(seconds):
+        lat, lon = lat0 + (lat1 - lat0) * t / seconds, lon0 + (lon1 - lon0) * t / seconds
+        gga = gga_sentence(lat, lon, t)
+        start = time.perf_counter()
+        selector.check(gga, t)
+        checks.append(time.perf_counter() - start)
+        station = index.entries[selector.mountpoint]
+        chosen.append(ntrip_client.great_circle_distance(lat, lon, station['lat'], station['lon']))
+        fixed.append(ntrip_client.great_circle_distance(lat, lon, first['lat'], first['lon']))
+    results['drive'] = {
+        'duration_s': seconds,
+        'fixed_baseline_km_max': max(fixed) / 1000,
+        'selected_baseline_km_p50': sorted(chosen)[len(chosen) // 2] / 1000,
+        'selected_baseline_km_max': max(chosen) / 1000,
+        'switches': selector.switches,
+        'check': _quantiles(checks, p99=True),
+    }
+
+    # StreamEngine: erste GGA weit vom Mountpoint → Reconnect auf den nächsten Mountpoint
+    class FarUART(RecordingUART):
+        GGA = gga_sentence(53.55, 9.99)
+
+    selector = ntrip_client.MountpointSelector(sourcetable, first['mountpoint'], args.max_baseline * 1000,
+                                               args.hysteresis * 1000)
+    engine = ntrip_client.StreamEngine(FarUART(), framer=ntrip_client.RTCM3Framer())
+    engine.mountpoints = selector
+    client = ntrip_client.NTRIPClient('127.0.0.1', caster.port, 'user', 'pass', first['mountpoint'])
+    client.connect()
+    start = time.monotonic()
+    result = engine.run(client)
+    switch = time.monotonic() - start
+    client.close()
+    client = ntrip_client.NTRIPClient('127.0.0.1', caster.port, 'user', 'pass', selector.mountpoint)
+    reconnected = client.connect()
+    client.close()
+    engine.close(wait=True)
+    caster.stop()
+    results['engine'] = {
+        'run_result': result,
+        'switch_after_s': switch,
+        'new_mountpoint': selector.mountpoint,
+        'reconnected': reconnected and caster.requests[f"/{selector.mountpoint}"] == 1,
+    }
+    return results
+
+
+def msm7_message(msg_type, rng, gps_tod_ms=0, station=0, multiple=False):
+    """Zufällige, aber plausible MSM7 Nachricht (zerlegt, für ntrip_client.msm_encode)"""
+    system = ntrip_client.RTCM_MSM_SYSTEMS[msg_type // 10]
+    sat_ids = sorted(rng.sample(range(1, 37), rng.randint(4, 12)))
+    sig_ids = sorted(rng.sample(sorted(ntrip_client.MSM_SIGNAL_BANDS[system]), 3))
+    nsat, nsig = len(sat_ids), len(sig_ids)
+    cells = [rng.random() < 0.85 for _ in range(nsat * nsig)]
+    cells[0] = True
+    ncell = sum(cells)
+
+    def signed(bits, invalid_rate=0.05):
+        if rng.random() < invalid_rate:
+            return -(1 << (bits - 1))
+        return rng.randint(-(1 << (bits - 1)) + 1, (1 << (bits - 1)) - 1)
+
+    cell_mask = 0
+    for bit in cells:
+        cell_mask = (cell_mask << 1) | bit
+    return {
+        'type': msg_type,
+        # Station (12 Bit), Epochenzeit (30 Bit), danach 19 Bit Flags (Multiple Message usw.)
+        'header': (station << 49) | (msm_epoch_field(msg_type, gps_tod_ms) << 19) | (multiple << 18),
+        'sat_mask': sum(1 << (64 - sat) for sat in sat_ids),
+        'sig_mask': sum(1 << (32 - sig) for sig in sig_ids),
+        'cell_mask': cell_mask,
+        'sat': {
+            'rough_ms': [rng.randint(60, 90) for _ in sat_ids],
+            'ext_info': [rng.randint(0, 15) for _ in sat_ids],
+            'rough_mod': [rng.randint(0, 1023) for _ in sat_ids],
+            'rough_rate': [signed(14) for _ in sat_ids],
+        },
+        'sig': {
+            'pr': [signed(20) for _ in range(ncell)],
+            'cp': [signed(24) for _ in range(ncell)],
+            'lock': [rng.choice((rng.randint(0, 63), rng.randint(64, 704))) for _ in range(ncell)],
+            'half': [rng.randint(0, 1) for _ in range(ncell)],
+            'cnr': [rng.randint(0, 1023) for _ in range(ncell)],
+            'rate': [signed(15) for _ in range(ncell)],
+        },
+    }
+
+
+def msm_cells(msg):
+    """Zellen einer zerlegten MSM Nachricht als {(Satellit, Signal): {Feld: Wert}}"""
+    sat_ids = ntrip_client._mask_ids(msg['sat_mask'], 64)
+    sig_ids = ntrip_client._mask_ids(msg['sig_mask'], 32)
+    cells, index = {}, 0
+    for i, sat in enumerate(sat_ids):
+        for j, sig in enumerate(sig_ids):
+            if msg['cell_mask'] >> (len(sat_ids) * len(sig_ids) - 1 - (i * len(sig_ids) + j)) & 1:
+                cell = {name: values[index] for name, values in msg['sig'].items()}
+                cell.update({name: values[i] for name, values in msg['sat'].items()})
+                cells[(sat, sig)] = cell
+                index += 1
+    return cells
+
+
+def _lock_df402_ms(indicator):
+    return 0 if indicator == 0 else 1 << (indicator + 4)
+
+
+def verify_msm4(original, converted, dropped_ids=()):
+    """Umgerechnete MSM4 Zellen gegen das MSM7 Original prüfen, Returns: Liste von Fehlern"""
+    errors = []
+    before = {key: cell for key, cell in msm_cells(original).items() if key[1] not in dropped_ids}
+    after = msm_cells(converted)
+    if set(before) != set(after):
+        return [f"Zellen {sorted(set(before) ^ set(after))}"]
+    level = original['type'] % 10
+    for key, old in before.items():
+        new = after[key]
+        if (new['rough_ms'], new['rough_mod'], new['half']) != (old['rough_ms'], old['rough_mod'], old['half']):
+            errors.append(f"{key} rough/half")
+        if level in (4, 5):
+            if any(new[name] != old[name] for name in ('pr', 'cp', 'lock', 'cnr')):
+                errors.append(f"{key} MSM4 Felder")
+            continue
+        # Physikalische Werte innerhalb der halben MSM4 Auflösung (oder beide ungültig)
+        for name, res_old, res_new, bits in (('pr', 2 ** -29, 2 ** -24, 15), ('cp', 2 ** -31, 2 ** -29, 22)):
+            invalid_old = old[name] == -(1 << (bits + (5 if name == 'pr' else 2) - 1))
+            if invalid_old != (new[name] == -(1 << (bits - 1))):
+                errors.append(f"{key} {name} ungültig")
+            elif not invalid_old and abs(new[name] * res_new - old[name] * res_old) > res_new:
+                errors.append(f"{key} {name}")
+        lock_ms = ntrip_client.msm_lock_time_ms(old['lock'])
+        if not (_lock_df402_ms(new['lock']) <= lock_ms and (new['lock'] == 15 or lock_ms < _lock_df402_ms(new['lock'] + 1))):
+            errors.append(f"{key} lock")
+        if abs(new['cnr'] - old['cnr'] / 16) > 0.5 and not (new['cnr'] == 63 and old['cnr'] / 16 > 63):
+            errors.append(f"{key} cnr")
+    return errors
+
+
+def bench_rewrite(args):
+    """MSM7 → MSM4 Umkodierung und Signalfilter: Korrektheit und Ersparnis
+
+    Ohne --input wird ein synthetischer MSM7 Stream erzeugt, mit --input eine
+    aufgezeichnete RTCM Datei (roher Caster-Stream) geprüft. Jede umkodierte
+    Nachricht wird zellweise gegen das Original verifiziert.
+    """
+    if args.input:
+        with open(args.input, 'rb') as f:
+            frames = ntrip_client.RTCM3Framer().feed(f.read())
+    else:
+        rng = random.Random(5)
+        frames = []
+        for epoch in range(args.epochs // 10):
+            for msg_type in (1005, 1077, 1087, 1097, 1127):
+                if msg_type == 1005:
+                    frames.append(rtcm_frame(rtcm_payload(1005, 19, rng)))
+                else:
+                    frames.append(ntrip_client.msm_encode(msm7_message(msg_type, rng, epoch * 1000)))
+    exclude_systems, exclude_signals = ntrip_client.parse_rtcm_exclude(args.exclude)
+    rewriter = ntrip_client.RTCMRewriter(exclude_systems, exclude_signals, msm4=True)
+
+    start = time.perf_counter()
+    output = rewriter.rewrite(frames, now=0)
+    elapsed = time.perf_counter() - start
+
+    # Prüfen: Ausgabe ist gültiges RTCM, jede MSM Nachricht zellweise korrekt
+    framer = ntrip_client.RTCM3Framer()
+    reframed = framer.feed(b''.join(output))
+    errors = []
+    originals = [msg for msg in map(ntrip_client.msm_decode, frames) if msg is not None]
+    originals = [msg for msg in originals if ntrip_client.rtcm_system(msg['type']) not in exclude_systems]
+    converted = [ntrip_client.msm_decode(frame) for frame in reframed]
+    converted = [msg for msg in converted if msg is not None]
+    for original in originals:
+        dropped_ids = exclude_signals.get(ntrip_client.rtcm_system(original['type']), set())
+        match = next((msg for msg in converted if msg['type'] // 10 == original['type'] // 10
+                      and msg['header'] & ((1 << 61) - 1) == original['header'] & ((1 << 61) - 1)), None)
+        if match is None:
+            if set(ntrip_client._mask_ids(original['sig_mask'], 32)) - dropped_ids:
+                errors.append(f"{original['type']} fehlt")
+            continue
+        converted.remove(match)
+        errors += verify_msm4(original, match, dropped_ids)
+
+    epochs = max(1, sum(1 for frame in frames if ntrip_client.rtcm_message_type(frame) == 1005))
+    return {
+        'input': args.input or 'synthetisch',
+        'exclude': args.exclude or None,
+        'frames_in': len(frames),
+        'frames_out': len(output),
+        'crc_errors': framer.crc_errors,
+        'verify_errors': len(errors),
+        'first_errors': errors[:5],
+        'bytes_in': rewriter.bytes_in,
+        'bytes_out': rewriter.bytes_out,
+        'saved_percent': (1 - rewriter.bytes_out / rewriter.bytes_in) * 100 if rewriter.bytes_in else None,
+        'saved_bytes_per_minute_1hz': (rewriter.bytes_in - rewriter.bytes_out) / epochs * 60,
+        'us_per_frame': elapsed / len(frames) * 1e6 if frames else None,
+    }
+
+
+SBF_TOW0 = 345600000  # Dienstag 00:00 GPS Zeit
+
+
+def sbf_uart_stream(seconds, rate_hz, seed=4):
+    """UART Stream eines mosaic-H mit SBF Ausgabe
+
+    PVTGeodetic + DOP mit rate_hz, einmal pro Sekunde ReceiverStatus, NMEA
+    GGA (sec1) und DiffCorrIn für jede Nachricht der RTCM Epoche. Gibt
+    (Stream, [(Offset nach der Epoche, TOW), ...]) zurück.
+    """
+    rng = random.Random(seed)
+    out = bytearray()
+    epochs = []
+    for i in range(int(seconds * rate_hz)):
+        tow = SBF_TOW0 + round(i * 1000 / rate_hz)
+        if i % rate_hz == 0:
+            for msg_type, size in RTCM_EPOCH:
+                out += diff_corr_in_block(tow, rtcm_frame(rtcm_payload(msg_type, size, rng)))
+            out += receiver_status_block(tow)
+            out += nmea_sentence("GPGGA,235942.00,4806.9960,N,01130.9960,E,4,24,0.7,513.3,M,47.1,M,1.2,1234")
+        out += pvt_geodetic_block(tow, 48.1166 + i * 1e-7, 11.5166 + i * 1e-7)
+        out += dop_block(tow)
+        epochs.append((len(out), tow))
+    return bytes(out), epochs
+
+
+def sbf_decode(chunks):
+    """UARTDemux + SBFDecoder über den ganzen Stream (GGA Synthese pro PVTGeodetic)"""
+    decoder = ntrip_client.SBFDecoder()
+    demux = ntrip_client.UARTDemux(on_sbf=decoder.feed_block)
+    for raw in chunks:
+        demux.feed(raw)
+    return decoder, demux
+
+
+def nmea_positions(sentences):
+    """NMEA Pfad pro Position: NMEAFramer + parse_gga"""
+    framer = ntrip_client.NMEAFramer()
+    for sentence in sentences:
+        ntrip_client.parse_gga(framer.feed(sentence))
+    return len(sentences)
+
+
+def sbf_positions(blocks):
+    """SBF Pfad pro Position: UARTDemux + SBFDecoder (PVTGeodetic + DOP, GGA Synthese) + parse_gga"""
+    decoder = ntrip_client.SBFDecoder()
+    demux = ntrip_client.UARTDemux(on_sbf=decoder.feed_block)
+    for epoch in blocks:
+        demux.feed(epoch)
+        ntrip_client.parse_gga(decoder.latest_gga)
+    return decoder.gga_count
+
+
+def _write_sbf_epochs(fd, stream, epochs, rate_hz, seconds, sent):
+    """SBF Epochen im Takt auf den pty Master schreiben, Sendezeit pro TOW in sent"""
+    start = time.monotonic()
+    pos = 0
+    for i, (end, tow) in enumerate(epochs):
+        due = start + i / rate_hz
+        if due - start > seconds:
+            break
+        time.sleep(max(0.0, due - time.monotonic()))
+        sent[tow] = time.monotonic()
+        os.write(fd, stream[pos:end])
+        pos = end
+
+
+def bench_sbf(args):
+    """SBF Decoder als Positionsquelle: Durchsatz bei 10-20 Hz PVT und GGA über read_nmea()
+
+    Offline wird ein mosaic-H Stream (PVTGeodetic, DOP, ReceiverStatus,
+    DiffCorrIn, NMEA) durch UARTDemux + SBFDecoder geschickt und die Kosten
+    pro Position gegen den NMEA Pfad (Framer + parse_gga) gemessen. Danach
+    liefert ein pty die Epochen in Echtzeit und read_nmea() muss die aus SBF
+    erzeugten GGA Sätze mit der PVT Rate zurückgeben.
+    """
+    results = {}
+    for rate in sorted({10, 20, args.rate}):
+        stream, epochs = sbf_uart_stream(args.stream_seconds, rate)
+        chunks = chunked(stream)
+        (decoder, demux), per_run = run_timed(sbf_decode, chunks, args.seconds)
+        blocks = sum(decoder.blocks.values())
+
+        # Erzeugte GGA prüfen: Position, Qualität, Satelliten, Korrekturalter
+        info = ntrip_client.parse_gga(decoder.latest_gga)
+        i = len(epochs) - 1
+        error_m = math.hypot((info['lat'] - (48.1166 + i * 1e-7)) * 111320,
+                             (info['lon'] - (11.5166 + i * 1e-7)) * 111320 * math.cos(math.radians(info['lat'])))
+
+        # Kosten pro Position: NMEA Text gegen SBF Binär
+        nmea = [nmea_sentence(f"GPGGA,{n % 60:02d}0000.00,4807.{n % 10000:04d},N,01131.0000,E,4,24,0.7,513.3,M,47.1,M,1.2,1234")
+                for n in range(1000)]
+        sbf = [pvt_geodetic_block(SBF_TOW0 + n * 100, 48.1166 + n * 1e-7, 11.5166) + dop_block(SBF_TOW0 + n * 100)
+               for n in range(1000)]
+        _, nmea_per_run = run_timed(nmea_positions, nmea, args.seconds / 2)
+        _, sbf_per_run = run_timed(sbf_positions, sbf, args.seconds / 2)
+
+        results[f"{rate}hz"] = {
+            'stream_bytes_per_s': len(stream) / args.stream_seconds,
+            'blocks': blocks,
+            'pvt_blocks': decoder.blocks[ntrip_client.SBFDecoder.PVT_GEODETIC],
+            'gga_synthesized': decoder.gga_count,
+            'crc_errors': demux.crc_errors,
+            'blocks_per_s': blocks / per_run,
+            'mbytes_per_s': len(stream) / per_run / 1e6,
+            'us_per_block': per_run / blocks * 1e6,
+            'cpu_percent_at_rate': per_run / args.stream_seconds * 100,
+            'us_per_position_sbf': sbf_per_run / len(sbf) * 1e6,
+            'us_per_position_nmea': nmea_per_run / len(nmea) * 1e6,
+            'gga_position_error_m': error_m,
+            'gga_quality': info['quality'],
+            'gga_satellites': info['satellites'],
+            'gga_age': info['age'],
+            'summary': decoder.summary(),
+            # Mittleres Alter der Position beim GGA Upload (gleichverteilt zwischen zwei Positionen)
+            'position_age_ms_sbf': 500 / rate,
+            'position_age_ms_nmea_sec1': 500.0,
+        }
+
+        # Echtzeit über pty: read_nmea() liefert die SBF GGA mit der PVT Rate
+        master, slave = pty.openpty()
+        tty.setraw(master)
+        tty.setraw(slave)
+        uart = ntrip_client.MosaicUARTInterface(os.ttyname(slave), 115200)
+        uart.serial = serial.Serial(os.ttyname(slave), 115200, timeout=1)
+        sent = {}
+        writer = threading.Thread(target=_write_sbf_epochs,
+                                  args=(master, stream, epochs, rate, args.seconds, sent), daemon=True)
+        writer.start()
+        received, delays = 0, []
+        start = time.monotonic()
+        while writer.is_alive() or uart.serial.in_waiting:
+            gga = uart.read_nmea(timeout=0.5)
+            now = time.monotonic()
+            if not gga:
+                continue
+            received += 1
+            # GGA Zeit (UTC) → TOW der Epoche → Sendezeitpunkt
+            hhmmss = gga.split(',')[1]
+            tod = round((int(hhmmss[:2]) * 3600 + int(hhmmss[2:4]) * 60 + float(hhmmss[4:])) * 1000)
+            tow = SBF_TOW0 + (tod + ntrip_client.GPS_LEAP_SECONDS * 1000) % ntrip_client.DAY_MS
+            if tow in sent:
+                delays.append(now - sent[tow])
+        elapsed = time.monotonic() - start
+        uart.serial.close()
+        os.close(master)
+        os.close(slave)
+        delays.sort()
+        results[f"{rate}hz"].update({
+            'read_nmea_gga_per_s': received / elapsed,
+            'read_nmea_delay_ms_p50': delays[len(delays) // 2] * 1000 if delays else None,
+            'read_nmea_delay_ms_max': delays[-1] * 1000 if delays else None,
+        })
+    return results
+
+
+def _pump_socket(sock, data, seconds):
+    """Sender-Prozess: Daten so schnell wie möglich in den Socket schreiben"""
+    deadline = time.monotonic() + seconds
+    view = memoryview(data)
+    try:
+        while time.monotonic() < deadline:
+            for pos in range(0, len(view), 4096):
+                sock.sendall(view[pos:pos + 4096])
+    except OSError:
+        pass
+    sock.close()
+
+
+def _drain_fd(fd):
+    """Drain-Prozess: pty Master leer lesen (simuliert das mosaic-H)"""
+    try:
+        while os.read(fd, 65536):
+            pass
+    except OSError:
+        pass
+
+
+def _forward_copy(client, uart, seconds):
+    """Bisheriger Pfad: recv(4096) → neues bytes Objekt → serial.write()"""
+    total = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        data = client.receive_data(timeout=1)
+        if not data:
+            break
+        uart.send_data(data)
+        total += len(data)
+    return total
+
+
+def _forward_zero_copy(client, uart, seconds):
+    """Neuer Pfad: recv_into(Puffer) → memoryview → os.writev()"""
+    total = 0
+    buf = bytearray(4096)
+    view = memoryview(buf)
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        length = client.receive_into(buf, timeout=1)
+        if not length:
+            break
+        uart.send_buffers((view[:length],))
+        total += length
+    return total
+
+
+def bench_forward(args):
+    """Caster → UART Weiterleitung: recv/serial.write gegen recv_into/memoryview
+
+    Sender und "mosaic-H" (pty Master) laufen in eigenen Prozessen, damit die
+    gemessene CPU-Zeit nur den Weiterleitungspfad enthält.
+    """
+    stream = rtcm_stream(args.epochs)
+    results = {'stream_bytes': len(stream)}
+    ctx = multiprocessing.get_context('fork')
+
+    for name, forward in (('copy', _forward_copy), ('zero_copy', _forward_zero_copy)):
+        master, slave = pty.openpty()
+        tty.setraw(master)
+        uart = ntrip_client.MosaicUARTInterface(os.ttyname(slave), 115200)
+        uart.serial = serial.Serial(os.ttyname(slave), 115200, timeout=1)
+        os.close(slave)
+        drain = ctx.Process(target=_drain_fd, args=(master,), daemon=True)
+        drain.start()
+
+        local, remote = socket.socketpair()
+        client = ntrip_client.NTRIPClient('localhost', 0, '', '', '')
+        client.socket = local
+        sender = ctx.Process(target=_pump_socket, args=(remote, stream, args.seconds + 1), daemon=True)
+        sender.start()
+        remote.close()
+
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        start = time.perf_counter()
+        total = forward(client, uart, args.seconds)
+        wall = time.perf_counter() - start
+        usage_end = resource.getrusage(resource.RUSAGE_SELF)
+        cpu = (usage_end.ru_utime - usage.ru_utime) + (usage_end.ru_stime - usage.ru_stime)
+
+        client.close()
+        uart.close()
+        os.close(master)
+        sender.terminate()
+        drain.terminate()
+
+        results[name] = {
+            'bytes': total,
+            'mbytes_per_s': total / wall / 1e6,
+            'cpu_percent': cpu / wall * 100,
+            'cpu_us_per_mbyte': cpu / (total / 1e6) * 1e6 if total else None,
+        }
+    return results
+
+
+BENCHMARKS = {
+    'failover': bench_failover,
+    'coalesce': bench_coalesce,
+    'commands': bench_commands,
+    'control': bench_control,
+    'forward': bench_forward,
+    'gga': bench_gga,
+    'nmea': bench_nmea,
+    'reconnect': bench_reconnect,
+    'rewrite': bench_rewrite,
+    'rtcm': bench_rtcm,
+    'sbf': bench_sbf,
+    'scheduler': bench_scheduler,
+    'sourcetable': bench_sourcetable,
+    'stream': bench_stream,
+    'supervisor': bench_supervisor,
+}
+
+
+def print_results(name, results):
+    """Ergebnisse formatiert ausgeben"""
+    print(f"\n{'='*70}")
+    print(f"  Benchmark: {name}")
+    print(f"{'='*70}")
+    for key, value in results.items():
+        if isinstance(value, dict):
+            print(f"\n  {key}:")
+            for sub_key, sub_value in value.items():
+                if isinstance(sub_value, float):
+                    sub_value = f"{sub_value:.4g}"
+                print(f"    {sub_key:<20} {sub_value}")
+        else:
+            print(f"  {key:<22} {value}")
+
+
+def git_revision():
+    """Commit des Arbeitsverzeichnisses (mit -dirty bei lokalen Änderungen), None ohne git"""
+    try:
+        result = subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def flatten_results(results, prefix=''):
+    """Numerische Werte als {'stream.latency.p50_ms': 1.2, ...}"""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten_results(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare_results(baseline, results):
+    """Gemeinsame numerische Werte zweier Läufe mit Änderung in % ausgeben"""
+    old, new = flatten_results(baseline['results']), flatten_results(results)
+    meta = baseline.get('meta', {})
+    print(f"\n{'='*70}")
+    print(f"  Vergleich mit {meta.get('commit') or '?'} ({meta.get('time', '?')})")
+    print(f"{'='*70}")
+    print(f"  {'Wert':<44} {'vorher':>10} {'jetzt':>10} {'Δ':>8}")
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        delta = f"{(after - before) / abs(before) * 100:+.1f}%" if before else '-'
+        print(f"  {key:<44} {before:>10.4g} {after:>10.4g} {delta:>8}")
+
+
+def main():
+    """Hauptprogramm"""
+    parser = argparse.ArgumentParser(description="mosaic-H NTRIP Client Benchmarks")
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS) + ['all'])
+    parser.add_argument('--seconds', type=float, default=2.0, help="Mindestlaufzeit pro Messung")
+    parser.add_argument('--stream-seconds', type=float, default=60.0, help="Simulierte Stream-Dauer")
+    parser.add_argument('--rate', type=int, default=20, help="Simulierte NMEA/SBF Rate in Hz")
+    parser.add_argument('--gga-rate', type=float, default=1.0, help="Simulierte GGA Rate in Hz (sec1 = 1)")
+    parser.add_argument('--epochs', type=int, default=600, help="Anzahl simulierter RTCM Epochen")
+    parser.add_argument('--epoch-rate', type=float, default=1.0, help="RTCM Epochenrate der Ersatz-Caster in Hz")
+    parser.add_argument('--failover-age', type=float, default=1.5, help="Datenalter in s bis zum Failover")
+    parser.add_argument('--failback-hold', type=float, default=3.0, help="Stabile Zeit in s vor dem Failback")
+    parser.add_argument('--queue-size', type=int, default=8, help="Puffer im Empfangspool (reconnect)")
+    parser.add_argument('--stall', type=float, default=5.0, help="Dauer des Caster-Stalls in s (scheduler)")
+    parser.add_argument('--max-age', type=float, default=2.0, help="RTCM_MAX_AGE für den Scheduler (scheduler, stream)")
+    parser.add_argument('--baudrate', type=int, default=115200, help="Simulierte UART Baudrate (scheduler, stream)")
+    parser.add_argument('--segments', type=int, default=6, help="TCP Segmente pro Epoche (coalesce)")
+    parser.add_argument('--segment-gap', type=float, default=0.0005, help="Abstand der Segmente in s (coalesce)")
+    parser.add_argument('--coalesce', type=float, default=5.0, help="UART_COALESCE_MS (coalesce, stream)")
+    parser.add_argument('--usb-transfer-size', type=int, default=512,
+                        help="Maximale Bytes pro USB Bulk Transfer des Adapters (coalesce)")
+    parser.add_argument('--command-delay', type=float, default=0.01,
+                        help="Verarbeitungszeit pro Kommando des mosaic-H Ersatzes in s (commands)")
+    parser.add_argument('--link-latency', type=float, default=0.004, help="USB-Seriell Latenz je Richtung in s (commands)")
+    parser.add_argument('--legacy-samples', type=int, default=3, help="Gemessene Befehle der bisherigen Diagnose (commands)")
+    parser.add_argument('--control-rounds', type=int, default=20,
+                        help="Diagnose-Durchläufe über den Kontroll-Port (control)")
+    parser.add_argument('--gga-min-interval', type=float, default=1.0, help="GGA_MIN_INTERVAL (gga)")
+    parser.add_argument('--gga-max-interval', type=float, default=30.0, help="GGA_MAX_INTERVAL (gga)")
+    parser.add_argument('--gga-recenter-distance', type=float, default=100.0, help="GGA_RECENTER_DISTANCE (gga)")
+    parser.add_argument('--input', help="Aufgezeichneter RTCM Stream (rewrite)")
+    parser.add_argument('--exclude', default='', help="RTCM_EXCLUDE für rewrite, z.B. GLO,GPS:L5")
+    parser.add_argument('--duration', type=float, default=30.0, help="Laufzeit des Ende-zu-Ende Streams in s (stream, supervisor)")
+    parser.add_argument('--scenario', default='drop:8,stall:14+3,burst:20+3',
+                        help="Caster-Ereignisse 'art:zeitpunkt[+dauer]' mit drop, stall, burst (stream)")
+    parser.add_argument('--engine', choices=('async', 'legacy'), default='async', help="STREAM_ENGINE (stream)")
+    parser.add_argument('--reconnect-delay', type=float, default=1.0, help="RECONNECT_DELAY in s (stream)")
+    parser.add_argument('--reconnect-max-delay', type=float, default=60.0, help="RECONNECT_MAX_DELAY in s (stream)")
+    parser.add_argument('--stall-epochs', type=float, default=5.0, help="STALL_EPOCHS (stream)")
+    parser.add_argument('--correction-max-age', type=float, default=5.0, help="CORRECTION_MAX_AGE in s, 0 = aus (stream)")
+    parser.add_argument('--fast-start', action='store_true',
+                        help="Start mit gespeicherter GGA und Caster-Verbindung parallel zum UART (stream)")
+    parser.add_argument('--vrs', action='store_true', help="Ersatz-Caster sendet erst nach der ersten GGA (stream)")
+    parser.add_argument('--first-gga', type=float, help="Sekunden bis zur ersten GGA des mosaic-H Ersatzes (stream)")
+    parser.add_argument('--pipelines', type=int, default=12, help="Anzahl Pipelines (supervisor)")
+    parser.add_argument('--stations', type=int, default=12000, help="Mountpoints der Ersatz-Sourcetable (sourcetable)")
+    parser.add_argument('--queries', type=int, default=2000, help="nearest() Abfragen (sourcetable)")
+    parser.add_argument('--max-baseline', type=float, default=20.0, help="MOUNTPOINT_MAX_BASELINE in km (sourcetable)")
+    parser.add_argument('--hysteresis', type=float, default=5.0, help="MOUNTPOINT_HYSTERESIS in km (sourcetable)")
+    parser.add_argument('--json', action='store_true', help="Ergebnisse als JSON ausgeben")
+    parser.add_argument('--save', metavar='FILE', help="Ergebnisse mit Commit und Parametern als JSON speichern")
+    parser.add_argument('--compare', metavar='FILE', help="Mit gespeicherten Ergebnissen (--save) vergleichen")
+    args = parser.parse_args()
+    try:
+        parse_scenario(args.scenario)
+    except ValueError as e:
+        parser.error(f"--scenario: {e}")
+
+    names = sorted(BENCHMARKS) if args.benchmark == 'all' else [args.benchmark]
+    all_results = {name: BENCHMARKS[name](args) for name in names}
+
+    if args.json:
+        json.dump(all_results, sys.stdout, indent=2)
+        print()
+    else:
+        for name, results in all_results.items():
+            print_results(name, results)
+
+    if args.save:
+        meta = {
+            'commit': git_revision(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'args': vars(args),
+        }
+        with open(args.save, 'w') as f:
+            json.dump({'meta': meta, 'results': all_results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(json.load(f), all_results)
+
+
+if __name__ == "__main__":
+    main()
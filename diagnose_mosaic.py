@@ -3,6 +3,11 @@
 mosaic-H Diagnose Script
 
 Liest wichtige Konfigurationsparameter vom mosaic-H aus, um RTK Performance zu analysieren.
+Die get-Kommandos laufen gepipelinet über die MosaicCommandEngine aus ntrip_client.py
+(Antwortende per Prompt statt fester Pausen).
+Läuft der Container im Stream-Modus mit CONTROL_PORT, geht die Diagnose über dessen
+Kontroll-Port (MOSAIC_CONTROL=socket://127.0.0.1:<port>) - der Container muss dann
+nicht gestoppt werden und die RTCM Weiterleitung läuft weiter.
 Verwendung: python diagnose_mosaic.py
 """
 
@@ -10,24 +15,43 @@ import serial
 import time
 import sys
 
+from ntrip_client import MosaicCommandEngine
+
 # UART Konfiguration - ANPASSEN falls nötig!
 UART_DEVICE = "/dev/ttyACM0"  # oder COM Port unter Windows
 UART_BAUDRATE = 115200
 UART_TIMEOUT = 2  # Sekunden
 
+# Kontroll-Port des laufenden Containers (CONTROL_PORT), leer = UART direkt öffnen
+MOSAIC_CONTROL = ""  # z.B. "socket://127.0.0.1:28784"
+
 
 class MosaicDiagnose:
     """Diagnose-Klasse für mosaic-H GNSS Modul"""
     
-    def __init__(self, port, baudrate=115200, timeout=2):
+    def __init__(self, port, baudrate=115200, timeout=2, control=None):
         self.port = port
         self.baudrate = baudrate
         self.timeout = timeout
+        self.control = control
         self.ser = None
+        self.commands = None
     
     def connect(self):
         """Verbindung zum mosaic-H herstellen"""
         try:
+            if self.control:
+                # Kontroll-Port des Stream-Modus: der Container behält den UART
+                self.ser = serial.serial_for_url(self.control, timeout=self.timeout)
+                print(f"✓ Verbunden mit Kontroll-Port {self.control}")
+                self.commands = MosaicCommandEngine(self.ser, timeout=self.timeout)
+                prompt = self.commands.sync()
+                if prompt:
+                    print(f"✓ Prompt {prompt}> erhalten")
+                else:
+                    print("✗ Kein Prompt erhalten - läuft der Stream-Modus?")
+                return True
+            
             self.ser = serial.Serial(
                 port=self.port,
                 baudrate=self.baudrate,
@@ -37,18 +61,24 @@ class MosaicDiagnose:
                 stopbits=serial.STOPBITS_ONE
             )
             print(f"✓ Verbunden mit {self.port} @ {self.baudrate} baud")
-            time.sleep(0.5)
+            self.commands = MosaicCommandEngine(self.ser, timeout=self.timeout)
             
             # COM2 zurück in Command-Modus zwingen (falls es in NMEA-Only Modus ist)
             print("\nSetze COM2 in Command-Modus...")
-            self.ser.write(b"SSSSSSSSSS\r\n")  # 10x 'S' + Enter zwingt Command-Modus
-            time.sleep(0.5)
-            self.ser.reset_input_buffer()
+            prompt = self.commands.sync(force=True)  # 10x 'S' + Enter zwingt Command-Modus
+            if prompt:
+                print(f"✓ Prompt {prompt}> erhalten")
+            else:
+                print("✗ Kein Prompt erhalten - versuche trotzdem fortzufahren")
             
             return True
         except serial.SerialException as e:
-            print(f"✗ Fehler beim Öffnen von {self.port}: {e}")
-            print("\nHinweis: Docker Container stoppen mit: docker-compose down")
+            print(f"✗ Fehler beim Öffnen von {self.control or self.port}: {e}")
+            if self.control:
+                print("\nHinweis: Container mit CONTROL_PORT im Stream-Modus starten")
+            else:
+                print("\nHinweis: Docker Container stoppen mit: docker-compose down")
+                print("         oder CONTROL_PORT setzen und MOSAIC_CONTROL nutzen")
             return False
     
     def restore_nmea_mode(self):
@@ -57,14 +87,11 @@ class MosaicDiagnose:
         print("  COM2 wird zurück in NMEA-Modus gesetzt...")
         print("="*70)
         
-        # NMEA Output auf COM2 wieder aktivieren
-        self.ser.reset_input_buffer()
-        self.ser.write(b"setDataInOut,COM2,,+NMEA\r\n")
-        time.sleep(0.5)
-        
-        # GGA Stream konfigurieren
-        self.ser.write(b"setNMEAOutput,Stream1,COM2,GGA,sec1\r\n")
-        time.sleep(0.5)
+        # NMEA Output auf COM2 wieder aktivieren und GGA Stream konfigurieren
+        replies = self.commands.execute(["setDataInOut,COM2,,+NMEA", "setNMEAOutput,Stream1,COM2,GGA,sec1"])
+        for reply in replies:
+            if not reply.ok:
+                print(f"✗ {reply.command}: {reply.error}")
         
         print("✓ COM2 ist wieder im NMEA-Modus")
         print("✓ Docker Container kann jetzt gestartet werden: docker-compose up -d")
@@ -81,30 +108,8 @@ class MosaicDiagnose:
             return None
         
         try:
-            # Buffer leeren
-            self.ser.reset_input_buffer()
-            
-            # Befehl senden
-            cmd = f"{command}\r\n"
-            self.ser.write(cmd.encode('ascii'))
-            
-            # Antwort lesen (mehrere Zeilen möglich)
-            response_lines = []
-            start_time = time.time()
-            
-            while time.time() - start_time < self.timeout:
-                if self.ser.in_waiting:
-                    line = self.ser.readline().decode('ascii', errors='ignore').strip()
-                    if line:
-                        response_lines.append(line)
-                        # Wenn wir eine vollständige Antwort haben (endet oft mit leerem Prompt)
-                        if line.startswith("COM") and ">" in line:
-                            break
-                else:
-                    time.sleep(0.1)
-            
-            return '\n'.join(response_lines)
-        
+            reply = self.commands.command(command)
+            return reply.text or None
         except Exception as e:
             print(f"Fehler bei Befehl '{command}': {e}")
             return None
@@ -115,70 +120,88 @@ class MosaicDiagnose:
         print(f"  {title}")
         print(f"{'='*70}")
     
-    def print_command(self, command, description):
-        """Befehl ausführen und Antwort ausgeben"""
+    def print_reply(self, reply, description):
+        """Antwort eines Befehls formatiert ausgeben"""
         print(f"\n→ {description}")
-        print(f"  Befehl: {command}")
-        response = self.send_command(command)
-        if response:
-            # Antwort formatiert ausgeben
-            for line in response.split('\n'):
-                if line and not line.startswith("COM"):  # Prompt-Zeilen überspringen
-                    print(f"  {line}")
+        print(f"  Befehl: {reply.command}")
+        if reply.kind is not None:
+            # Antwort ohne abschließenden Prompt ausgeben
+            for line in reply.text.splitlines()[:-1]:
+                if line.strip():
+                    print(f"  {line.strip()}")
         else:
             print("  ✗ Keine Antwort erhalten")
-        time.sleep(0.3)  # Kurze Pause zwischen Befehlen
+    
+    def print_command(self, command, description):
+        """Befehl ausführen und Antwort ausgeben"""
+        self.print_reply(self.commands.command(command), description)
+    
+    # Abgefragte Einstellungen: (Sektion, [(Befehl, Beschreibung), ...])
+    DIAGNOSTICS = [
+        ("SYSTEM INFO", [
+            ("getReceiverInfo", "Receiver Model & Firmware"),
+            ("getHardwareVersion", "Hardware Version"),
+        ]),
+        ("COM PORT EINSTELLUNGEN", [
+            ("getCOMSettings,COM1", "COM1 (Flight Controller)"),
+            ("getCOMSettings,COM2", "COM2 (Companion Computer)"),
+            ("getDataInOut,COM1", "COM1 Data In/Out"),
+            ("getDataInOut,COM2", "COM2 Data In/Out"),
+        ]),
+        ("SBF OUTPUT KONFIGURATION", [
+            ("getSBFOutput,Stream1", "SBF Stream 1 (normalerweise COM1)"),
+            ("getSBFOutput,Stream2", "SBF Stream 2"),
+        ]),
+        ("NMEA OUTPUT KONFIGURATION", [
+            ("getNMEAOutput,Stream1", "NMEA Stream 1 (für VRS)"),
+        ]),
+        ("GNSS KONSTELLATIONEN", [
+            ("getSignalTracking", "Aktive Signale & Konstellationen"),
+            ("getElevationMask", "Elevation Mask (Mindesthöhe Satelliten)"),
+        ]),
+        ("RTK / DIFFERENTIAL CORRECTION", [
+            ("getDiffCorrSettings", "Differential Correction Settings"),
+            ("getDiffCorrUsage", "Verwendung von Diff. Corrections"),
+            ("getPVTMode", "PVT Mode (Stand-Alone, DGNSS, RTK, etc.)"),
+            ("getReceiverDynamics", "Receiver Dynamics (Static/Kinematic)"),
+        ]),
+        ("RTK AMBIGUITY RESOLUTION", [
+            ("getAmbiguityMode", "Ambiguity Resolution Mode"),
+        ]),
+        ("ATTITUDE & HEADING (Dual-Antenna)", [
+            ("getAttitudeStatus", "Attitude/Heading Status"),
+            ("getAttitudeCoverage", "Attitude Antenna Coverage"),
+        ]),
+        ("NTRIP EINSTELLUNGEN", [
+            ("getNTRIPSettings,NTR1", "NTRIP Connection 1"),
+        ]),
+        ("AKTUELLER STATUS", [
+            ("getPVTMode", "Aktueller PVT Mode"),
+            ("getTrackingStatus", "Tracking Status (Satelliten)"),
+        ]),
+    ]
     
     def run_diagnostics(self):
         """Vollständige Diagnose durchführen"""
         
-        self.print_section("SYSTEM INFO")
-        self.print_command("getReceiverInfo", "Receiver Model & Firmware")
-        self.print_command("getHardwareVersion", "Hardware Version")
-        
-        self.print_section("COM PORT EINSTELLUNGEN")
-        self.print_command("getCOMSettings,COM1", "COM1 (Flight Controller)")
-        self.print_command("getCOMSettings,COM2", "COM2 (Companion Computer)")
-        self.print_command("getDataInOut,COM1", "COM1 Data In/Out")
-        self.print_command("getDataInOut,COM2", "COM2 Data In/Out")
-        
-        self.print_section("SBF OUTPUT KONFIGURATION")
-        self.print_command("getSBFOutput,Stream1", "SBF Stream 1 (normalerweise COM1)")
-        self.print_command("getSBFOutput,Stream2", "SBF Stream 2")
-        
-        self.print_section("NMEA OUTPUT KONFIGURATION")
-        self.print_command("getNMEAOutput,Stream1", "NMEA Stream 1 (für VRS)")
-        
-        self.print_section("GNSS KONSTELLATIONEN")
-        self.print_command("getSignalTracking", "Aktive Signale & Konstellationen")
-        self.print_command("getElevationMask", "Elevation Mask (Mindesthöhe Satelliten)")
-        
-        self.print_section("RTK / DIFFERENTIAL CORRECTION")
-        self.print_command("getDiffCorrSettings", "Differential Correction Settings")
-        self.print_command("getDiffCorrUsage", "Verwendung von Diff. Corrections")
-        self.print_command("getPVTMode", "PVT Mode (Stand-Alone, DGNSS, RTK, etc.)")
-        self.print_command("getReceiverDynamics", "Receiver Dynamics (Static/Kinematic)")
-        
-        self.print_section("RTK AMBIGUITY RESOLUTION")
-        self.print_command("getAmbiguityMode", "Ambiguity Resolution Mode")
-        
-        self.print_section("ATTITUDE & HEADING (Dual-Antenna)")
-        self.print_command("getAttitudeStatus", "Attitude/Heading Status")
-        self.print_command("getAttitudeCoverage", "Attitude Antenna Coverage")
-        
-        self.print_section("NTRIP EINSTELLUNGEN")
-        self.print_command("getNTRIPSettings,NTR1", "NTRIP Connection 1")
+        # Alle get-Befehle gepipelinet senden, danach sektionsweise ausgeben
+        commands = [command for _, entries in self.DIAGNOSTICS for command, _ in entries]
+        start = time.monotonic()
+        replies = iter(self.commands.execute(commands))
+        elapsed = time.monotonic() - start
         
-        self.print_section("AKTUELLER STATUS")
-        self.print_command("getPVTMode", "Aktueller PVT Mode")
-        self.print_command("getTrackingStatus", "Tracking Status (Satelliten)")
+        for title, entries in self.DIAGNOSTICS:
+            self.print_section(title)
+            for _, description in entries:
+                self.print_reply(next(replies), description)
         
         print(f"\n{'='*70}")
-        print("  DIAGNOSE ABGESCHLOSSEN")
+        print(f"  DIAGNOSE ABGESCHLOSSEN ({len(commands)} Befehle in {elapsed:.2f} s)")
         print(f"{'='*70}")
         
-        # COM2 wieder in NMEA-Modus zurücksetzen
-        self.restore_nmea_mode()
+        # COM2 wieder in NMEA-Modus zurücksetzen (über den Kontroll-Port bleibt COM2 unverändert)
+        if not self.control:
+            self.restore_nmea_mode()
 
 
 def main():
@@ -190,13 +213,19 @@ def main():
     # UART Device aus Umgebungsvariable oder Default
     import os
     uart_device = os.getenv('UART_DEVICE', UART_DEVICE)
+    control = os.getenv('MOSAIC_CONTROL', MOSAIC_CONTROL)
     
-    print(f"\nVerbinde mit: {uart_device}")
-    print(f"Baudrate: {UART_BAUDRATE}")
-    print("\nHinweis: Docker Container muss gestoppt sein!")
-    print("         → docker-compose down\n")
+    if control:
+        print(f"\nVerbinde mit Kontroll-Port: {control}")
+        print("Container läuft weiter, RTCM Weiterleitung wird nicht unterbrochen\n")
+    else:
+        print(f"\nVerbinde mit: {uart_device}")
+        print(f"Baudrate: {UART_BAUDRATE}")
+        print("\nHinweis: Docker Container muss gestoppt sein!")
+        print("         → docker-compose down")
+        print("         (oder CONTROL_PORT setzen und MOSAIC_CONTROL nutzen)\n")
     
-    diag = MosaicDiagnose(uart_device, UART_BAUDRATE, UART_TIMEOUT)
+    diag = MosaicDiagnose(uart_device, UART_BAUDRATE, UART_TIMEOUT, control)
     
     if not diag.connect():
         sys.exit(1)
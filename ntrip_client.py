@@ -5,377 +5,5911 @@ Holt RTCM Korrekturdaten von einem NTRIP Caster und leitet sie über UART an das
 """
 
 import os
+import re
 import sys
 import time
 import serial
 import socket
 import base64
+import struct
+import binascii
+import hashlib
+import json
+import random
+import math
+import mmap
+import select
+import signal
+import asyncio
+import subprocess
+import http.client
+import atexit
 import logging
+import logging.handlers
+import queue as queue_module
+import threading
+import operator
+import collections
+from functools import reduce
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from datetime import datetime
 
-# Logging konfigurieren
-log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
-logging.basicConfig(
-    level=getattr(logging, log_level),
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('/app/logs/ntrip_client.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
 logger = logging.getLogger(__name__)
 
 
+class LogRateLimiter(logging.Filter):
+    """Warnungen und Fehler pro Meldungsschlüssel auf burst Meldungen je interval Sekunden begrenzen
+
+    Schlüssel ist die Aufrufstelle (Datei, Zeile) oder extra={'rate_key': ...}.
+    Fehlerpfade im Forwarding-Loop (z.B. send_data/receive_data) erzeugen so
+    höchstens burst Zeilen pro Fenster; die Anzahl unterdrückter Meldungen
+    wird an der ersten Meldung des nächsten Fensters vermerkt.
+    """
+
+    def __init__(self, burst=10, interval=60.0, level=logging.WARNING):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.level = level
+        self.suppressed = 0
+        # Schlüssel → [Fensterbeginn, Meldungen, unterdrückt]
+        self._windows = {}
+
+    def filter(self, record):
+        if record.levelno < self.level:
+            return True
+        key = getattr(record, 'rate_key', None) or (record.pathname, record.lineno)
+        window = self._windows.get(key)
+        if window is None or record.created - window[0] >= self.interval:
+            self._windows[key] = [record.created, 1, 0]
+            if window is not None and window[2]:
+                record.suppressed = window[2]
+                record.msg = f"{record.msg} ({window[2]} gleichartige Meldungen unterdrückt)"
+            return True
+        if window[1] < self.burst:
+            window[1] += 1
+            return True
+        window[2] += 1
+        self.suppressed += 1
+        return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, der bei voller Queue verwirft statt zu warten
+
+    Schreiben (Datei auf der SD-Karte, stdout) übernimmt der QueueListener in
+    einem eigenen Thread - der aufrufende Thread wartet nie auf I/O.
+    """
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+        self._reported = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue_module.Full:
+            self.dropped += 1
+            return
+        if self._reported < self.dropped:
+            # Verluste nachträglich melden, sobald wieder Platz ist
+            dropped, self._reported = self.dropped - self._reported, self.dropped
+            notice = logging.LogRecord(logger.name, logging.WARNING, __file__, 0,
+                                       f"{dropped} Log-Meldungen verworfen (Log-Queue voll)", None, None)
+            try:
+                self.queue.put_nowait(notice)
+            except queue_module.Full:
+                pass
+
+
+class JSONLogFormatter(logging.Formatter):
+    """Eine JSON Zeile pro Meldung (LOG_FORMAT=json), z.B. für Loki/Elasticsearch
+
+    Tracebacks stehen bereits in message (QueueHandler.prepare() formatiert sie im Aufrufer).
+    Im Supervisor-Modus trägt jede Zeile zusätzlich den Namen der Pipeline.
+    """
+
+    def __init__(self, pipeline=None):
+        super().__init__()
+        self.pipeline = pipeline
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if self.pipeline:
+            entry['pipeline'] = self.pipeline
+        if getattr(record, 'suppressed', None):
+            entry['suppressed'] = record.suppressed
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def setup_logging():
+    """Logging konfigurieren (rotierende Datei + stdout über eine Queue)
+
+    Wird erst beim Programmstart aufgerufen, damit Hilfsskripte (z.B. benchmark.py)
+    das Modul ohne /app/logs importieren können. Aufrufer legen Meldungen nur
+    in eine Queue (LOG_QUEUE_SIZE, bei Überlauf verworfen), geschrieben wird
+    im Thread des QueueListeners. Warnungen und Fehler werden pro Aufrufstelle
+    begrenzt (LOG_RATE_LIMIT=Meldungen/Sekunden, 0 = aus).
+
+    Returns:
+        Gestarteter QueueListener (wird beim Beenden automatisch gestoppt)
+    """
+    log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
+    log_file = os.getenv('LOG_FILE', '/app/logs/ntrip_client.log')
+    log_max_bytes = int(float(os.getenv('LOG_MAX_MB', '10')) * 1024 * 1024)
+    log_backup_count = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+    log_format = os.getenv('LOG_FORMAT', 'text').lower()
+    log_rate_limit = os.getenv('LOG_RATE_LIMIT', '10/60')
+    log_queue_size = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+    # Vom Supervisor gesetzt: Pipeline-Name in jeder Zeile (gemeinsames stdout)
+    pipeline = os.getenv('PIPELINE_NAME', '')
+
+    if log_format == 'json':
+        formatter = JSONLogFormatter(pipeline)
+    elif pipeline:
+        formatter = logging.Formatter(f'%(asctime)s - {pipeline} - %(levelname)s - %(message)s')
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    handlers = [logging.StreamHandler(sys.stdout)]
+    file_error = None
+    if log_file:
+        try:
+            handlers.append(logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=log_max_bytes, backupCount=log_backup_count, encoding='utf-8'))
+        except OSError as e:
+            file_error = e
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    queue_handler = NonBlockingQueueHandler(queue_module.Queue(log_queue_size))
+    burst, _, interval = log_rate_limit.partition('/')
+    if burst and int(burst) > 0:
+        queue_handler.addFilter(LogRateLimiter(int(burst), float(interval or 60)))
+    listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, log_level))
+    root.handlers = [queue_handler]
+    if file_error:
+        logger.warning(f"Log-Datei {log_file} kann nicht geöffnet werden ({file_error}) - nur stdout")
+    return listener
+
+
+def nmea_checksum_ok(sentence):
+    """Prüft die XOR-Checksumme eines NMEA Satzes (bytes, beginnt mit '$')"""
+    star = sentence.find(b'*')
+    if star < 1 or len(sentence) < star + 3:
+        return False
+    try:
+        expected = int(sentence[star + 1:star + 3], 16)
+    except ValueError:
+        return False
+    return reduce(operator.xor, sentence[1:star], 0) == expected
+
+
+class NMEAFramer:
+    """Inkrementeller, begrenzter NMEA Framer für den UART Byte-Stream
+
+    Arbeitet auf einem vorab allokierten Puffer fester Größe: neue Bytes werden
+    angehängt, vollständige Zeilen ausgewertet und nur der unvollständige Rest
+    an den Pufferanfang verschoben. Der Stream darf NMEA, SBF und $R Antworten
+    gemischt enthalten - es werden nur GGA Sätze mit gültiger Checksumme
+    akzeptiert, und pro feed() immer die neueste.
+    """
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self._len = 0
+
+        # Letzte gültige GGA (str inkl. \r\n) und Empfangszeitpunkt (monotonic)
+        self.latest_gga = None
+        self.latest_gga_time = None
+
+        self.gga_count = 0
+        self.checksum_errors = 0
+        self.overflows = 0
+
+    @property
+    def gga_age(self):
+        """Alter der letzten gültigen GGA in Sekunden (None wenn noch keine)"""
+        if self.latest_gga_time is None:
+            return None
+        return time.monotonic() - self.latest_gga_time
+
+    def reset(self):
+        """Unvollständige Daten verwerfen (Cache der letzten GGA bleibt erhalten)"""
+        self._len = 0
+
+    def feed(self, data):
+        """Bytes verarbeiten
+
+        Returns:
+            Neueste gültige GGA aus diesem Aufruf (str) oder None
+        """
+        newest = None
+        view = memoryview(data)
+        while view:
+            free = self.capacity - self._len
+            if not free:
+                # Puffer voll ohne Zeilenende (z.B. SBF Binärdaten) - verwerfen
+                self.overflows += 1
+                self._len = 0
+                free = self.capacity
+            part = view[:free]
+            view = view[free:]
+            self._buf[self._len:self._len + len(part)] = part
+            self._len += len(part)
+            gga = self._process()
+            if gga:
+                newest = gga
+        return newest
+
+    def _process(self):
+        buf = self._buf
+        last_nl = buf.rfind(b'\n', 0, self._len)
+        if last_nl < 0:
+            return None
+
+        gga = None
+        search_end = last_nl
+        while True:
+            pos = buf.rfind(b'GGA,', 0, search_end)
+            if pos < 3:
+                break
+            start = pos - 3
+            search_end = start
+            if buf[start] != 0x24:  # '$'
+                continue
+            end = buf.find(b'\n', pos, last_nl + 1)
+            sentence = bytes(buf[start:end]).rstrip(b'\r')
+            if nmea_checksum_ok(sentence):
+                gga = sentence.decode('ascii') + '\r\n'
+                break
+            self.checksum_errors += 1
+
+        # Unvollständigen Rest an den Pufferanfang verschieben
+        rest = self._len - (last_nl + 1)
+        buf[0:rest] = buf[last_nl + 1:self._len]
+        self._len = rest
+
+        if gga:
+            self.latest_gga = gga
+            self.latest_gga_time = time.monotonic()
+            self.gga_count += 1
+        return gga
+
+
+def _crc24q_table():
+    table = []
+    for i in range(256):
+        crc = i << 16
+        for _ in range(8):
+            crc <<= 1
+            if crc & 0x1000000:
+                crc ^= 0x1864CFB
+        table.append(crc & 0xFFFFFF)
+    return tuple(table)
+
+
+CRC24Q_TABLE = _crc24q_table()
+
+
+def crc24q(data, crc=0):
+    """CRC-24Q (RTCM3 / Qualcomm) über bytes-artige Daten"""
+    table = CRC24Q_TABLE
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFF) ^ table[(crc >> 16) ^ byte]
+    return crc
+
+
+def rtcm_message_type(frame):
+    """Nachrichtentyp (DF002, 12 Bit) eines vollständigen RTCM3 Frames"""
+    if len(frame) < 6:
+        return 0
+    return (frame[3] << 4) | (frame[4] >> 4)
+
+
+# GPS - UTC Schaltsekunden (Stand 2017, per GPS_LEAP_SECONDS überschreibbar)
+GPS_LEAP_SECONDS = int(os.getenv('GPS_LEAP_SECONDS', '18'))
+DAY_MS = 86400000
+
+# MSM Nachrichten (1071-1137) je Konstellation: Offset der Epochenzeit zu GPS Zeit
+RTCM_MSM_SYSTEMS = {107: 'GPS', 108: 'GLONASS', 109: 'Galileo', 110: 'SBAS', 111: 'QZSS', 112: 'BeiDou', 113: 'NavIC'}
+
+
+def rtcm_epoch_tod_ms(frame):
+    """Epochenzeit einer RTCM Beobachtungsnachricht als GPS Tageszeit in ms
+
+    Unterstützt MSM1-7 aller Konstellationen sowie die Legacy Nachrichten
+    1001-1004 (GPS) und 1009-1012 (GLONASS). Gibt None für alle anderen
+    Nachrichtentypen zurück. Verglichen wird nur modulo 24 h, da GGA keine
+    Wochennummer enthält.
+    """
+    if len(frame) < 13:
+        return None
+    msg_type = (frame[3] << 4) | (frame[4] >> 4)
+    # Epochenzeit beginnt bei Payload-Bit 24 (nach Typ und Stations-ID)
+    bits = int.from_bytes(frame[6:10], 'big')
+    if 1071 <= msg_type <= 1137 and 1 <= msg_type % 10 <= 7:
+        system = RTCM_MSM_SYSTEMS.get(msg_type // 10)
+        if system == 'GLONASS':
+            # 3 Bit Wochentag + 27 Bit ms des Tages in Moskauer Zeit (UTC+3)
+            tod = (bits >> 2) & 0x7FFFFFF
+            return (tod - 3 * 3600000 + GPS_LEAP_SECONDS * 1000) % DAY_MS
+        tow = bits >> 2
+        if system == 'BeiDou':
+            tow += 14000  # BDT = GPST - 14 s
+        return tow % DAY_MS
+    if 1001 <= msg_type <= 1004:
+        return (bits >> 2) % DAY_MS
+    if 1009 <= msg_type <= 1012:
+        tod = bits >> 5
+        return (tod - 3 * 3600000 + GPS_LEAP_SECONDS * 1000) % DAY_MS
+    return None
+
+
+def rtcm_epoch_end(frame):
+    """Schließt diese Beobachtungsnachricht die Epoche ab?
+
+    Wertet das Multiple Message Bit (MSM, DF393) bzw. das Synchronous GNSS
+    Flag (1001-1004 DF005, 1009-1012 DF039) aus: 0 = letzte Nachricht der
+    Epoche. Gibt None für Nachrichten ohne Epochenbezug zurück.
+    """
+    if len(frame) < 13:
+        return None
+    msg_type = (frame[3] << 4) | (frame[4] >> 4)
+    # Flag folgt direkt auf die Epochenzeit (Payload-Bit 54 bzw. 51 bei GLONASS Legacy)
+    bits = int.from_bytes(frame[6:11], 'big')
+    if (1071 <= msg_type <= 1137 and 1 <= msg_type % 10 <= 7) or 1001 <= msg_type <= 1004:
+        return not (bits >> 9) & 1
+    if 1009 <= msg_type <= 1012:
+        return not (bits >> 12) & 1
+    return None
+
+
+# MSM Kopf bis einschließlich Glättungsintervall (DF002 ... DF418) in Bit
+MSM_HEADER_BITS = 73
+
+# MSM Datenfelder (Name, Bit, vorzeichenbehaftet) je MSM Stufe, pro Feld für alle Satelliten bzw. Zellen
+MSM_SAT_FIELDS = {
+    4: (('rough_ms', 8, False), ('rough_mod', 10, False)),
+    5: (('rough_ms', 8, False), ('ext_info', 4, False), ('rough_mod', 10, False), ('rough_rate', 14, True)),
+    6: (('rough_ms', 8, False), ('rough_mod', 10, False)),
+    7: (('rough_ms', 8, False), ('ext_info', 4, False), ('rough_mod', 10, False), ('rough_rate', 14, True)),
+}
+MSM_SIG_FIELDS = {
+    4: (('pr', 15, True), ('cp', 22, True), ('lock', 4, False), ('half', 1, False), ('cnr', 6, False)),
+    5: (('pr', 15, True), ('cp', 22, True), ('lock', 4, False), ('half', 1, False), ('cnr', 6, False),
+        ('rate', 15, True)),
+    6: (('pr', 20, True), ('cp', 24, True), ('lock', 10, False), ('half', 1, False), ('cnr', 10, False)),
+    7: (('pr', 20, True), ('cp', 24, True), ('lock', 10, False), ('half', 1, False), ('cnr', 10, False),
+        ('rate', 15, True)),
+}
+
+# Frequenzband (erste Ziffer des RINEX Codes) je MSM Signal-ID, für RTCM_EXCLUDE=System:Band
+MSM_SIGNAL_BANDS = {
+    'GPS': {2: '1', 3: '1', 4: '1', 8: '2', 9: '2', 10: '2', 15: '2', 16: '2', 17: '2',
+            22: '5', 23: '5', 24: '5', 30: '1', 31: '1', 32: '1'},
+    'GLONASS': {2: '1', 3: '1', 8: '2', 9: '2'},
+    'Galileo': {2: '1', 3: '1', 4: '1', 5: '1', 6: '1', 8: '6', 9: '6', 10: '6', 11: '6', 12: '6',
+                14: '7', 15: '7', 16: '7', 18: '8', 19: '8', 20: '8', 22: '5', 23: '5', 24: '5'},
+    'SBAS': {2: '1', 22: '5', 23: '5', 24: '5'},
+    'QZSS': {2: '1', 9: '6', 10: '6', 11: '6', 15: '2', 16: '2', 17: '2', 22: '5', 23: '5', 24: '5',
+             30: '1', 31: '1', 32: '1'},
+    'BeiDou': {2: '2', 3: '2', 4: '2', 8: '6', 9: '6', 10: '6', 14: '7', 15: '7', 16: '7',
+               22: '5', 23: '5', 24: '5', 25: '7', 26: '7', 27: '7', 30: '1', 31: '1', 32: '1'},
+    'NavIC': {8: '5', 22: '5'},
+}
+
+# Nicht-MSM Nachrichten mit Konstellationsbezug (Legacy Beobachtungen, Ephemeriden, Biases)
+RTCM_SYSTEM_TYPES = {
+    1001: 'GPS', 1002: 'GPS', 1003: 'GPS', 1004: 'GPS', 1019: 'GPS',
+    1009: 'GLONASS', 1010: 'GLONASS', 1011: 'GLONASS', 1012: 'GLONASS', 1020: 'GLONASS', 1230: 'GLONASS',
+    1041: 'NavIC', 1042: 'BeiDou', 1043: 'SBAS', 1044: 'QZSS', 1045: 'Galileo', 1046: 'Galileo',
+}
+
+# Kurzformen für RTCM_EXCLUDE
+RTCM_SYSTEM_ALIASES = {
+    'GPS': 'GPS', 'GLONASS': 'GLONASS', 'GLO': 'GLONASS', 'GALILEO': 'Galileo', 'GAL': 'Galileo',
+    'SBAS': 'SBAS', 'QZSS': 'QZSS', 'QZS': 'QZSS', 'BEIDOU': 'BeiDou', 'BDS': 'BeiDou',
+    'NAVIC': 'NavIC', 'IRN': 'NavIC',
+}
+
+
+def rtcm_system(msg_type):
+    """Konstellation einer RTCM Nachricht oder None (Stationsdaten usw.)"""
+    if 1071 <= msg_type <= 1137:
+        return RTCM_MSM_SYSTEMS.get(msg_type // 10)
+    return RTCM_SYSTEM_TYPES.get(msg_type)
+
+
+def _unpack(block, bits, count, signed):
+    """count Werte zu je bits Bit aus einem zusammenhängenden Block lesen"""
+    mask = (1 << bits) - 1
+    sign = 1 << (bits - 1)
+    values = [(block >> (bits * (count - 1 - i))) & mask for i in range(count)]
+    if signed:
+        values = [v - (sign << 1) if v & sign else v for v in values]
+    return values
+
+
+def msm_decode(frame):
+    """MSM4-7 Frame in Kopf, Masken und Feldlisten zerlegen
+
+    Returns:
+        dict mit type, header (73 Bit roh), sat_mask, sig_mask, cell_mask,
+        sat {Feld: [Werte je Satellit]}, sig {Feld: [Werte je Zelle]};
+        None für andere Nachrichten oder abgeschnittene Frames
+    """
+    msg_type = rtcm_message_type(frame)
+    if not (1071 <= msg_type <= 1137 and 4 <= msg_type % 10 <= 7):
+        return None
+    length = ((frame[1] & 0x03) << 8) | frame[2]
+    total = length * 8
+    payload = int.from_bytes(frame[3:3 + length], 'big')
+    pos = 0
+
+    def take(bits):
+        nonlocal pos
+        pos += bits
+        return (payload >> (total - pos)) & ((1 << bits) - 1) if pos <= total else 0
+
+    header = take(MSM_HEADER_BITS)
+    sat_mask = take(64)
+    sig_mask = take(32)
+    nsat = bin(sat_mask).count('1')
+    nsig = bin(sig_mask).count('1')
+    cell_mask = take(nsat * nsig)
+    ncell = bin(cell_mask).count('1')
+    level = msg_type % 10
+    sat = {name: _unpack(take(bits * nsat), bits, nsat, signed) for name, bits, signed in MSM_SAT_FIELDS[level]}
+    sig = {name: _unpack(take(bits * ncell), bits, ncell, signed) for name, bits, signed in MSM_SIG_FIELDS[level]}
+    if pos > total:
+        return None
+    return {'type': msg_type, 'header': header, 'sat_mask': sat_mask, 'sig_mask': sig_mask,
+            'cell_mask': cell_mask, 'sat': sat, 'sig': sig}
+
+
+def msm_encode(msg):
+    """Zerlegte MSM Nachricht (siehe msm_decode) als RTCM3 Frame mit CRC-24Q kodieren"""
+    level = msg['type'] % 10
+    nsat = bin(msg['sat_mask']).count('1')
+    nsig = bin(msg['sig_mask']).count('1')
+    header = (msg['type'] << (MSM_HEADER_BITS - 12)) | (msg['header'] & ((1 << (MSM_HEADER_BITS - 12)) - 1))
+    value = (((header << 64 | msg['sat_mask']) << 32 | msg['sig_mask']) << (nsat * nsig)) | msg['cell_mask']
+    total = MSM_HEADER_BITS + 96 + nsat * nsig
+    for fields, data in ((MSM_SAT_FIELDS[level], msg['sat']), (MSM_SIG_FIELDS[level], msg['sig'])):
+        for name, bits, _ in fields:
+            mask = (1 << bits) - 1
+            for v in data[name]:
+                value = (value << bits) | (v & mask)
+                total += bits
+    padding = -total % 8
+    length = (total + padding) // 8
+    body = bytes((0xD3, (length >> 8) & 0x03, length & 0xFF)) + (value << padding).to_bytes(length, 'big')
+    return body + crc24q(body).to_bytes(3, 'big')
+
+
+def _mask_ids(mask, width):
+    """IDs (1-basiert, MSB zuerst) der gesetzten Bits einer Maske"""
+    return [i + 1 for i in range(width) if mask >> (width - 1 - i) & 1]
+
+
+def msm_filter_signals(msg, drop_ids):
+    """Signale (MSM Signal-IDs) aus einer zerlegten MSM Nachricht entfernen
+
+    Zellen der entfernten Signale und Satelliten ohne verbleibende Zelle
+    fallen weg. Returns: neue Nachricht, unveränderte Nachricht wenn nichts
+    zu entfernen ist, None wenn keine Zelle übrig bleibt.
+    """
+    sig_ids = _mask_ids(msg['sig_mask'], 32)
+    keep_sig = [sid not in drop_ids for sid in sig_ids]
+    if all(keep_sig):
+        return msg
+    sat_ids = _mask_ids(msg['sat_mask'], 64)
+    nsig = len(sig_ids)
+    ncells = len(sat_ids) * nsig
+
+    kept_cells, kept_sats, cell_rows = [], [], []
+    cell = 0
+    for i in range(len(sat_ids)):
+        row = []
+        for j in range(nsig):
+            if msg['cell_mask'] >> (ncells - 1 - (i * nsig + j)) & 1:
+                if keep_sig[j]:
+                    kept_cells.append(cell)
+                    row.append(1)
+                else:
+                    row.append(0)
+                cell += 1
+            else:
+                row.append(0)
+        if any(row):
+            kept_sats.append(i)
+            cell_rows.append([bit for bit, keep in zip(row, keep_sig) if keep])
+    if not kept_cells:
+        return None
+
+    sat_mask = 0
+    for i in kept_sats:
+        sat_mask |= 1 << (64 - sat_ids[i])
+    sig_mask = 0
+    for sid, keep in zip(sig_ids, keep_sig):
+        if keep:
+            sig_mask |= 1 << (32 - sid)
+    cell_mask = 0
+    for row in cell_rows:
+        for bit in row:
+            cell_mask = (cell_mask << 1) | bit
+    return dict(msg, sat_mask=sat_mask, sig_mask=sig_mask, cell_mask=cell_mask,
+                sat={name: [values[i] for i in kept_sats] for name, values in msg['sat'].items()},
+                sig={name: [values[c] for c in kept_cells] for name, values in msg['sig'].items()})
+
+
+def _rescale(value, shift, bits):
+    """Vorzeichenbehaftetes Feld um shift Bit gröber runden, Ungültig-Wert (-2^(n-1)) erhalten"""
+    limit = 1 << (bits - 1)
+    if value == -(limit << shift):
+        return -limit
+    value = (value + (1 << (shift - 1))) >> shift
+    return max(-limit + 1, min(limit - 1, value))
+
+
+def msm_lock_time_ms(indicator):
+    """Minimale Lock-Zeit in ms eines erweiterten Lock-Time Indikators (DF407)"""
+    if indicator < 64:
+        return indicator
+    group = min(indicator, 704) >> 5
+    return (1 << (group + 4)) + (1 << (group - 1)) * (min(indicator, 704) - 32 * group)
+
+
+def msm_lock_indicator(lock_ms):
+    """Lock-Time Indikator DF402 (4 Bit) für eine Lock-Zeit in ms"""
+    if lock_ms < 32:
+        return 0
+    return min(15, lock_ms.bit_length() - 5)
+
+
+def msm_to_msm4(msg):
+    """MSM5/6/7 nach MSM4: hochauflösende Felder runden, Doppler und Zusatzinfo entfallen
+
+    DF405/DF406 (2^-29/2^-31 ms) → DF400/DF401 (2^-24/2^-29 ms), DF407 →
+    DF402 über die minimale Lock-Zeit, DF408 (1/16 dB-Hz) → DF403 (dB-Hz).
+    """
+    level = msg['type'] % 10
+    sat, sig = msg['sat'], msg['sig']
+    if level in (6, 7):
+        pr = [_rescale(v, 5, 15) for v in sig['pr']]
+        cp = [_rescale(v, 2, 22) for v in sig['cp']]
+        lock = [msm_lock_indicator(msm_lock_time_ms(v)) for v in sig['lock']]
+        cnr = [min(63, (v + 8) >> 4) for v in sig['cnr']]
+    else:
+        pr, cp, lock, cnr = sig['pr'], sig['cp'], sig['lock'], sig['cnr']
+    return dict(msg, type=msg['type'] - level + 4,
+                sat={'rough_ms': sat['rough_ms'], 'rough_mod': sat['rough_mod']},
+                sig={'pr': pr, 'cp': cp, 'lock': lock, 'half': sig['half'], 'cnr': cnr})
+
+
+def parse_rtcm_exclude(value):
+    """RTCM_EXCLUDE lesen: kommagetrennt System (ganze Konstellation) oder System:Band
+
+    Beispiel "GLONASS,GPS:L5,GAL:E6" - GLONASS komplett, GPS L5 und Galileo E6.
+
+    Returns:
+        (Menge ausgeschlossener Systeme, {System: Menge auszuschließender MSM Signal-IDs})
+    """
+    systems, signals = set(), {}
+    for entry in value.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, bands = entry.partition(':')
+        system = RTCM_SYSTEM_ALIASES.get(name.strip().upper())
+        if system is None:
+            raise ValueError(f"Unbekanntes GNSS System '{name}'")
+        if not bands:
+            systems.add(system)
+            continue
+        # Band als RINEX Ziffer, Präfixe wie L/E/B sind erlaubt ("GPS:L5", "GAL:E6", "GPS:L2L5")
+        for band in (char for char in bands if char.isdigit()):
+            ids = {sid for sid, sig_band in MSM_SIGNAL_BANDS[system].items() if sig_band == band}
+            if not ids:
+                raise ValueError(f"Kein MSM Signal im Band {band} für {system}")
+            signals.setdefault(system, set()).update(ids)
+    return systems, signals
+
+
+class RTCMRewriter:
+    """Optionale Umschreibstufe vor dem UART: Konstellationen/Signale filtern, MSM7 → MSM4
+
+    Viele VRS Mountpoints senden MSM7 für vier Konstellationen und lasten
+    einen 115200 Baud UART fast aus. Nachrichten ausgeschlossener Systeme
+    werden verworfen, ausgeschlossene Signale aus den MSM Zellen entfernt und
+    MSM5-7 auf Wunsch als MSM4 neu kodiert (inkl. CRC). Nicht betroffene
+    Frames werden unverändert (ohne Kopie) durchgereicht.
+    """
+
+    def __init__(self, exclude_systems=(), exclude_signals=None, msm4=False, report_interval=60):
+        self.exclude_systems = set(exclude_systems)
+        self.exclude_signals = exclude_signals or {}
+        self.msm4 = msm4
+        self.report_interval = report_interval
+
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.frames_dropped = 0
+        self.frames_rewritten = 0
+        # Ersparnis der letzten vollständigen Minute (bytes_in, bytes_out)
+        self.last_report = None
+        self._report_start = None
+        self._report_in = 0
+        self._report_out = 0
+
+    def rewrite(self, frames, now=None):
+        """Frames umschreiben, Returns: neue Frame-Liste (ggf. kürzer)"""
+        out = []
+        size_in = size_out = 0
+        for frame in frames:
+            size_in += len(frame)
+            msg_type = rtcm_message_type(frame)
+            system = rtcm_system(msg_type)
+            if system in self.exclude_systems:
+                self.frames_dropped += 1
+                continue
+            level = msg_type % 10 if 1071 <= msg_type <= 1137 else 0
+            drop_ids = self.exclude_signals.get(system)
+            if (drop_ids and 4 <= level <= 7) or (self.msm4 and 5 <= level <= 7):
+                msg = msm_decode(frame)
+                if msg is not None:
+                    if drop_ids:
+                        msg = msm_filter_signals(msg, drop_ids)
+                        if msg is None:
+                            self.frames_dropped += 1
+                            continue
+                    if self.msm4 and level > 4:
+                        msg = msm_to_msm4(msg)
+                    frame = msm_encode(msg)
+                    self.frames_rewritten += 1
+            size_out += len(frame)
+            out.append(frame)
+
+        self.bytes_in += size_in
+        self.bytes_out += size_out
+        self._account(size_in, size_out, time.monotonic() if now is None else now)
+        return out
+
+    def _account(self, size_in, size_out, now):
+        """Ersparnis pro report_interval (Standard: Minute) loggen"""
+        if self._report_start is None:
+            self._report_start = now
+        self._report_in += size_in
+        self._report_out += size_out
+        if now - self._report_start >= self.report_interval:
+            self.last_report = (self._report_in, self._report_out)
+            if self._report_in:
+                saved = self._report_in - self._report_out
+                logger.info(
+                    f"RTCM Umschreibung: {saved} bytes/min eingespart "
+                    f"({self._report_in} → {self._report_out} bytes, -{saved / self._report_in * 100:.1f}%)"
+                )
+            self._report_start = now
+            self._report_in = self._report_out = 0
+
+
+def gga_gps_tod_ms(gga):
+    """UTC Zeit einer GGA (hhmmss.ss) als GPS Tageszeit in ms, None wenn ungültig"""
+    try:
+        utc = gga.split(',', 2)[1]
+        tod = int(utc[0:2]) * 3600000 + int(utc[2:4]) * 60000 + round(float(utc[4:]) * 1000)
+    except (IndexError, ValueError):
+        return None
+    return (tod + GPS_LEAP_SECONDS * 1000) % DAY_MS
+
+
+def _nmea_coordinate(value, hemisphere):
+    """NMEA (d)ddmm.mmmm + Hemisphäre in Dezimalgrad"""
+    dot = value.index('.') if '.' in value else len(value)
+    degrees = int(value[:dot - 2]) + float(value[dot - 2:]) / 60
+    return -degrees if hemisphere in ('S', 'W') else degrees
+
+
+def parse_gga(gga):
+    """GGA Satz in ein dict zerlegen, None wenn ungültig
+
+    Felder: time (hhmmss.ss), lat/lon (Dezimalgrad), quality (0 ungültig,
+    1 GPS, 2 DGPS, 4 RTK fixed, 5 RTK float, ...), satellites, hdop, altitude,
+    age (Alter der Differenzkorrektur in s) und station.
+    """
+    try:
+        fields = gga.split('*', 1)[0].split(',')
+        if len(fields) < 15 or not fields[0].endswith('GGA'):
+            return None
+        return {
+            'time': fields[1],
+            'lat': _nmea_coordinate(fields[2], fields[3]) if fields[2] else None,
+            'lon': _nmea_coordinate(fields[4], fields[5]) if fields[4] else None,
+            'quality': int(fields[6] or 0),
+            'satellites': int(fields[7] or 0),
+            'hdop': float(fields[8]) if fields[8] else None,
+            'altitude': float(fields[9]) if fields[9] else None,
+            'age': float(fields[13]) if fields[13] else None,
+            'station': fields[14],
+        }
+    except (ValueError, IndexError):
+        return None
+
+
+def gga_distance(a, b):
+    """Horizontaler Abstand zweier parse_gga() Positionen in Metern (lokal eben, für kurze Strecken)"""
+    lat = math.radians((a['lat'] + b['lat']) / 2)
+    north = math.radians(b['lat'] - a['lat']) * 6371000
+    east = math.radians(b['lon'] - a['lon']) * 6371000 * math.cos(lat)
+    return math.hypot(north, east)
+
+
+class GGAScheduler:
+    """Adaptive GGA Uploads für VRS: Zeitpunkt aus dem Inhalt der GGA ableiten
+
+    check() entscheidet pro aktueller GGA, ob sie an den Caster geht:
+      - first: erste Position einer Verbindung (VRS wird erst damit erzeugt)
+      - moved: seit dem letzten Upload mehr als recenter_distance bewegt -
+        der Caster soll die VRS sofort neu berechnen
+      - quality: Fix-Qualität hat sich geändert (z.B. RTK fixed → float/DGPS)
+      - interval: aktuelles Intervall abgelaufen
+    Im Stand verdoppelt sich das Intervall nach jedem Upload bis
+    max_interval. Sobald sich das Fahrzeug wieder bewegt, gilt sofort
+    wieder interval (Anfahren nach langem Stand). Als Stand gilt eine
+    Bewegung unter stationary_distance × HDOP (mindestens × 1) - bei
+    schlechter Geometrie wird Positionsrauschen nicht als Bewegung gewertet.
+    Zwischen zwei Uploads liegen nie weniger als min_interval Sekunden
+    (Caster-Vorgaben, Uplink über LTE).
+
+    Mit min_interval = max_interval = interval und recenter_distance = 0
+    entspricht das dem festen Intervall (fixed()).
+    """
+
+    REASONS = ('first', 'moved', 'quality', 'interval')
+
+    def __init__(self, interval=5.0, min_interval=1.0, max_interval=30.0, recenter_distance=100.0,
+                 stationary_distance=2.0):
+        self.base_interval = interval
+        self.min_interval = min(min_interval, interval)
+        self.max_interval = max(max_interval, interval)
+        self.recenter_distance = recenter_distance
+        self.stationary_distance = stationary_distance
+        self.interval = interval
+        self.uploads = {reason: 0 for reason in self.REASONS}
+        self.last_distance = None
+        self._last_time = None
+        self._last_info = None
+
+    @classmethod
+    def fixed(cls, interval):
+        """Festes Intervall wie bisher (GGA alle interval Sekunden)"""
+        return cls(interval, min_interval=interval, max_interval=interval, recenter_distance=0)
+
+    def reset(self):
+        """Neue Caster-Verbindung: nächste GGA sofort senden"""
+        self._last_time = None
+        self._last_info = None
+        self.interval = self.base_interval
+
+    def check(self, gga, now):
+        """Grund für einen Upload der GGA zum Zeitpunkt now (time.monotonic), None = nicht senden"""
+        if self._last_time is None:
+            return 'first'
+        elapsed = now - self._last_time
+        if elapsed < self.min_interval:
+            return None
+        info, last = parse_gga(gga), self._last_info
+        interval = self.interval
+        if info and last and info['lat'] is not None and last['lat'] is not None:
+            if info['quality'] != last['quality']:
+                return 'quality'
+            distance = gga_distance(last, info)
+            if self.recenter_distance and distance >= self.recenter_distance:
+                return 'moved'
+            if distance >= self._noise(info):
+                interval = self.base_interval
+        elif info and info['lat'] is not None and last is not None:
+            # Erste gültige Position nach GGA ohne Fix
+            return 'quality'
+        if elapsed >= interval:
+            return 'interval'
+        return None
+
+    def _noise(self, info):
+        """Bewegung unterhalb dieser Strecke (m) gilt als Stand"""
+        return self.stationary_distance * max(1.0, info['hdop'] or 1.0)
+
+    def sent(self, gga, now, reason):
+        """Upload vermerken und Intervall anpassen (Stand: verdoppeln, Bewegung: zurücksetzen)"""
+        info, last = parse_gga(gga), self._last_info
+        if info and last and info['lat'] is not None and last['lat'] is not None:
+            self.last_distance = gga_distance(last, info)
+            if self.last_distance < self._noise(info):
+                self.interval = min(self.interval * 2, self.max_interval)
+            else:
+                self.interval = self.base_interval
+        self.uploads[reason] += 1
+        self._last_time = now
+        self._last_info = info
+
+    def wait_time(self, now):
+        """Sekunden bis zum nächsten periodischen Upload (neue GGA wird vorher geprüft)"""
+        if self._last_time is None:
+            return 0.0
+        return max(self._last_time + self.interval - now, 0.0)
+
+
+class RTCM3Framer:
+    """Streaming RTCM3 Framer (0xD3 Präambel, 10-Bit Länge, CRC-24Q)
+
+    Sitzt zwischen Caster und UART: feed() liefert nur vollständige Frames mit
+    gültiger CRC. Frames die komplett in einem Chunk liegen werden als
+    memoryview auf den Chunk zurückgegeben (keine Kopie), nur über
+    Chunk-Grenzen gestückelte Frames werden zusammengesetzt.
+    """
+
+    PREAMBLE = 0xD3
+    MAX_FRAME = 3 + 1023 + 3
+
+    def __init__(self):
+        self._carry = bytearray()
+
+        self.frames = 0
+        self.bytes = 0
+        self.crc_errors = 0
+        self.discarded_bytes = 0
+        # Nachrichtentyp → [Frames, Bytes]
+        self.type_stats = {}
+
+    def reset(self):
+        """Unvollständigen Frame verwerfen (z.B. bei Reconnect)"""
+        if self._carry:
+            logger.debug(f"Verwerfe unvollständigen RTCM Frame ({len(self._carry)} bytes)")
+            self.discarded_bytes += len(self._carry)
+            self._carry.clear()
+
+    def feed(self, data, end=None, start=0):
+        """Chunk verarbeiten
+
+        Args:
+            data: bytes oder bytearray (z.B. wiederverwendeter recv_into Puffer)
+            end: Ende der gültigen Bytes in data (Standard: len(data))
+            start: Beginn der gültigen Bytes in data
+
+        Returns:
+            Liste gültiger, vollständiger RTCM3 Frames (memoryview oder bytes)
+        """
+        if end is None:
+            end = len(data)
+        frames = []
+        pos = start
+        if self._carry:
+            pos = self._complete_carry(data, start, end, frames)
+            if pos is None:
+                return frames
+            if not isinstance(pos, int):
+                # Resync nach ungültigem gestückeltem Frame
+                data, pos = pos, 0
+                end = len(data)
+        self._scan(data, pos, end, frames)
+        return frames
+
+    def _complete_carry(self, data, start, end, frames):
+        """Über die Chunk-Grenze gestückelten Frame vervollständigen
+
+        Returns:
+            Offset in data ab dem weitergescannt wird, None wenn data komplett
+            verbraucht ist, oder neue Daten (bytes) für einen Resync
+        """
+        carry = self._carry
+        view = memoryview(data)[:end]
+        pos = start
+        if len(carry) < 3:
+            pos = min(start + 3 - len(carry), end)
+            carry += view[start:pos]
+            if len(carry) < 3:
+                return None
+        need = (((carry[1] & 0x03) << 8) | carry[2]) + 6 - len(carry)
+        if len(view) - pos < need:
+            carry += view[pos:]
+            return None
+        carry += view[pos:pos + need]
+        pos += need
+        frame = bytes(carry)
+        carry.clear()
+        if crc24q(memoryview(frame)[:-3]) == int.from_bytes(frame[-3:], 'big'):
+            self._count(frame)
+            frames.append(frame)
+            return pos
+        # Ungültig - ab dem nächsten Byte neu synchronisieren (selten, Kopie ok)
+        self.crc_errors += 1
+        self.discarded_bytes += 1
+        return frame[1:] + bytes(view[pos:])
+
+    def _scan(self, data, pos, end, frames):
+        view = memoryview(data)
+        while pos < end:
+            if data[pos] != 0xD3:
+                nxt = data.find(b'\xd3', pos, end)
+                if nxt < 0:
+                    self.discarded_bytes += end - pos
+                    return
+                self.discarded_bytes += nxt - pos
+                pos = nxt
+            if end - pos < 3:
+                break
+            if data[pos + 1] & 0xFC:
+                # Reservierte Bits gesetzt - keine Präambel
+                self.discarded_bytes += 1
+                pos += 1
+                continue
+            total = (((data[pos + 1] & 0x03) << 8) | data[pos + 2]) + 6
+            if end - pos < total:
+                break
+            crc_end = pos + total - 3
+            if crc24q(view[pos:crc_end]) != int.from_bytes(view[crc_end:crc_end + 3], 'big'):
+                self.crc_errors += 1
+                self.discarded_bytes += 1
+                pos += 1
+                continue
+            frame = view[pos:pos + total]
+            self._count(frame)
+            frames.append(frame)
+            pos += total
+        self._carry += view[pos:end]
+
+    def _count(self, frame):
+        size = len(frame)
+        self.frames += 1
+        self.bytes += size
+        msg_type = rtcm_message_type(frame)
+        stats = self.type_stats.get(msg_type)
+        if stats is None:
+            self.type_stats[msg_type] = [1, size]
+        else:
+            stats[0] += 1
+            stats[1] += size
+
+    def summary(self):
+        """Kompakte Statistik pro Nachrichtentyp, z.B. '1005:10/210B 1077:10/4512B'"""
+        return " ".join(
+            f"{msg_type}:{count}/{size}B"
+            for msg_type, (count, size) in sorted(self.type_stats.items())
+        )
+
+
+class ChunkedDecoder:
+    """Streaming Decoder für HTTP Transfer-Encoding: chunked (NTRIP v2)
+
+    decode() liefert nur (start, end) Bereiche der Nutzdaten im übergebenen
+    Puffer - die Nutzdaten selbst werden nie kopiert. Nur die kurzen
+    Chunk-Size Zeilen werden bei Bedarf über Puffergrenzen hinweg gesammelt.
+    """
+
+    SIZE, DATA, DATA_CRLF, TRAILER = range(4)
+
+    def __init__(self):
+        self.state = self.SIZE
+        self.remaining = 0
+        self.finished = False
+        self._line = bytearray()
+
+    def decode(self, data, end=None, start=0):
+        """Bereich data[start:end] verarbeiten
+
+        Returns:
+            Liste von (start, end) Bereichen mit Nutzdaten in data
+        """
+        if end is None:
+            end = len(data)
+        ranges = []
+        pos = start
+        while pos < end and not self.finished:
+            if self.state == self.DATA:
+                stop = min(end, pos + self.remaining)
+                ranges.append((pos, stop))
+                self.remaining -= stop - pos
+                pos = stop
+                if not self.remaining:
+                    self.state = self.DATA_CRLF
+                continue
+
+            # Zeilenorientierte Zustände: Chunk-Size, CRLF nach Daten, Trailer
+            nl = data.find(b'\n', pos, end)
+            if nl < 0:
+                self._line += data[pos:end]
+                if len(self._line) > 1024:
+                    raise ValueError("Ungültiger Chunked-Transfer (Zeile zu lang)")
+                break
+            self._line += data[pos:nl]
+            line = bytes(self._line).strip()
+            self._line.clear()
+            pos = nl + 1
+
+            if self.state == self.SIZE:
+                size = int(line.split(b';', 1)[0], 16)
+                if size:
+                    self.remaining = size
+                    self.state = self.DATA
+                else:
+                    self.state = self.TRAILER
+            elif self.state == self.DATA_CRLF:
+                if line:
+                    raise ValueError("Ungültiger Chunked-Transfer (CRLF nach Chunk fehlt)")
+                self.state = self.SIZE
+            elif not line:
+                # Leerzeile nach dem letzten Chunk - Stream beendet
+                self.finished = True
+        return ranges
+
+
+def parse_ntrip_response(buffer):
+    """NTRIP/HTTP Antwortheader parsen
+
+    Unterstützt NTRIP v1 ("ICY 200 OK", optional mit Headerzeilen), NTRIP v2
+    bzw. HTTP ("HTTP/1.1 200 OK" + Header) und "SOURCETABLE 200 OK".
+
+    Returns:
+        (status_line, headers dict mit kleingeschriebenen Namen, Header-Länge)
+        oder None wenn der Header noch unvollständig ist
+    """
+    line_end = buffer.find(b'\r\n')
+    if line_end < 0:
+        return None
+    status_line = bytes(buffer[:line_end]).decode('latin-1').strip()
+    header_end = buffer.find(b'\r\n\r\n')
+
+    if status_line.startswith('ICY'):
+        # NTRIP v1: Daten dürfen direkt auf die Statuszeile folgen. Headerzeilen
+        # sind nur dann vorhanden, wenn der Rest wie Text aussieht.
+        rest = buffer[line_end + 2:]
+        if not rest:
+            return status_line, {}, line_end + 2
+        if rest[:2] == b'\r\n':
+            return status_line, {}, line_end + 4
+        colon = rest.find(b':', 0, 64)
+        if colon <= 0 or not bytes(rest[:colon]).replace(b'-', b'').isalnum():
+            return status_line, {}, line_end + 2
+    if header_end < 0:
+        return None
+
+    headers = {}
+    for line in bytes(buffer[line_end + 2:header_end]).decode('latin-1').split('\r\n'):
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    return status_line, headers, header_end + 4
+
+
 class NTRIPClient:
-    """NTRIP Client zum Empfangen von RTCM-Korrekturdaten"""
+    """NTRIP Client zum Empfangen von RTCM-Korrekturdaten
+
+    Halboffene Verbindungen (Mobilfunk, NAT Timeout) erkennt der Kernel über
+    TCP Keepalive (keepalive = (Leerlauf, Intervall, Proben) in Sekunden) und
+    TCP_USER_TIMEOUT (unbestätigte Daten, z.B. GGA, nach user_timeout
+    Sekunden). None verwendet KEEPALIVE bzw. USER_TIMEOUT, 0 schaltet ab.
+
+    Mit resolver (z.B. StartupState) kommen die Adressen des Casters aus
+    einem Cache statt bei jedem Verbindungsaufbau aus dem DNS.
+    """
     
-    def __init__(self, caster, port, username, password, mountpoint):
+    KEEPALIVE = (10, 5, 3)
+    USER_TIMEOUT = 20
+    
+    def __init__(self, caster, port, username, password, mountpoint, version='v1', keepalive=None, user_timeout=None,
+                 resolver=None):
         self.caster = caster
         self.port = int(port)
         self.username = username
         self.password = password
         self.mountpoint = mountpoint
+        # Angefragte Protokollversion: v1, v2 oder auto (v2 mit Fallback auf v1)
+        self.version = version
+        self.keepalive = self.KEEPALIVE if keepalive is None else keepalive
+        self.user_timeout = self.USER_TIMEOUT if user_timeout is None else user_timeout
+        self.resolver = resolver
         self.socket = None
+        self._timeout = None
+        # Zuletzt gesendete GGA (None = noch keine Position an diese Verbindung)
+        self.last_gga = None
         
-    def connect(self):
-        """Verbindung zum NTRIP Caster herstellen"""
-        try:
-            logger.info(f"Verbinde zu NTRIP Caster {self.caster}:{self.port}...")
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.settimeout(10)
-            self.socket.connect((self.caster, self.port))
-            
-            # NTRIP Request senden
-            auth_string = f"{self.username}:{self.password}"
-            auth_bytes = auth_string.encode('ascii')
-            auth_b64 = base64.b64encode(auth_bytes).decode('ascii')
-            
-            request = (
-                f"GET /{self.mountpoint} HTTP/1.0\r\n"
+        # Ergebnis des Handshakes
+        self.protocol = None
+        self.headers = {}
+        self.decoder = None
+        self.pending = b''
+        
+    def _build_request(self, version, mountpoint=None):
+        """NTRIP Request für v1 (HTTP/1.0) oder v2 (HTTP/1.1 + Ntrip-Version), mountpoint '' = Sourcetable"""
+        if mountpoint is None:
+            mountpoint = self.mountpoint
+        auth_string = f"{self.username}:{self.password}"
+        auth_bytes = auth_string.encode('ascii')
+        auth_b64 = base64.b64encode(auth_bytes).decode('ascii')
+        
+        if version == 'v2':
+            return (
+                f"GET /{mountpoint} HTTP/1.1\r\n"
+                f"Host: {self.caster}:{self.port}\r\n"
+                f"Ntrip-Version: Ntrip/2.0\r\n"
                 f"User-Agent: NTRIP mosaic-H-Client/1.0\r\n"
                 f"Authorization: Basic {auth_b64}\r\n"
                 f"Accept: */*\r\n"
                 f"Connection: close\r\n"
                 f"\r\n"
             )
+        return (
+            f"GET /{mountpoint} HTTP/1.0\r\n"
+            f"User-Agent: NTRIP mosaic-H-Client/1.0\r\n"
+            f"Authorization: Basic {auth_b64}\r\n"
+            f"Accept: */*\r\n"
+            f"Connection: close\r\n"
+            f"\r\n"
+        )
+    
+    def connect(self):
+        """Verbindung zum NTRIP Caster herstellen"""
+        if self.version == 'auto':
+            status = self._connect('v2')
+            if status is None:
+                logger.info("NTRIP v2 Handshake fehlgeschlagen - versuche NTRIP v1")
+                self.close()
+                status = self._connect('v1')
+            return bool(status)
+        return bool(self._connect('v2' if self.version == 'v2' else 'v1'))
+    
+    def _connect(self, version):
+        """Handshake mit der angegebenen Version
+
+        Returns:
+            True bei Erfolg, False bei endgültigem Fehler (z.B. Auth),
+            None wenn ein anderer Versuch mit v1 sinnvoll ist
+        """
+        try:
+            logger.info(f"Verbinde zu NTRIP Caster {self.caster}:{self.port} (NTRIP {version})...")
+            self._open_socket()
+            self.socket.sendall(self._build_request(version).encode('ascii'))
             
-            self.socket.send(request.encode('ascii'))
+            # Header inkrementell lesen - Bytes nach dem Header gehören zum RTCM Stream
+            buffer = bytearray()
+            while True:
+                chunk = self.socket.recv(4096)
+                if not chunk:
+                    logger.error("NTRIP Caster hat die Verbindung während des Handshakes geschlossen")
+                    return None
+                buffer += chunk
+                parsed = parse_ntrip_response(buffer)
+                if parsed:
+                    break
+                if len(buffer) > 16384:
+                    logger.error("NTRIP Response Header zu lang")
+                    return None
             
-            # Response lesen
-            response = self.socket.recv(1024).decode('ascii', errors='ignore')
-            logger.info(f"NTRIP Response: {response.split()[0:2]}")
+            status_line, self.headers, header_length = parsed
+            logger.info(f"NTRIP Response: {status_line.split()[0:2]}")
             
-            if "200 OK" in response or "ICY 200 OK" in response:
-                logger.info("Erfolgreich mit NTRIP Caster verbunden")
-                return True
-            else:
-                logger.error(f"NTRIP Verbindung fehlgeschlagen: {response}")
+            parts = status_line.split()
+            if status_line.startswith('SOURCETABLE'):
+                logger.error(f"Mountpoint '{self.mountpoint}' nicht gefunden (Caster liefert Sourcetable)")
                 return False
+            if len(parts) < 2 or parts[1] != '200':
+                logger.error(f"NTRIP Verbindung fehlgeschlagen: {status_line}")
+                return False if len(parts) > 1 and parts[1] in ('401', '403', '404') else None
+            
+            self.protocol = 'v2' if status_line.startswith('HTTP/1.1') or 'ntrip-version' in self.headers else 'v1'
+            chunked = 'chunked' in self.headers.get('transfer-encoding', '').lower()
+            self.decoder = ChunkedDecoder() if chunked else None
+            
+            # Bereits mitgelesene Nutzdaten aufbewahren statt sie zu verwerfen
+            trailing = bytes(buffer[header_length:])
+            if self.decoder:
+                trailing = b''.join(trailing[start:end] for start, end in self.decoder.decode(trailing))
+            self.pending = trailing
+            
+            logger.info(
+                f"Erfolgreich mit NTRIP Caster verbunden (NTRIP {self.protocol}"
+                f"{', chunked' if chunked else ''}, {len(self.pending)} bytes im Handshake)"
+            )
+            return True
                 
         except Exception as e:
             logger.error(f"Fehler beim Verbinden zum NTRIP Caster: {e}")
-            return False
+            return None
+    
+    def _open_socket(self):
+        """TCP Verbindung aufbauen, ohne resolver löst connect() den Namen bei jedem Aufruf auf"""
+        if self.resolver is None:
+            addresses = [(self.caster, self.port)]
+        else:
+            addresses = self.resolver.resolve(self.caster, self.port)
+        for i, address in enumerate(addresses):
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._tune_socket()
+            self._timeout = None
+            self._set_timeout(10)
+            try:
+                self.socket.connect(address)
+                return
+            except OSError:
+                self.socket.close()
+                if i == len(addresses) - 1:
+                    if self.resolver is not None:
+                        self.resolver.invalidate(self.caster, self.port)
+                    raise
+    
+    def fetch_sourcetable(self, headers=None, max_size=16 << 20):
+        """Sourcetable des Casters abrufen (GET /)
+
+        headers werden zusätzlich gesendet, z.B. If-None-Match bzw.
+        If-Modified-Since für eine bedingte Aktualisierung (NTRIP v2).
+
+        Returns:
+            (Statuscode, Header, Text der Sourcetable) - Text ist bei 304 leer
+
+        Raises:
+            OSError bei Verbindungsfehlern, ValueError bei ungültiger Antwort
+        """
+        request = self._build_request('v1' if self.version == 'v1' else 'v2', '')
+        if headers:
+            request = request[:-2] + ''.join(f"{name}: {value}\r\n" for name, value in headers.items()) + "\r\n"
+        self._open_socket()
+        try:
+            self._set_timeout(30)
+            self.socket.sendall(request.encode('ascii'))
+            buffer = bytearray()
+            while True:
+                chunk = self.socket.recv(65536)
+                if not chunk:
+                    break
+                buffer += chunk
+                # NTRIP v1 Caster schließen die Verbindung nicht immer nach ENDSOURCETABLE
+                if buffer.find(b'ENDSOURCETABLE', max(0, len(buffer) - len(chunk) - 16)) >= 0:
+                    break
+                if len(buffer) > max_size:
+                    raise ValueError(f"Sourcetable größer als {max_size} bytes")
+        finally:
+            self.socket.close()
+            self.socket = None
+        parsed = parse_ntrip_response(buffer)
+        if parsed is None:
+            raise ValueError("Unvollständige Antwort auf die Sourcetable Anfrage")
+        status_line, response_headers, header_length = parsed
+        parts = status_line.split()
+        body = bytes(buffer[header_length:])
+        if 'chunked' in response_headers.get('transfer-encoding', '').lower():
+            body = b''.join(body[start:end] for start, end in ChunkedDecoder().decode(body))
+        return parts[1] if len(parts) > 1 else '', response_headers, body.decode('latin-1')
+    
+    def take_pending(self):
+        """Beim Handshake mitgelesene Nutzdaten abholen (einmalig)"""
+        pending, self.pending = self.pending, b''
+        return pending
+    
+    def payload_ranges(self, data, end):
+        """Nutzdaten-Bereiche eines empfangenen Puffers (Chunked-Decoding ohne Kopie)"""
+        if self.decoder:
+            return self.decoder.decode(data, end)
+        return ((0, end),)
     
     def send_gga(self, gga_sentence):
         """GGA Position zum NTRIP Caster senden (für VRS)"""
         try:
             if self.socket and gga_sentence:
                 self.socket.send(gga_sentence.encode('ascii'))
+                self.last_gga = gga_sentence
+                return True
+            return False
+        except Exception as e:
+            logger.error(f"Fehler beim Senden von GGA: {e}")
+            return False
+    
+    async def send_gga_async(self, gga_sentence):
+        """GGA Position asynchron zum NTRIP Caster senden (Socket im non-blocking Modus)"""
+        try:
+            if self.socket and gga_sentence:
+                loop = asyncio.get_running_loop()
+                await loop.sock_sendall(self.socket, gga_sentence.encode('ascii'))
+                self.last_gga = gga_sentence
                 return True
             return False
         except Exception as e:
             logger.error(f"Fehler beim Senden von GGA: {e}")
             return False
     
+    def _tune_socket(self):
+        """TCP Keepalive und TCP_USER_TIMEOUT setzen (Optionen fehlen je nach Plattform)"""
+        sock = self.socket
+        if self.keepalive:
+            idle, interval, count = self.keepalive
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            for name, value in (('TCP_KEEPIDLE', idle), ('TCP_KEEPINTVL', interval), ('TCP_KEEPCNT', count)):
+                if hasattr(socket, name):
+                    sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name), int(value))
+        if self.user_timeout and hasattr(socket, 'TCP_USER_TIMEOUT'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT, int(self.user_timeout * 1000))
+    
+    def _set_timeout(self, timeout):
+        """Socket Timeout nur bei Änderung setzen (spart einen Syscall pro Empfang)"""
+        if timeout != self._timeout:
+            self.socket.settimeout(timeout)
+            self._timeout = timeout
+    
     def receive_data(self, timeout=5):
-        """RTCM Daten vom NTRIP Caster empfangen"""
+        """RTCM Daten vom NTRIP Caster empfangen
+
+        Returns:
+            Nutzdaten, None bei Timeout, b'' wenn die Verbindung geschlossen bzw. abgebrochen ist
+            (auch bei fehlerhaftem Chunked-Transfer)
+        """
+        if self.pending:
+            return self.take_pending()
+        try:
+            self._set_timeout(timeout)
+            data = self.socket.recv(4096)
+            if data and self.decoder:
+                data = b''.join(data[start:end] for start, end in self.decoder.decode(data)) or None
+            return data
+        except socket.timeout:
+            return None
+        except OSError as e:
+            # Verbindungsabbruch (Reset, TCP_USER_TIMEOUT, Keepalive) wie geschlossene Verbindung behandeln
+            logger.error(f"Fehler beim Empfangen von Daten: {e}")
+            return b''
+        except ValueError as e:
+            # Chunked-Stream kaputt, der Decoder erholt sich nicht - sofort neu verbinden statt Timeout melden
+            logger.error(f"Fehler beim Empfangen von Daten: {e}")
+            return b''
+        except Exception as e:
+            logger.error(f"Fehler beim Empfangen von Daten: {e}")
+            return None
+    
+    def receive_into(self, buffer, timeout=5):
+        """RTCM Daten in einen vorab allokierten Puffer empfangen
+
+        Returns:
+            Anzahl empfangener Bytes (0 = Verbindung geschlossen bzw. abgebrochen, auch bei fehlerhaftem
+            Chunked-Transfer), None bei Timeout
+        """
+        if self.pending:
+            length = min(len(self.pending), len(buffer))
+            buffer[:length] = self.pending[:length]
+            self.pending = self.pending[length:]
+            return length
+        try:
+            self._set_timeout(timeout)
+            length = self.socket.recv_into(buffer)
+            if length and self.decoder:
+                # Nutzdaten innerhalb des Puffers nach vorne schieben
+                pos = 0
+                for start, end in self.decoder.decode(buffer, length):
+                    buffer[pos:pos + end - start] = buffer[start:end]
+                    pos += end - start
+                return pos or None
+            return length
+        except socket.timeout:
+            return None
+        except OSError as e:
+            # Verbindungsabbruch wie in receive_data() als geschlossene Verbindung melden
+            logger.error(f"Fehler beim Empfangen von Daten: {e}")
+            return 0
+        except ValueError as e:
+            # Fehlerhafter Chunked-Transfer wie in receive_data() als geschlossene Verbindung melden
+            logger.error(f"Fehler beim Empfangen von Daten: {e}")
+            return 0
+        except Exception as e:
+            logger.error(f"Fehler beim Empfangen von Daten: {e}")
+            return None
+    
+    def close(self):
+        """Verbindung schließen"""
+        if self.socket:
+            try:
+                self.socket.close()
+                logger.info("NTRIP Verbindung geschlossen")
+            except:
+                pass
+
+
+def parse_sourcetable(text):
+    """STR Einträge einer NTRIP Sourcetable als Liste von dicts
+
+    Felder: mountpoint, identifier, format, nav_system, network, country,
+    lat/lon (Dezimalgrad, None ohne Position), nmea (Caster erwartet GGA)
+    und solution (0 Einzelstation, 1 Netzwerk/VRS).
+    """
+    entries = []
+    for line in text.splitlines():
+        if not line.startswith('STR;'):
+            continue
+        fields = line.split(';')
+        if len(fields) < 13:
+            continue
+        try:
+            lat, lon = float(fields[9]), float(fields[10])
+        except ValueError:
+            lat = lon = None
+        if lat == 0 and lon == 0:
+            lat = lon = None  # Keine Position angegeben
+        elif lon is not None and lon > 180:
+            lon -= 360  # Manche Caster geben 0..360° an
+        entries.append({
+            'mountpoint': fields[1],
+            'identifier': fields[2],
+            'format': fields[3],
+            'nav_system': fields[6],
+            'network': fields[7],
+            'country': fields[8],
+            'lat': lat,
+            'lon': lon,
+            'nmea': fields[11] == '1',
+            'solution': int(fields[12]) if fields[12].isdigit() else 0,
+        })
+    return entries
+
+
+def great_circle_distance(lat1, lon1, lat2, lon2):
+    """Abstand zweier Positionen (Dezimalgrad) auf der Kugel in Metern (Haversine)"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * 6371000 * math.asin(min(1.0, math.sqrt(a)))
+
+
+class MountpointIndex:
+    """Räumlicher Index über Sourcetable Einträge (Gitter aus cell × cell Grad Zellen, 0.25° ≈ 28 km)
+
+    nearest() sucht ringförmig um die Position bis zum ersten Treffer und
+    prüft danach nur die Zellen, die näher liegen können - bei 10k Einträgen
+    wenige Zellen statt eines Abstands zu jedem Eintrag. Ist das Gitter dünn
+    besetzt, werden direkt die belegten Zellen durchsucht.
+    """
+
+    EARTH_RADIUS = 6371000.0
+
+    def __init__(self, entries, cell=0.25):
+        self.cell = cell
+        self.columns = round(360 / cell)
+        self.entries = {entry['mountpoint']: entry for entry in entries}
+        self._grid = {}
+        for entry in self.entries.values():
+            if entry['lat'] is not None:
+                self._grid.setdefault(self._key(entry['lat'], entry['lon']), []).append(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _key(self, lat, lon):
+        return math.floor(lat / self.cell), math.floor(lon / self.cell) % self.columns
+
+    def nearest(self, lat, lon, accept=None):
+        """Nächster Eintrag mit Position, für den accept(entry) wahr ist
+
+        Returns:
+            (Eintrag, Abstand in Metern) bzw. (None, inf)
+        """
+        row, column = self._key(lat, lon)
+        best = (None, math.inf)
+        seen = set()
+        ring = 0
+        while best[0] is None and (2 * ring + 1) ** 2 <= len(self._grid):
+            for dr in range(-ring, ring + 1):
+                step = 1 if abs(dr) == ring else 2 * ring
+                for dc in range(-ring, ring + 1, step):
+                    best = self._scan((row + dr, (column + dc) % self.columns), lat, lon, accept, best, seen)
+            ring += 1
+        if best[0] is None:
+            keys = self._grid
+        else:
+            # Nur Zellen im Umkreis des bisher besten Eintrags können näher liegen
+            angle = best[1] / self.EARTH_RADIUS
+            dlat = math.degrees(angle)
+            rows = range(math.floor((lat - dlat) / self.cell), math.floor((lat + dlat) / self.cell) + 1)
+            cos_lat = math.cos(math.radians(lat))
+            if abs(lat) + dlat >= 90 or math.sin(angle) >= cos_lat:
+                columns = range(self.columns)  # Pol im Umkreis
+            else:
+                dlon = math.degrees(math.asin(math.sin(angle) / cos_lat))
+                columns = range(math.floor((lon - dlon) / self.cell), math.floor((lon + dlon) / self.cell) + 1)
+            if len(rows) * len(columns) > len(self._grid):
+                keys = self._grid
+            else:
+                keys = [(r, c % self.columns) for r in rows for c in columns]
+        for key in keys:
+            best = self._scan(key, lat, lon, accept, best, seen)
+        return best
+
+    def _scan(self, key, lat, lon, accept, best, seen):
+        """Einträge einer Zelle prüfen (jede Zelle nur einmal)"""
+        if key in seen:
+            return best
+        seen.add(key)
+        for entry in self._grid.get(key, ()):
+            if accept is not None and not accept(entry):
+                continue
+            distance = great_circle_distance(lat, lon, entry['lat'], entry['lon'])
+            if distance < best[1]:
+                best = (entry, distance)
+        return best
+
+
+class Sourcetable:
+    """Sourcetable eines Casters mit Platten-Cache und räumlichem Index
+
+    Die geparsten Einträge werden als JSON gespeichert (path) und sind nach
+    einem Neustart sofort verfügbar. Nach ttl Sekunden wird im Hintergrund
+    neu abgerufen - bedingt mit ETag/Last-Modified, ein 304 verlängert nur
+    die Gültigkeit. Abruffehler behalten die bisherige Tabelle.
+    """
+
+    def __init__(self, client, path=None, ttl=86400):
+        # NTRIPClient mit den Zugangsdaten des Casters (Mountpoint wird nicht verwendet)
+        self.client = client
+        self.path = path
+        self.ttl = ttl
+        self.index = None
+        self.fetched = 0
+        self.fetches = 0
+        self.not_modified = 0
+        self.errors = 0
+        self._validators = {}
+        self._refreshing = threading.Lock()
+
+    @property
+    def stale(self):
+        return time.time() - self.fetched >= self.ttl
+
+    def load(self):
+        """Gespeicherte Sourcetable laden (True wenn vorhanden)"""
+        if not self.path:
+            return False
+        try:
+            with open(self.path) as f:
+                cached = json.load(f)
+            self.index = MountpointIndex(cached['entries'])
+            self.fetched = cached.get('fetched', 0)
+            self._validators = cached.get('validators', {})
+        except (OSError, ValueError, KeyError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning(f"Sourcetable Cache {self.path} nicht lesbar: {e}")
+            return False
+        logger.info(f"Sourcetable aus Cache: {len(self.index)} Mountpoints"
+                    f" (Stand {datetime.fromtimestamp(self.fetched):%Y-%m-%d %H:%M})")
+        return True
+
+    def refresh(self):
+        """Sourcetable vom Caster abrufen (bedingt, wenn bereits eine Tabelle vorliegt)
+
+        Returns:
+            True wenn die Tabelle aktuell ist
+        """
+        if not self._refreshing.acquire(blocking=False):
+            return False
+        try:
+            headers = {}
+            if self.index is not None and 'etag' in self._validators:
+                headers['If-None-Match'] = self._validators['etag']
+            if self.index is not None and 'last-modified' in self._validators:
+                headers['If-Modified-Since'] = self._validators['last-modified']
+            start = time.monotonic()
+            try:
+                status, response_headers, text = self.client.fetch_sourcetable(headers)
+            except (OSError, ValueError) as e:
+                self.errors += 1
+                logger.warning(f"Sourcetable von {self.client.caster} konnte nicht abgerufen werden: {e}")
+                return False
+            self.fetches += 1
+            if status == '304' and self.index is not None:
+                self.not_modified += 1
+                logger.info("Sourcetable unverändert (304)")
+            elif status == '200':
+                entries = parse_sourcetable(text)
+                if not entries:
+                    self.errors += 1
+                    logger.warning(f"Sourcetable von {self.client.caster} enthält keine Mountpoints")
+                    return False
+                self.index = MountpointIndex(entries)
+                self._validators = {name: response_headers[name] for name in ('etag', 'last-modified')
+                                    if name in response_headers}
+                logger.info(f"Sourcetable abgerufen: {len(entries)} Mountpoints in "
+                            f"{time.monotonic() - start:.2f} s")
+            else:
+                self.errors += 1
+                logger.warning(f"Sourcetable Anfrage an {self.client.caster} fehlgeschlagen (Status {status})")
+                return False
+            self.fetched = time.time()
+            self._store()
+            return True
+        finally:
+            self._refreshing.release()
+
+    def refresh_async(self):
+        """Abgelaufene Sourcetable in einem eigenen Thread aktualisieren (nicht im Forwarding-Pfad)"""
+        if self.stale and not self._refreshing.locked():
+            threading.Thread(target=self.refresh, name='sourcetable', daemon=True).start()
+
+    def _store(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # Atomar ersetzen, damit ein Abbruch keine halbe Datei hinterlässt
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump({'fetched': self.fetched, 'validators': self._validators,
+                           'entries': list(self.index.entries.values())}, f)
+            os.replace(self.path + '.tmp', self.path)
+        except OSError as e:
+            logger.warning(f"Sourcetable konnte nicht gespeichert werden ({self.path}): {e}")
+
+
+class MountpointSelector:
+    """Nächsten kompatiblen Mountpoint wählen und bei zu langer Basislinie wechseln
+
+    Gewechselt wird, wenn die Basislinie zum aktuellen Mountpoint
+    max_baseline Meter überschreitet, ein kompatibler Mountpoint mindestens
+    hysteresis Meter näher liegt und der letzte Wechsel min_hold Sekunden
+    zurückliegt. Kompatibel sind Einträge mit format (z.B. 'RTCM 3'), allen
+    nav_systems und bei single_base=True nur Einzelstationen. Ist der
+    aktuelle Mountpoint in der Sourcetable, aber selbst nicht kompatibel
+    (z.B. VRS), wird nicht gewechselt.
+    """
+
+    def __init__(self, sourcetable, mountpoint, max_baseline=20000.0, hysteresis=5000.0, min_hold=60.0,
+                 format='RTCM 3', nav_systems=(), single_base=True):
+        self.sourcetable = sourcetable
+        self.mountpoint = mountpoint
+        self.max_baseline = max_baseline
+        self.hysteresis = hysteresis
+        self.min_hold = min_hold
+        self.format = format
+        self.nav_systems = tuple(system.upper() for system in nav_systems)
+        self.single_base = single_base
+        self.baseline = None
+        self.switches = 0
+        self.last_switch = -math.inf
+        self._checked = None
+        # Index nur mit kompatiblen Einträgen (neu aufgebaut, wenn sich die Sourcetable ändert)
+        self._source = None
+        self._compatible = None
+
+    def compatible(self, entry):
+        if self.single_base and entry['solution'] != 0:
+            return False
+        if self.format and not entry['format'].upper().startswith(self.format.upper()):
+            return False
+        systems = entry['nav_system'].upper()
+        return all(system in systems for system in self.nav_systems)
+
+    def nearest(self, lat, lon):
+        """Nächster kompatibler Mountpoint: (Eintrag, Abstand in Metern) bzw. (None, inf)"""
+        index = self.sourcetable.index
+        if index is None:
+            return None, math.inf
+        if index is not self._source:
+            self._compatible = MountpointIndex([entry for entry in index.entries.values() if self.compatible(entry)],
+                                               index.cell)
+            self._source = index
+        return self._compatible.nearest(lat, lon)
+
+    def check(self, gga, now=None):
+        """Basislinie zur aktuellen Position prüfen
+
+        Returns:
+            Neuer Mountpoint, wenn gewechselt werden soll, sonst None
+        """
+        if gga is self._checked:
+            return None
+        self._checked = gga
+        index = self.sourcetable.index
+        info = parse_gga(gga)
+        if index is None or not info or info['quality'] == 0 or info['lat'] is None:
+            return None
+        lat, lon = info['lat'], info['lon']
+        current = index.entries.get(self.mountpoint)
+        if current is not None and (current['lat'] is None or not self.compatible(current)):
+            return None
+        self.baseline = great_circle_distance(lat, lon, current['lat'], current['lon']) if current else None
+        if self.baseline is not None and self.baseline <= self.max_baseline:
+            return None
+        if now is not None and now - self.last_switch < self.min_hold:
+            return None
+        entry, distance = self.nearest(lat, lon)
+        if entry is None or entry['mountpoint'] == self.mountpoint:
+            return None
+        if self.baseline is not None and distance > self.baseline - self.hysteresis:
+            return None
+        logger.info(
+            f"Mountpoint Wechsel: {self.mountpoint} ("
+            + (f"{self.baseline / 1000:.1f} km" if self.baseline is not None else "nicht in der Sourcetable")
+            + f") → {entry['mountpoint']} ({distance / 1000:.1f} km)"
+        )
+        self.mountpoint = entry['mountpoint']
+        self.baseline = distance
+        self.switches += 1
+        self.last_switch = now if now is not None else time.monotonic()
+        return self.mountpoint
+
+    def collect_metrics(self):
+        index = self.sourcetable.index
+        return [
+            ('ntrip_mountpoint_baseline_meters', 'gauge', 'Abstand zum Referenzpunkt des aktuellen Mountpoints',
+             [({'mountpoint': self.mountpoint}, self.baseline)] if self.baseline is not None else []),
+            ('ntrip_mountpoint_switches_total', 'counter', 'Mountpoint Wechsel wegen zu langer Basislinie',
+             [({}, self.switches)]),
+            ('ntrip_sourcetable_entries', 'gauge', 'Mountpoints in der Sourcetable',
+             [({}, len(index) if index is not None else 0)]),
+            ('ntrip_sourcetable_fetches_total', 'counter', 'Sourcetable Abrufe (result: ok, not_modified, error)',
+             [({'result': 'ok'}, self.sourcetable.fetches - self.sourcetable.not_modified),
+              ({'result': 'not_modified'}, self.sourcetable.not_modified),
+              ({'result': 'error'}, self.sourcetable.errors)]),
+        ]
+
+
+# Maximale Anzahl Puffer pro writev() Aufruf (Linux IOV_MAX)
+IOV_MAX = 1024
+
+
+def wait_readable(port, timeout):
+    """Auf Daten eines seriellen Ports warten (select auf den File-Deskriptor statt Polling)"""
+    try:
+        fd = port.fileno()
+    except (AttributeError, NotImplementedError, serial.SerialException):
+        # Kein File-Deskriptor verfügbar - blockierendes read() mit UART Timeout
+        return True
+    readable, _, _ = select.select([fd], [], [], max(0.0, timeout))
+    return bool(readable)
+
+
+class CommandReply:
+    """Strukturierte Antwort des mosaic-H auf ein ASCII Kommando
+
+    kind ist das Zeichen nach "$R": ':' (set/get/exe), ';' (lst), '!'
+    (login/Info) oder '?' (Fehler); None wenn bis zum Timeout keine Antwort
+    kam. header ist die erste Zeile ohne "$R:" (bei set/get/exe das Echo des
+    Kommandos), lines die folgenden Zeilen ohne Prompt.
+    """
+
+    def __init__(self, command, raw=b'', elapsed=0.0):
+        self.command = command
+        self.elapsed = elapsed
+        self.text = raw.decode('ascii', errors='replace')
+        self.kind = self.text[2] if raw else None
+        lines = [line.strip() for line in self.text.splitlines()]
+        self.prompt = lines.pop() if lines else None
+        self.header = lines[0][3:].strip() if lines else ''
+        self.lines = [line for line in lines[1:] if line and line != '---->']
+
+    @property
+    def ok(self):
+        return self.kind in (':', ';', '!')
+
+    @property
+    def error(self):
+        """Fehlermeldung bei "$R?" bzw. Timeout, sonst None"""
+        if self.kind == '?':
+            return self.header
+        if self.kind is None:
+            return "Keine Antwort"
+        return None
+
+    @property
+    def records(self):
+        """Antwortzeilen als Feldlisten, z.B. [['COMSettings', 'COM2', 'baud115200', ...]]"""
+        return [[field.strip().strip('"') for field in line.split(',')] for line in self.lines]
+
+    def __repr__(self):
+        return f"CommandReply({self.command!r}, kind={self.kind!r}, lines={len(self.lines)}, {self.elapsed * 1000:.0f} ms)"
+
+
+class MosaicCommandEngine:
+    """Kommando/Antwort Engine für die ASCII Schnittstelle des mosaic-H
+
+    Eine Antwort beginnt mit "$R:", "$R;", "$R!" oder "$R?" und endet mit
+    CR/LF und dem Prompt der Verbindung (z.B. "COM2>", bei Reset "STOP>").
+    Statt fester Pausen wird genau bis zu diesem Prompt gelesen. Alles
+    zwischen zwei Antworten (NMEA, SBF, $TD/$TE Meldungen) geht an
+    on_output, z.B. den NMEAFramer - im Config-Modus laufende GGA gehen so
+    nicht verloren.
+
+    Unabhängige get/lst Kommandos werden bis zu window Stück ohne Warten
+    hintereinander gesendet (Pipelining); der Empfänger arbeitet sie der Reihe
+    nach ab. set/exe/login Kommandos ändern den Zustand und werden einzeln
+    gesendet - wie im Reference Guide gefordert erst nach dem Prompt der
+    vorherigen Antwort.
+    """
+
+    REPLY_START = re.compile(rb'\$R[:;!?]')
+    PROMPT = re.compile(rb'(?:^|\n)((?:[A-Z]{2,4}\d{1,2}|STOP)>)')
+    # Stellen vor "$R" für einen angeschnittenen Antwortbeginn aufheben
+    START_TAIL = 2
+
+    def __init__(self, port, timeout=3.0, window=4, on_output=None):
+        self.serial = port
+        self.timeout = timeout
+        self.window = max(1, window)
+        self.on_output = on_output
+        self._buffer = bytearray()
+
+    @staticmethod
+    def read_only(command):
+        """get/lst Kommandos (auch als Kürzel wie grc, lcf) ändern nichts und dürfen gepipelinet werden"""
+        name = command.split(',', 1)[0].strip().lower()
+        if name in ('login', 'logout'):
+            return False
+        return name.startswith(('get', 'lst')) or (len(name) <= 5 and name[:1] in ('g', 'l'))
+
+    def command(self, command, timeout=None):
+        """Ein Kommando senden und die Antwort abwarten"""
+        return self.execute([command], timeout)[0]
+
+    def execute(self, commands, timeout=None):
+        """Kommandos senden, Antworten in Kommando-Reihenfolge als CommandReply zurückgeben"""
+        timeout = self.timeout if timeout is None else timeout
+        commands = [command.strip() for command in commands]
+        replies = [None] * len(commands)
+        pending = collections.deque()
+        sent = 0
+        while sent < len(commands) or pending:
+            # Fenster auffüllen: nur get/lst hinter anderen get/lst
+            while sent < len(commands) and len(pending) < self.window:
+                if pending and not (self.read_only(commands[sent]) and self.read_only(commands[pending[0][0]])):
+                    break
+                self.serial.write(commands[sent].encode('ascii') + b'\r\n')
+                pending.append((sent, time.monotonic()))
+                sent += 1
+            index, sent_at = pending[0]
+            raw = self._read_reply(sent_at + timeout)
+            now = time.monotonic()
+            if raw is None:
+                replies[index] = CommandReply(commands[index], elapsed=now - sent_at)
+                pending.popleft()
+                continue
+            reply = CommandReply(commands[index], raw, now - sent_at)
+            if reply.kind in (':', ';') and not self._echoes(reply.header, commands[index]):
+                # Verspätete Antwort auf ein früheres (abgelaufenes) Kommando verwerfen
+                logger.debug(f"Unerwartete Antwort verworfen: {reply.header}")
+                continue
+            replies[index] = reply
+            pending.popleft()
+        return replies
+
+    def sync(self, force=False, timeout=None):
+        """Auf Kommandobereitschaft warten: leere Zeile senden und den Prompt abwarten
+
+        Mit force=True wird vorher "SSSSSSSSSS" gesendet, das einen Port im
+        reinen Datenmodus (z.B. nur NMEA/RTCM) zurück in den Kommandomodus
+        zwingt. Gibt den Prompt (z.B. "COM2") oder None zurück.
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        self.serial.write(b'SSSSSSSSSS\r\n' if force else b'\r\n')
+        while True:
+            match = self.PROMPT.search(self._buffer)
+            if match:
+                prompt = match.group(1)[:-1].decode('ascii')
+                self._emit(match.start())
+                del self._buffer[:match.end() - match.start()]
+                return prompt
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self._fill(remaining)
+
+    def _read_reply(self, deadline):
+        """Nächste vollständige Antwort (roh, inkl. Prompt) lesen oder None nach deadline"""
+        while True:
+            start = self.REPLY_START.search(self._buffer)
+            if start is None:
+                # Alles außer einem möglichen angeschnittenen "$R" ist Ausgabe anderer Protokolle
+                self._emit(max(0, len(self._buffer) - self.START_TAIL))
+            else:
+                self._emit(start.start())
+                end = self.PROMPT.search(self._buffer)
+                if end:
+                    raw = bytes(self._buffer[:end.end()])
+                    del self._buffer[:end.end()]
+                    return raw
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self._fill(remaining)
+
+    def _fill(self, timeout):
+        """Verfügbare Bytes vom Port lesen, höchstens timeout Sekunden warten"""
+        port = self.serial
+        waiting = port.in_waiting
+        if not waiting:
+            if not wait_readable(port, timeout):
+                return False
+            waiting = max(port.in_waiting, 1)
+        data = port.read(waiting)
+        self._buffer += data
+        return bool(data)
+
+    def _emit(self, length):
+        """Die ersten length Bytes des Puffers an on_output weitergeben und entfernen"""
+        if length <= 0:
+            return
+        if self.on_output:
+            self.on_output(bytes(self._buffer[:length]))
+        del self._buffer[:length]
+
+    @staticmethod
+    def _echoes(header, command):
+        """Ist header das Echo von command? (Leerzeichen und Groß/Kleinschreibung egal)"""
+        return header.replace(' ', '').lower() == command.replace(' ', '').lower()
+
+
+class UARTDemux:
+    """Zerlegt den UART Empfangsstrom des mosaic-H nach Protokoll
+
+    Der mosaic-H mischt auf einem Port NMEA Sätze, Kommando-Antworten ("$R"
+    bis zum Prompt), ASCII Meldungen ("$TD"/"$TE", ebenfalls bis zum Prompt),
+    SBF Blöcke ("$@", Länge und CRC im Header), RTCM3 Frames und einzelne
+    Prompts. feed() schneidet vollständige Nachrichten heraus und übergibt sie
+    dem Callback ihrer Art, unvollständige Reste bleiben bis zum nächsten
+    Aufruf im Puffer. "$R"/"$T" beginnt eine Antwort nur an einer Nachrichten-
+    oder Zeilengrenze; eine offene Antwort wird aufgegeben, sobald danach ein
+    vollständiger NMEA Satz oder SBF Block folgt oder REPLY_TIMEOUT bzw.
+    MAX_REPLY überschritten ist - ein Störbyte hält NMEA und SBF nicht auf. So besitzt genau ein Leser (der Stream-Modus) den Port
+    und kann trotzdem Antworten auf Kommandos anderer Werkzeuge zustellen.
+
+    Callbacks (None = verwerfen): on_nmea(bytes), on_reply(bytes inkl.
+    Prompt), on_event(bytes inkl. Prompt), on_sbf(block_id, bytes),
+    on_rtcm(bytes), on_prompt(str, z.B. "COM2").
+    """
+
+    KINDS = ('nmea', 'reply', 'event', 'sbf', 'rtcm', 'prompt', 'other')
+    # Mögliche Nachrichtenanfänge: '$', RTCM3 Präambel oder ein Prompt
+    START = re.compile(rb'[$\xd3]|(?:[A-Z]{2,4}\d{1,2}|STOP)>')
+    PROMPT = re.compile(rb'(?:[A-Z]{2,4}\d{1,2}|STOP)>')
+    # Ende einer Antwort bzw. Meldung: Prompt am Zeilenanfang
+    END = MosaicCommandEngine.PROMPT
+    # Längste NMEA Zeile bzw. Antwort ohne Ende, danach gilt der Anfang als Störung
+    MAX_LINE = 256
+    MAX_REPLY = 16384
+    # Sekunden, die eine Antwort ohne Prompt offen bleiben darf
+    REPLY_TIMEOUT = 3.0
+    # Vollständiger NMEA Satz (Talker + Satzkennung, Prüfsumme), beendet eine offene Antwort
+    NMEA_SENTENCE = re.compile(rb'\$[A-Z]{5},[^\r\n$]*\*[0-9A-F]{2}\r?\n')
+    # Unvollständiger Prompt am Pufferende ("COM2" ohne ">")
+    PROMPT_TAIL = 6
+
+    def __init__(self, on_nmea=None, on_reply=None, on_event=None, on_sbf=None, on_rtcm=None, on_prompt=None):
+        self.on_nmea = on_nmea
+        self.on_reply = on_reply
+        self.on_event = on_event
+        self.on_sbf = on_sbf
+        self.on_rtcm = on_rtcm
+        self.on_prompt = on_prompt
+        self._buf = bytearray()
+        # Pufferanfang liegt an einer Nachrichten- oder Zeilengrenze
+        self._boundary = True
+        # Seit wann die Antwort am Pufferanfang auf den Prompt wartet
+        self._reply_since = None
+
+        self.messages = dict.fromkeys(self.KINDS, 0)
+        self.bytes = dict.fromkeys(self.KINDS, 0)
+        self.crc_errors = 0
+
+    def reset(self):
+        """Unvollständige Daten verwerfen"""
+        del self._buf[:]
+        self._boundary = True
+        self._reply_since = None
+
+    def feed(self, data):
+        """Bytes verarbeiten und vollständige Nachrichten an die Callbacks übergeben"""
+        buf = self._buf
+        buf += data
+        pos, end = 0, len(buf)
+        # Ende der letzten erkannten Nachricht (Grenze für den Beginn einer Antwort)
+        last_end = 0 if self._boundary else -1
+        while pos < end:
+            match = self.START.search(buf, pos)
+            if match is None:
+                # Ein angeschnittener Prompt bleibt für den nächsten Aufruf im Puffer
+                skip = max(pos, end - self.PROMPT_TAIL)
+                self._count('other', skip - pos)
+                pos = skip
+                break
+            if match.start() > pos:
+                self._count('other', match.start() - pos)
+                pos = match.start()
+            boundary = pos == last_end or (pos > 0 and buf[pos - 1] in (0x0A, 0x3E))  # '\n', '>'
+            kind, length = self._message(buf, pos, end, boundary)
+            if not length:
+                break
+            if kind is None:
+                self._count('other', length)
+            else:
+                self._dispatch(kind, buf, pos, length)
+                last_end = pos + length
+            pos += length
+        self._boundary = pos == last_end or (pos > 0 and buf[pos - 1] in (0x0A, 0x3E))
+        del buf[:pos]
+
+    def _message(self, buf, pos, end, boundary=True):
+        """Art und Länge der Nachricht ab pos: (kind, Länge), Länge 0 = unvollständig, kind None = Störung
+
+        boundary: pos liegt an einer Nachrichten- oder Zeilengrenze (nur dort beginnt eine Antwort)
+        """
+        lead = buf[pos]
+        if lead == 0xD3:
+            return self._rtcm(buf, pos, end)
+        if lead != 0x24:  # '$'
+            return 'prompt', self.PROMPT.match(buf, pos).end() - pos
+        if end - pos < 2:
+            return None, 0
+        second = buf[pos + 1]
+        if second == 0x40:  # '@'
+            return self._sbf(buf, pos, end)
+        if second in (0x52, 0x54):  # 'R', 'T'
+            if not boundary:
+                return None, 1
+            match = self.END.search(buf, pos)
+            if match:
+                self._reply_since = None
+                return ('reply' if second == 0x52 else 'event'), match.end() - pos
+            if self._reply_abandoned(buf, pos, end):
+                # Störung statt Antwort: nur "$" verwerfen, der Rest wird normal zerlegt
+                self._reply_since = None
+                return None, 1
+            return None, 0
+        # NMEA: '$' + Talker (Großbuchstaben) bis Zeilenende
+        newline = buf.find(b'\n', pos, pos + self.MAX_LINE)
+        if newline >= 0:
+            return ('nmea' if 0x41 <= second <= 0x5A else None), newline + 1 - pos
+        return None, (1 if end - pos >= self.MAX_LINE else 0)
+
+    def _reply_abandoned(self, buf, pos, end):
+        """Offene Antwort ab pos aufgeben? (zu lang, zu alt oder danach ein vollständiger NMEA Satz/SBF Block)"""
+        now = time.monotonic()
+        if self._reply_since is None:
+            self._reply_since = now
+        if end - pos > self.MAX_REPLY or now - self._reply_since > self.REPLY_TIMEOUT:
+            return True
+        if self.NMEA_SENTENCE.search(buf, pos + 2, end):
+            return True
+        sync = buf.find(b'$@', pos + 2, end)
+        while sync >= 0:
+            if self._sbf(buf, sync, end, probe=True)[0] == 'sbf':
+                return True
+            sync = buf.find(b'$@', sync + 1, end)
+        return False
+
+    def _sbf(self, buf, pos, end, probe=False):
+        """SBF Block: Sync "$@", CRC (CCITT über ID bis Blockende), ID, Länge (Vielfaches von 4)
+
+        probe=True zählt keine CRC-Fehler (Suche nach einem Block hinter einer offenen Antwort)
+        """
+        if end - pos < 8:
+            return None, 0
+        crc, _, length = struct.unpack_from('<HHH', buf, pos + 2)
+        if length < 8 or length % 4:
+            return None, 1
+        if end - pos < length:
+            return None, 0
+        if binascii.crc_hqx(buf[pos + 4:pos + length], 0) != crc:
+            if not probe:
+                self.crc_errors += 1
+            return None, 1
+        return 'sbf', length
+
+    def _rtcm(self, buf, pos, end):
+        """RTCM3 Frame: Präambel 0xD3, 10 Bit Länge, Payload, CRC-24Q"""
+        if end - pos < 3:
+            return None, 0
+        length = (((buf[pos + 1] & 0x03) << 8) | buf[pos + 2]) + 6
+        if end - pos < length:
+            return None, 0
+        frame = buf[pos:pos + length]
+        if crc24q(frame[:-3]) != int.from_bytes(frame[-3:], 'big'):
+            return None, 1
+        return 'rtcm', length
+
+    def _dispatch(self, kind, buf, pos, length):
+        self._count(kind, length)
+        if kind == 'prompt':
+            if self.on_prompt:
+                self.on_prompt(buf[pos:pos + length - 1].decode('ascii'))
+            return
+        callback = getattr(self, 'on_' + kind)
+        if callback is None:
+            return
+        data = bytes(buf[pos:pos + length])
+        if kind == 'sbf':
+            callback(struct.unpack_from('<H', data, 4)[0] & 0x1FFF, data)
+        else:
+            callback(data)
+
+    def _count(self, kind, length):
+        if length > 0:
+            self.messages[kind] += 1
+            self.bytes[kind] += length
+
+
+class SBFDecoder:
+    """Dekodiert SBF Blöcke des mosaic-H: Position, RTK Modus und Korrekturen
+
+    Die Blöcke kommen fertig gerahmt und CRC-geprüft aus dem UARTDemux
+    (on_sbf). Jeder Block wird mit einem vorkompilierten struct.Struct in
+    einem einzigen unpack_from() zerlegt, ohne Text-Parsing. Ausgewertet
+    werden PVTGeodetic (Position, Modus, Satelliten, mittleres
+    Korrekturalter), DOP (HDOP für die GGA), ReceiverStatus (CPU Last,
+    Temperatur, Fehler) und DiffCorrIn (beim Empfänger eingehende
+    Korrekturen). Aus jeder gültigen PVTGeodetic wird eine GGA für den
+    Caster erzeugt - mit der PVT Rate des Empfängers statt GGA sec1.
+    """
+
+    PVT_GEODETIC = 4007
+    DOP = 4001
+    RECEIVER_STATUS = 4014
+    DIFF_CORR_IN = 5919
+    BLOCK_NAMES = {4007: 'PVTGeodetic', 4001: 'DOP', 4014: 'ReceiverStatus', 5919: 'DiffCorrIn'}
+
+    # Felder nach dem 8 Byte Header (Rev 2): TOW, WNc, Mode, Error, Lat, Lon, Height, Undulation,
+    # Vn, Ve, Vu, COG, RxClkBias, RxClkDrift, TimeSystem, Datum, NrSV, WACorrInfo, ReferenceID,
+    # MeanCorrAge, SignalInfo, AlertFlag, NrBases, PPPInfo, Latency, HAccuracy, VAccuracy, Misc
+    _PVT = struct.Struct('<IHBBdddfffffdfBBBBHHIBBHHHHB')
+    # TOW, WNc, NrSV, Reserved, PDOP, TDOP, HDOP, VDOP, HPL, VPL
+    _DOP = struct.Struct('<IHBBHHHHff')
+    # TOW, WNc, CPULoad, ExtError, UpTime, RxState, RxError, N, SBLength, CmdCount, Temperature
+    _STATUS = struct.Struct('<IHBBIIIBBBB')
+    # TOW, WNc, Mode (2 = RTCMv3), Source
+    _DIFF = struct.Struct('<IHBB')
+
+    # Do-Not-Use Wert der Gleitkommafelder
+    DNU_FLOAT = -2e10
+    # PVT Modus (Bits 0-3) → GGA Fix-Qualität
+    GGA_QUALITY = {0: 0, 1: 1, 2: 2, 3: 7, 4: 4, 5: 5, 6: 2, 7: 4, 8: 5, 10: 5}
+    MODE_NAMES = {0: 'kein PVT', 1: 'Stand-Alone', 2: 'DGNSS', 3: 'Fixed location', 4: 'RTK fixed',
+                  5: 'RTK float', 6: 'SBAS', 7: 'Moving-Base RTK fixed', 8: 'Moving-Base RTK float', 10: 'PPP'}
+
+    def __init__(self):
+        self._handlers = {
+            self.PVT_GEODETIC: self._pvt_geodetic,
+            self.DOP: self._dop,
+            self.RECEIVER_STATUS: self._receiver_status,
+            self.DIFF_CORR_IN: self._diff_corr_in,
+        }
+        self.blocks = collections.Counter()
+        self.short_blocks = 0
+
+        # Letzte PVTGeodetic
+        self.tow = None
+        self.mode = None
+        self.error = None
+        self.lat = None
+        self.lon = None
+        self.height = None
+        self.undulation = None
+        self.satellites = None
+        self.correction_age = None
+        self.reference_id = None
+        self.h_accuracy = None
+        self.hdop = None
+
+        # Aus PVTGeodetic erzeugte GGA (str inkl. \r\n) und Zeitpunkt (monotonic)
+        self.latest_gga = None
+        self.latest_gga_time = None
+        self.gga_count = 0
+
+        # ReceiverStatus: cpu_load (%), uptime (s), rx_error (Bitfeld), temperature (°C)
+        self.status = {}
+
+        # DiffCorrIn: beim Empfänger eingegangene Korrekturnachrichten
+        self.corrections = collections.Counter()
+        self.last_correction_time = None
+
+    @property
+    def rtk_mode(self):
+        """PVT Modus als Text (z.B. "RTK fixed"), None vor der ersten PVTGeodetic"""
+        if self.mode is None:
+            return None
+        return self.MODE_NAMES.get(self.mode, f"Modus {self.mode}")
+
+    @property
+    def fix_quality(self):
+        """PVT Modus als GGA Fix-Qualität (4 = RTK fixed, 5 = RTK float)"""
+        if self.mode is None:
+            return None
+        return self.GGA_QUALITY.get(self.mode, 0)
+
+    @property
+    def correction_input_age(self):
+        """Sekunden seit der letzten beim Empfänger eingegangenen Korrektur (DiffCorrIn)"""
+        if self.last_correction_time is None:
+            return None
+        return time.monotonic() - self.last_correction_time
+
+    def feed_block(self, block_id, data):
+        """Einen SBF Block (inkl. Header, Blocknummer ohne Revision) auswerten"""
+        self.blocks[block_id] += 1
+        handler = self._handlers.get(block_id)
+        if handler is None:
+            return
+        try:
+            handler(data)
+        except struct.error:
+            # Ältere Revision ohne alle Felder
+            self.short_blocks += 1
+
+    def _pvt_geodetic(self, data):
+        (tow, _, mode, error, lat, lon, height, undulation, _, _, _, _, _, _, _, _,
+         nr_sv, _, reference_id, mean_corr_age, _, _, _, _, _, h_accuracy, _, _) = self._PVT.unpack_from(data, 8)
+        self.tow = tow
+        self.mode = mode & 0x0F
+        self.error = error
+        self.satellites = nr_sv if nr_sv != 255 else None
+        self.correction_age = mean_corr_age / 100 if mean_corr_age != 65535 else None
+        self.reference_id = reference_id if reference_id != 65535 else None
+        self.h_accuracy = h_accuracy / 100 if h_accuracy != 65535 else None
+        # Do-Not-Use (-2e10) und unplausible Werte liegen außerhalb des Wertebereichs
+        if self.mode == 0 or not (abs(lat) <= math.pi / 2 and abs(lon) <= math.pi):
+            self.lat = self.lon = self.height = None
+            return
+        self.lat = math.degrees(lat)
+        self.lon = math.degrees(lon)
+        self.height = height if abs(height) < 1e7 else None
+        self.undulation = undulation if abs(undulation) < 1e3 else None
+        if tow != 4294967295:
+            self.latest_gga = self.gga()
+            self.latest_gga_time = time.monotonic()
+            self.gga_count += 1
+
+    def _dop(self, data):
+        hdop = self._DOP.unpack_from(data, 8)[6]
+        self.hdop = hdop / 100 if hdop else None
+
+    def _receiver_status(self, data):
+        _, _, cpu_load, _, uptime, _, rx_error, _, _, _, temperature = self._STATUS.unpack_from(data, 8)
+        self.status = {
+            'cpu_load': cpu_load if cpu_load != 255 else None,
+            'uptime': uptime,
+            'rx_error': rx_error,
+            'temperature': temperature - 100 if temperature else None,
+        }
+
+    def _diff_corr_in(self, data):
+        _, _, mode, _ = self._DIFF.unpack_from(data, 8)
+        msg_type = rtcm_message_type(data[16:]) if mode == 2 and data[16:17] == b'\xd3' else None
+        self.corrections[msg_type] += 1
+        self.last_correction_time = time.monotonic()
+
+    def gga(self):
+        """GGA Satz aus der letzten PVTGeodetic (UTC aus TOW, Höhe über Geoid, HDOP aus DOP)"""
+        tod = (self.tow - GPS_LEAP_SECONDS * 1000) % DAY_MS
+        # Sekunden auf 1/100 s abschneiden, sonst wird aus 59.999 s "60.00"
+        utc = f"{tod // 3600000:02d}{tod // 60000 % 60:02d}{tod // 10 % 6000 / 100:05.2f}"
+        # Erst die Gesamtminuten runden, dann teilen - sonst wird aus 47.99999999999° "4760.0000000"
+        lat_deg, lat_min = divmod(round(abs(self.lat) * 60, 7), 60)
+        lon_deg, lon_min = divmod(round(abs(self.lon) * 60, 7), 60)
+        altitude = self.height - (self.undulation or 0.0) if self.height is not None else None
+        differential = self.mode in (2, 4, 5, 6, 7, 8) and self.correction_age is not None
+        body = ",".join((
+            "GPGGA", utc,
+            f"{int(lat_deg):02d}{lat_min:010.7f}", 'N' if self.lat >= 0 else 'S',
+            f"{int(lon_deg):03d}{lon_min:010.7f}", 'E' if self.lon >= 0 else 'W',
+            str(self.fix_quality),
+            f"{self.satellites:02d}" if self.satellites is not None else '',
+            f"{self.hdop:.1f}" if self.hdop is not None else '',
+            f"{altitude:.3f}" if altitude is not None else '', 'M',
+            f"{self.undulation:.3f}" if self.undulation is not None else '', 'M',
+            f"{self.correction_age:.1f}" if differential else '',
+            f"{self.reference_id:04d}" if differential and self.reference_id is not None else '',
+        ))
+        checksum = reduce(operator.xor, body.encode('ascii'), 0)
+        return f"${body}*{checksum:02X}\r\n"
+
+    def summary(self):
+        """Kurzer Zustand für das Log, z.B. "RTK fixed, 24 SV, Korrekturalter 1.2 s, HDOP 0.7" """
+        parts = [self.rtk_mode or 'kein PVT']
+        if self.satellites is not None:
+            parts.append(f"{self.satellites} SV")
+        if self.correction_age is not None:
+            parts.append(f"Korrekturalter {self.correction_age:.1f} s")
+        if self.hdop is not None:
+            parts.append(f"HDOP {self.hdop:.1f}")
+        return ", ".join(parts)
+
+
+class MosaicUARTInterface:
+    """UART Interface zum mosaic-H Modul"""
+    
+    # Quelle der GGA für den Caster: 'auto' (SBF wenn aktuell, sonst NMEA), 'sbf' oder 'nmea'
+    GGA_SOURCES = ('auto', 'sbf', 'nmea')
+    # Ab diesem Alter gilt die SBF Position als ausgefallen ('auto' fällt auf NMEA zurück)
+    SBF_STALE = 2.0
+    
+    def __init__(self, device, baudrate=115200, gga_source='auto'):
+        self.device = device
+        self.baudrate = baudrate
+        self.serial = None
+        self.nmea = NMEAFramer()
+        self.sbf = SBFDecoder()
+        self.gga_source = gga_source if gga_source in self.GGA_SOURCES else 'auto'
+        # Empfangsstrom nach Protokoll zerlegen: NMEA an den Framer, SBF an den Decoder,
+        # Antworten z.B. an den Kontroll-Port
+        self.demux = UARTDemux(on_nmea=self.nmea.feed, on_sbf=self.sbf.feed_block)
+        self._commands = None
+        # Writes aus Stream und Kontroll-Port dürfen sich nicht mitten im Frame mischen
+        self._write_lock = threading.RLock()
+        # Optionaler Mitschnitt (CaptureWriter) von UART TX/RX
+        self.capture = None
+        
+    def connect(self):
+        """Verbindung zum UART Device herstellen"""
+        try:
+            logger.info(f"Öffne UART Device {self.device} mit {self.baudrate} Baud...")
+            self.serial = serial.Serial(
+                port=self.device,
+                baudrate=self.baudrate,
+                bytesize=serial.EIGHTBITS,
+                parity=serial.PARITY_NONE,
+                stopbits=serial.STOPBITS_ONE,
+                timeout=1
+            )
+            time.sleep(0.5)  # Kurze Pause für Initialisierung
+            logger.info("UART Verbindung hergestellt")
+            return True
+        except Exception as e:
+            logger.error(f"Fehler beim Öffnen von {self.device}: {e}")
+            return False
+    
+    def read_nmea(self, timeout=1.0, debug=False):
+        """NMEA GGA Nachricht vom mosaic-H lesen
+
+        Liest alle verfügbaren Bytes und gibt die neueste gültige GGA zurück.
+        Ist noch keine neue GGA da, wird bis zu timeout Sekunden auf Daten gewartet.
+        Je nach gga_source stammt die GGA aus dem SBF PVTGeodetic Block oder
+        aus dem NMEA Strom.
+        """
+        try:
+            if not self.serial or not self.serial.is_open:
+                return None
+            
+            deadline = time.monotonic() + timeout
+            newest = None
+            
+            while True:
+                waiting = self.serial.in_waiting
+                if not waiting:
+                    remaining = deadline - time.monotonic()
+                    if newest or remaining <= 0:
+                        break
+                    if not self._wait_readable(remaining):
+                        continue
+                    waiting = max(self.serial.in_waiting, 1)
+                
+                chunk = self.serial.read(waiting)
+                if debug and chunk:
+                    logger.debug(f"UART empfangen: {repr(chunk[:100])}")
+                if self.capture is not None and chunk:
+                    self.capture.record(CaptureWriter.UART_RX, chunk)
+                counts = self.nmea.gga_count, self.sbf.gga_count
+                self.demux.feed(chunk)
+                newest = self._new_gga(*counts) or newest
+            
+            if debug and not newest:
+                logger.debug("Keine gültige GGA im UART Stream gefunden")
+            
+            return newest
+            
+        except Exception as e:
+            logger.error(f"Fehler beim Lesen von NMEA: {e}")
+            return None
+    
+    def poll_gga(self):
+        """Verfügbare UART Bytes verarbeiten ohne zu blockieren
+
+        Gibt nur eine seit dem letzten Aufruf neu empfangene GGA zurück, sonst
+        None - die gecachte latest_gga würde Watchdog und Scheduler eine
+        Live-Position vortäuschen, obwohl das mosaic-H nichts mehr sendet.
+        """
+        counts = self.nmea.gga_count, self.sbf.gga_count
+        try:
+            if self.serial and self.serial.is_open:
+                waiting = self.serial.in_waiting
+                if waiting:
+                    chunk = self.serial.read(waiting)
+                    if self.capture is not None:
+                        self.capture.record(CaptureWriter.UART_RX, chunk)
+                    self.demux.feed(chunk)
+        except Exception as e:
+            logger.error(f"Fehler beim Lesen von NMEA: {e}")
+        return self._new_gga(*counts)
+    
+    @property
+    def latest_gga(self):
+        """Letzte gültige GGA (gecacht, blockiert nicht)"""
+        if self._use_sbf():
+            return self.sbf.latest_gga
+        return self.nmea.latest_gga
+    
+    def _use_sbf(self):
+        """SBF Position verwenden? Bei 'auto' nur solange PVTGeodetic Blöcke aktuell sind"""
+        if self.gga_source == 'nmea' or self.sbf.latest_gga is None:
+            return self.gga_source == 'sbf'
+        return self.gga_source == 'sbf' or time.monotonic() - self.sbf.latest_gga_time < self.SBF_STALE
+    
+    def _new_gga(self, nmea_count, sbf_count):
+        """Neue GGA der aktiven Quelle seit den übergebenen Zählerständen, sonst None"""
+        if self._use_sbf():
+            return self.sbf.latest_gga if self.sbf.gga_count != sbf_count else None
+        return self.nmea.latest_gga if self.nmea.gga_count != nmea_count else None
+    
+    def _wait_readable(self, timeout):
+        """Auf UART Daten warten (select auf den File-Deskriptor statt Polling)"""
+        return wait_readable(self.serial, timeout)
+    
+    def send_data(self, data):
+        """Daten über UART senden"""
+        try:
+            if self.serial and self.serial.is_open:
+                with self._write_lock:
+                    self.serial.write(data)
+                    if self.capture is not None:
+                        self.capture.record(CaptureWriter.UART_TX, data)
+                return True
+            return False
+        except Exception as e:
+            logger.error(f"Fehler beim Senden über UART: {e}")
+            return False
+    
+    def send_buffers(self, buffers):
+        """Puffer (memoryview Slices) ohne Kopie über UART senden
+
+        Schreibt direkt per os.writev() auf den File-Deskriptor des Ports - ein
+        Syscall für alle Puffer. serial.write() würde jede memoryview erst in
+        bytes kopieren. Ohne File-Deskriptor wird auf send_data() zurückgefallen.
+        """
+        try:
+            if not self.serial or not self.serial.is_open:
+                return False
+            try:
+                fd = self.serial.fileno()
+            except (AttributeError, NotImplementedError, serial.SerialException):
+                with self._write_lock:
+                    return all(self.send_data(buf) for buf in buffers)
+            
+            with self._write_lock:
+                pending = list(buffers)
+                while pending:
+                    try:
+                        written = os.writev(fd, pending[:IOV_MAX])
+                    except BlockingIOError:
+                        # Port ist non-blocking geöffnet - warten bis der Treiber wieder Platz hat
+                        _, writable, _ = select.select([], [fd], [], self.serial.write_timeout)
+                        if not writable:
+                            raise serial.SerialTimeoutException("Write timeout")
+                        continue
+                    # Vollständig geschriebene Puffer entfernen, Rest ohne Kopie anschneiden
+                    while pending and written >= len(pending[0]):
+                        written -= len(pending[0])
+                        pending.pop(0)
+                    if written:
+                        pending[0] = memoryview(pending[0])[written:]
+                if self.capture is not None:
+                    self.capture.record(CaptureWriter.UART_TX, b''.join(buffers))
+            return True
+        except Exception as e:
+            logger.error(f"Fehler beim Senden über UART: {e}")
+            return False
+    
+    def pending_output(self):
+        """Bytes im Ausgabepuffer des Treibers, die noch nicht gesendet wurden (0 wenn unbekannt)"""
+        try:
+            return self.serial.out_waiting
+        except Exception:
+            return 0
+    
+    @property
+    def commands(self):
+        """MosaicCommandEngine des geöffneten Ports (NMEA zwischen den Antworten geht an den NMEAFramer)"""
+        if self._commands is None or self._commands.serial is not self.serial:
+            self._commands = MosaicCommandEngine(self.serial, on_output=self.nmea.feed)
+        return self._commands
+    
+    def send_command(self, command):
+        """Kommando an mosaic-H senden, Antwort als Text"""
+        return self.send_commands([command])[0].text
+    
+    def send_commands(self, commands, timeout=3.0):
+        """Kommandos an mosaic-H senden (get/lst gepipelinet), Antworten als CommandReply"""
+        try:
+            for command in commands:
+                logger.info(f"Sende Kommando: {command}")
+            replies = self.commands.execute(commands, timeout)
+        except Exception as e:
+            logger.error(f"Fehler beim Senden des Kommandos: {e}")
+            return [CommandReply(command) for command in commands]
+        for reply in replies:
+            if reply.kind is None:
+                logger.warning(f"Keine Response vom mosaic-H erhalten ({reply.command})")
+            else:
+                logger.info(f"Response ({reply.elapsed * 1000:.0f} ms): {reply.text.strip()}")
+        return replies
+    
+    def login(self, username, password):
+        """Login am mosaic-H durchführen (optional)"""
+        if not username or not password:
+            logger.info("Kein Username/Password angegeben - verwende anonymous access")
+            return True
+        
+        try:
+            logger.info(f"Versuche Login als Benutzer: {username}")
+            cmd = f"login,{username},{password}"
+            reply = self.send_commands([cmd])[0]
+            
+            # Erfolg: "$R! LogIn", Fehler: "$R? LogIn: Wrong username or password!"
+            if reply.ok:
+                logger.info("Login erfolgreich")
+                return True
+            else:
+                logger.warning(f"Login fehlgeschlagen: {reply.error}")
+                return False
+                
+        except Exception as e:
+            logger.error(f"Fehler beim Login: {e}")
+            return False
+    
+    def close(self):
+        """UART Verbindung schließen"""
+        if self.serial and self.serial.is_open:
+            try:
+                self.serial.close()
+                logger.info("UART Verbindung geschlossen")
+            except:
+                pass
+
+
+class MosaicSetting:
+    """Gewünschter Zustand eines mosaic-H Konfigurationsblocks (z.B. NMEAOutput, Stream1)
+
+    fields sind die Argumente nach dem Connection Descriptor in der
+    Reihenfolge des set-Kommandos; None = nicht ändern, "+X" = X muss in der
+    '+'-Liste enthalten sein. Felder in exact werden mit Groß/Kleinschreibung
+    verglichen (Caster, Benutzer, Mountpoint). Felder in secret (Passwort)
+    kann der Empfänger nicht zurückliefern - sie werden über einen Hash im
+    Snapshot-Cache verglichen.
+    """
+
+    def __init__(self, name, cd, fields, exact=(), secret=()):
+        self.name = name
+        self.cd = cd
+        self.fields = [None if value is None else str(value) for value in fields]
+        self.exact = exact
+        self.secret = secret
+
+    @property
+    def key(self):
+        return f"{self.name},{self.cd}"
+
+    @property
+    def get_command(self):
+        return f"get{self.name},{self.cd}"
+
+    @property
+    def set_command(self):
+        return ",".join([f"set{self.name}", self.cd] + ['' if value is None else value for value in self.fields])
+
+    def secret_hash(self):
+        """Hash der geheimen Felder (für den Cache, Klartext wird nie gespeichert)"""
+        if not self.secret:
+            return None
+        values = "\0".join(self.fields[i] or '' for i in self.secret)
+        return hashlib.sha256(f"{self.key}\0{values}".encode('utf-8')).hexdigest()
+
+    def parse(self, reply):
+        """Aktuelle Felder aus der get-Antwort ("NtripSettings, NTR1, Client, ...") oder None"""
+        for record in reply.records:
+            if len(record) >= 2 and record[0].lower() == self.name.lower() and record[1].lower() == self.cd.lower():
+                return record[2:]
+        return None
+
+    def matches(self, actual, secret_hash=None):
+        """Entspricht der aktuelle Zustand (parse()) dem gewünschten?"""
+        if actual is None:
+            return False
+        for i, value in enumerate(self.fields):
+            if value is None:
+                continue
+            if i in self.secret:
+                if secret_hash != self.secret_hash():
+                    return False
+                continue
+            current = actual[i] if i < len(actual) else ''
+            if value.startswith('+'):
+                if not set(value[1:].lower().split('+')) <= set(current.lower().split('+')):
+                    return False
+            elif i in self.exact:
+                if value != current:
+                    return False
+            elif value.lower() != current.lower():
+                return False
+        return True
+
+
+def mosaic_desired_settings(config):
+    """Gewünschte mosaic-H Einstellungen aus der Konfiguration (Umgebungsvariablen)"""
+    settings = [
+        # NMEA GGA Ausgabe auf COM2 (für VRS NTRIP), Eingang unverändert
+        MosaicSetting("DataInOut", "COM2", [None, "+NMEA"]),
+        MosaicSetting("NMEAOutput", "Stream1", ["COM2", "GGA", "sec1"]),
+    ]
+    mode = config['mode']
+    if mode in ("Client", "Server"):
+        version = config['version'] if config['version'] in ('v1', 'v2') else None
+        send_gga = config['send_gga'] if mode == "Client" else None
+        settings.append(MosaicSetting(
+            "NTRIPSettings", config['connection'],
+            [mode, config['caster'], config['port'], config['username'], config['password'],
+             config['mountpoint'], version, send_gga],
+            exact=(1, 3, 5), secret=(4,)
+        ))
+    return settings
+
+
+def mosaic_sbf_settings(interval, stream=10):
+    """SBF Positionsblöcke auf COM2 für den SBFDecoder (Stream-Modus)
+
+    PVTGeodetic und DOP kommen mit interval (z.B. msec100 = 10 Hz),
+    DiffCorrIn und ReceiverStatus im folgenden Stream bei Änderung.
+    """
+    return [
+        MosaicSetting("DataInOut", "COM2", [None, "+NMEA+SBF"]),
+        MosaicSetting("SBFOutput", f"Stream{stream}", ["COM2", "+PVTGeodetic+DOP", interval]),
+        MosaicSetting("SBFOutput", f"Stream{stream + 1}", ["COM2", "+DiffCorrIn+ReceiverStatus", "OnChange"]),
+    ]
+
+
+def mosaic_receiver_serial(reply):
+    """Seriennummer aus der Antwort auf lstInternalFile,Identification (None wenn nicht gefunden)"""
+    match = re.search(r'serial\s*(?:number|nr\.?)?\W{0,3}([A-Za-z0-9][A-Za-z0-9-]{3,})', reply.text, re.IGNORECASE)
+    return match.group(1) if match else None
+
+
+class MosaicConfigCache:
+    """Snapshot der mosaic-H Konfiguration auf der Platte, pro Empfänger-Seriennummer
+
+    Enthält die zuletzt gelesenen bzw. gesetzten Felder je Block sowie Hashes
+    der geheimen Felder. Passwörter werden nur als Hash gespeichert.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, serial_number):
+        safe = re.sub(r'[^A-Za-z0-9_-]', '_', serial_number)
+        return os.path.join(self.directory, f"mosaic_config_{safe}.json")
+
+    def load(self, serial_number):
+        try:
+            with open(self.path(serial_number)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, serial_number, snapshot):
+        path = self.path(serial_number)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Atomar ersetzen, damit ein Abbruch keinen halben Snapshot hinterlässt
+            with open(path + '.tmp', 'w') as f:
+                json.dump(snapshot, f, indent=2, sort_keys=True)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            logger.warning(f"Konfigurations-Snapshot konnte nicht gespeichert werden ({path}): {e}")
+
+
+class StartupState:
+    """Schneller Start: letzte gültige GGA und aufgelöste Caster-Adressen auf der Platte
+
+    Beim Start wird die gespeicherte GGA direkt nach dem Handshake gesendet,
+    so liefert ein VRS Caster Korrekturen, bevor das mosaic-H die erste
+    Position ausgibt. Die erste Live-GGA ersetzt sie sofort. Adressen gelten
+    dns_ttl Sekunden; nach einem Verbindungsfehler wird neu aufgelöst, bei
+    DNS Ausfall werden abgelaufene Adressen weiter verwendet.
+
+    Zusätzlich werden die Zeiten ab Programmstart bis zu den ersten
+    Ereignissen (Caster verbunden, erstes RTCM Byte, erster UART Write, erste
+    Live-GGA) einmalig geloggt und als Metrik exportiert. Ohne path wird
+    nichts gespeichert, nur gemessen.
+    """
+
+    EVENTS = {
+        'caster_connected': "Caster verbunden",
+        'cached_gga_sent': "gespeicherte GGA gesendet",
+        'first_rtcm_byte': "erstes RTCM Byte vom Caster",
+        'first_uart_write': "erster UART Write (Time-to-first-correction)",
+        'first_live_gga': "erste Live-GGA vom mosaic-H",
+    }
+    # Ältere Positionen nicht verwenden (Empfänger wurde vermutlich bewegt)
+    GGA_MAX_AGE = 7 * 86400
+
+    def __init__(self, path=None, dns_ttl=3600, store_interval=300):
+        self.path = path
+        self.dns_ttl = dns_ttl
+        self.store_interval = store_interval
+        self.start = time.monotonic()
+        self.times = {}
+        self._stored_at = -math.inf
+        self._state = {'gga': None, 'gga_time': 0, 'addresses': {}}
+        if path:
+            try:
+                with open(path) as f:
+                    self._state.update(json.load(f))
+            except (OSError, ValueError):
+                pass
+
+    def cached_gga(self, now=None):
+        """Gespeicherte GGA (None wenn keine oder älter als GGA_MAX_AGE)"""
+        gga = self._state.get('gga')
+        if gga and (now or time.time()) - self._state.get('gga_time', 0) <= self.GGA_MAX_AGE:
+            return gga
+        return None
+
+    def mark(self, event, now=None):
+        """Zeitpunkt eines Start-Ereignisses festhalten und loggen (nur das erste Auftreten)"""
+        if event in self.times:
+            return
+        elapsed = self.times[event] = (now or time.monotonic()) - self.start
+        logger.info(f"Start: {self.EVENTS[event]} nach {elapsed:.3f} s")
+
+    def live_gga(self, gga, now=None):
+        """Live-GGA vom mosaic-H merken (gültiger Fix, höchstens alle store_interval Sekunden speichern)
+
+        Returns:
+            True bei der ersten Live-GGA seit Programmstart
+        """
+        first = 'first_live_gga' not in self.times
+        if first:
+            self.mark('first_live_gga', now)
+        info = parse_gga(gga)
+        if info and info['quality'] > 0 and info['lat'] is not None:
+            monotonic = now or time.monotonic()
+            if monotonic - self._stored_at >= self.store_interval:
+                self._stored_at = monotonic
+                self._state['gga'] = gga
+                self._state['gga_time'] = time.time()
+                self.save()
+        return first
+
+    def resolve(self, host, port):
+        """Adressen des Casters [(ip, port), ...] aus dem Cache bzw. per DNS"""
+        key = f"{host}:{port}"
+        entry = self._state['addresses'].get(key)
+        if entry and time.time() - entry['resolved'] < self.dns_ttl:
+            return [tuple(address) for address in entry['addresses']]
+        try:
+            infos = socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM)
+        except OSError as e:
+            if not entry:
+                raise
+            logger.warning(f"DNS Auflösung von {host} fehlgeschlagen ({e}) - verwende gespeicherte Adressen")
+            return [tuple(address) for address in entry['addresses']]
+        addresses = list(dict.fromkeys(info[4][:2] for info in infos))
+        self._state['addresses'][key] = {'addresses': addresses, 'resolved': time.time()}
+        if not entry or [tuple(address) for address in entry['addresses']] != addresses:
+            logger.info(f"Caster {host} aufgelöst: {', '.join(ip for ip, _ in addresses)}")
+            self.save()
+        return addresses
+
+    def invalidate(self, host, port):
+        """Adressen beim nächsten Verbindungsaufbau neu auflösen (Verbindung fehlgeschlagen)"""
+        entry = self._state['addresses'].get(f"{host}:{port}")
+        if entry:
+            entry['resolved'] = 0
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # Atomar ersetzen, damit ein Abbruch keine halbe Datei hinterlässt
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump(self._state, f, indent=2, sort_keys=True)
+            os.replace(self.path + '.tmp', self.path)
+        except OSError as e:
+            logger.warning(f"Startzustand konnte nicht gespeichert werden ({self.path}): {e}")
+
+    def collect_metrics(self):
+        return [
+            ('ntrip_startup_seconds', 'gauge', 'Sekunden ab Programmstart bis zum ersten Auftreten des Ereignisses',
+             [({'event': event}, elapsed) for event, elapsed in self.times.items()]),
+        ]
+
+
+def configure_mosaic_ntrip(uart, config, force=False, cache=None, verify=False):
+    """Konfiguriert das mosaic-H Modul für NTRIP
+
+    Jedes Kommando wartet genau bis zum Prompt der Antwort (keine festen
+    Pausen), set-Kommandos werden über ihre "$R:"/"$R?" Antwort geprüft.
+
+    Standardmäßig wird die aktuelle Konfiguration gelesen (gepipelinete
+    get-Kommandos) und nur gesendet, was sich ändert; exeWriteSettings
+    (Flash-Schreibzugriff) nur bei Änderungen. Mit einem MosaicConfigCache
+    wird der Snapshot pro Seriennummer gespeichert: stimmt er mit der
+    gewünschten Konfiguration überein, entfallen die get-Abfragen (außer
+    verify=True). force=True sendet wie bisher alles.
+    """
+    logger.info("=== Starte mosaic-H NTRIP Konfiguration ===")
+    started = time.monotonic()
+    
+    # Kommunikationstest mit mosaic-H (zusammen mit der Seriennummer für den Cache)
+    logger.info("Teste Kommunikation mit mosaic-H...")
+    commands = ["getCOMSettings,COM2"] + (["lstInternalFile,Identification"] if cache and not force else [])
+    replies = uart.send_commands(commands)
+    reply = replies[0]
+    # mosaic-H antwortet mit $R: oder $R; oder $R?
+    if reply.kind is None:
+        logger.error("Keine Antwort vom mosaic-H erhalten!")
+        logger.error("Prüfe UART-Verbindung und Baudrate (sollte 115200 sein)")
+        return False
+    elif reply.kind == '?':
+        logger.error(f"mosaic-H meldet ungültigen Befehl: {reply.error}")
+        return False
+    else:
+        logger.info("✓ Kommunikation mit mosaic-H erfolgreich")
+    serial_number = mosaic_receiver_serial(replies[1]) if len(replies) > 1 and replies[1].ok else None
+    if cache and not force and not serial_number:
+        logger.warning("Seriennummer des mosaic-H nicht ermittelbar - Snapshot-Cache wird nicht verwendet")
+    
+    # Optional: Login durchführen
+    if 'mosaic_username' in config and 'mosaic_password' in config:
+        uart.login(config['mosaic_username'], config['mosaic_password'])
+    
+    if config['version'] != "auto":
+        logger.info(f"NTRIP Version: {config['version']}")
+    if config['send_gga'] != "auto":
+        logger.info(f"GGA Intervall: {config['send_gga']}")
+    
+    settings = mosaic_desired_settings(config)
+    snapshot = (cache.load(serial_number) if serial_number else None) or {'settings': {}, 'secrets': {}}
+    
+    # Aktuelle Konfiguration lesen (entfällt bei passendem Snapshot)
+    if force:
+        current = {}
+    elif serial_number and not verify and all(
+            setting.matches(snapshot['settings'].get(setting.key), snapshot['secrets'].get(setting.key))
+            for setting in settings):
+        logger.info(f"Konfiguration laut Snapshot ({serial_number}) aktuell - keine Abfrage nötig")
+        current = snapshot['settings']
+    else:
+        replies = uart.send_commands([setting.get_command for setting in settings])
+        current = {setting.key: setting.parse(reply) for setting, reply in zip(settings, replies)}
+        snapshot['settings'].update((key, fields) for key, fields in current.items() if fields is not None)
+    
+    # Nur abweichende Blöcke setzen
+    changed = 0
+    for setting in settings:
+        if not force and setting.matches(current.get(setting.key), snapshot['secrets'].get(setting.key)):
+            logger.info(f"✓ {setting.key} bereits korrekt")
+            continue
+        logger.info(f"Setze {setting.key}...")
+        reply = uart.send_commands([setting.set_command])[0]
+        if not reply.ok:
+            logger.error(f"Kommando fehlgeschlagen: set{setting.key} - {reply.error}")
+            return False
+        changed += 1
+        # Die Antwort enthält die neue Konfiguration des Blocks
+        snapshot['settings'][setting.key] = setting.parse(reply) or setting.fields
+        if setting.secret:
+            snapshot['secrets'][setting.key] = setting.secret_hash()
+    
+    # Konfiguration dauerhaft speichern - nur wenn sich etwas geändert hat
+    if changed:
+        logger.info("Speichere Konfiguration...")
+        reply = uart.send_commands(["exeWriteSettings"])[0]
+        if not reply.ok:
+            logger.error(f"Kommando fehlgeschlagen: exeWriteSettings - {reply.error}")
+            return False
+    else:
+        logger.info("Keine Änderungen - exeWriteSettings entfällt")
+    
+    if cache and serial_number:
+        snapshot['serial'] = serial_number
+        snapshot['updated'] = datetime.now().isoformat(timespec='seconds')
+        cache.store(serial_number, snapshot)
+    
+    # Status abfragen
+    if changed and config['mode'] == "Client":
+        uart.send_commands([f"getNTRIPSettings,{config['connection']}"])
+    
+    logger.info(f"=== mosaic-H NTRIP Konfiguration abgeschlossen: {changed} Änderung(en), "
+                f"{time.monotonic() - started:.2f} s ===")
+    return True
+
+
+def enable_sbf_output(uart, interval, stream=10):
+    """SBF Ausgabe für den SBFDecoder einschalten (nur laufende Konfiguration, kein exeWriteSettings)"""
+    settings = mosaic_sbf_settings(interval, stream)
+    replies = uart.send_commands([setting.get_command for setting in settings])
+    for setting, reply in zip(settings, replies):
+        if setting.matches(setting.parse(reply)):
+            continue
+        reply = uart.send_commands([setting.set_command])[0]
+        if not reply.ok:
+            logger.warning(f"SBF Ausgabe nicht aktiviert: set{setting.key} - {reply.error}")
+            return False
+    logger.info(f"SBF Ausgabe aktiv: PVTGeodetic+DOP mit {interval}, DiffCorrIn+ReceiverStatus bei Änderung")
+    return True
+
+
+def preconnect_caster(ntrip_client, gga=None, startup=None):
+    """Caster-Verbindung im Hintergrund aufbauen, während der UART geöffnet und konfiguriert wird
+
+    Direkt nach dem Handshake wird gga (die gespeicherte Position) gesendet,
+    damit ein VRS Caster schon vor der ersten Live-GGA Korrekturen erzeugt.
+
+    Returns:
+        Future mit dem Ergebnis von ntrip_client.connect()
+    """
+    def run():
+        if not ntrip_client.connect():
+            return False
+        if startup is not None:
+            startup.mark('caster_connected')
+        if gga and ntrip_client.send_gga(gga):
+            logger.info(f"Gespeicherte GGA Position gesendet: {gga.strip()}")
+            if startup is not None:
+                startup.mark('cached_gga_sent')
+        return True
+
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='caster-preconnect')
+    future = pool.submit(run)
+    pool.shutdown(wait=False)
+    return future
+
+
+def stream_mode(ntrip_client, uart, framer=None, fanout=None, coalesce=0.0, capture=None, gga_scheduler=None,
+                cadence=None, startup=None, mountpoints=None, watchdog=None):
+    """Stream-Modus: Leitet NTRIP Daten kontinuierlich an mosaic-H weiter
+
+    Wann GGA Positionen an den Caster gehen, entscheidet gga_scheduler
+    (GGAScheduler, Standard: fest alle 5 Sekunden). Ein Stall wird aus dem
+    Epochentakt erkannt (cadence, RTCMCadence über Reconnects hinweg).
+
+    Mit coalesce > 0 werden Empfänge bis zum Ende der Epoche bzw. höchstens
+    coalesce Sekunden gesammelt und mit einem serial.write() geschrieben.
+    Mit capture (CaptureWriter) werden Caster-Nutzdaten und GGA Uploads
+    mitgeschnitten, UART TX/RX über uart.capture. Mit startup (StartupState)
+    werden die Zeiten bis zur ersten Korrektur gemessen und gültige GGA
+    Positionen für den nächsten Start gespeichert. Mit mountpoints
+    (MountpointSelector) endet der Stream für einen Reconnect, sobald ein
+    näherer Mountpoint gewählt wurde, mit watchdog (CorrectionWatchdog),
+    sobald die Korrekturen veraltet sind.
+    """
+    logger.info("=== Starte Stream-Modus ===")
+    
+    if framer:
+        framer.reset()  # Teil-Frames der vorherigen Verbindung verwerfen
+    
+    bytes_received = 0
+    last_log_time = time.time()
+    last_warn_time = time.time()
+    last_gga_time = time.time()
+    if gga_scheduler is None:
+        gga_scheduler = GGAScheduler.fixed(5)  # GGA alle 5 Sekunden senden
+    gga_scheduler.reset()  # Erste Position sofort senden
+    # Wurde beim Verbindungsaufbau schon die gespeicherte GGA gesendet, nicht auf das mosaic-H warten
+    gga_sent = ntrip_client.last_gga is not None
+    if cadence is None:
+        cadence = RTCMCadence()
+    cadence.reset()
+    if watchdog is not None:
+        watchdog.reset()
+    last_data_time = time.monotonic()
+    
+    def receive(timeout):
+        data = ntrip_client.receive_data(timeout=timeout)
+        if data:
+            cadence.on_data(time.monotonic())
+            if startup is not None:
+                startup.mark('first_rtcm_byte')
+            if capture is not None:
+                capture.record(CaptureWriter.CASTER_RX, data)
+        return data
+    
+    try:
+        while True:
+            current_time = time.time()
+            
+            # GGA Position zum Caster senden (für VRS) - bis zur ersten Position blockierend lesen
+            gga = uart.poll_gga() if gga_sent else uart.read_nmea(timeout=1.0, debug=True)
+            if gga:
+                last_gga_time = current_time
+                now = time.monotonic()
+                # Erste Live-GGA ersetzt die gespeicherte Position sofort
+                if startup is not None and startup.live_gga(gga, now):
+                    gga_scheduler.reset()
+                if mountpoints is not None and mountpoints.check(gga, now):
+                    return False  # Reconnect zum neuen Mountpoint
+                if watchdog is not None:
+                    info = parse_gga(gga)
+                    if info:
+                        watchdog.on_gga(info, now)
+                reason = gga_scheduler.check(gga, now)
+                if reason and ntrip_client.send_gga(gga):
+                    gga_scheduler.sent(gga, now, reason)
+                    if capture is not None:
+                        capture.record(CaptureWriter.GGA_TX, gga.encode('ascii'))
+                    if not gga_sent:
+                        logger.info(f"Erste GGA Position gesendet: {gga.strip()}")
+                        gga_sent = True
+            elif (current_time - last_gga_time >= gga_scheduler.base_interval
+                  and current_time - last_warn_time >= gga_scheduler.base_interval):
+                # Seit einem GGA Intervall keine neue Position (der Scheduler bekommt nur Live-GGAs)
+                logger.warning("Keine GGA Position vom mosaic-H empfangen - mosaic-H gibt evtl. keine NMEA Daten aus")
+                last_warn_time = current_time  # Verhindere zu häufiges Logging
+            
+            # Daten vom NTRIP Caster empfangen
+            data = receive(1)
+            if data == b'':
+                logger.warning("NTRIP Caster hat die Verbindung geschlossen - Reconnect...")
+                return False  # Reconnect erforderlich
+            if data:
+                last_data_time = time.monotonic()
+            
+            if data and framer:
+                # Nur vollständige Frames mit gültiger CRC weiterleiten
+                frames = framer.feed(data)
+                if coalesce > 0:
+                    # Rest der Epoche abwarten statt jeden Empfang einzeln zu schreiben
+                    deadline = time.monotonic() + coalesce
+                    checked = 0
+                    while not any(rtcm_epoch_end(frame) for frame in frames[checked:]):
+                        checked = len(frames)
+                        timeout = deadline - time.monotonic()
+                        more = receive(timeout) if timeout > 0 else None
+                        if not more:
+                            break
+                        frames += framer.feed(more)
+                if frames and watchdog is not None:
+                    watchdog.on_frames(frames, time.monotonic())
+                data = b''.join(frames) or None
+            elif data and coalesce > 0:
+                deadline = time.monotonic() + coalesce
+                chunks = [data]
+                while (timeout := deadline - time.monotonic()) > 0:
+                    more = receive(timeout)
+                    if not more:
+                        break
+                    chunks.append(more)
+                data = b''.join(chunks)
+            
+            if data:
+                # Daten über UART an mosaic-H senden
+                sent = uart.send_data(data)
+                if fanout:
+                    fanout.publish((data,))
+                if sent:
+                    bytes_received += len(data)
+                    if startup is not None:
+                        startup.mark('first_uart_write')
+                    
+                    # Log alle 10 Sekunden
+                    if current_time - last_log_time >= 10:
+                        logger.info(f"RTCM Daten empfangen und weitergeleitet: {bytes_received} bytes")
+                        last_log_time = current_time
+            elif gga_sent and time.monotonic() - last_data_time >= cadence.timeout():
+                # Nur wenn GGA gesendet wurde und länger als STALL_EPOCHS Epochen keine Daten kommen
+                logger.warning(f"Keine RTCM Daten vom NTRIP Caster seit {cadence.timeout():.1f} s - Reconnect...")
+                return False  # Reconnect erforderlich
+            
+            stale = watchdog.check(time.monotonic()) if watchdog is not None else None
+            if stale:
+                logger.warning(f"Korrekturen veraltet: {stale[1]} - Reconnect...")
+                return False  # Reconnect erforderlich
+                
+    except KeyboardInterrupt:
+        logger.info("Stream-Modus durch Benutzer beendet")
+        return True
+    except Exception as e:
+        logger.error(f"Fehler im Stream-Modus: {e}")
+        return False
+
+
+class CaptureWriter:
+    """Mitschnitt für die Offline-Analyse: Caster-Nutzdaten, UART TX/RX, GGA Uploads
+
+    Kompaktes Binärformat, nur angehängt:
+      Dateikopf (32 Bytes): MAGIC, Version u2, reserviert u2, Index-Intervall ms u4,
+                            Startzeit Unix ns u8, reserviert u8
+      Record: Zeit ns seit Start u8, Länge u4, Art u1, Kanal u1, Nutzdaten
+    Alle index_interval Sekunden (bzw. index_bytes) folgt ein Index-Record mit
+    Offset und Zeit des ersten Records seit dem letzten Index sowie dem Offset
+    des vorherigen Index - vom Dateiende aus ergibt sich so ohne Vollscan ein
+    Sprungverzeichnis. Danach wird der Puffer auf die Platte geschrieben, nach
+    einem Absturz fehlen höchstens die Records seit dem letzten Index.
+
+    record() ist threadsicher (UART Threads, Event-Loop, Kontroll-Port) und
+    blockiert nie: die Records gehen über eine begrenzte Queue an einen
+    eigenen Schreib-Thread, die Weiterleitung wartet nicht auf die SD-Karte.
+    Ist die Queue voll, wird der Record verworfen und in dropped gezählt.
+    Ein Schreibfehler (z.B. SD-Karte voll) beendet die Aufnahme (failed):
+    der Schreib-Thread leert die Queue weiter, alle Records zählen als verworfen.
+    """
+
+    MAGIC = b'MNTRCAP1'
+    INDEX_MAGIC = b'MNTRIDX1'
+    VERSION = 1
+    HEADER = struct.Struct('<8sHHIqq')
+    RECORD = struct.Struct('<QIBB')
+    # MAGIC, vorheriger Index (0 = keiner), erster Record des Blocks, dessen Zeit, Records, Bytes
+    INDEX = struct.Struct('<8sQQQIQ')
+
+    # Arten (Kanal = Index des Casters bei CASTER_RX/GGA_TX)
+    CASTER_RX = 1
+    UART_TX = 2
+    UART_RX = 3
+    GGA_TX = 4
+    EVENT = 5
+    INDEX_RECORD = 0x7F
+    KINDS = {'caster': CASTER_RX, 'uart_tx': UART_TX, 'uart_rx': UART_RX, 'gga': GGA_TX, 'event': EVENT}
+
+    def __init__(self, path, kinds=None, index_interval=10.0, index_bytes=1 << 20, queue_size=4096):
+        self.path = path
+        # Aufgezeichnete Arten (None = alle), Index-Records immer
+        self.kinds = set(kinds) if kinds is not None else set(self.KINDS.values())
+        self.index_interval = index_interval
+        self.index_bytes = index_bytes
+        self.records = 0
+        self.bytes = 0
+        self.dropped = 0
+        self.failed = False
+        self._queue = queue_module.Queue(queue_size)
+        self._closed = False
+        self._file = open(path, 'wb', buffering=1 << 16)
+        self._start_ns = time.monotonic_ns()
+        self._file.write(self.HEADER.pack(self.MAGIC, self.VERSION, 0, int(index_interval * 1000), time.time_ns(), 0))
+        self._offset = self.HEADER.size
+        self._last_index = 0
+        self._block_offset = self._offset
+        self._block_time = None
+        self._block_records = 0
+        self._block_bytes = 0
+        self._index_due = time.monotonic() + index_interval
+        self._thread = threading.Thread(target=self._writer, name='capture', daemon=True)
+        self._thread.start()
+
+    def record(self, kind, data, channel=0):
+        """Einen Record anhängen (data: bytes, bytearray oder memoryview), blockiert nicht"""
+        if kind not in self.kinds or self._closed:
+            return
+        if self.failed:
+            self.dropped += 1
+            return
+        timestamp = time.monotonic_ns() - self._start_ns
+        try:
+            # Kopie: Empfangspuffer (recv_into) werden wiederverwendet
+            self._queue.put_nowait((timestamp, kind, channel, bytes(data)))
+        except queue_module.Full:
+            self.dropped += 1
+
+    def event(self, text, channel=0):
+        """Ereignis (Verbindung, Failover, ...) als Text aufzeichnen"""
+        self.record(self.EVENT, text.encode('utf-8'), channel)
+
+    def _writer(self):
+        """Im Schreib-Thread: Records aus der Queue schreiben, Index und flush nach Fälligkeit"""
+        while True:
+            try:
+                item = self._queue.get(timeout=max(self._index_due - time.monotonic(), 0.01))
+            except queue_module.Empty:
+                item = ()
+            if item is None:
+                break
+            if self.failed:
+                # Nach einem Schreibfehler nur noch leeren, damit record() und close() nie blockieren
+                self.dropped += bool(item)
+                self._index_due = time.monotonic() + self.index_interval
+                continue
+            try:
+                if not item:
+                    self._write_index(time.monotonic_ns() - self._start_ns)
+                    continue
+                timestamp, kind, channel, data = item
+                length = len(data)
+                self._file.write(self.RECORD.pack(timestamp, length, kind, channel))
+                self._file.write(data)
+                if self._block_time is None:
+                    self._block_time = timestamp
+                self._offset += self.RECORD.size + length
+                self._block_records += 1
+                self._block_bytes += length
+                self.records += 1
+                self.bytes += length
+                if self._block_bytes >= self.index_bytes or time.monotonic() >= self._index_due:
+                    self._write_index(timestamp)
+            except OSError as e:
+                self._failed(e)
+        try:
+            if not self.failed:
+                self._write_index(time.monotonic_ns() - self._start_ns)
+            self._file.close()
+        except OSError as e:
+            self._failed(e)
+
+    def _failed(self, error):
+        """Aufnahme nach einem Schreibfehler beenden (einmalig melden)"""
+        if not self.failed:
+            self.failed = True
+            logger.error(f"Mitschnitt {self.path} abgebrochen, Schreibfehler: {error}")
+
+    def _write_index(self, timestamp):
+        """Index-Record für den Block seit dem letzten Index schreiben und Puffer leeren"""
+        if self._block_records:
+            payload = self.INDEX.pack(self.INDEX_MAGIC, self._last_index, self._block_offset,
+                                      self._block_time, self._block_records, self._block_bytes)
+            self._file.write(self.RECORD.pack(timestamp, len(payload), self.INDEX_RECORD, 0))
+            self._file.write(payload)
+            self._last_index = self._offset
+            self._offset += self.RECORD.size + len(payload)
+            self._block_offset = self._offset
+            self._block_time = None
+            self._block_records = 0
+            self._block_bytes = 0
+        self._file.flush()
+        self._index_due = time.monotonic() + self.index_interval
+
+    def close(self):
+        """Queue abarbeiten, letzten Index schreiben und Datei schließen"""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._queue.put(None, timeout=5)
+        except queue_module.Full:
+            logger.error(f"Mitschnitt {self.path}: Schreib-Thread reagiert nicht")
+        self._thread.join(timeout=5)
+        logger.info(f"Mitschnitt {self.path} geschlossen: {self.records} Records, {self.bytes} bytes"
+                    + (f", {self.dropped} verworfen" if self.dropped else "")
+                    + (" - abgebrochen nach Schreibfehler" if self.failed else ""))
+
+
+class CaptureReader:
+    """Liest einen CaptureWriter Mitschnitt per mmap (Nutzdaten als memoryview ohne Kopie)
+
+    Eine abgeschnittene Datei (Absturz während der Aufnahme) wird bis zum
+    letzten vollständigen Record gelesen.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        header = CaptureWriter.HEADER
+        if len(self._map) < header.size:
+            raise ValueError(f"{path}: zu kurz für einen Mitschnitt")
+        magic, self.version, _, interval_ms, self.start_unix_ns, _ = header.unpack_from(self._map, 0)
+        if magic != CaptureWriter.MAGIC:
+            raise ValueError(f"{path}: kein Mitschnitt (Magic {magic!r})")
+        self.index_interval = interval_ms / 1000
+
+    def close(self):
+        self._view.release()
+        try:
+            self._map.close()
+        except BufferError:
+            pass  # Nutzdaten (memoryview) noch in Verwendung - Mapping endet mit der letzten Referenz
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def first_timestamp(self):
+        """Zeit (ns seit Aufnahmebeginn) des ersten Records, None bei leerem Mitschnitt"""
+        if len(self._map) < CaptureWriter.HEADER.size + CaptureWriter.RECORD.size:
+            return None
+        return CaptureWriter.RECORD.unpack_from(self._map, CaptureWriter.HEADER.size)[0]
+
+    def index(self):
+        """Sprungverzeichnis [(Zeit ns, Offset), ...] aufsteigend, über die Kette der Index-Records"""
+        entries = []
+        offset = self._last_index()
+        while offset:
+            _, previous, block_offset, block_time, _, _ = CaptureWriter.INDEX.unpack_from(
+                self._map, offset + CaptureWriter.RECORD.size)
+            entries.append((block_time, block_offset))
+            offset = previous
+        entries.reverse()
+        return entries
+
+    def _last_index(self):
+        """Offset des letzten Index-Records (vom Dateiende rückwärts gesucht), 0 = keiner"""
+        pos = len(self._map)
+        while True:
+            pos = self._map.rfind(CaptureWriter.INDEX_MAGIC, CaptureWriter.HEADER.size, pos)
+            if pos < 0:
+                return 0
+            offset = pos - CaptureWriter.RECORD.size
+            if offset >= CaptureWriter.HEADER.size:
+                _, length, kind, _ = CaptureWriter.RECORD.unpack_from(self._map, offset)
+                if kind == CaptureWriter.INDEX_RECORD and length == CaptureWriter.INDEX.size \
+                        and pos + length <= len(self._map):
+                    return offset
+            pos += len(CaptureWriter.INDEX_MAGIC) - 1
+
+    def seek(self, timestamp_ns):
+        """Offset, ab dem alle Records mit Zeit >= timestamp_ns liegen"""
+        offset = CaptureWriter.HEADER.size
+        for block_time, block_offset in self.index():
+            if block_time > timestamp_ns:
+                break
+            offset = block_offset
+        return offset
+
+    def records(self, start_ns=0, end_ns=None, kinds=None):
+        """Records (Zeit ns, Art, Kanal, memoryview) ab start_ns, Index-Records ausgenommen"""
+        view = self._view
+        size = len(view)
+        header = CaptureWriter.RECORD
+        offset = self.seek(start_ns) if start_ns else CaptureWriter.HEADER.size
+        while offset + header.size <= size:
+            timestamp, length, kind, channel = header.unpack_from(view, offset)
+            end = offset + header.size + length
+            if end > size:
+                break
+            if end_ns is not None and timestamp > end_ns:
+                break
+            if kind != CaptureWriter.INDEX_RECORD and timestamp >= start_ns and (kinds is None or kind in kinds):
+                yield timestamp, kind, channel, view[offset + header.size:end]
+            offset = end
+
+    def summary(self):
+        """Dauer, Records und Bytes pro Art"""
+        names = {kind: name for name, kind in CaptureWriter.KINDS.items()}
+        kinds = collections.defaultdict(lambda: [0, 0])
+        first = last = None
+        for timestamp, kind, _, data in self.records():
+            stats = kinds[names.get(kind, str(kind))]
+            stats[0] += 1
+            stats[1] += len(data)
+            first = timestamp if first is None else first
+            last = timestamp
+        return {
+            'file_bytes': len(self._map),
+            'started': datetime.fromtimestamp(self.start_unix_ns / 1e9).isoformat(timespec='seconds'),
+            'duration_s': (last - first) / 1e9 if first is not None else 0.0,
+            'index_entries': len(self.index()),
+            'kinds': {name: {'records': count, 'bytes': size} for name, (count, size) in sorted(kinds.items())},
+        }
+
+
+class LatencyHistogram:
+    """Rollierendes Latenz-Histogramm mit festem Speicherbedarf
+
+    Logarithmische Buckets (bucket_per_decade pro Dekade zwischen min_value und
+    max_value) in mehreren Zeitscheiben: alte Scheiben werden beim Rotieren
+    geleert, Perzentile beziehen sich daher auf die letzten window Sekunden.
+    Der Speicher ist unabhängig von der Anzahl Messungen.
+    """
+
+    def __init__(self, window=60, slices=6, min_value=1e-4, max_value=100.0, buckets_per_decade=40):
+        self.min_value = min_value
+        self.buckets_per_decade = buckets_per_decade
+        self.nbuckets = int(math.log10(max_value / min_value) * buckets_per_decade) + 2
+        self.slice_length = window / slices
+        self._slices = [[0] * self.nbuckets for _ in range(slices)]
+        self._slice_ids = [None] * slices
+
+        # Kumuliert seit Start (für Mittelwert / Export)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def _bucket(self, value):
+        if value <= self.min_value:
+            return 0
+        index = int(math.log10(value / self.min_value) * self.buckets_per_decade) + 1
+        return index if index < self.nbuckets else self.nbuckets - 1
+
+    def _bound(self, index):
+        """Obergrenze eines Buckets"""
+        return self.min_value * 10 ** (index / self.buckets_per_decade)
+
+    def record(self, value, now=None):
+        """Messwert (Sekunden) eintragen"""
+        slice_id = int((time.monotonic() if now is None else now) / self.slice_length)
+        pos = slice_id % len(self._slices)
+        counts = self._slices[pos]
+        if self._slice_ids[pos] != slice_id:
+            # Scheibe ist abgelaufen - für das neue Zeitfenster wiederverwenden
+            counts[:] = [0] * self.nbuckets
+            self._slice_ids[pos] = slice_id
+        counts[self._bucket(value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentiles(self, quantiles=(0.5, 0.95, 0.99), now=None):
+        """Perzentile im aktuellen Fenster (Bucket-Obergrenzen), None ohne Messwerte"""
+        current = int((time.monotonic() if now is None else now) / self.slice_length)
+        oldest = current - len(self._slices) + 1
+        totals = [0] * self.nbuckets
+        for slice_id, counts in zip(self._slice_ids, self._slices):
+            if slice_id is not None and slice_id >= oldest:
+                for index, count in enumerate(counts):
+                    if count:
+                        totals[index] += count
+        n = sum(totals)
+        if not n:
+            return None
+        result = []
+        for q in quantiles:
+            rank = q * n
+            cumulative = 0
+            for index, count in enumerate(totals):
+                cumulative += count
+                if cumulative >= rank:
+                    result.append(self._bound(index))
+                    break
+        return tuple(result)
+
+    def format(self, unit=1000, suffix='ms'):
+        """p50/p95/p99 als Text, z.B. '3.2/8.9/12.6 ms'"""
+        values = self.percentiles()
+        if not values:
+            return "-"
+        return "/".join(f"{value * unit:.1f}" for value in values) + f" {suffix}"
+
+
+class CorrectionLatency:
+    """Latenz-Instrumentierung des Korrekturpfads
+
+    - forward:   Socket-Empfang → UART Write abgeschlossen (pro Chunk/Frame)
+    - epoch_age: Alter der RTCM Epoche beim UART Write, bezogen auf die GPS
+                 Zeit der letzten GGA (nur mit RTCM Framer)
+    """
+
+    def __init__(self, window=60):
+        self.forward = LatencyHistogram(window)
+        self.epoch_age = LatencyHistogram(window)
+        self._gga_tod_ms = None
+        self._gga_time = None
+        self._last_epoch = None
+
+    def on_gga(self, gga, received_at):
+        """Neue GGA als Zeitreferenz übernehmen"""
+        tod = gga_gps_tod_ms(gga)
+        if tod is not None:
+            self._gga_tod_ms = tod
+            self._gga_time = received_at
+
+    def on_written(self, received_at, frames, now):
+        """Chunk wurde vollständig auf den UART geschrieben"""
+        self.forward.record(now - received_at, now)
+        if self._gga_tod_ms is None:
+            return
+        # Aktuelle GPS Zeit aus der letzten GGA fortschreiben
+        gps_now = self._gga_tod_ms + (now - self._gga_time) * 1000
+        for frame in frames:
+            epoch = rtcm_epoch_tod_ms(frame)
+            if epoch is None or epoch == self._last_epoch:
+                continue  # Eine Messung pro Epoche, nicht pro Konstellation
+            self._last_epoch = epoch
+            age = (gps_now - epoch) % DAY_MS
+            if age > DAY_MS / 2:
+                age -= DAY_MS  # Epoche liegt (Uhrenversatz) in der Zukunft
+            self.epoch_age.record(max(age, 0) / 1000, now)
+
+    def summary(self):
+        """p50/p95/p99 der letzten Minute als Logzeile"""
+        return f"Weiterleitung {self.forward.format()}, Korrekturalter {self.epoch_age.format()}"
+
+
+class RTCMScheduler:
+    """Bandbreitenbewusste Auswahl der RTCM Frames für den nächsten UART Write
+
+    Bei 115200 Baud trägt der UART nur ~11.5 KB/s. Staut sich nach einem
+    Stall ein Burst an, plant der Scheduler alle wartenden Frames gemeinsam:
+      - überholt: ältere Epochen derselben Beobachtungsnachricht (Typ und
+        Station) sowie wiederholte Stationsnachrichten werden verworfen
+      - Priorität: Stationsdaten, dann die neueste Epoche, dann übrige
+        Nachrichten (Ephemeriden, ...), zuletzt ältere Epochen
+      - veraltet: Beobachtungen, die bei der aktuellen Warteschlange erst
+        nach max_age am Empfänger ankämen, werden nicht mehr geschrieben
+    Das mosaic-H erhält so immer zuerst die frischeste Epoche.
+
+    Das Alter einer Epoche bezieht sich auf die Stream-Uhr: neueste bisher
+    empfangene Epoche plus die seitdem vergangene Zeit. Nach einem Stall
+    sind die nachgelieferten Epochen dadurch als alt erkennbar, auch ohne GGA.
+    """
+
+    # Referenzstation: Position (1005/1006), Antenne (1007/1008/1033), GLONASS Biases (1230)
+    STATION_TYPES = frozenset((1005, 1006, 1007, 1008, 1033, 1230))
+
+    def __init__(self, baudrate, max_age=2.0):
+        self.max_age = max_age
+        # Nominale Leitungsrate bei 8N1 (10 Bit pro Byte)
+        self.line_rate = baudrate / 10
+        # Gemessene Rate aus Writes, die vom UART gebremst wurden (Bytes/s, EWMA)
+        self.throughput = None
+        self.backlog_bytes = 0
+        self.dropped = {'stale': 0, 'superseded': 0}
+        self.dropped_bytes = 0
+        # Stream-Uhr: neueste Epoche und lokale Empfangszeit
+        self._clock_epoch = None
+        self._clock_time = None
+
+    @property
+    def rate(self):
+        """Für die Planung verwendete UART Rate in Bytes/s"""
+        return self.throughput or self.line_rate
+
+    def schedule(self, batch, now, queued=0):
+        """Wartende Chunks zu einer Frame-Liste für einen Write zusammenfassen
+
+        Args:
+            batch: Liste von (received_at, frames) in Empfangsreihenfolge
+            now: aktuelle Zeit (time.monotonic)
+            queued: Bytes, die noch im Ausgabepuffer des UART liegen
+        Returns:
+            (received_at des ältesten geplanten Frames oder None, Liste der Frames)
+        """
+        entries = []
+        newest = {}
+        latest_epoch = None
+        latest_time = None
+        for received_at, frames in batch:
+            for frame in frames:
+                msg_type = rtcm_message_type(frame)
+                epoch = rtcm_epoch_tod_ms(frame)
+                key = None
+                if epoch is not None or msg_type in self.STATION_TYPES:
+                    # Typ + Stations-ID (DF003, direkt nach dem Nachrichtentyp)
+                    key = (msg_type, ((frame[4] & 0x0F) << 8) | frame[5])
+                    current = newest.get(key)
+                    if current is None or epoch is None or _epoch_not_before(epoch, entries[current][3]):
+                        newest[key] = len(entries)
+                if epoch is not None and (latest_epoch is None or _epoch_not_before(epoch, latest_epoch)):
+                    if epoch != latest_epoch:
+                        latest_time = received_at
+                    latest_epoch = epoch
+                entries.append((received_at, frame, msg_type, epoch, key))
+
+        # Stream-Uhr läuft lokal weiter und wird nur vorgestellt, wenn Daten ihr voraus sind -
+        # nach einem Stall nachgelieferte Epochen stellen sie nicht zurück
+        if latest_epoch is not None:
+            if self._clock_epoch is None:
+                ahead = True
+            else:
+                expected = (self._clock_epoch + round((latest_time - self._clock_time) * 1000)) % DAY_MS
+                ahead = latest_epoch != expected and _epoch_not_before(latest_epoch, expected)
+            if ahead:
+                self._clock_epoch = latest_epoch
+                self._clock_time = latest_time
+        if self._clock_epoch is not None:
+            stream_now = self._clock_epoch + (now - self._clock_time) * 1000
+
+        planned = []
+        for index, (received_at, frame, msg_type, epoch, key) in enumerate(entries):
+            if key is not None and newest[key] != index:
+                self._drop('superseded', frame)
+                continue
+            if msg_type in self.STATION_TYPES:
+                priority = 0
+            elif epoch is None:
+                priority = 2
+            else:
+                priority = 1 if epoch == latest_epoch else 3
+            planned.append((priority, index))
+        planned.sort()
+
+        rate = self.rate
+        backlog = queued
+        oldest = None
+        frames = []
+        for _, index in planned:
+            received_at, frame, _, epoch, _ = entries[index]
+            if epoch is not None:
+                # Alter beim Eintreffen am Empfänger: Alter nach Stream-Uhr + Sendedauer bis zum Frame
+                age = (stream_now - epoch) % DAY_MS
+                age = max(now - received_at, age / 1000 if age < DAY_MS / 2 else 0.0)
+                if age + (backlog + len(frame)) / rate > self.max_age:
+                    self._drop('stale', frame)
+                    continue
+            backlog += len(frame)
+            frames.append(frame)
+            if oldest is None or received_at < oldest:
+                oldest = received_at
+        self.backlog_bytes = backlog
+        return oldest, frames
+
+    def on_written(self, nbytes, seconds, queued=0):
+        """Write abgeschlossen - Rate nachführen, wenn der UART gebremst hat"""
+        self.backlog_bytes = queued
+        # Kurze Writes landen nur im Treiberpuffer und sagen nichts über die Leitungsrate
+        if seconds >= 0.005 and nbytes:
+            sample = nbytes / seconds
+            self.throughput = sample if self.throughput is None else 0.8 * self.throughput + 0.2 * sample
+
+    def _drop(self, reason, frame):
+        self.dropped[reason] += 1
+        self.dropped_bytes += len(frame)
+
+    def summary(self):
+        """Kurzfassung für das 10-Sekunden-Log"""
+        return (
+            f"{self.dropped['stale']} veraltet, {self.dropped['superseded']} überholt verworfen "
+            f"({self.dropped_bytes} bytes), UART {self.rate / 1000:.1f} KB/s"
+        )
+
+
+def _epoch_not_before(epoch, other):
+    """Epochenvergleich modulo 24 h: epoch ist gleich oder neuer als other"""
+    return (epoch - other) % DAY_MS < DAY_MS // 2
+
+
+class ReconnectBackoff:
+    """Wartezeit vor dem nächsten Verbindungsversuch zum Caster
+
+    Nach einem Abbruch wird sofort neu verbunden (Caster-Neustart,
+    Funkzellenwechsel), jeder weitere Fehlschlag wartet base · factor^n
+    Sekunden bis höchstens max_delay. Der Jitter kürzt jede Wartezeit um
+    einen zufälligen Anteil bis jitter - nach einem Caster-Ausfall verbinden
+    sich viele Clients so nicht im Gleichtakt. Erst eine Verbindung, die
+    stable_after Sekunden gehalten hat, setzt die Folge zurück; ein Caster,
+    der Verbindungen sofort wieder trennt, wird nicht im Sekundentakt belastet.
+    """
+
+    def __init__(self, base=1.0, max_delay=60.0, factor=2.0, jitter=0.5, stable_after=30.0, rng=None):
+        self.base = base
+        self.max_delay = max(max_delay, base)
+        self.factor = factor
+        self.jitter = jitter
+        self.stable_after = stable_after
+        self.failures = 0
+        self._random = (rng or random.Random()).random
+
+    def next_delay(self):
+        """Wartezeit in Sekunden vor dem nächsten Versuch (0 = sofort)"""
+        attempt = self.failures
+        self.failures += 1
+        if attempt == 0:
+            return 0.0
+        delay = min(self.base * self.factor ** (attempt - 1), self.max_delay)
+        return delay * (1 - self.jitter * self._random())
+
+    def connection_ended(self, duration):
+        """Verbindung nach duration Sekunden beendet - stabile Verbindungen setzen die Folge zurück"""
+        if duration >= self.stable_after:
+            self.failures = 0
+
+
+class RTCMCadence:
+    """Stall-Erkennung aus dem Takt der RTCM Epochen statt fester 30 Sekunden
+
+    Empfänge mit mehr als gap Sekunden Abstand zum vorherigen gelten als neue
+    Epoche, der Epochenabstand wird gleitend gemittelt. Ohne Daten seit
+    epochs · Abstand (mindestens min_timeout) gilt die Verbindung als
+    hängend. Solange der Takt noch nicht bekannt ist, gilt max_timeout.
+    Lange Lücken (Stall, Reconnect) gehen nicht in den Mittelwert ein.
+    """
+
+    def __init__(self, epochs=5, min_timeout=2.0, max_timeout=30.0, gap=0.1):
+        self.epochs = epochs
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.gap = gap
+        self.period = None
+        self._last = None
+        self._samples = 0
+
+    def reset(self):
+        """Neue Verbindung: gelernten Takt behalten, Lücke zur alten Verbindung nicht messen"""
+        self._last = None
+
+    def on_data(self, now):
+        """Empfang mit Nutzdaten"""
+        last, self._last = self._last, now
+        if last is None:
+            return
+        interval = now - last
+        if interval <= self.gap or interval >= self.timeout():
+            return
+        self._samples += 1
+        if self.period is None:
+            self.period = interval
+        else:
+            # Schnell einschwingen, danach träge gegenüber einzelnen Ausreißern
+            alpha = max(0.1, 1 / self._samples)
+            self.period += alpha * (interval - self.period)
+
+    def timeout(self):
+        """Sekunden ohne Daten, nach denen die Verbindung als hängend gilt"""
+        if self.period is None or self._samples < 3:
+            return self.max_timeout
+        return min(max(self.epochs * self.period, self.min_timeout), self.max_timeout)
+
+
+class CorrectionWatchdog:
+    """Erkennt veraltete Korrekturen eines Casters, nicht nur ausbleibende Bytes
+
+    Ein Caster, der nur noch Stationsdaten (1005/1033/1230) oder immer
+    dieselbe Epoche sendet, besteht die Stall-Erkennung (RTCMCadence), weil
+    weiter Bytes kommen. check() meldet deshalb zusätzlich:
+      - epoch: die neueste Epochenzeit der Beobachtungen (MSM, 1001-1012)
+        rückt länger als max_age Sekunden nicht vor (bei Casters mit
+        seltenen Beobachtungen mindestens drei gelernte Epochenabstände)
+      - observations: seit grace Sekunden Daten, aber keine Beobachtungen
+      - receiver: das mosaic-H meldet in der GGA länger als max_age keine
+        frischen Korrekturen (Fix-Qualität 2/4/5 mit Korrekturalter bis
+        max_age). Erst aktiv, nachdem der Empfänger auf dieser Verbindung
+        frische Korrekturen gemeldet hat, und nur mit mindestens
+        min_satellites Satelliten - ohne Sicht (Tunnel) wird nicht
+        neu verbunden.
+    Pro Frame wird nur die Epochenzeit aus dem Kopf gelesen. Nach reset()
+    (neue Verbindung) gilt eine Schonfrist von grace Sekunden.
+    """
+
+    KINDS = ('epoch', 'observations', 'receiver')
+    CORRECTION_QUALITIES = (2, 4, 5)
+
+    def __init__(self, max_age=5.0, grace=None, min_satellites=6):
+        self.max_age = max_age
+        self.grace = 2 * max_age if grace is None else grace
+        self.min_satellites = min_satellites
+        # Gelernter Epochenabstand (bleibt über Reconnects erhalten)
+        self.period = None
+        self.reset()
+
+    def reset(self, now=None):
+        """Neue Verbindung: Epochen vergessen, Schonfrist beginnt"""
+        self.since = time.monotonic() if now is None else now
+        self.epoch = None
+        self.epoch_time = None
+        self.data_time = None
+        self.reset_receiver()
+
+    def reset_receiver(self):
+        """Rückmeldung des Empfängers vergessen (z.B. nach dem Umschalten auf einen anderen Caster)"""
+        self.receiver_time = None
+        self.gga_time = None
+        self._gga_utc = None
+        self.satellites = 0
+
+    def on_frames(self, frames, now):
+        """Vollständige RTCM Frames des Casters: neueste Epochenzeit merken"""
+        self.data_time = now
+        newest = self.epoch
+        for frame in frames:
+            epoch = rtcm_epoch_tod_ms(frame)
+            if epoch is not None and (newest is None or (epoch != newest and _epoch_not_before(epoch, newest))):
+                newest = epoch
+        if newest == self.epoch:
+            return
+        if self.epoch is not None:
+            # Abstand aus den Epochenzeiten selbst, unabhängig vom Empfangsjitter
+            interval = min(((newest - self.epoch) % DAY_MS) / 1000, self.max_age)
+            self.period = interval if self.period is None else self.period + 0.1 * (interval - self.period)
+        self.epoch = newest
+        self.epoch_time = now
+
+    def on_gga(self, info, now):
+        """Rückmeldung des Empfängers aus einer parse_gga() GGA
+
+        Eine wiederholte GGA (gleiche UTC Zeit wie die vorige) ist keine neue
+        Rückmeldung und frischt receiver_time nicht auf.
+        """
+        if info['time'] and info['time'] == self._gga_utc:
+            return
+        self._gga_utc = info['time']
+        self.gga_time = now
+        self.satellites = info['satellites']
+        age = info['age']
+        if info['quality'] in self.CORRECTION_QUALITIES and age is not None and age <= self.max_age:
+            self.receiver_time = now - age
+
+    def epoch_age(self, now):
+        """Sekunden seit die neueste Epoche zuletzt vorgerückt ist (None ohne Beobachtungen)"""
+        if self.epoch_time is None:
+            return None
+        return now - self.epoch_time
+
+    def epoch_limit(self):
+        """Sekunden ohne neue Epoche, ab denen die Korrekturen als veraltet gelten"""
+        return max(self.max_age, 3 * self.period) if self.period else self.max_age
+
+    def fresh(self, now):
+        """Rückt die Epoche im erwarteten Takt vor? (False ohne Beobachtungen)"""
+        return self.epoch_time is not None and now - self.epoch_time <= self.epoch_limit()
+
+    def check(self, now, receiver=True):
+        """(Art, Grund) wenn die Korrekturen veraltet sind, sonst None
+
+        receiver=False prüft nur den Datenstrom (Standby-Caster, deren
+        Korrekturen der Empfänger nicht bekommt).
+        """
+        if now - self.since < self.grace:
+            return None
+        if self.epoch_time is not None:
+            if now - self.epoch_time > self.epoch_limit():
+                return 'epoch', f"keine neue RTCM Epoche seit {now - self.epoch_time:.1f} s"
+        elif self.data_time is not None:
+            return 'observations', f"seit {now - self.since:.0f} s RTCM Daten ohne Beobachtungen"
+        if (receiver and self.receiver_time is not None and now - self.receiver_time > self.max_age
+                and self.satellites >= self.min_satellites and now - self.gga_time <= self.max_age):
+            return 'receiver', f"mosaic-H ohne frische Korrekturen seit {now - self.receiver_time:.1f} s"
+        return None
+
+
+class OutageStats:
+    """Zeit ohne Korrekturen am UART pro Ausfall (Abbruch, Stall, Reconnect)
+
+    Ein Ausfall ist eine Lücke zwischen zwei UART Writes mit RTCM Daten von
+    mindestens threshold Sekunden. Export als Prometheus Histogramm.
+    """
+
+    BOUNDS = (1, 2, 5, 10, 30, 60, 120, 300, 600)
+
+    def __init__(self, threshold=2.0):
+        self.threshold = threshold
+        self.buckets = [0] * len(self.BOUNDS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.last = None
+
+    def record_gap(self, gap, period=None):
+        """Lücke zwischen zwei Writes prüfen, True wenn sie als Ausfall zählt
+
+        Mit period (Epochenabstand) zählen erst Lücken ab zwei Epochen.
+        """
+        if gap < max(self.threshold, 2 * period if period else 0):
+            return False
+        for index, bound in enumerate(self.BOUNDS):
+            if gap <= bound:
+                self.buckets[index] += 1
+        self.count += 1
+        self.sum += gap
+        self.max = max(self.max, gap)
+        self.last = gap
+        return True
+
+    def metrics(self):
+        """Metrik-Tupel für collect_metrics()"""
+        samples = [({'le': str(bound), '__suffix': '_bucket'}, count) for bound, count in zip(self.BOUNDS, self.buckets)]
+        samples += [
+            ({'le': '+Inf', '__suffix': '_bucket'}, self.count),
+            ({'__suffix': '_sum'}, self.sum),
+            ({'__suffix': '_count'}, self.count),
+        ]
+        return [('ntrip_correction_outage_seconds', 'histogram',
+                 'Zeit ohne RTCM Daten am UART pro Ausfall (Abbruch, Stall, Reconnect)', samples)]
+
+
+class CasterUpstream:
+    """Eine Caster-Verbindung der StreamEngine (primärer Caster oder Hot-Standby)
+
+    Jede Verbindung hat einen eigenen RTCM3Framer: ein Standby wird laufend
+    geframed, damit beim Umschalten sofort ab einer Frame-Grenze
+    weitergeleitet werden kann.
+    """
+
+    def __init__(self, caster, port, username, password, mountpoint, version='v1', framer=None,
+                 keepalive=None, user_timeout=None, resolver=None):
+        self.caster = caster
+        self.port = port
+        self.username = username
+        self.password = password
+        self.mountpoint = mountpoint
+        self.version = version
+        self.framer = framer
+        self.keepalive = keepalive
+        self.user_timeout = user_timeout
+        self.resolver = resolver
+        self.name = f"{caster}:{port}/{mountpoint}"
+
+        self.client = None
+        self.connects = 0
+        self.connected_at = None
+        self.last_data_time = None
+        self.gga_sent = False
+        # Frames der letzten Epoche, solange der Caster Standby ist (beim Umschalten nachgereicht)
+        self.recent_epoch = []
+
+    def new_client(self):
+        """Neuen (noch nicht verbundenen) NTRIPClient für diesen Caster anlegen"""
+        return NTRIPClient(self.caster, self.port, self.username, self.password, self.mountpoint, self.version,
+                           keepalive=self.keepalive, user_timeout=self.user_timeout, resolver=self.resolver)
+
+    def attach(self, client):
+        """Verbundenen Client übernehmen (Socket non-blocking, Framer zurücksetzen)"""
+        client.socket.setblocking(False)
+        if self.framer:
+            self.framer.reset()  # Teil-Frames der vorherigen Verbindung verwerfen
+        self.client = client
+        self.connected_at = time.monotonic()
+        self.last_data_time = None
+        # Eine beim Verbindungsaufbau gesendete GGA (gespeicherte Position) zählt
+        self.gga_sent = client.last_gga is not None
+        self.recent_epoch = []
+
+    def detach(self):
+        """Client freigeben - der Caster gilt ab jetzt als ohne Daten"""
+        self.client = None
+        self.last_data_time = None
+        self.recent_epoch = []
+
+    def data_age(self, now):
+        """Sekunden seit dem letzten gültigen RTCM Frame (inf ohne Verbindung/Daten)"""
+        if self.client is None or self.last_data_time is None:
+            return math.inf
+        return now - self.last_data_time
+
+
+class StreamEngine:
+    """Ereignisgesteuerter Stream-Modus (asyncio)
+
+    Statt einer seriellen Schleife laufen drei unabhängige Tasks:
+      - Caster → UART: RTCM Daten sofort nach Empfang weiterleiten
+      - UART → GGA: NMEA vom mosaic-H lesen und neueste GGA merken
+      - GGA → Caster: Position für VRS hochladen, wann entscheidet der
+        GGAScheduler (Standard: festes gga_interval)
+    Ein blockierendes read_nmea() verzögert so nie die RTCM Weiterleitung.
+    Die Engine bleibt über Reconnects hinweg bestehen, run() wird pro
+    Caster-Verbindung aufgerufen.
+
+    Mit zero_copy=True empfängt die Engine per recv_into() in einen Pool
+    vorab allokierter Puffer und übergibt memoryview Slices direkt an den
+    UART Writer - pro Chunk wird kein neues bytes Objekt angelegt.
+
+    Mit run_failover() hält die Engine mehrere Caster gleichzeitig verbunden
+    (Hot-Standby). Alle erhalten GGA, aber nur der aktive Caster wird an den
+    UART weitergeleitet. Überschreitet dessen Datenalter failover_age, wird
+    auf den Standby mit den frischesten Daten umgeschaltet; ist der primäre
+    Caster failback_hold Sekunden stabil, wird zwischen zwei Epochen
+    zurückgeschaltet.
+
+    Mit coalesce > 0 sammelt der UART Writer die Chunks einer Epoche (bis
+    zur Nachricht mit Multiple Message Bit 0) bzw. alles innerhalb von
+    coalesce Sekunden ab Empfang des ersten Chunks und schreibt sie mit
+    einem Write - ein Syscall und ein USB Transfer statt vieler kleiner.
+
+    Mit correction_max_age > 0 prüft ein CorrectionWatchdog pro Caster, ob
+    die Korrekturen frisch sind (Epochenzeiten, Rückmeldung des mosaic-H).
+    Veraltete Korrekturen führen zum Umschalten auf einen Standby bzw. zum
+    Reconnect, der Grund steht in last_failover_reason.
+    """
+
+    # Pause im Datenstrom, die als Grenze zwischen zwei Epochen gilt (Failback)
+    EPOCH_GAP = 0.1
+
+    def __init__(self, uart, gga_interval=5, stall_timeout=30, log_interval=10, queue_size=64, framer=None,
+                 zero_copy=False, buffer_size=4096, latency=None, failover_age=1.5, failback_hold=10,
+                 reconnect_delay=1, scheduler=None, rewriter=None, coalesce=0.0, gga_scheduler=None,
+                 reconnect_max_delay=60, stall_epochs=5, correction_max_age=0.0, correction_min_satellites=6):
+        self.uart = uart
+        self.framer = framer
+        self.zero_copy = zero_copy
+        # Optionale Latenz-Instrumentierung (CorrectionLatency), None = aus
+        self.latency = latency
+        # Optionaler RTCMScheduler (nur mit Framer), None = Frames in Empfangsreihenfolge schreiben
+        self.scheduler = scheduler if framer else None
+        # Optionaler RTCMRewriter (nur mit Framer): Filter und MSM4 Umkodierung für den UART
+        self.rewriter = rewriter if framer else None
+        self.gga_interval = gga_interval
+        # Zeitpunkt der GGA Uploads (adaptiv oder festes gga_interval)
+        self.gga_scheduler = gga_scheduler or GGAScheduler.fixed(gga_interval)
+        # Stall-Erkennung: stall_epochs ausgebliebene Epochen, höchstens stall_timeout Sekunden
+        self.stall_timeout = stall_timeout
+        self.stall_epochs = stall_epochs
+        # Watchdog für veraltete Korrekturen (Sekunden ohne neue Epoche bzw. frische Korrektur), 0 = aus
+        self.correction_max_age = correction_max_age
+        self.correction_min_satellites = correction_min_satellites
+        self.log_interval = log_interval
+        self.queue_size = queue_size
+        self.failover_age = failover_age
+        self.failback_hold = failback_hold
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        # Maximale Wartezeit (s) zum Zusammenfassen einer Epoche in einen UART Write, 0 = aus
+        self.coalesce = coalesce
+
+        # Caster-Verbindungen des aktuellen Laufs, active wird an den UART weitergeleitet
+        self.upstreams = []
+        self.active = None
+        self.failovers = 0
+        self.last_failover_reason = None
+
+        # Optionaler Callback pro weitergeleitetem Chunk: on_forward(nbytes, latency)
+        self.on_forward = None
+        # Optionaler lokaler Caster (RTCMFanout), erhält jeden an den UART geschriebenen Chunk
+        self.fanout = None
+        # Optionaler Mitschnitt (CaptureWriter): Caster-Nutzdaten, GGA Uploads und Ereignisse
+        self.capture = None
+        # Optionaler StartupState: Zeiten bis zur ersten Korrektur, letzte gültige GGA speichern
+        self.startup = None
+        # Optionaler MountpointSelector: Reconnect zum nächsten Mountpoint bei zu langer Basislinie
+        self.mountpoints = None
+
+        self.latest_gga = None
+        # Anzahl der vom UART gelesenen GGAs (der Uploader prüft nur neue, nicht die gecachte latest_gga)
+        self.gga_count = 0
+        self.fix_quality = None
+        self.bytes_forwarded = 0
+        self.chunks_forwarded = 0
+        self.gga_uploads = 0
+        self.reconnects = 0
+        self.last_correction_time = None
+        self.outages = OutageStats()
+        # Gelernter Epochentakt pro Caster (bleibt über Reconnects erhalten)
+        self._cadences = {}
+        self._watchdogs = {}
+        self.watchdog_triggers = collections.Counter()
+        self.uart_write_seconds = 0.0
+        self.chunks_coalesced = 0
+        self.coalesce_wait_seconds = 0.0
+        self._epoch_end_time = -math.inf
+        self.loop_iteration = LatencyHistogram()
+        self.last_latency = None
+        self.max_latency = 0.0
+        self._latency_sum = 0.0
+        self._latency_count = 0
+
+        # UART Zugriffe blockieren - je ein eigener Thread für Lesen und Schreiben
+        self._write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='uart-tx')
+        self._read_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='uart-rx')
+
+        # Empfangspuffer für den zero-copy Pfad (bleiben über Reconnects bestehen)
+        self._buffers = [bytearray(buffer_size) for _ in range(queue_size)] if zero_copy else []
+
+    def run(self, ntrip_client):
+        """Stream über eine Caster-Verbindung betreiben
+
+        Returns:
+            True bei Benutzer-Interrupt, False wenn ein Reconnect nötig ist
+        """
+        logger.info("=== Starte Stream-Modus (asyncio) ===")
+        try:
+            return asyncio.run(self._run(ntrip_client))
+        except KeyboardInterrupt:
+            logger.info("Stream-Modus durch Benutzer beendet")
+            return True
+        except Exception as e:
+            logger.error(f"Fehler im Stream-Modus: {e}")
+            return False
+
+    def run_failover(self, upstreams):
+        """Stream über mehrere Caster mit Hot-Standby betreiben
+
+        Verbindungsabbrüche werden pro Caster intern behandelt, run_failover()
+        kehrt nur bei Benutzer-Interrupt oder unerwarteten Fehlern zurück.
+
+        Returns:
+            True bei Benutzer-Interrupt, False bei Fehler
+        """
+        logger.info(f"=== Starte Stream-Modus (asyncio, {len(upstreams)} Caster mit Hot-Standby) ===")
+        try:
+            return asyncio.run(self._run_failover(upstreams))
+        except KeyboardInterrupt:
+            logger.info("Stream-Modus durch Benutzer beendet")
+            return True
+        except Exception as e:
+            logger.error(f"Fehler im Stream-Modus: {e}")
+            return False
+
+    def cadence(self, upstream):
+        """RTCMCadence eines Casters (Stall-Erkennung aus dem Epochentakt)"""
+        cadence = self._cadences.get(upstream.name)
+        if cadence is None:
+            cadence = self._cadences[upstream.name] = RTCMCadence(self.stall_epochs, max_timeout=self.stall_timeout)
+        return cadence
+
+    def watchdog(self, upstream):
+        """CorrectionWatchdog eines Casters, None wenn correction_max_age = 0"""
+        if self.correction_max_age <= 0:
+            return None
+        watchdog = self._watchdogs.get(upstream.name)
+        if watchdog is None:
+            watchdog = self._watchdogs[upstream.name] = CorrectionWatchdog(
+                self.correction_max_age, min_satellites=self.correction_min_satellites)
+        return watchdog
+
+    def close(self, wait=False):
+        """Worker-Threads beenden (wait=True: laufende UART Zugriffe abwarten, z.B. vor uart.close())"""
+        self._write_pool.shutdown(wait=wait)
+        self._read_pool.shutdown(wait=wait)
+
+    @property
+    def mean_latency(self):
+        """Mittlere Weiterleitungslatenz (Caster-Empfang → UART geschrieben) in Sekunden"""
+        if not self._latency_count:
+            return None
+        return self._latency_sum / self._latency_count
+
+    async def _run(self, ntrip_client):
+        upstream = CasterUpstream(ntrip_client.caster, ntrip_client.port, ntrip_client.username,
+                                  ntrip_client.password, ntrip_client.mountpoint, ntrip_client.version,
+                                  framer=self.framer, keepalive=ntrip_client.keepalive,
+                                  user_timeout=ntrip_client.user_timeout, resolver=ntrip_client.resolver)
+        upstream.attach(ntrip_client)
+        self.upstreams = [upstream]
+        self.active = upstream
+        queue = self._prepare()
+        return await self._supervise(queue, [
+            (self._caster_reader(upstream, queue), 'caster-rx'),
+        ])
+
+    async def _run_failover(self, upstreams):
+        self.upstreams = list(upstreams)
+        self.active = self.upstreams[0]
+        queue = self._prepare()
+        try:
+            return await self._supervise(queue, [
+                (self._upstream_loop(upstream, queue), f'caster-rx-{i}') for i, upstream in enumerate(self.upstreams)
+            ] + [
+                (self._failover_monitor(), 'failover'),
+            ])
+        finally:
+            for upstream in self.upstreams:
+                if upstream.client:
+                    upstream.client.close()
+                    upstream.detach()
+
+    def _prepare(self):
+        """Queue und Pufferpool für einen Lauf anlegen"""
+        self._free_buffers = asyncio.Queue()
+        for buf in self._buffers:
+            self._free_buffers.put_nowait(buf)
+        self._gga_sent = False
+        self._gga_event = asyncio.Event()
+        self.gga_scheduler.reset()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        return self._queue
+
+    async def _supervise(self, queue, readers):
+        """Caster-Tasks plus UART/GGA Tasks starten, beim ersten Ende alle beenden"""
+        tasks = [asyncio.create_task(coro, name=name) for coro, name in readers] + [
+            asyncio.create_task(self._uart_writer(queue), name='uart-tx'),
+            asyncio.create_task(self._gga_reader(), name='uart-rx'),
+            asyncio.create_task(self._gga_uploader(), name='gga-tx'),
+            asyncio.create_task(self._loop_monitor(), name='loop-monitor'),
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception():
+                    logger.error(f"Fehler in Task {task.get_name()}: {task.exception()}")
+                    return False
+            return all(task.result() for task in done)
+        finally:
+            # asyncio.wait_for (Python < 3.12) verschluckt die Cancellation, wenn das Ergebnis
+            # gleichzeitig eintrifft (z.B. Reconnect bei laufendem Datenstrom) - bis zum Ende wiederholen
+            pending = tasks
+            while pending:
+                for task in pending:
+                    task.cancel()
+                _, pending = await asyncio.wait(pending, timeout=0.1)
+            for task in tasks:
+                if not task.cancelled():
+                    task.exception()  # als abgerufen markieren (keine "never retrieved" Warnung)
+            # Laufenden UART Write abwarten, bevor Puffer wiederverwendet werden
+            await asyncio.get_running_loop().run_in_executor(self._write_pool, lambda: None)
+
+    async def _upstream_loop(self, upstream, queue):
+        """Verbindung zu einem Caster halten und nach Abbruch neu verbinden"""
+        loop = asyncio.get_running_loop()
+        backoff = ReconnectBackoff(self.reconnect_delay, self.reconnect_max_delay)
+        while True:
+            if upstream.connects:
+                self.reconnects += 1
+            upstream.connects += 1
+            client = upstream.new_client()
+            if await loop.run_in_executor(None, client.connect):
+                upstream.attach(client)
+                if self.startup is not None:
+                    self.startup.mark('caster_connected')
+                # Standby sofort mit Position versorgen, damit ein VRS Stream startet
+                if self.latest_gga:
+                    await self._send_gga(upstream, self.latest_gga)
+                try:
+                    await self._caster_reader(upstream, queue)
+                except Exception as e:
+                    logger.error(f"Fehler beim Empfang von {upstream.name}: {e}")
+                finally:
+                    backoff.connection_ended(time.monotonic() - upstream.connected_at)
+                    upstream.detach()
+            client.close()
+            delay = backoff.next_delay()
+            logger.info(f"Reconnect zu {upstream.name} in {delay:.1f} Sekunden...")
+            await asyncio.sleep(delay)
+
+    async def _failover_monitor(self, interval=0.05):
+        """Datenalter überwachen und die UART Weiterleitung umschalten
+
+        Failover sobald der aktive Caster failover_age ohne gültige Frames
+        ist (bei 1 Hz Korrekturen also spätestens eine Epoche Verlust).
+        Failback erst wenn der primäre Caster failback_hold Sekunden stabil
+        liefert, und dann in einer Pause zwischen zwei Epochen.
+        """
+        primary = self.upstreams[0]
+        healthy_since = None
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            active = self.active
+
+            if primary.data_age(now) > self.failover_age or not self._fresh(primary, now):
+                healthy_since = None
+            elif healthy_since is None:
+                healthy_since = now
+
+            age = active.data_age(now)
+            if age > self.failover_age:
+                standby = min((upstream for upstream in self.upstreams
+                               if upstream is not active and self._fresh(upstream, now)),
+                              key=lambda upstream: upstream.data_age(now), default=None)
+                if standby is not None and standby.data_age(now) <= self.failover_age:
+                    reason = "keine Verbindung" if active.client is None else f"Datenalter {age:.2f} s"
+                    self._switch(standby, reason)
+            elif active is not primary and healthy_since is not None:
+                held = now - healthy_since
+                if held >= self.failback_hold and (age >= self.EPOCH_GAP or held >= 2 * self.failback_hold):
+                    self._switch(primary, f"primärer Caster seit {held:.0f} s stabil", replay=False)
+
+    def _switch(self, upstream, reason, replay=True):
+        """UART Weiterleitung auf einen anderen Caster umschalten
+
+        Die zuletzt vom Standby empfangene Epoche wird sofort nachgereicht,
+        so geht beim Failover keine Epoche verloren, die der Standby bereits
+        geliefert hat. Beim Failback (replay=False) wäre sie ein Duplikat.
+        """
+        logger.warning(f"Caster Failover: {self.active.name} → {upstream.name} ({reason})")
+        if self.capture is not None:
+            self.capture.event(f"failover {self.active.name} -> {upstream.name}: {reason}",
+                               self.upstreams.index(upstream))
+        self.active = upstream
+        self.failovers += 1
+        self.last_failover_reason = reason
+        watchdog = self.watchdog(upstream)
+        if watchdog is not None:
+            watchdog.reset_receiver()  # Rückmeldung des mosaic-H bezog sich auf den vorherigen Caster
+        recent, upstream.recent_epoch = upstream.recent_epoch, []
+        if recent and replay and not self._queue.full():
+            self._queue.put_nowait((upstream.last_data_time, recent, None))
+
+    def _fresh(self, upstream, now):
+        """Liefert der Caster frische Epochen? (immer True ohne Watchdog oder Framer)"""
+        watchdog = self.watchdog(upstream)
+        return watchdog is None or upstream.framer is None or watchdog.fresh(now)
+
+    def _stale(self, upstream, kind, reason, now):
+        """Watchdog meldet veraltete Korrekturen: auf einen frischen Standby umschalten, Grund festhalten
+
+        Der betroffene Caster wird danach neu verbunden (Rückgabe False des
+        Caster-Tasks).
+        """
+        self.watchdog_triggers[kind] += 1
+        logger.warning(f"Korrekturen von {upstream.name} veraltet: {reason} - Reconnect...")
+        if self.capture is not None:
+            self.capture.event(f"stale {upstream.name}: {reason}", self.upstreams.index(upstream))
+        if upstream is not self.active:
+            return
+        standby = min((other for other in self.upstreams if other is not upstream
+                       and other.data_age(now) <= self.failover_age and self._fresh(other, now)),
+                      key=lambda other: other.data_age(now), default=None)
+        if standby is not None:
+            self._switch(standby, reason)
+        else:
+            self.last_failover_reason = reason
+
+    async def _caster_reader(self, upstream, queue):
+        """Caster → Queue: RTCM Frames mit Empfangszeitstempel einreihen
+
+        Frames eines Standby-Casters werden nur geframed (Datenalter, Frame-
+        Grenzen) und verworfen, solange er nicht aktiv ist.
+        """
+        loop = asyncio.get_running_loop()
+        ntrip_client = upstream.client
+        sock = ntrip_client.socket
+        framer = upstream.framer
+        capture = self.capture
+        channel = self.upstreams.index(upstream)
+        cadence = self.cadence(upstream)
+        cadence.reset()
+        watchdog = self.watchdog(upstream)
+        if watchdog is not None:
+            watchdog.reset()
+        if capture is not None:
+            capture.event(f"connected {upstream.name} ({ntrip_client.protocol})", channel)
+
+        # Beim Handshake mitgelesene Nutzdaten zuerst weiterleiten
+        pending = ntrip_client.take_pending()
+        if pending and capture is not None:
+            capture.record(CaptureWriter.CASTER_RX, pending, channel)
+        if pending:
+            if self.startup is not None:
+                self.startup.mark('first_rtcm_byte')
+            frames = framer.feed(pending) if framer else (pending,)
+            if frames:
+                upstream.last_data_time = time.monotonic()
+                if framer and watchdog is not None:
+                    watchdog.on_frames(frames, upstream.last_data_time)
+                if upstream is self.active:
+                    await queue.put((upstream.last_data_time, frames, None))
+
+        while True:
+            if watchdog is not None:
+                stale = watchdog.check(time.monotonic(), upstream is self.active)
+                if stale:
+                    self._stale(upstream, *stale, time.monotonic())
+                    return False
+            buf = await self._free_buffers.get() if self.zero_copy else None
+            try:
+                try:
+                    if buf is None:
+                        data = await asyncio.wait_for(loop.sock_recv(sock, 4096), timeout=1)
+                        length = len(data)
+                    else:
+                        data = buf
+                        length = await asyncio.wait_for(loop.sock_recv_into(sock, buf), timeout=1)
+                except asyncio.TimeoutError:
+                    length = None
+
+                now = time.monotonic()
+                if length:
+                    cadence.on_data(now)
+                    if self.startup is not None:
+                        self.startup.mark('first_rtcm_byte', now)
+                    # Nutzdaten (ggf. chunked dekodiert) ohne Kopie als Bereiche des Puffers
+                    ranges = ntrip_client.payload_ranges(data, length)
+                    if capture is not None:
+                        view = memoryview(data)
+                        for start, end in ranges:
+                            capture.record(CaptureWriter.CASTER_RX, view[start:end], channel)
+                    if framer:
+                        # Nur vollständige Frames mit gültiger CRC weiterleiten
+                        frames = []
+                        for start, end in ranges:
+                            frames += framer.feed(data, end, start)
+                        if frames and watchdog is not None:
+                            watchdog.on_frames(frames, now)
+                    else:
+                        view = memoryview(data)
+                        frames = [view[start:end] for start, end in ranges]
+                    if frames:
+                        if upstream is self.active:
+                            upstream.last_data_time = now
+                            # Puffer gehört jetzt dem Writer und wird nach dem Schreiben freigegeben
+                            await queue.put((now, frames, buf))
+                            buf = None
+                            continue
+                        if framer:
+                            # Standby: letzte Epoche (Frames bis zur nächsten Pause) für das Umschalten merken
+                            if upstream.last_data_time is None or now - upstream.last_data_time > self.EPOCH_GAP:
+                                upstream.recent_epoch = []
+                            upstream.recent_epoch += [bytes(frame) for frame in frames]
+                        upstream.last_data_time = now
+                elif length is not None:
+                    logger.warning(f"NTRIP Caster {upstream.name} hat die Verbindung geschlossen - Reconnect...")
+                    if capture is not None:
+                        capture.event(f"closed {upstream.name}", channel)
+                    return False
+                elif upstream.gga_sent and now - (upstream.last_data_time or upstream.connected_at) >= cadence.timeout():
+                    # Nur wenn GGA gesendet wurde und länger als stall_epochs Epochen keine Daten kommen
+                    logger.warning(f"Keine RTCM Daten von {upstream.name} seit {cadence.timeout():.1f} s - Reconnect...")
+                    if capture is not None:
+                        capture.event(f"stalled {upstream.name}", channel)
+                    return False
+            finally:
+                # Puffer nicht verlieren - im Failover-Betrieb läuft die Engine weiter und
+                # verbindet sich mit demselben Pool neu (Close, Stall, Exception)
+                if buf is not None:
+                    self._free_buffers.put_nowait(buf)
+
+    async def _uart_writer(self, queue):
+        """Queue → UART: Chunks schreiben und Weiterleitungslatenz messen"""
+        loop = asyncio.get_running_loop()
+        last_log_time = time.monotonic()
+        latency_stats = self.latency
+        scheduler = self.scheduler
+        while True:
+            # Alles, was sich während des letzten Writes angestaut hat, gemeinsam schreiben
+            batch = [await queue.get()]
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            if self.coalesce > 0:
+                await self._coalesce(queue, batch)
+            write_start = time.monotonic()
+            chunks = [(item[0], item[1]) for item in batch]
+            if self.rewriter is not None:
+                chunks = [(received_at, self.rewriter.rewrite(frames, write_start)) for received_at, frames in chunks]
+            if scheduler is not None:
+                received_at, frames = scheduler.schedule(chunks, write_start, self.uart.pending_output())
+            elif len(chunks) == 1:
+                received_at, frames = chunks[0]
+            else:
+                received_at, frames = chunks[0][0], [frame for _, chunk in chunks for frame in chunk]
+
+            ok = False
+            if frames:
+                if self.zero_copy:
+                    ok = await loop.run_in_executor(self._write_pool, self.uart.send_buffers, frames)
+                    nbytes = sum(len(frame) for frame in frames)
+                else:
+                    data = frames[0] if len(frames) == 1 else b''.join(frames)
+                    ok = await loop.run_in_executor(self._write_pool, self.uart.send_data, data)
+                    nbytes = len(data)
+            if self.fanout is not None:
+                # Lokale Abonnenten sind nicht durch den UART begrenzt und erhalten alle Frames;
+                # publish() kopiert, bevor die Puffer wiederverwendet werden
+                for item in batch:
+                    self.fanout.publish(item[1])
+            for item in batch:
+                if item[2] is not None:
+                    self._free_buffers.put_nowait(item[2])
+            now = time.monotonic()
+            self.uart_write_seconds += now - write_start
+            if scheduler is not None and frames:
+                scheduler.on_written(nbytes, now - write_start, self.uart.pending_output())
+            if not ok:
+                continue
+            if self.startup is not None:
+                self.startup.mark('first_uart_write', now)
+
+            latency = now - received_at
+            if self.last_correction_time is not None:
+                gap = now - self.last_correction_time
+                if self.outages.record_gap(gap, self.cadence(self.active).period):
+                    logger.info(f"RTCM Korrekturen wieder verfügbar nach {gap:.1f} s Ausfall")
+            self.last_correction_time = now
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+            self._latency_sum += latency
+            self._latency_count += 1
+            self.bytes_forwarded += nbytes
+            self.chunks_forwarded += 1
+            if latency_stats is not None:
+                latency_stats.on_written(received_at, frames if self.framer else (), now)
+            if self.on_forward:
+                self.on_forward(nbytes, latency)
+            logger.debug(f"RTCM Chunk weitergeleitet: {nbytes} bytes, Latenz {latency * 1000:.1f} ms")
+
+            # Log alle 10 Sekunden
+            if now - last_log_time >= self.log_interval:
+                logger.info(
+                    f"RTCM Daten empfangen und weitergeleitet: {self.bytes_forwarded} bytes "
+                    f"(Latenz Ø {self.mean_latency * 1000:.1f} ms, max {self.max_latency * 1000:.1f} ms)"
+                )
+                framer = self.active.framer
+                if framer:
+                    logger.info(
+                        f"RTCM Frames: {framer.frames} gültig, {framer.crc_errors} CRC-Fehler, "
+                        f"{framer.discarded_bytes} bytes verworfen"
+                        + (f" ({self.active.name})" if len(self.upstreams) > 1 else "")
+                    )
+                    logger.debug(f"RTCM Nachrichtentypen: {framer.summary()}")
+                if scheduler is not None and (scheduler.dropped['stale'] or scheduler.dropped['superseded']):
+                    logger.info(f"UART Scheduler: {scheduler.summary()}")
+                if latency_stats is not None:
+                    logger.info(f"Latenz p50/p95/p99: {latency_stats.summary()}")
+                sbf = getattr(self.uart, 'sbf', None)
+                if sbf is not None and sbf.mode is not None:
+                    logger.info(f"mosaic-H (SBF): {sbf.summary()}")
+                last_log_time = now
+
+    async def _coalesce(self, queue, batch):
+        """Batch um weitere Chunks ergänzen, bis die Epoche vollständig oder die Frist abgelaufen ist
+
+        Die Frist läuft ab Empfang des ersten Chunks, eine bereits
+        vollständige Epoche wird ohne Wartezeit geschrieben. Nachrichten ohne
+        Epochenbezug (z.B. 1230), die kurz nach dem Ende einer Epoche
+        eintreffen, gehören zu dieser und werden ebenfalls sofort geschrieben.
+        """
+        deadline = batch[0][0] + self.coalesce
+        start = time.monotonic()
+        checked = 0
+        observations = False
+        while True:
+            if self.framer is not None:
+                complete = False
+                for item in batch[checked:]:
+                    for frame in item[1]:
+                        end = rtcm_epoch_end(frame)
+                        if end is not None:
+                            observations = True
+                            if end:
+                                complete = True
+                                self._epoch_end_time = item[0]
+                checked = len(batch)
+                if complete:
+                    break
+                if not observations and batch[0][0] - self._epoch_end_time < self.coalesce:
+                    break
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+        self.chunks_coalesced += len(batch) - 1
+        self.coalesce_wait_seconds += time.monotonic() - start
+
+    async def _gga_reader(self):
+        """UART → GGA: Empfangsstrom im eigenen Thread lesen und zerlegen (UARTDemux), neueste GGA merken"""
+        loop = asyncio.get_running_loop()
+        while True:
+            gga = await loop.run_in_executor(
+                self._read_pool, self.uart.read_nmea, 1.0, not self._gga_sent
+            )
+            if gga:
+                self.latest_gga = gga
+                self.gga_count += 1
+                # Erste Live-GGA ersetzt die gespeicherte Position sofort
+                if self.startup is not None and self.startup.live_gga(gga):
+                    self.gga_scheduler.reset()
+                if self.mountpoints is not None and len(self.upstreams) == 1 and self.mountpoints.check(
+                        gga, time.monotonic()):
+                    return False  # Reconnect zum neuen Mountpoint
+                self._gga_event.set()
+                info = parse_gga(gga)
+                if info:
+                    self.fix_quality = info['quality']
+                    watchdog = self.watchdog(self.active)
+                    if watchdog is not None:
+                        watchdog.on_gga(info, time.monotonic())
+                    if self.fanout is not None and info['lat'] is not None:
+                        self.fanout.position = (info['lat'], info['lon'])
+                if self.latency is not None:
+                    self.latency.on_gga(gga, time.monotonic())
+
+    async def _gga_uploader(self):
+        """GGA → Caster: Position nach dem GGAScheduler an alle verbundenen Caster senden (für VRS)"""
+        last_gga_time = last_warn_time = time.monotonic()
+        # Eine vor dem Start gesetzte (gespeicherte) latest_gga zählt einmal als neu
+        seen = -1
+        scheduler = self.gga_scheduler
+        while True:
+            self._gga_event.clear()
+            now = time.monotonic()
+            gga = self.latest_gga
+            if gga and self.gga_count != seen:
+                # Nur neue GGAs an den Scheduler - sonst würde eine veraltete Position weiter hochgeladen
+                seen = self.gga_count
+                last_gga_time = now
+                reason = scheduler.check(gga, now)
+                if reason:
+                    if reason in ('moved', 'quality'):
+                        logger.debug(f"GGA Upload ({reason}): {gga.strip()}")
+                    for upstream in self.upstreams:
+                        if upstream.client is not None:
+                            await self._send_gga(upstream, gga)
+                    scheduler.sent(gga, now, reason)
+            elif now - last_gga_time >= self.gga_interval and now - last_warn_time >= self.gga_interval:
+                # Seit einem GGA Intervall keine neue Position
+                logger.warning("Keine GGA Position vom mosaic-H empfangen - mosaic-H gibt evtl. keine NMEA Daten aus")
+                last_warn_time = now
+            # Bis zur nächsten GGA bzw. bis eine Warnung fällig wäre warten
+            warn_due = max(last_gga_time, last_warn_time) + self.gga_interval
+            try:
+                await asyncio.wait_for(self._gga_event.wait(), max(warn_due - time.monotonic(), 0.01))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send_gga(self, upstream, gga):
+        """GGA an einen Caster senden und Zähler aktualisieren"""
+        if await upstream.client.send_gga_async(gga):
+            self.gga_uploads += 1
+            if self.capture is not None:
+                self.capture.record(CaptureWriter.GGA_TX, gga.encode('ascii'), self.upstreams.index(upstream))
+            if not upstream.gga_sent:
+                logger.info(f"Erste GGA Position an {upstream.name} gesendet: {gga.strip()}")
+                upstream.gga_sent = True
+                self._gga_sent = True
+
+    async def _loop_monitor(self, interval=0.1):
+        """Event-Loop Iterationszeit messen (Verzögerung eines periodischen Timers)"""
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            self.loop_iteration.record(max(now - start - interval, 0.0), now)
+
+    def collect_metrics(self):
+        """Metriken für den Exporter: Liste von (Name, Typ, Hilfe, [(Labels, Wert), ...])
+
+        Wird aus dem HTTP-Thread aufgerufen und liest nur Attribute - der
+        Forwarding-Pfad selbst wird dadurch nicht verzögert.
+        """
+        now = time.monotonic()
+        metrics = [
+            ('ntrip_bytes_forwarded_total', 'counter', 'RTCM Bytes an den UART weitergeleitet',
+             [({}, self.bytes_forwarded)]),
+            ('ntrip_chunks_forwarded_total', 'counter', 'UART Writes mit RTCM Daten',
+             [({}, self.chunks_forwarded)]),
+            ('ntrip_reconnects_total', 'counter', 'Reconnects zum NTRIP Caster',
+             [({}, self.reconnects)]),
+            ('ntrip_gga_uploads_total', 'counter', 'GGA Positionen an den Caster gesendet',
+             [({}, self.gga_uploads)]),
+            ('ntrip_gga_upload_decisions_total', 'counter',
+             'GGA Uploads nach Grund (first, moved, quality, interval)',
+             [({'reason': reason}, count) for reason, count in self.gga_scheduler.uploads.items()]),
+            ('ntrip_gga_interval_seconds', 'gauge', 'Aktuelles GGA Upload Intervall (wächst im Stand)',
+             [({}, self.gga_scheduler.interval)]),
+            ('ntrip_uart_write_seconds_total', 'counter', 'Zeit blockiert in UART Writes',
+             [({}, self.uart_write_seconds)]),
+        ]
+        if self.coalesce > 0:
+            metrics += [
+                ('ntrip_uart_coalesced_chunks_total', 'counter', 'Empfangene Chunks, die mit einem vorherigen zusammengefasst wurden',
+                 [({}, self.chunks_coalesced)]),
+                ('ntrip_uart_coalesce_wait_seconds_total', 'counter', 'Wartezeit auf den Rest der Epoche vor UART Writes',
+                 [({}, self.coalesce_wait_seconds)]),
+            ]
+        if self.last_correction_time is not None:
+            metrics.append(('ntrip_time_since_last_correction_seconds', 'gauge',
+                            'Sekunden seit dem letzten UART Write mit RTCM Daten',
+                            [({}, now - self.last_correction_time)]))
+        metrics += self.outages.metrics()
+        cadence = self._cadences.get(self.active.name) if self.active is not None else None
+        if cadence is not None:
+            metrics.append(('ntrip_stall_timeout_seconds', 'gauge',
+                            'Sekunden ohne Daten bis zum Reconnect (aus dem gelernten Epochentakt)',
+                            [({}, cadence.timeout())]))
+        if self.correction_max_age > 0:
+            metrics.append(('ntrip_watchdog_triggers_total', 'counter',
+                            'Reconnects/Umschaltungen wegen veralteter Korrekturen (epoch, observations, receiver)',
+                            [({'reason': kind}, self.watchdog_triggers[kind]) for kind in CorrectionWatchdog.KINDS]))
+            watchdog = self._watchdogs.get(self.active.name) if self.active is not None else None
+            epoch_age = watchdog.epoch_age(now) if watchdog is not None else None
+            if epoch_age is not None:
+                metrics.append(('ntrip_epoch_progress_age_seconds', 'gauge',
+                                'Sekunden seit die neueste RTCM Epoche des aktiven Casters zuletzt vorgerückt ist',
+                                [({}, epoch_age)]))
+        if self.fix_quality is not None:
+            metrics.append(('ntrip_fix_quality', 'gauge',
+                            'GGA Fix-Qualität (0 ungültig, 1 GPS, 2 DGPS, 4 RTK fixed, 5 RTK float)',
+                            [({}, self.fix_quality)]))
+        upstreams = list(self.upstreams)
+        if len(upstreams) > 1:
+            # Hot-Standby: Framer und Zustand pro Caster mit Label
+            framers = [({'caster': upstream.name}, upstream.framer) for upstream in upstreams if upstream.framer]
+            active = self.active
+            metrics += [
+                ('ntrip_failovers_total', 'counter', 'Umschaltungen zwischen Castern (Failover und Failback)',
+                 [({}, self.failovers)]),
+                ('ntrip_caster_active', 'gauge', '1 für den Caster, der an den UART weitergeleitet wird',
+                 [({'caster': upstream.name}, int(upstream is active)) for upstream in upstreams]),
+                ('ntrip_caster_connected', 'gauge', '1 wenn die Verbindung zum Caster steht',
+                 [({'caster': upstream.name}, int(upstream.client is not None)) for upstream in upstreams]),
+                ('ntrip_caster_data_age_seconds', 'gauge', 'Sekunden seit dem letzten gültigen Frame des Casters',
+                 [({'caster': upstream.name}, upstream.data_age(now)) for upstream in upstreams
+                  if upstream.data_age(now) != math.inf]),
+            ]
+        else:
+            framers = [({}, self.framer)] if self.framer else []
+        if framers:
+            metrics += [
+                ('ntrip_rtcm_frames_total', 'counter', 'Gültige RTCM Frames pro Nachrichtentyp',
+                 [(dict(labels, type=str(msg_type)), count) for labels, framer in framers
+                  for msg_type, (count, _) in sorted(dict(framer.type_stats).items())]),
+                ('ntrip_rtcm_bytes_total', 'counter', 'RTCM Bytes pro Nachrichtentyp',
+                 [(dict(labels, type=str(msg_type)), size) for labels, framer in framers
+                  for msg_type, (_, size) in sorted(dict(framer.type_stats).items())]),
+                ('ntrip_rtcm_crc_errors_total', 'counter', 'RTCM Frames mit ungültiger CRC',
+                 [(labels, framer.crc_errors) for labels, framer in framers]),
+            ]
+        metrics.append(summary_metric('ntrip_loop_iteration_seconds',
+                                      'Event-Loop Iterationszeit (Verzögerung gegenüber Timer)',
+                                      self.loop_iteration))
+        demux = getattr(self.uart, 'demux', None)
+        if demux is not None:
+            metrics += [
+                ('ntrip_uart_rx_messages_total', 'counter', 'Vom mosaic-H empfangene Nachrichten pro Art',
+                 [({'kind': kind}, demux.messages[kind]) for kind in demux.KINDS if kind != 'other']),
+                ('ntrip_uart_rx_bytes_total', 'counter', 'Vom mosaic-H empfangene Bytes pro Art (other = nicht zuordenbar)',
+                 [({'kind': kind}, demux.bytes[kind]) for kind in demux.KINDS]),
+                ('ntrip_uart_rx_sbf_crc_errors_total', 'counter', 'SBF Blöcke mit ungültiger CRC',
+                 [({}, demux.crc_errors)]),
+            ]
+        sbf = getattr(self.uart, 'sbf', None)
+        if sbf is not None and sbf.blocks:
+            metrics.append(('ntrip_sbf_blocks_total', 'counter', 'Dekodierte SBF Blöcke pro Block',
+                            [({'block': sbf.BLOCK_NAMES.get(number, str(number))}, count)
+                             for number, count in sorted(sbf.blocks.items())]))
+            receiver = [
+                ('ntrip_receiver_pvt_mode', 'PVT Modus aus PVTGeodetic (4 RTK fixed, 5 RTK float)', sbf.mode),
+                ('ntrip_receiver_satellites', 'Satelliten in der PVT Lösung', sbf.satellites),
+                ('ntrip_receiver_correction_age_seconds', 'Mittleres Alter der verwendeten Korrekturen (PVTGeodetic)',
+                 sbf.correction_age),
+                ('ntrip_receiver_correction_input_age_seconds', 'Sekunden seit der letzten Korrektur am Empfänger (DiffCorrIn)',
+                 sbf.correction_input_age),
+                ('ntrip_receiver_hdop', 'HDOP aus dem DOP Block', sbf.hdop),
+                ('ntrip_receiver_cpu_load_percent', 'CPU Last des Empfängers (ReceiverStatus)', sbf.status.get('cpu_load')),
+                ('ntrip_receiver_temperature_celsius', 'Temperatur des Empfängers (ReceiverStatus)',
+                 sbf.status.get('temperature')),
+            ]
+            metrics += [(name, 'gauge', help_text, [({}, value)])
+                        for name, help_text, value in receiver if value is not None]
+        if self.scheduler is not None:
+            scheduler = self.scheduler
+            metrics += [
+                ('ntrip_uart_dropped_frames_total', 'counter', 'Vom UART Scheduler verworfene RTCM Frames',
+                 [({'reason': reason}, count) for reason, count in sorted(scheduler.dropped.items())]),
+                ('ntrip_uart_dropped_bytes_total', 'counter', 'Vom UART Scheduler verworfene Bytes',
+                 [({}, scheduler.dropped_bytes)]),
+                ('ntrip_uart_backlog_bytes', 'gauge', 'Bytes im UART Ausgabepuffer bzw. zuletzt eingeplant',
+                 [({}, scheduler.backlog_bytes)]),
+                ('ntrip_uart_rate_bytes_per_second', 'gauge', 'Für die Planung verwendete UART Rate',
+                 [({}, scheduler.rate)]),
+            ]
+        if self.rewriter is not None:
+            rewriter = self.rewriter
+            metrics += [
+                ('ntrip_rewrite_bytes_in_total', 'counter', 'RTCM Bytes vor der Umschreibung',
+                 [({}, rewriter.bytes_in)]),
+                ('ntrip_rewrite_bytes_out_total', 'counter', 'RTCM Bytes nach der Umschreibung (an den UART)',
+                 [({}, rewriter.bytes_out)]),
+                ('ntrip_rewrite_dropped_frames_total', 'counter', 'Frames ausgeschlossener Konstellationen/Signale',
+                 [({}, rewriter.frames_dropped)]),
+                ('ntrip_rewrite_rewritten_frames_total', 'counter', 'Neu kodierte MSM Frames',
+                 [({}, rewriter.frames_rewritten)]),
+            ]
+        if self.capture is not None:
+            metrics += [
+                ('ntrip_capture_records_total', 'counter', 'In den Mitschnitt geschriebene Records',
+                 [({}, self.capture.records)]),
+                ('ntrip_capture_dropped_records_total', 'counter', 'Verworfene Records (Mitschnitt-Queue voll)',
+                 [({}, self.capture.dropped)]),
+            ]
+        if self.latency is not None:
+            metrics.append(summary_metric('ntrip_forward_latency_seconds',
+                                          'Latenz Socket-Empfang → UART Write', self.latency.forward))
+            metrics.append(summary_metric('ntrip_correction_epoch_age_seconds',
+                                          'Alter der RTCM Epoche beim UART Write', self.latency.epoch_age))
+        return metrics
+
+
+def summary_metric(name, help_text, histogram):
+    """LatencyHistogram als Prometheus Summary (Perzentile der letzten Minute)"""
+    quantiles = (0.5, 0.95, 0.99)
+    values = histogram.percentiles(quantiles) or ()
+    samples = [({'quantile': str(q)}, value) for q, value in zip(quantiles, values)]
+    samples.append(({'__suffix': '_sum'}, histogram.sum))
+    samples.append(({'__suffix': '_count'}, histogram.count))
+    return (name, 'summary', help_text, samples)
+
+
+def format_metrics(metrics):
+    """Metriken im Prometheus Text-Format (Version 0.0.4) formatieren"""
+    lines = []
+    for name, metric_type, help_text, samples in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            labels = dict(labels)
+            suffix = labels.pop('__suffix', '')
+            label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+            if label_text:
+                label_text = "{" + label_text + "}"
+            lines.append(f"{name}{suffix}{label_text} {value}")
+    return "\n".join(lines) + "\n"
+
+
+METRIC_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)')
+METRIC_LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_metrics(text):
+    """Prometheus Text-Format zurück in Metriken (Name, Typ, Hilfe, [(Labels, Wert), ...])
+
+    Gegenstück zu format_metrics() für den Supervisor: Samples wie name_sum
+    oder name_count werden über das Label __suffix ihrer Familie zugeordnet.
+    Werte bleiben Text und werden unverändert wieder ausgegeben.
+    """
+    families = {}
+    current = None
+    for line in text.splitlines():
+        if line.startswith('# HELP ') or line.startswith('# TYPE '):
+            name, _, rest = line[7:].partition(' ')
+            current = families.setdefault(name, [name, 'untyped', '', []])
+            current[2 if line[2] == 'H' else 1] = rest
+            continue
+        match = METRIC_SAMPLE.match(line)
+        if not match:
+            continue
+        sample, label_text, value = match.groups()
+        labels = dict(METRIC_LABEL.findall(label_text or ''))
+        family = current if current is not None and sample.startswith(current[0]) else families.get(sample)
+        if family is None:
+            family = families[sample] = [sample, 'untyped', '', []]
+        if sample != family[0]:
+            labels['__suffix'] = sample[len(family[0]):]
+        family[3].append((labels, value))
+    return [tuple(family) for family in families.values()]
+
+
+class MetricsExporter:
+    """Optionaler HTTP Endpunkt /metrics im Prometheus Format
+
+    Läuft in einem eigenen Daemon-Thread. Beim Scrape wird collect() aufgerufen,
+    das nur Zähler liest - der RTCM Forwarding-Pfad wartet nie auf den Exporter.
+    """
+
+    def __init__(self, collect, port, bind='127.0.0.1'):
+        self.collect = collect
+        self.port = port
+        self.bind = bind
+        self.server = None
+
+    def start(self):
+        """HTTP Server im Hintergrund starten"""
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                try:
+                    body = format_metrics(exporter.collect()).encode('utf-8')
+                except Exception as e:
+                    logger.error(f"Fehler beim Erzeugen der Metriken: {e}")
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"Metrics: {format % args}")
+
+        try:
+            self.server = ThreadingHTTPServer((self.bind, self.port), Handler)
+        except OSError as e:
+            logger.error(f"Metrics Endpunkt {self.bind}:{self.port} konnte nicht gestartet werden: {e}")
+            return False
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='metrics', daemon=True).start()
+        logger.info(f"Metrics Endpunkt: http://{self.bind}:{self.port}/metrics")
+        return True
+
+    def stop(self):
+        """HTTP Server beenden"""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+class FanoutClient:
+    """Ein Abonnent des lokalen Casters mit begrenzter Warteschlange
+
+    Neue Chunks werden nur angehängt; ist die Warteschlange voll, wird der
+    älteste Chunk verworfen (frische Korrekturen sind wertvoller als alte).
+    Chunks bestehen aus ganzen RTCM Frames, Verwerfen zerstört also kein Framing.
+    """
+
+    def __init__(self, name, kind, writer, queue_size, chunked=False):
+        self.name = name
+        self.kind = kind
+        self.writer = writer
+        self.queue_size = queue_size
+        self.chunked = chunked
+        self.queue = collections.deque()
+        self.wakeup = asyncio.Event()
+        self.bytes_sent = 0
+        self.dropped = 0
+
+    def push(self, data):
+        """Chunk einreihen - blockiert nie"""
+        if len(self.queue) >= self.queue_size:
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(data)
+        self.wakeup.set()
+
+    async def run(self):
+        """Warteschlange in den Socket schreiben, Backpressure nur für diesen Client"""
+        writer = self.writer
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            while self.queue:
+                data = self.queue.popleft()
+                if self.chunked:
+                    # NTRIP v2: Transfer-Encoding chunked
+                    writer.write(b'%X\r\n' % len(data))
+                    writer.write(data)
+                    writer.write(b'\r\n')
+                else:
+                    writer.write(data)
+                self.bytes_sent += len(data)
+            await writer.drain()
+
+
+class RTCMFanout:
+    """Lokaler NTRIP Caster und RTCM Verteiler für weitere Geräte im Netz
+
+    Der weitergeleitete RTCM Stream wird zusätzlich angeboten als
+      - NTRIP Caster (v1/v2, Sourcetable, optional Basic Auth)
+      - rohe TCP Ausgabe (Stream ab Verbindungsaufbau)
+      - UDP Datagramme an feste Ziele (an Frame-Grenzen aufgeteilt)
+
+    Der Verteiler läuft in einem eigenen Thread mit eigener Event-Loop und
+    bleibt über Caster-Reconnects hinweg bestehen. publish() kopiert den
+    Chunk einmal und übergibt ihn per call_soon_threadsafe() - langsame
+    Abonnenten füllen nur ihre eigene begrenzte Warteschlange und verzögern
+    den UART Pfad nie.
+    """
+
+    # Nutzdaten pro UDP Datagramm (unter typischer MTU)
+    UDP_PAYLOAD = 1400
+
+    def __init__(self, mountpoint, caster_port=0, tcp_port=0, udp_targets=(), bind='0.0.0.0', auth=None,
+                 queue_size=32, max_clients=64, framer=None):
+        self.mountpoint = mountpoint
+        self.caster_port = caster_port
+        self.tcp_port = tcp_port
+        self.udp_targets = list(udp_targets)
+        self.bind = bind
+        self.auth = base64.b64encode(auth.encode('utf-8')).decode('ascii') if auth else None
+        self.queue_size = queue_size
+        self.max_clients = max_clients
+        # Framer des Engines für Nachrichtentypen in der Sourcetable
+        self.framer = framer
+        # Letzte Position (lat, lon) für die Sourcetable, wird vom Engine gesetzt
+        self.position = None
+
+        self.clients = set()
+        self.chunks_published = 0
+        self.bytes_published = 0
+        self.udp_datagrams = 0
+        self.udp_errors = 0
+        self.rejected = 0
+        self._bytes_sent_closed = 0
+        self._dropped_closed = 0
+
+        self._loop = None
+        self._thread = None
+        self._servers = []
+        self._udp = None
+
+    def start(self):
+        """Server im Hintergrund-Thread starten
+
+        Returns:
+            True wenn alle konfigurierten Ausgaben laufen
+        """
+        started = threading.Event()
+        result = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_until_complete(self._start_servers())
+            except OSError as e:
+                logger.error(f"Lokaler Caster konnte nicht gestartet werden: {e}")
+                result.append(False)
+                started.set()
+                loop.close()
+                return
+            self._loop = loop
+            result.append(True)
+            started.set()
+            try:
+                loop.run_forever()
+            finally:
+                loop.close()
+
+        self._thread = threading.Thread(target=run, name='rtcm-fanout', daemon=True)
+        self._thread.start()
+        started.wait()
+        return result[0]
+
+    def stop(self):
+        """Server und Abonnenten beenden"""
+        loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=5)
+
+    def publish(self, frames):
+        """Weitergeleitete Frames an alle Abonnenten verteilen (aus dem Forwarding-Pfad)
+
+        Kostet im aufrufenden Thread nur eine Kopie des Chunks und ein
+        call_soon_threadsafe(), unabhängig von der Anzahl Abonnenten.
+        """
+        loop = self._loop
+        if loop is None:
+            return
+        data = b''.join(frames)
+        sizes = [len(frame) for frame in frames] if self.udp_targets else None
+        loop.call_soon_threadsafe(self._dispatch, data, sizes)
+
+    async def _start_servers(self):
+        if self.caster_port:
+            server = await asyncio.start_server(self._handle_ntrip, self.bind, self.caster_port)
+            self._servers.append(server)
+            logger.info(f"Lokaler NTRIP Caster: {self.bind}:{self.caster_port}/{self.mountpoint}")
+        if self.tcp_port:
+            server = await asyncio.start_server(self._handle_raw, self.bind, self.tcp_port)
+            self._servers.append(server)
+            logger.info(f"RTCM TCP Ausgabe: {self.bind}:{self.tcp_port}")
+        if self.udp_targets:
+            self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._udp.setblocking(False)
+            self._udp.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            logger.info(f"RTCM UDP Ausgabe: {', '.join(f'{host}:{port}' for host, port in self.udp_targets)}")
+
+    async def _shutdown(self):
+        for server in self._servers:
+            server.close()
+        for client in list(self.clients):
+            client.writer.close()
+        if self._udp:
+            self._udp.close()
+        # Verbindungs-Tasks (enden mit dem geschlossenen Writer) abwarten, bevor stop() den Loop schließt
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        if tasks:
+            await asyncio.wait(tasks, timeout=1.0)
+
+    def _dispatch(self, data, sizes):
+        """Im Fan-out Thread: Chunk in alle Warteschlangen und UDP Datagramme"""
+        self.chunks_published += 1
+        self.bytes_published += len(data)
+        for client in self.clients:
+            client.push(data)
+        if self._udp:
+            for datagram in self._datagrams(data, sizes):
+                for target in self.udp_targets:
+                    try:
+                        self._udp.sendto(datagram, target)
+                        self.udp_datagrams += 1
+                    except OSError:
+                        # Voller Socket-Puffer oder Ziel nicht erreichbar: Datagramm verwerfen
+                        self.udp_errors += 1
+
+    def _datagrams(self, data, sizes):
+        """Chunk an Frame-Grenzen in Datagramme bis UDP_PAYLOAD Bytes aufteilen"""
+        view = memoryview(data)
+        limit = self.UDP_PAYLOAD
+        start = pos = 0
+        for size in sizes:
+            if pos + size - start > limit and pos > start:
+                yield view[start:pos]
+                start = pos
+            pos += size
+            # Einzelner Frame größer als ein Datagramm (nur ohne RTCM-Prüfung möglich)
+            while pos - start > limit:
+                yield view[start:start + limit]
+                start += limit
+        if pos > start:
+            yield view[start:pos]
+
+    def _sourcetable(self):
+        """NTRIP Sourcetable mit dem lokalen Mountpoint"""
+        types = sorted(dict(self.framer.type_stats)) if self.framer else []
+        systems = [name for name, prefix in (('GPS', 107), ('GLO', 108), ('GAL', 109), ('QZS', 111), ('BDS', 112))
+                   if any(msg_type // 10 == prefix for msg_type in types)]
+        lat, lon = self.position or (0.0, 0.0)
+        entry = ';'.join([
+            'STR', self.mountpoint, self.mountpoint, 'RTCM 3', ','.join(str(t) for t in types), '2',
+            '+'.join(systems), 'mosaic-H', '', f"{lat:.2f}", f"{lon:.2f}", '0', '0',
+            'NTRIP mosaic-H-Client/1.0', 'none', 'B' if self.auth else 'N', 'N', '0', '',
+        ])
+        return f"{entry}\r\nENDSOURCETABLE\r\n".encode('ascii')
+
+    async def _handle_ntrip(self, reader, writer):
+        """NTRIP Anfrage: Sourcetable, Mountpoint-Stream oder Fehler"""
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout=10)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, OSError):
+            writer.close()
+            return
+        lines = request.decode('latin-1').split('\r\n')
+        parts = lines[0].split()
+        headers = {}
+        for line in lines[1:]:
+            key, _, value = line.partition(':')
+            headers[key.strip().lower()] = value.strip()
+        v2 = headers.get('ntrip-version', '').lower().startswith('ntrip/2')
+        mountpoint = parts[1].lstrip('/') if len(parts) >= 2 and parts[0] == 'GET' else None
+
+        if mountpoint != self.mountpoint:
+            if mountpoint is None:
+                writer.write(b"HTTP/1.1 400 Bad Request\r\nConnection: close\r\n\r\n")
+            elif mountpoint and v2:
+                writer.write(b"HTTP/1.1 404 Not Found\r\nNtrip-Version: Ntrip/2.0\r\nConnection: close\r\n\r\n")
+            else:
+                # Sourcetable für "/" und (v1) unbekannte Mountpoints
+                table = self._sourcetable()
+                status = b"HTTP/1.1 200 OK\r\nNtrip-Version: Ntrip/2.0\r\nContent-Type: gnss/sourcetable\r\n" if v2 \
+                    else b"SOURCETABLE 200 OK\r\nContent-Type: text/plain\r\n"
+                writer.write(status + b"Server: NTRIP mosaic-H-Client/1.0\r\nContent-Length: %d\r\n"
+                             b"Connection: close\r\n\r\n" % len(table) + table)
+            await self._close(writer)
+            return
+
+        if self.auth and headers.get('authorization', '') != f"Basic {self.auth}":
+            writer.write(b"HTTP/1.1 401 Unauthorized\r\nWWW-Authenticate: Basic realm=\"/%s\"\r\n"
+                         b"Connection: close\r\n\r\n" % self.mountpoint.encode('ascii', 'replace'))
+            await self._close(writer)
+            return
+
+        if v2:
+            writer.write(b"HTTP/1.1 200 OK\r\nNtrip-Version: Ntrip/2.0\r\nServer: NTRIP mosaic-H-Client/1.0\r\n"
+                         b"Content-Type: gnss/data\r\nTransfer-Encoding: chunked\r\nCache-Control: no-store\r\n"
+                         b"Connection: close\r\n\r\n")
+        else:
+            writer.write(b"ICY 200 OK\r\n\r\n")
+        await self._serve(reader, writer, 'ntrip', chunked=v2)
+
+    async def _handle_raw(self, reader, writer):
+        """Rohe TCP Ausgabe: RTCM Stream ohne Handshake"""
+        await self._serve(reader, writer, 'tcp')
+
+    async def _serve(self, reader, writer, kind, chunked=False):
+        """Abonnenten registrieren, bis Verbindungsende bedienen"""
+        peer = writer.get_extra_info('peername')
+        name = f"{peer[0]}:{peer[1]}" if peer else kind
+        if len(self.clients) >= self.max_clients:
+            logger.warning(f"Lokaler Caster: maximale Anzahl Abonnenten erreicht, {name} abgewiesen")
+            self.rejected += 1
+            await self._close(writer)
+            return
+
+        # Kleiner Sendepuffer: ein langsamer Client staut in seiner Queue, nicht im Kernel/Transport
+        writer.transport.set_write_buffer_limits(high=16384)
+        client = FanoutClient(name, kind, writer, self.queue_size, chunked)
+        self.clients.add(client)
+        logger.info(f"Lokaler Caster: {kind} Abonnent {name} verbunden ({len(self.clients)} aktiv)")
+        sender = asyncio.create_task(client.run())
+        # Eingehende Daten (z.B. GGA von NTRIP Clients) lesen und verwerfen, EOF = Verbindungsende
+        receiver = asyncio.create_task(self._drain_input(reader))
+        try:
+            await asyncio.wait((sender, receiver), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            sender.cancel()
+            receiver.cancel()
+            self.clients.discard(client)
+            self._bytes_sent_closed += client.bytes_sent
+            self._dropped_closed += client.dropped
+            logger.info(
+                f"Lokaler Caster: {kind} Abonnent {name} getrennt "
+                f"({client.bytes_sent} bytes gesendet, {client.dropped} Chunks verworfen)"
+            )
+            await self._close(writer)
+
+    @staticmethod
+    async def _drain_input(reader):
+        while await reader.read(4096):
+            pass
+
+    @staticmethod
+    async def _close(writer):
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+    def collect_metrics(self):
+        """Metriken des Verteilers (Format wie StreamEngine.collect_metrics)"""
+        clients = list(self.clients)
+        counts = {'ntrip': 0, 'tcp': 0}
+        for client in clients:
+            counts[client.kind] += 1
+        return [
+            ('ntrip_fanout_clients', 'gauge', 'Verbundene Abonnenten des lokalen Casters',
+             [({'kind': kind}, count) for kind, count in sorted(counts.items())]),
+            ('ntrip_fanout_bytes_published_total', 'counter', 'RTCM Bytes an den lokalen Caster übergeben',
+             [({}, self.bytes_published)]),
+            ('ntrip_fanout_bytes_sent_total', 'counter', 'RTCM Bytes in die Sendepuffer der Abonnenten geschrieben',
+             [({}, self._bytes_sent_closed + sum(client.bytes_sent for client in clients))]),
+            ('ntrip_fanout_dropped_chunks_total', 'counter', 'Chunks wegen voller Abonnenten-Queue verworfen',
+             [({}, self._dropped_closed + sum(client.dropped for client in clients))]),
+            ('ntrip_fanout_rejected_total', 'counter', 'Abgewiesene Abonnenten (max_clients erreicht)',
+             [({}, self.rejected)]),
+            ('ntrip_fanout_udp_datagrams_total', 'counter', 'Gesendete UDP Datagramme',
+             [({}, self.udp_datagrams)]),
+            ('ntrip_fanout_udp_errors_total', 'counter', 'Verworfene UDP Datagramme (Sendefehler)',
+             [({}, self.udp_errors)]),
+        ]
+
+
+class MosaicControlServer:
+    """Lokaler Kommando-Port zum mosaic-H während des Stream-Modus
+
+    Im Stream-Modus besitzt der Client den UART allein. Werkzeuge wie
+    diagnose_mosaic.py verbinden sich statt mit dem UART per TCP mit diesem
+    Port (pyserial URL "socket://127.0.0.1:<port>") und sprechen dasselbe
+    ASCII Protokoll: jede Zeile ist ein Kommando, zurück kommt die Antwort
+    des Empfängers unverändert inkl. Prompt. Kommandos werden unter dem
+    Write-Lock des UART zwischen zwei RTCM Writes gesendet, die Antworten
+    schneidet der UARTDemux des Stream-Lesers aus dem Empfangsstrom - die
+    RTCM Weiterleitung läuft ungestört weiter.
+
+    Auch bei mehreren Clients ist immer nur ein Kommando unterwegs (wie im
+    Reference Guide gefordert erst nach dem Prompt der vorherigen Antwort).
+    Kommandos, die den Port des Stream-Modus selbst umkonfigurieren, werden
+    abgelehnt. Läuft wie RTCMFanout in einem eigenen Thread mit Event-Loop.
+    """
+
+    # Kommandos (Name und Kürzel), die Ein-/Ausgabe bzw. Baudrate eines Ports ändern
+    PORT_COMMANDS = ('setdatainout', 'sdio', 'setcomsettings', 'scs')
+    # Erzwingt den Kommandomodus an einem Port im Datenmodus - über den Kontroll-Port nur ein Prompt
+    FORCE_COMMAND_MODE = 'SSSSSSSSSS'
+    LINE_END = re.compile(rb'\r\n|\r|\n')
+
+    def __init__(self, uart, port, bind='127.0.0.1', timeout=5.0):
+        self.uart = uart
+        self.port = port
+        self.bind = bind
+        self.timeout = timeout
+        # Prompt des Stream-Ports (z.B. "COM2"), aus Antworten und Prompts gelernt
+        self.prompt = None
+
+        self.clients = 0
+        self.commands = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.unsolicited = 0
+
+        self._loop = None
+        self._thread = None
+        self._server = None
+        self._busy = None
+        # Laufendes Kommando (Text, Future), wird aus dem UART Lese-Thread aufgelöst
+        self._pending = None
+        self._pending_lock = threading.Lock()
+
+    def start(self):
+        """Server im Hintergrund-Thread starten und Antworten des UART Demultiplexers übernehmen
+
+        Returns:
+            True wenn der Port geöffnet ist
+        """
+        started = threading.Event()
+        result = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                self._busy = asyncio.Lock()
+                self._server = loop.run_until_complete(asyncio.start_server(self._handle, self.bind, self.port))
+                # Port 0: vom System vergebenen Port übernehmen
+                self.port = self._server.sockets[0].getsockname()[1]
+            except OSError as e:
+                logger.error(f"Kontroll-Port {self.bind}:{self.port} konnte nicht gestartet werden: {e}")
+                result.append(False)
+                started.set()
+                loop.close()
+                return
+            self._loop = loop
+            result.append(True)
+            started.set()
+            try:
+                loop.run_forever()
+            finally:
+                loop.close()
+
+        self._thread = threading.Thread(target=run, name='mosaic-control', daemon=True)
+        self._thread.start()
+        started.wait()
+        if result[0]:
+            self.uart.demux.on_reply = self._on_reply
+            self.uart.demux.on_prompt = self._on_prompt
+            logger.info(f"mosaic-H Kontroll-Port: {self.bind}:{self.port} (z.B. MOSAIC_CONTROL=socket://{self.bind}:{self.port})")
+        return result[0]
+
+    def stop(self):
+        """Server beenden"""
+        loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        self.uart.demux.on_reply = None
+        self.uart.demux.on_prompt = None
+        loop.call_soon_threadsafe(self._server.close)
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=5)
+
+    async def _handle(self, reader, writer):
+        """Client bedienen: Zeilen als Kommandos ausführen, Antworten roh zurückschreiben"""
+        peer = writer.get_extra_info('peername')
+        name = f"{peer[0]}:{peer[1]}" if peer else 'client'
+        self.clients += 1
+        logger.info(f"Kontroll-Port: {name} verbunden")
+        data = b''
         try:
-            self.socket.settimeout(timeout)
-            data = self.socket.recv(4096)
-            return data
-        except socket.timeout:
-            return None
-        except Exception as e:
-            logger.error(f"Fehler beim Empfangen von Daten: {e}")
-            return None
-    
-    def close(self):
-        """Verbindung schließen"""
-        if self.socket:
+            while True:
+                chunk = await reader.read(4096)
+                if not chunk:
+                    break
+                data += chunk
+                while True:
+                    match = self.LINE_END.search(data)
+                    # Einzelnes CR am Ende: evtl. folgt noch das LF
+                    if match is None or (match.group() == b'\r' and match.end() == len(data)):
+                        break
+                    line, data = data[:match.start()], data[match.end():]
+                    writer.write(await self.execute(line.decode('ascii', errors='replace').strip()))
+                    await writer.drain()
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.clients -= 1
+            logger.info(f"Kontroll-Port: {name} getrennt")
             try:
-                self.socket.close()
-                logger.info("NTRIP Verbindung geschlossen")
-            except:
+                writer.close()
+                await writer.wait_closed()
+            except OSError:
                 pass
 
+    async def execute(self, command):
+        """Ein Kommando an den Empfänger senden, Antwort roh (inkl. Prompt) oder b'' nach Timeout"""
+        if command.upper() == self.FORCE_COMMAND_MODE:
+            command = ''
+        reason = self._blocked(command)
+        if reason:
+            self.rejected += 1
+            logger.warning(f"Kontroll-Port: '{command}' abgelehnt - {reason}")
+            return f"$R? {command}: {reason}\r\n{self.prompt}>".encode('ascii', errors='replace')
 
-class MosaicUARTInterface:
-    """UART Interface zum mosaic-H Modul"""
-    
-    def __init__(self, device, baudrate=115200):
-        self.device = device
-        self.baudrate = baudrate
-        self.serial = None
-        
-    def connect(self):
-        """Verbindung zum UART Device herstellen"""
-        try:
-            logger.info(f"Öffne UART Device {self.device} mit {self.baudrate} Baud...")
-            self.serial = serial.Serial(
-                port=self.device,
-                baudrate=self.baudrate,
-                bytesize=serial.EIGHTBITS,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE,
-                timeout=1
-            )
-            time.sleep(0.5)  # Kurze Pause für Initialisierung
-            logger.info("UART Verbindung hergestellt")
-            return True
-        except Exception as e:
-            logger.error(f"Fehler beim Öffnen von {self.device}: {e}")
+        loop = asyncio.get_running_loop()
+        async with self._busy:
+            future = loop.create_future()
+            with self._pending_lock:
+                self._pending = (command, future)
+            self.commands += 1
+            logger.debug(f"Kontroll-Port Kommando: {command.split(',', 1)[0] or '<Enter>'}")
+            try:
+                sent = await loop.run_in_executor(None, self.uart.send_data, command.encode('ascii', errors='replace') + b'\r\n')
+                if sent:
+                    return await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                logger.warning(f"Kontroll-Port: keine Antwort vom mosaic-H innerhalb {self.timeout:.0f} s "
+                               f"({command.split(',', 1)[0] or '<Enter>'})")
+            finally:
+                with self._pending_lock:
+                    if self._pending is not None and self._pending[1] is future:
+                        self._pending = None
+            return b''
+
+    def _blocked(self, command):
+        """Grund für die Ablehnung oder None"""
+        fields = [field.strip().lower() for field in command.split(',')]
+        if fields[0] not in self.PORT_COMMANDS or len(fields) < 2 or not self.prompt:
+            return None
+        targets = fields[1].split('+')
+        if self.prompt.lower() in targets or 'all' in targets:
+            return f"{self.prompt} wird vom Stream-Modus genutzt (RTCM/NMEA würden unterbrochen)"
+        return None
+
+    def _on_reply(self, raw):
+        """Antwort aus dem UART Lese-Thread dem laufenden Kommando zuordnen"""
+        reply = CommandReply('', raw)
+        if reply.prompt and reply.prompt.endswith('>'):
+            self.prompt = reply.prompt[:-1]
+        with self._pending_lock:
+            pending = self._pending
+            if pending is None or not self._answers(reply, pending[0]):
+                self.unsolicited += 1
+                logger.debug(f"Kontroll-Port: Antwort ohne laufendes Kommando verworfen: {reply.header}")
+                return
+            self._pending = None
+        self._resolve(pending[1], raw)
+
+    def _on_prompt(self, prompt):
+        """Einzelner Prompt (Antwort auf eine leere Zeile) aus dem UART Lese-Thread"""
+        self.prompt = prompt
+        with self._pending_lock:
+            pending = self._pending
+            if pending is None or pending[0]:
+                return
+            self._pending = None
+        self._resolve(pending[1], f"\r\n{prompt}>".encode('ascii'))
+
+    @staticmethod
+    def _answers(reply, command):
+        """Passt die Antwort zum Kommando? set/get/exe/lst Antworten beginnen mit dem Echo"""
+        if not command:
             return False
-    
-    def read_nmea(self, timeout=1.0, debug=False):
-        """NMEA GGA Nachricht vom mosaic-H lesen"""
+        if reply.kind in (':', ';'):
+            return MosaicCommandEngine._echoes(reply.header, command)
+        return True
+
+    def _resolve(self, future, raw):
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(raw))
+
+    def collect_metrics(self):
+        """Metriken des Kontroll-Ports (Format wie StreamEngine.collect_metrics)"""
+        return [
+            ('ntrip_control_clients', 'gauge', 'Verbundene Clients des mosaic-H Kontroll-Ports',
+             [({}, self.clients)]),
+            ('ntrip_control_commands_total', 'counter', 'Über den Kontroll-Port gesendete Kommandos',
+             [({}, self.commands)]),
+            ('ntrip_control_timeouts_total', 'counter', 'Kommandos ohne Antwort innerhalb des Timeouts',
+             [({}, self.timeouts)]),
+            ('ntrip_control_rejected_total', 'counter', 'Abgelehnte Kommandos (Port des Stream-Modus)',
+             [({}, self.rejected)]),
+            ('ntrip_control_unsolicited_replies_total', 'counter', 'Antworten ohne passendes Kommando',
+             [({}, self.unsolicited)]),
+        ]
+
+
+def parse_caster_list(value, primary):
+    """Standby-Caster aus NTRIP_CASTERS lesen
+
+    Format: kommagetrennte Einträge [user:pass@][host[:port]]/mountpoint.
+    Fehlende Teile werden vom primären Caster übernommen, "/VRS2" ist also
+    ein zweiter Mountpoint auf demselben Caster.
+
+    Returns:
+        Liste von dicts mit caster, port, username, password, mountpoint
+    """
+    casters = []
+    for entry in value.replace(';', ',').split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        spec = dict(primary)
+        credentials, _, address = entry.rpartition('@')
+        if credentials:
+            spec['username'], _, spec['password'] = credentials.partition(':')
+        address, _, mountpoint = address.partition('/')
+        if not mountpoint:
+            raise ValueError(f"Kein Mountpoint in NTRIP_CASTERS Eintrag '{entry}'")
+        spec['mountpoint'] = mountpoint
+        if address:
+            host, _, port = address.partition(':')
+            spec['caster'] = host
+            spec['port'] = port or '2101'
+        casters.append(spec)
+    return casters
+
+
+def parse_udp_targets(value):
+    """RTCM_UDP_TARGETS lesen: kommagetrennte host:port Einträge
+
+    Hostnamen werden einmalig beim Start aufgelöst, damit sendto() im
+    Verteiler nie auf DNS wartet.
+
+    Returns:
+        Liste von (ip, port) Tupeln
+    """
+    targets = []
+    for entry in value.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        host, _, port = entry.rpartition(':')
+        if not host:
+            raise ValueError(f"Eintrag '{entry}' hat nicht das Format host:port")
+        targets.append((socket.gethostbyname(host), int(port)))
+    return targets
+
+
+PIPELINE_NAME = re.compile(r'^[A-Za-z0-9_-]+$')
+PIPELINE_ENV_KEY = re.compile(r'^[A-Z][A-Z0-9_]*$')
+
+
+def _pipeline_env(values, where):
+    """Einträge einer Pipeline-Konfiguration als Umgebungsvariablen (Strings)"""
+    if not isinstance(values, dict):
+        raise ValueError(f"{where} ist kein JSON Objekt")
+    env = {}
+    for key, value in values.items():
+        if not PIPELINE_ENV_KEY.match(key):
+            raise ValueError(f"Unbekannter Eintrag '{key}' in {where} (erwartet: Umgebungsvariablen wie in der .env)")
+        if isinstance(value, bool):
+            value = 'true' if value else 'false'
+        env[key] = '' if value is None else str(value)
+    return env
+
+
+def load_pipelines(path):
+    """PIPELINES_FILE für den Supervisor lesen
+
+    Format (JSON): {"defaults": {...}, "pipelines": [{"name": "front", ...}]}.
+    Schlüssel sind die Umgebungsvariablen des Stream-Modus (UART_DEVICE,
+    UART_BAUDRATE, NTRIP_CASTER, NTRIP_MOUNTPOINT, ...), defaults gilt für
+    alle Pipelines. "share_upstream": false nimmt eine Pipeline von der
+    gemeinsamen Caster-Verbindung aus.
+
+    Returns:
+        (defaults, pipelines) - pipelines als Liste von dicts mit name, share und env
+    """
+    with open(path) as f:
+        config = json.load(f)
+    if not isinstance(config, dict) or not isinstance(config.get('pipelines'), list) or not config['pipelines']:
+        raise ValueError("'pipelines' fehlt oder ist leer")
+    defaults = _pipeline_env(config.get('defaults', {}), 'defaults')
+    pipelines = []
+    names = set()
+    for index, entry in enumerate(config['pipelines'], 1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Pipeline {index} ist kein JSON Objekt")
+        entry = dict(entry)
+        name = str(entry.pop('name', f'pipeline{index}'))
+        if not PIPELINE_NAME.match(name) or name in names:
+            raise ValueError(f"Ungültiger oder doppelter Pipeline-Name '{name}' (erlaubt: A-Z a-z 0-9 _ -)")
+        names.add(name)
+        share = entry.pop('share_upstream', True)
+        pipelines.append({'name': name, 'share': bool(share), 'env': _pipeline_env(entry, f"Pipeline {name}")})
+    return defaults, pipelines
+
+
+def pipeline_path(path, name):
+    """Dateipfad pro Pipeline: ntrip_state.json → ntrip_state_front.json"""
+    root, ext = os.path.splitext(path)
+    return f"{root}_{name}{ext}"
+
+
+class PipelineProcess:
+    """Eine Pipeline des Supervisors: Stream-Modus in einem eigenen Prozess
+
+    Ein Absturz (UART abgezogen, Exception, Speicher) betrifft nur diesen
+    Prozess. Nach dem Beenden wird er mit ReconnectBackoff neu gestartet:
+    der erste Neustart sofort, danach mit wachsender Wartezeit; ein Prozess,
+    der mindestens 30 Sekunden lief, setzt die Folge zurück.
+    """
+
+    def __init__(self, name, env, share=True, restart_delay=1.0, restart_max_delay=60.0):
+        self.name = name
+        self.env = env
+        self.share = share
+        self.upstream = None          # Pipeline, deren Caster-Verbindung mitgenutzt wird
+        self.leader = None            # deren PipelineProcess
+        self.own_env = None           # Umgebung mit eigener Caster-Verbindung (zum Zurückfallen)
+        self.metrics_address = None   # (host, port) des Metrik-Endpunkts der Pipeline
+        self.process = None
+        self.restarts = 0
+        self.started_at = 0.0
+        self.next_start = 0.0
+        self.backoff = ReconnectBackoff(restart_delay, restart_max_delay)
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self, now):
+        """Stream-Modus als Kindprozess starten (eigene Session, Strg+C leitet der Supervisor weiter)"""
         try:
-            if not self.serial or not self.serial.is_open:
-                return None
-            
-            start_time = time.time()
-            buffer = ""
-            
-            while time.time() - start_time < timeout:
-                if self.serial.in_waiting:
-                    chunk = self.serial.read(self.serial.in_waiting).decode('ascii', errors='ignore')
-                    buffer += chunk
-                    
-                    if debug and chunk:
-                        logger.debug(f"UART empfangen: {repr(chunk[:100])}")
-                    
-                    # Suche nach GGA Nachricht
-                    lines = buffer.split('\n')
-                    for line in lines:
-                        if '$GPGGA' in line or '$GNGGA' in line:
-                            # Validiere Checksum wenn vorhanden
-                            if '*' in line:
-                                line = line.strip()
-                                if not line.endswith('\r\n'):
-                                    line += '\r\n'
-                                return line
-                time.sleep(0.01)
-            
-            if debug and buffer:
-                logger.debug(f"Buffer enthielt keine GGA: {repr(buffer[:200])}")
-            
-            return None
-            
-        except Exception as e:
-            logger.error(f"Fehler beim Lesen von NMEA: {e}")
-            return None
-    
-    def send_data(self, data):
-        """Daten über UART senden"""
+            self.process = subprocess.Popen([sys.executable, '-u', os.path.abspath(__file__)],
+                                            env=self.env, start_new_session=True)
+        except OSError as e:
+            delay = self.backoff.next_delay()
+            self.next_start = now + max(delay, 1.0)
+            logger.error(f"Pipeline {self.name} konnte nicht gestartet werden: {e}")
+            return
+        self.started_at = now
+        logger.info(f"Pipeline {self.name} gestartet (PID {self.process.pid}, "
+                    f"UART {self.env.get('UART_DEVICE', '/dev/ttyUSB0')})")
+
+    def poll(self, now):
+        """Fälligen Start ausführen bzw. nach dem Beenden den Neustart planen"""
+        if self.process is None:
+            if now >= self.next_start:
+                self.start(now)
+            return
+        code = self.process.poll()
+        if code is None:
+            return
+        self.process = None
+        self.backoff.connection_ended(now - self.started_at)
+        delay = self.backoff.next_delay()
+        self.restarts += 1
+        self.next_start = now + delay
+        logger.warning(f"Pipeline {self.name} beendet (Exit-Code {code}) - Neustart in {delay:.1f} Sekunden")
+
+    def interrupt(self):
+        """Pipeline wie mit Strg+C beenden lassen"""
+        if self.running:
+            self.process.send_signal(signal.SIGINT)
+
+    def wait(self, deadline):
+        """Auf das Ende warten, nach deadline (monotonic) hart beenden"""
+        if self.process is None:
+            return
         try:
-            if self.serial and self.serial.is_open:
-                self.serial.write(data)
-                return True
-            return False
-        except Exception as e:
-            logger.error(f"Fehler beim Senden über UART: {e}")
-            return False
-    
-    def send_command(self, command):
-        """Kommando an mosaic-H senden"""
+            self.process.wait(max(deadline - time.monotonic(), 0))
+        except subprocess.TimeoutExpired:
+            logger.warning(f"Pipeline {self.name} reagiert nicht - wird beendet")
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def scrape(self, timeout=1.0):
+        """Metriken der Pipeline abrufen (leer, wenn sie gerade nicht läuft)"""
+        if self.metrics_address is None or not self.running:
+            return []
+        connection = http.client.HTTPConnection(*self.metrics_address, timeout=timeout)
         try:
-            # Puffer leeren vor dem Senden
-            if self.serial.in_waiting:
-                self.serial.reset_input_buffer()
-            
-            cmd = command.strip() + "\r\n"
-            logger.info(f"Sende Kommando: {command}")
-            self.serial.write(cmd.encode('ascii'))
-            self.serial.flush()
-            time.sleep(0.3)
-            
-            # Response lesen
-            response = ""
-            start_time = time.time()
-            while time.time() - start_time < 3:
-                if self.serial.in_waiting:
-                    chunk = self.serial.read(self.serial.in_waiting).decode('ascii', errors='ignore')
-                    response += chunk
-                    if '\n' in chunk:
-                        time.sleep(0.1)  # Kurz warten für komplette Antwort
-                        if self.serial.in_waiting == 0:
-                            break
-                time.sleep(0.1)
-            
-            if response:
-                logger.info(f"Response: {response.strip()}")
+            connection.request('GET', '/metrics')
+            response = connection.getresponse()
+            if response.status != 200:
+                return []
+            return parse_metrics(response.read().decode('utf-8'))
+        except (OSError, http.client.HTTPException):
+            return []
+        finally:
+            connection.close()
+
+
+class PipelineSupervisor:
+    """Mehrere mosaic-H Pipelines (UART ↔ Caster) auf einem Rechner betreiben
+
+    Jede Pipeline läuft als eigener Prozess im Stream-Modus, so bleiben
+    Abstürze isoliert und der GIL wird nicht geteilt - auf einem Raspberry Pi
+    verteilen sich ein Dutzend Pipelines auf alle Kerne. Die Umgebung einer
+    Pipeline ist os.environ, darüber defaults und die Einträge der Pipeline.
+    Dateien (State, Log, Mitschnitt) bekommen den Pipeline-Namen angehängt,
+    geerbte Ports werden abgeschaltet, damit sich die Prozesse nicht stören.
+
+    Gemeinsame Caster-Verbindung: Pipelines mit gleichem Caster, Port,
+    Benutzer und Mountpoint, deren letzte Positionen (NTRIP_STATE_FILE)
+    höchstens share_distance Meter auseinander liegen, belegen nur ein
+    Caster-Login. Die erste Pipeline der Gruppe verbindet sich zum Caster
+    und stellt den Strom über ihren lokalen Caster (RTCMFanout, 127.0.0.1)
+    bereit, die übrigen verbinden sich dorthin - ihre GGA erreicht den Caster
+    nicht, ein VRS rechnet für die Position der ersten. Deshalb wird nur
+    geteilt, wenn beide Positionen bekannt sind; ohne State-File (erster
+    Start) hat jede Pipeline ihre eigene Verbindung. Die Gruppen entstehen
+    beim Start. Vor jedem Neustart und alle share_recheck Sekunden wird der
+    Abstand erneut geprüft: ist er zu groß oder eine Position unbekannt,
+    wird die Pipeline mit eigener Caster-Verbindung neu gestartet (ein
+    erneutes Teilen gibt es erst beim nächsten Start des Supervisors).
+    Pipelines mit NTRIP_CASTERS oder MOUNTPOINT_SELECT wählen ihre
+    Verbindung selbst und teilen nicht.
+
+    Metriken: die Pipelines exportieren auf metrics_port + 1 + i (nur
+    127.0.0.1), der Supervisor fasst sie beim Scrape mit Label pipeline
+    zusammen und ergänzt Zustand und Neustarts je Pipeline.
+    """
+
+    # Pro Pipeline umbenannt (Default des Stream-Modus, falls nicht gesetzt)
+    PIPELINE_FILES = {
+        'NTRIP_STATE_FILE': '/app/config/ntrip_state.json',
+        'LOG_FILE': '/app/logs/ntrip_client.log',
+        'CAPTURE_FILE': '',
+    }
+    # Nur wenn die Pipeline sie selbst setzt - geerbt würden alle Prozesse denselben Port belegen
+    PIPELINE_PORTS = ('METRICS_PORT', 'CONTROL_PORT', 'LOCAL_CASTER_PORT', 'RTCM_TCP_PORT')
+    # Mitnutzer starten nach der Pipeline mit der Caster-Verbindung
+    FOLLOWER_DELAY = 1.0
+
+    def __init__(self, defaults, pipelines, base_env=None, metrics_port=0, metrics_bind='127.0.0.1',
+                 share=True, share_distance=1000.0, share_port=2110, share_recheck=300.0,
+                 restart_delay=1.0, restart_max_delay=60.0):
+        self.metrics_port = metrics_port
+        self.metrics_bind = metrics_bind
+        self.share_distance = share_distance
+        self.share_port = share_port
+        self.share_recheck = share_recheck
+        self._next_recheck = 0.0
+        self._exporter = None
+        self._scraper = None
+        base = dict(os.environ if base_env is None else base_env)
+        base.update(defaults)
+        base.pop('PIPELINES_FILE', None)
+        for key in self.PIPELINE_PORTS:
+            base[key] = '0'
+        self.workers = []
+        for index, spec in enumerate(pipelines):
+            env = dict(base)
+            for key, default in self.PIPELINE_FILES.items():
+                path = base.get(key, default)
+                if path:
+                    env[key] = pipeline_path(path, spec['name'])
+            if metrics_port:
+                env['METRICS_PORT'] = str(metrics_port + 1 + index)
+                env['METRICS_BIND'] = '127.0.0.1'
+            env.update(spec['env'])
+            env['OPERATION_MODE'] = 'stream'
+            env['PIPELINE_NAME'] = spec['name']
+            worker = PipelineProcess(spec['name'], env, spec['share'] and share, restart_delay, restart_max_delay)
+            port = int(env.get('METRICS_PORT') or 0)
+            if port:
+                bind = env.get('METRICS_BIND', '127.0.0.1')
+                worker.metrics_address = ('127.0.0.1' if bind in ('', '0.0.0.0') else bind, port)
+            self.workers.append(worker)
+        self._share_upstreams()
+
+    @staticmethod
+    def _position(env):
+        """Letzte bekannte Position der Pipeline (lat, lon) aus dem State-File, sonst None"""
+        gga = StartupState(env.get('NTRIP_STATE_FILE') or None).cached_gga()
+        info = parse_gga(gga) if gga else None
+        if info and info['lat'] is not None and info['lon'] is not None:
+            return info['lat'], info['lon']
+        return None
+
+    def _nearby(self, a, b):
+        """Beide Positionen bekannt und höchstens share_distance Meter auseinander"""
+        return a is not None and b is not None and great_circle_distance(*a, *b) <= self.share_distance
+
+    def _share_upstreams(self):
+        """Pipelines mit gleichem Caster/Mountpoint und nahen Positionen auf eine Caster-Verbindung legen"""
+        groups = []
+        for worker in self.workers:
+            env = worker.env
+            if (not worker.share or env.get('NTRIP_CASTERS')
+                    or env.get('MOUNTPOINT_SELECT', 'off').lower() != 'off'):
+                continue
+            key = (env.get('NTRIP_CASTER'), env.get('NTRIP_PORT', '2101'),
+                   env.get('NTRIP_MOUNTPOINT'), env.get('NTRIP_USERNAME'))
+            position = self._position(env)
+            if position is None:
+                continue
+            for group_key, members in groups:
+                if group_key == key and all(self._nearby(position, other) for _, other in members):
+                    members.append((worker, position))
+                    break
             else:
-                logger.warning("Keine Response vom mosaic-H erhalten")
-            return response
-            
-        except Exception as e:
-            logger.error(f"Fehler beim Senden des Kommandos: {e}")
-            return ""
-    
-    def login(self, username, password):
-        """Login am mosaic-H durchführen (optional)"""
-        if not username or not password:
-            logger.info("Kein Username/Password angegeben - verwende anonymous access")
-            return True
-        
+                groups.append((key, [(worker, position)]))
+        shared = [members for _, members in groups if len(members) > 1]
+        for index, members in enumerate(shared):
+            leader = members[0][0]
+            env = leader.env
+            port = int(env.get('LOCAL_CASTER_PORT') or 0)
+            if not port:
+                port = self.share_port + index
+                env['LOCAL_CASTER_PORT'] = str(port)
+                env['LOCAL_CASTER_BIND'] = '127.0.0.1'
+            bind = env.get('LOCAL_CASTER_BIND', '0.0.0.0')
+            mountpoint = env.get('LOCAL_CASTER_MOUNTPOINT') or env.get('NTRIP_MOUNTPOINT')
+            username, _, password = (env.get('LOCAL_CASTER_AUTH') or 'local:local').partition(':')
+            for worker, _ in members[1:]:
+                worker.own_env = dict(worker.env)
+                worker.leader = leader
+                worker.env.update({
+                    'NTRIP_CASTER': '127.0.0.1' if bind in ('', '0.0.0.0') else bind,
+                    'NTRIP_PORT': str(port),
+                    'NTRIP_MOUNTPOINT': mountpoint,
+                    'NTRIP_USERNAME': username,
+                    'NTRIP_PASSWORD': password,
+                    'NTRIP_VERSION': 'v1',
+                })
+                worker.upstream = leader.name
+                logger.info(f"Pipeline {worker.name} nutzt die Caster-Verbindung von {leader.name} "
+                            f"({mountpoint} über Port {port})")
+
+    def _still_shared(self, worker):
+        """Liegt die Pipeline noch nahe genug an der Pipeline mit der Caster-Verbindung?"""
+        return self._nearby(self._position(worker.own_env), self._position(worker.leader.env))
+
+    def _detach(self, worker):
+        """Gemeinsame Caster-Verbindung aufgeben: eigene Verbindung, laufender Prozess wird neu gestartet"""
+        logger.warning(f"Pipeline {worker.name} ist nicht mehr innerhalb {self.share_distance:g} m von "
+                       f"{worker.upstream} (oder Position unbekannt) - eigene Caster-Verbindung")
+        worker.env = worker.own_env
+        worker.upstream = worker.leader = worker.own_env = None
+        worker.interrupt()
+
+    def collect_metrics(self):
+        """Eigene Metriken plus die aller Pipelines mit Label pipeline"""
+        metrics = [
+            ('ntrip_pipeline_up', 'gauge', 'Pipeline-Prozess läuft (1) oder wartet auf den Neustart (0)',
+             [({'pipeline': w.name}, int(w.running)) for w in self.workers]),
+            ('ntrip_pipeline_restarts_total', 'counter', 'Neustarts des Pipeline-Prozesses',
+             [({'pipeline': w.name}, w.restarts) for w in self.workers]),
+            ('ntrip_pipeline_shared_upstream', 'gauge',
+             'Pipeline nutzt die Caster-Verbindung einer anderen Pipeline (1) oder eine eigene (0)',
+             [({'pipeline': w.name}, int(w.upstream is not None)) for w in self.workers]),
+        ]
+        if self._scraper is None:
+            self._scraper = ThreadPoolExecutor(max_workers=min(len(self.workers), 8),
+                                               thread_name_prefix='scrape')
+        families = {}
+        for worker, worker_metrics in zip(self.workers, self._scraper.map(PipelineProcess.scrape, self.workers)):
+            for name, metric_type, help_text, samples in worker_metrics:
+                family = families.setdefault(name, (name, metric_type, help_text, []))
+                family[3].extend((dict(labels, pipeline=worker.name), value) for labels, value in samples)
+        return metrics + list(families.values())
+
+    def start(self):
+        """Metrik-Endpunkt starten und die Pipelines einplanen"""
+        if self.metrics_port:
+            self._exporter = MetricsExporter(self.collect_metrics, self.metrics_port, self.metrics_bind)
+            self._exporter.start()
+        now = time.monotonic()
+        self._next_recheck = now + self.share_recheck
+        for worker in self.workers:
+            worker.next_start = now + (self.FOLLOWER_DELAY if worker.upstream else 0.0)
+
+    def poll(self):
+        """Pipelines starten bzw. beendete neu starten, gemeinsame Verbindungen regelmäßig prüfen"""
+        now = time.monotonic()
+        recheck = self.share_recheck > 0 and now >= self._next_recheck
+        if recheck:
+            self._next_recheck = now + self.share_recheck
+        for worker in self.workers:
+            starting = worker.process is None and now >= worker.next_start
+            if worker.upstream and (recheck or starting) and not self._still_shared(worker):
+                self._detach(worker)
+            worker.poll(now)
+
+    def stop(self, timeout=5.0):
+        """Alle Pipelines beenden (SIGINT, nach timeout Sekunden SIGKILL)"""
+        for worker in self.workers:
+            worker.interrupt()
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            worker.wait(deadline)
+        if self._exporter:
+            self._exporter.stop()
+        if self._scraper:
+            self._scraper.shutdown(wait=False)
+
+    def run(self, interval=0.5):
+        """Überwachungsschleife bis Strg+C/SIGTERM"""
+        self.start()
         try:
-            logger.info(f"Versuche Login als Benutzer: {username}")
-            cmd = f"login,{username},{password}"
-            response = self.send_command(cmd)
-            
-            # Prüfe ob Login erfolgreich war
-            if "login successful" in response.lower() or "$R" in response:
-                logger.info("Login erfolgreich")
-                return True
-            else:
-                logger.warning(f"Login möglicherweise fehlgeschlagen: {response}")
-                return False
-                
-        except Exception as e:
-            logger.error(f"Fehler beim Login: {e}")
-            return False
-    
-    def close(self):
-        """UART Verbindung schließen"""
-        if self.serial and self.serial.is_open:
-            try:
-                self.serial.close()
-                logger.info("UART Verbindung geschlossen")
-            except:
-                pass
+            while True:
+                self.poll()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            logger.info("Supervisor beendet - stoppe Pipelines")
+        finally:
+            self.stop()
 
 
-def configure_mosaic_ntrip(uart, config):
-    """Konfiguriert das mosaic-H Modul für NTRIP"""
-    logger.info("=== Starte mosaic-H NTRIP Konfiguration ===")
-    
-    # Kommunikationstest mit mosaic-H
-    logger.info("Teste Kommunikation mit mosaic-H...")
-    response = uart.send_command("getCOMSettings,COM2")
-    # mosaic-H antwortet mit $R: oder $R; oder $R?
-    if not response or not response.strip():
-        logger.error("Keine Antwort vom mosaic-H erhalten!")
-        logger.error("Prüfe UART-Verbindung und Baudrate (sollte 115200 sein)")
-        return False
-    elif "$R?" in response and "Invalid" in response:
-        logger.error(f"mosaic-H meldet ungültigen Befehl: {response.strip()}")
-        return False
-    else:
-        logger.info("✓ Kommunikation mit mosaic-H erfolgreich")
-    
-    # Optional: Login durchführen
-    if 'mosaic_username' in config and 'mosaic_password' in config:
-        uart.login(config['mosaic_username'], config['mosaic_password'])
-    
-    # NMEA GGA Ausgabe auf COM2 aktivieren (für VRS NTRIP)
-    # COM2 = UART2 Port (wo der Companion Computer angeschlossen ist)
-    logger.info("Aktiviere NMEA Ausgabe auf COM2...")
-    uart.send_command("setDataInOut,COM2,,+NMEA")
-    time.sleep(0.5)
-    
-    logger.info("Konfiguriere NMEA GGA Stream auf COM2...")
-    uart.send_command("setNMEAOutput,Stream1,COM2,GGA,sec1")
-    time.sleep(0.5)
-    
-    connection = config['connection']
-    mode = config['mode']
-    caster = config['caster']
-    port = config['port']
-    username = config['username']
-    password = config['password']
-    mountpoint = config['mountpoint']
-    version = config['version']
-    send_gga = config['send_gga']
-    
-    # NTRIP Connection konfigurieren
-    if mode == "Client":
-        cmd = f"setNTRIPSettings,{connection},{mode},{caster},{port},{username},{password},{mountpoint}"
-        uart.send_command(cmd)
-        time.sleep(0.5)
-        
-        # Version und GGA Einstellungen
-        if version != "auto":
-            logger.info(f"Setze NTRIP Version auf {version}")
-        
-        if send_gga != "auto":
-            logger.info(f"Setze GGA Intervall auf {send_gga}")
-        
-        # Status abfragen
-        uart.send_command(f"getNTRIPSettings,{connection}")
-        
-    elif mode == "Server":
-        cmd = f"setNTRIPSettings,{connection},{mode},{caster},{port},{username},{password},{mountpoint}"
-        uart.send_command(cmd)
-    
-    # Konfiguration dauerhaft speichern
-    logger.info("Speichere Konfiguration...")
-    uart.send_command("exeWriteSettings")
-    time.sleep(1)
-    
-    logger.info("=== mosaic-H NTRIP Konfiguration abgeschlossen ===")
-    return True
+def _raise_keyboard_interrupt(signum, frame):
+    raise KeyboardInterrupt
 
 
-def stream_mode(ntrip_client, uart):
-    """Stream-Modus: Leitet NTRIP Daten kontinuierlich an mosaic-H weiter"""
-    logger.info("=== Starte Stream-Modus ===")
-    
-    bytes_received = 0
-    last_log_time = time.time()
-    last_gga_time = 0  # Sofort beim Start senden
-    gga_interval = 5  # GGA alle 5 Sekunden senden
-    gga_sent = False
+def supervisor_mode():
+    """OPERATION_MODE=supervisor: Pipelines aus PIPELINES_FILE starten und überwachen"""
+    pipelines_file = os.getenv('PIPELINES_FILE', '/app/config/pipelines.json')
+    metrics_port = int(os.getenv('METRICS_PORT', '0') or 0)
+    metrics_bind = os.getenv('METRICS_BIND', '127.0.0.1')
+    restart_delay = float(os.getenv('PIPELINE_RESTART_DELAY', '1'))
+    restart_max_delay = float(os.getenv('PIPELINE_RESTART_MAX_DELAY', '60'))
+    share_upstream = os.getenv('SHARE_UPSTREAM', 'true').lower() in ('1', 'true', 'yes', 'on')
+    share_distance = float(os.getenv('SHARE_DISTANCE', '1000'))
+    share_port = int(os.getenv('SHARE_PORT_BASE', '2110'))
+    share_recheck = float(os.getenv('SHARE_RECHECK', '300'))
     
     try:
-        while True:
-            current_time = time.time()
-            
-            # GGA Position zum Caster senden (für VRS)
-            if current_time - last_gga_time >= gga_interval:
-                gga = uart.read_nmea(timeout=1.0, debug=(not gga_sent))
-                if gga:
-                    if ntrip_client.send_gga(gga):
-                        if not gga_sent:
-                            logger.info(f"Erste GGA Position gesendet: {gga.strip()}")
-                            gga_sent = True
-                        last_gga_time = current_time
-                else:
-                    if not gga_sent:
-                        logger.warning("Keine GGA Position vom mosaic-H empfangen - mosaic-H gibt evtl. keine NMEA Daten aus")
-                    last_gga_time = current_time  # Verhindere zu häufiges Logging
-            
-            # Daten vom NTRIP Caster empfangen
-            data = ntrip_client.receive_data(timeout=1)
-            
-            if data:
-                # Daten über UART an mosaic-H senden
-                if uart.send_data(data):
-                    bytes_received += len(data)
-                    
-                    # Log alle 10 Sekunden
-                    if current_time - last_log_time >= 10:
-                        logger.info(f"RTCM Daten empfangen und weitergeleitet: {bytes_received} bytes")
-                        last_log_time = current_time
-            elif gga_sent and current_time - last_log_time >= 30:
-                # Nur warnen wenn GGA gesendet wurde und länger keine Daten kommen
-                logger.warning("Keine RTCM Daten vom NTRIP Caster empfangen - Reconnect...")
-                return False  # Reconnect erforderlich
-                
-    except KeyboardInterrupt:
-        logger.info("Stream-Modus durch Benutzer beendet")
-        return True
-    except Exception as e:
-        logger.error(f"Fehler im Stream-Modus: {e}")
-        return False
+        defaults, pipelines = load_pipelines(pipelines_file)
+    except (OSError, ValueError) as e:
+        logger.error(f"Pipelines aus {pipelines_file} können nicht gelesen werden: {e}")
+        sys.exit(1)
+    
+    logger.info("=== mosaic-H NTRIP Supervisor gestartet ===")
+    logger.info(f"{len(pipelines)} Pipelines aus {pipelines_file}: {', '.join(p['name'] for p in pipelines)}")
+    supervisor = PipelineSupervisor(defaults, pipelines, metrics_port=metrics_port, metrics_bind=metrics_bind,
+                                    share=share_upstream, share_distance=share_distance, share_port=share_port,
+                                    share_recheck=share_recheck,
+                                    restart_delay=restart_delay, restart_max_delay=restart_max_delay)
+    # docker stop sendet SIGTERM: wie Strg+C alle Pipelines geordnet beenden
+    signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+    supervisor.run()
+    logger.info("=== mosaic-H NTRIP Supervisor beendet ===")
 
 
 def main():
@@ -383,6 +5917,45 @@ def main():
     
     # Umgebungsvariablen lesen
     operation_mode = os.getenv('OPERATION_MODE', 'stream')
+    if operation_mode == "supervisor":
+        supervisor_mode()
+        return
+    stream_engine = os.getenv('STREAM_ENGINE', 'async').lower()
+    rtcm_validate = os.getenv('RTCM_VALIDATE', 'true').lower() in ('1', 'true', 'yes', 'on')
+    zero_copy = os.getenv('ZERO_COPY', 'true').lower() in ('1', 'true', 'yes', 'on')
+    latency_stats = os.getenv('LATENCY_STATS', 'false').lower() in ('1', 'true', 'yes', 'on')
+    rtcm_max_age = float(os.getenv('RTCM_MAX_AGE', '2.0'))
+    rtcm_exclude = os.getenv('RTCM_EXCLUDE', '')
+    rtcm_msm4 = os.getenv('RTCM_MSM4', 'false').lower() in ('1', 'true', 'yes', 'on')
+    uart_coalesce = float(os.getenv('UART_COALESCE_MS', '5') or 0) / 1000
+    metrics_port = int(os.getenv('METRICS_PORT', '0') or 0)
+    metrics_bind = os.getenv('METRICS_BIND', '127.0.0.1')
+    control_port = int(os.getenv('CONTROL_PORT', '0') or 0)
+    control_bind = os.getenv('CONTROL_BIND', '127.0.0.1')
+    gga_source = os.getenv('GGA_SOURCE', 'auto').lower()
+    mosaic_sbf_output = os.getenv('MOSAIC_SBF_OUTPUT', 'off')
+    mosaic_sbf_stream = int(os.getenv('MOSAIC_SBF_STREAM', '10'))
+    capture_file = os.getenv('CAPTURE_FILE', '')
+    capture_kinds = os.getenv('CAPTURE_KINDS', 'caster,uart_tx,uart_rx,gga,event')
+    capture_index_interval = float(os.getenv('CAPTURE_INDEX_INTERVAL', '10'))
+    
+    # GGA Uploads für VRS (adaptiv: sofort bei Bewegung/Qualitätswechsel, seltener im Stand)
+    gga_adaptive = os.getenv('GGA_ADAPTIVE', 'true').lower() in ('1', 'true', 'yes', 'on')
+    gga_interval = float(os.getenv('GGA_INTERVAL', '5'))
+    gga_min_interval = float(os.getenv('GGA_MIN_INTERVAL', '1'))
+    gga_max_interval = float(os.getenv('GGA_MAX_INTERVAL', '30'))
+    gga_recenter_distance = float(os.getenv('GGA_RECENTER_DISTANCE', '100'))
+    gga_stationary_distance = float(os.getenv('GGA_STATIONARY_DISTANCE', '2'))
+    
+    # Lokaler Caster / RTCM Verteiler (optional)
+    local_caster_port = int(os.getenv('LOCAL_CASTER_PORT', '0') or 0)
+    local_caster_bind = os.getenv('LOCAL_CASTER_BIND', '0.0.0.0')
+    local_caster_mountpoint = os.getenv('LOCAL_CASTER_MOUNTPOINT', '')
+    local_caster_auth = os.getenv('LOCAL_CASTER_AUTH', '')
+    rtcm_tcp_port = int(os.getenv('RTCM_TCP_PORT', '0') or 0)
+    rtcm_udp_targets = os.getenv('RTCM_UDP_TARGETS', '')
+    fanout_queue = int(os.getenv('FANOUT_QUEUE', '32'))
+    fanout_max_clients = int(os.getenv('FANOUT_MAX_CLIENTS', '64'))
     
     # NTRIP Parameter
     ntrip_caster = os.getenv('NTRIP_CASTER')
@@ -390,6 +5963,36 @@ def main():
     ntrip_username = os.getenv('NTRIP_USERNAME')
     ntrip_password = os.getenv('NTRIP_PASSWORD')
     ntrip_mountpoint = os.getenv('NTRIP_MOUNTPOINT')
+    ntrip_version = os.getenv('NTRIP_VERSION', 'v1').lower()
+    ntrip_casters = os.getenv('NTRIP_CASTERS', '')
+    failover_age = float(os.getenv('FAILOVER_AGE', '1.5'))
+    failback_hold = float(os.getenv('FAILBACK_HOLD', '10'))
+    
+    # Verbindungsverwaltung: Reconnect sofort, danach exponentiell mit Jitter; Stall aus dem Epochentakt
+    reconnect_delay = float(os.getenv('RECONNECT_DELAY', '1'))
+    reconnect_max_delay = float(os.getenv('RECONNECT_MAX_DELAY', '60'))
+    stall_epochs = float(os.getenv('STALL_EPOCHS', '5'))
+    stall_timeout = float(os.getenv('STALL_TIMEOUT', '30'))
+    # Watchdog: veraltete Korrekturen (keine neue Epoche, mosaic-H ohne frische Korrekturen), 0 = aus
+    correction_max_age = float(os.getenv('CORRECTION_MAX_AGE', '5'))
+    correction_min_satellites = int(os.getenv('CORRECTION_MIN_SATELLITES', '6'))
+    tcp_keepalive = os.getenv('TCP_KEEPALIVE', '10,5,3')
+    tcp_user_timeout = float(os.getenv('TCP_USER_TIMEOUT', '20') or 0)
+    
+    # Schneller Start: letzte GGA und Caster-Adressen im Config-Volume (leer = nicht speichern)
+    ntrip_state_file = os.getenv('NTRIP_STATE_FILE', '/app/config/ntrip_state.json')
+    dns_cache_ttl = float(os.getenv('DNS_CACHE_TTL', '3600'))
+    
+    # Mountpoint aus der Sourcetable: nächster kompatibler Mountpoint bei zu langer Basislinie
+    mountpoint_select = os.getenv('MOUNTPOINT_SELECT', 'off').lower()
+    mountpoint_max_baseline = float(os.getenv('MOUNTPOINT_MAX_BASELINE', '20'))
+    mountpoint_hysteresis = float(os.getenv('MOUNTPOINT_HYSTERESIS', '5'))
+    mountpoint_min_hold = float(os.getenv('MOUNTPOINT_MIN_HOLD', '60'))
+    mountpoint_format = os.getenv('MOUNTPOINT_FORMAT', 'RTCM 3')
+    mountpoint_nav_systems = os.getenv('MOUNTPOINT_NAV_SYSTEMS', '')
+    mountpoint_single_base = os.getenv('MOUNTPOINT_SINGLE_BASE', 'true').lower() in ('1', 'true', 'yes', 'on')
+    sourcetable_cache = os.getenv('SOURCETABLE_CACHE', '/app/config/sourcetable.json')
+    sourcetable_ttl = float(os.getenv('SOURCETABLE_TTL', '86400'))
     
     # UART Parameter
     uart_device = os.getenv('UART_DEVICE', '/dev/ttyUSB0')
@@ -400,12 +6003,22 @@ def main():
     mosaic_ntrip_connection = os.getenv('MOSAIC_NTRIP_CONNECTION', 'NTR1')
     mosaic_ntrip_version = os.getenv('MOSAIC_NTRIP_VERSION', 'v2')
     mosaic_send_gga = os.getenv('MOSAIC_SEND_GGA', 'auto')
+    mosaic_config_mode = os.getenv('MOSAIC_CONFIG_MODE', 'diff').lower()
+    mosaic_config_cache = os.getenv('MOSAIC_CONFIG_CACHE', '/app/config')
+    mosaic_config_verify = os.getenv('MOSAIC_CONFIG_VERIFY', 'false').lower() in ('1', 'true', 'yes', 'on')
     
     # mosaic-H Authentifizierung (optional)
     mosaic_username = os.getenv('MOSAIC_USERNAME', '')
     mosaic_password = os.getenv('MOSAIC_PASSWORD', '')
     
     # Validierung
+    try:
+        keepalive = tuple(float(value) for value in tcp_keepalive.split(',')) if tcp_keepalive not in ('', '0') else ()
+        if keepalive and len(keepalive) != 3:
+            raise ValueError
+    except ValueError:
+        logger.error(f"Ungültiges TCP_KEEPALIVE '{tcp_keepalive}' (Leerlauf,Intervall,Proben in Sekunden, 0 = aus)")
+        sys.exit(1)
     if not all([ntrip_caster, ntrip_username, ntrip_password, ntrip_mountpoint]):
         logger.error("NTRIP Parameter nicht vollständig konfiguriert!")
         logger.error("Bitte NTRIP_CASTER, NTRIP_USERNAME, NTRIP_PASSWORD und NTRIP_MOUNTPOINT setzen")
@@ -413,13 +6026,68 @@ def main():
     
     logger.info("=== mosaic-H NTRIP Client gestartet ===")
     logger.info(f"Betriebsmodus: {operation_mode}")
+    if operation_mode == "stream":
+        logger.info(f"Stream-Engine: {stream_engine}")
     logger.info(f"NTRIP Caster: {ntrip_caster}:{ntrip_port}")
     logger.info(f"Mount Point: {ntrip_mountpoint}")
+    
+    # Optionale Standby-Caster für Hot-Standby Failover
+    primary = {
+        'caster': ntrip_caster,
+        'port': ntrip_port,
+        'username': ntrip_username,
+        'password': ntrip_password,
+        'mountpoint': ntrip_mountpoint,
+    }
+    try:
+        standby_casters = parse_caster_list(ntrip_casters, primary)
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
+    for spec in standby_casters:
+        logger.info(f"Standby Caster: {spec['caster']}:{spec['port']}/{spec['mountpoint']}")
     logger.info(f"UART Device: {uart_device}")
     logger.info(f"UART Baudrate: {uart_baudrate} Baud")
     
+    # Caster parallel zum Öffnen des UART verbinden und die gespeicherte GGA senden
+    startup = None
+    preconnect = None
+    selector = None
+    if operation_mode == "stream":
+        startup = StartupState(ntrip_state_file or None, dns_cache_ttl)
+        if mountpoint_select not in ('off', 'nearest'):
+            logger.warning(f"Unbekannter MOUNTPOINT_SELECT '{mountpoint_select}' - verwende 'off'")
+        elif mountpoint_select == 'nearest' and standby_casters:
+            logger.warning("MOUNTPOINT_SELECT wird mit NTRIP_CASTERS (Failover) nicht unterstützt")
+        elif mountpoint_select == 'nearest':
+            sourcetable = Sourcetable(NTRIPClient(ntrip_caster, ntrip_port, ntrip_username, ntrip_password, '',
+                                                  ntrip_version, resolver=startup),
+                                      sourcetable_cache or None, sourcetable_ttl)
+            # Tabelle aus dem Cache sofort verwenden, Aktualisierung läuft im Hintergrund
+            sourcetable.load()
+            sourcetable.refresh_async()
+            selector = MountpointSelector(
+                sourcetable, ntrip_mountpoint, mountpoint_max_baseline * 1000, mountpoint_hysteresis * 1000,
+                mountpoint_min_hold, mountpoint_format,
+                [system.strip() for system in mountpoint_nav_systems.split(',') if system.strip()],
+                mountpoint_single_base)
+            logger.info(f"Mountpoint Auswahl: nächster Mountpoint ab {mountpoint_max_baseline:g} km Basislinie")
+        if not standby_casters:
+            cached_gga = startup.cached_gga()
+            if cached_gga:
+                logger.info(f"Gespeicherte GGA Position für den Start: {cached_gga.strip()}")
+                if selector is not None and selector.check(cached_gga):
+                    ntrip_mountpoint = selector.mountpoint
+            preconnect_client = NTRIPClient(ntrip_caster, ntrip_port, ntrip_username, ntrip_password,
+                                            ntrip_mountpoint, ntrip_version, keepalive=keepalive,
+                                            user_timeout=tcp_user_timeout, resolver=startup)
+            preconnect = preconnect_caster(preconnect_client, cached_gga, startup)
+    
     # UART Interface initialisieren
-    uart = MosaicUARTInterface(uart_device, uart_baudrate)
+    if gga_source not in MosaicUARTInterface.GGA_SOURCES:
+        logger.warning(f"Unbekannte GGA_SOURCE '{gga_source}' - verwende 'auto'")
+        gga_source = 'auto'
+    uart = MosaicUARTInterface(uart_device, uart_baudrate, gga_source=gga_source)
     if not uart.connect():
         logger.error("UART Verbindung fehlgeschlagen!")
         sys.exit(1)
@@ -439,7 +6107,13 @@ def main():
             'mosaic_username': mosaic_username,
             'mosaic_password': mosaic_password
         }
-        success = configure_mosaic_ntrip(uart, config)
+        if mosaic_config_mode not in ('diff', 'force'):
+            logger.warning(f"Unbekannter MOSAIC_CONFIG_MODE '{mosaic_config_mode}' - verwende 'diff'")
+            mosaic_config_mode = 'diff'
+        # Snapshot der Empfängerkonfiguration pro Seriennummer (leer = kein Cache)
+        cache = MosaicConfigCache(mosaic_config_cache) if mosaic_config_cache else None
+        success = configure_mosaic_ntrip(uart, config, force=mosaic_config_mode == 'force',
+                                         cache=cache, verify=mosaic_config_verify)
         uart.close()
         if not success:
             logger.error("Konfiguration fehlgeschlagen!")
@@ -449,36 +6123,219 @@ def main():
     
     # Stream-Modus: Kontinuierliche Weiterleitung von NTRIP Daten
     elif operation_mode == "stream":
-        reconnect_delay = 5
+        # Optional SBF Positionsblöcke statt/zusätzlich zu NMEA GGA (MOSAIC_SBF_OUTPUT=msec100 → 10 Hz)
+        if mosaic_sbf_output.lower() != 'off':
+            enable_sbf_output(uart, mosaic_sbf_output, mosaic_sbf_stream)
+        logger.info(f"GGA Quelle: {gga_source}")
+        if gga_adaptive:
+            gga_scheduler = GGAScheduler(gga_interval, gga_min_interval, gga_max_interval,
+                                         gga_recenter_distance, gga_stationary_distance)
+            logger.info(f"GGA Uploads adaptiv: {gga_min_interval:g}-{gga_max_interval:g} s, "
+                        f"sofort ab {gga_recenter_distance:g} m Bewegung oder bei Wechsel der Fix-Qualität")
+        else:
+            gga_scheduler = GGAScheduler.fixed(gga_interval)
+            logger.info(f"GGA Uploads alle {gga_interval:g} s")
         
-        while True:
-            # NTRIP Client initialisieren
-            ntrip_client = NTRIPClient(
-                ntrip_caster,
-                ntrip_port,
-                ntrip_username,
-                ntrip_password,
-                ntrip_mountpoint
+        # RTCM3 Frames prüfen (CRC-24Q) statt rohe Chunks weiterzuleiten
+        framer = RTCM3Framer() if rtcm_validate else None
+        
+        # Optionale Latenz-Histogramme (p50/p95/p99 im 10-Sekunden-Log)
+        latency = CorrectionLatency() if latency_stats else None
+        
+        # asyncio Engine (Standard) oder die ursprüngliche serielle Schleife
+        engine = None
+        if stream_engine != "async" and stream_engine != "legacy":
+            logger.warning(f"Unbekannte Stream-Engine '{stream_engine}' - verwende 'async'")
+            stream_engine = "async"
+        if stream_engine == "async":
+            # UART Scheduler: veraltete/überholte Epochen bei Rückstau verwerfen (RTCM_MAX_AGE=0 = aus)
+            scheduler = RTCMScheduler(uart_baudrate, rtcm_max_age) if framer and rtcm_max_age > 0 else None
+            # Optionale Umschreibung: Konstellationen/Signale filtern, MSM5-7 → MSM4
+            rewriter = None
+            if rtcm_exclude or rtcm_msm4:
+                try:
+                    exclude_systems, exclude_signals = parse_rtcm_exclude(rtcm_exclude)
+                except ValueError as e:
+                    logger.error(f"Ungültiges RTCM_EXCLUDE: {e}")
+                    sys.exit(1)
+                if framer:
+                    rewriter = RTCMRewriter(exclude_systems, exclude_signals, rtcm_msm4)
+                    logger.info(f"RTCM Umschreibung: ausgeschlossen '{rtcm_exclude or '-'}', MSM4: {rtcm_msm4}")
+                else:
+                    logger.warning("RTCM_EXCLUDE/RTCM_MSM4 benötigen RTCM_VALIDATE=true - ignoriert")
+            engine = StreamEngine(uart, gga_interval=gga_interval, stall_timeout=stall_timeout, framer=framer,
+                                  zero_copy=zero_copy, latency=latency,
+                                  failover_age=failover_age, failback_hold=failback_hold,
+                                  reconnect_delay=reconnect_delay, scheduler=scheduler, rewriter=rewriter,
+                                  coalesce=uart_coalesce, gga_scheduler=gga_scheduler,
+                                  reconnect_max_delay=reconnect_max_delay, stall_epochs=stall_epochs,
+                                  correction_max_age=correction_max_age,
+                                  correction_min_satellites=correction_min_satellites)
+            engine.startup = startup
+            engine.mountpoints = selector
+        else:
+            if standby_casters:
+                logger.warning("NTRIP_CASTERS wird nur mit STREAM_ENGINE=async unterstützt - nur primärer Caster")
+                standby_casters = []
+            if rtcm_exclude or rtcm_msm4:
+                logger.warning("RTCM_EXCLUDE/RTCM_MSM4 werden nur mit STREAM_ENGINE=async unterstützt")
+        
+        # Optionaler Mitschnitt für die Offline-Analyse (replay_capture.py)
+        capture = None
+        if capture_file:
+            kinds = [kind.strip().lower() for kind in capture_kinds.split(',') if kind.strip()]
+            unknown = [kind for kind in kinds if kind not in CaptureWriter.KINDS]
+            if unknown:
+                logger.error(f"Unbekannte CAPTURE_KINDS: {', '.join(unknown)} (erlaubt: {', '.join(CaptureWriter.KINDS)})")
+                sys.exit(1)
+            capture_path = datetime.now().strftime(capture_file)
+            try:
+                capture = CaptureWriter(capture_path, [CaptureWriter.KINDS[kind] for kind in kinds],
+                                        capture_index_interval)
+            except OSError as e:
+                logger.error(f"Mitschnitt {capture_path} kann nicht angelegt werden: {e}")
+                sys.exit(1)
+            uart.capture = capture
+            if engine:
+                engine.capture = capture
+            logger.info(f"Mitschnitt: {capture_path} ({', '.join(kinds)})")
+        
+        # Optionaler lokaler Caster für weitere Geräte (eigener Thread, nicht im Forwarding-Pfad)
+        fanout = None
+        if local_caster_port or rtcm_tcp_port or rtcm_udp_targets:
+            try:
+                udp_targets = parse_udp_targets(rtcm_udp_targets)
+            except (ValueError, OSError) as e:
+                logger.error(f"Ungültige RTCM_UDP_TARGETS: {e}")
+                sys.exit(1)
+            fanout = RTCMFanout(
+                local_caster_mountpoint or ntrip_mountpoint,
+                caster_port=local_caster_port,
+                tcp_port=rtcm_tcp_port,
+                udp_targets=udp_targets,
+                bind=local_caster_bind,
+                auth=local_caster_auth or None,
+                queue_size=fanout_queue,
+                max_clients=fanout_max_clients,
+                framer=framer
             )
+            if not fanout.start():
+                sys.exit(1)
+            if engine:
+                engine.fanout = fanout
+        
+        # Optionaler Kommando-Port für Diagnose/Optimierung während des Streams (eigener Thread)
+        control = None
+        if control_port:
+            if engine:
+                control = MosaicControlServer(uart, control_port, control_bind)
+                if not control.start():
+                    sys.exit(1)
+            else:
+                logger.warning("CONTROL_PORT wird nur mit STREAM_ENGINE=async unterstützt")
+        
+        # Optionaler Prometheus Endpunkt (eigener Thread, nicht im Forwarding-Pfad)
+        exporter = None
+        if metrics_port:
+            if engine:
+                sources = [engine, startup] + [source for source in (fanout, control, selector) if source]
+                collect = lambda: [metric for source in sources for metric in source.collect_metrics()]
+                exporter = MetricsExporter(collect, metrics_port, metrics_bind)
+                exporter.start()
+            else:
+                logger.warning("METRICS_PORT wird nur mit STREAM_ENGINE=async unterstützt")
+        
+        # Hot-Standby: alle Caster bleiben verbunden, Reconnects übernimmt die Engine
+        if standby_casters:
+            upstreams = [
+                CasterUpstream(spec['caster'], spec['port'], spec['username'], spec['password'],
+                               spec['mountpoint'], ntrip_version,
+                               framer=framer if i == 0 else (RTCM3Framer() if rtcm_validate else None),
+                               keepalive=keepalive, user_timeout=tcp_user_timeout, resolver=startup)
+                for i, spec in enumerate([primary] + standby_casters)
+            ]
+            # Vor der ersten Live-GGA erhalten alle Caster die gespeicherte Position
+            engine.latest_gga = startup.cached_gga()
+            while not engine.run_failover(upstreams):
+                logger.info(f"Neustart in {reconnect_delay} Sekunden...")
+                time.sleep(reconnect_delay)
+        
+        backoff = ReconnectBackoff(reconnect_delay, reconnect_max_delay)
+        cadence = RTCMCadence(stall_epochs, max_timeout=stall_timeout)
+        watchdog = CorrectionWatchdog(correction_max_age, min_satellites=correction_min_satellites) \
+            if correction_max_age > 0 else None
+        first_connect = True
+        while not standby_casters:
+            if engine and not first_connect:
+                engine.reconnects += 1
+            first_connect = False
+            if selector is not None:
+                ntrip_mountpoint = selector.mountpoint
+                sourcetable.refresh_async()
+            
+            # Erster Durchlauf: im Hintergrund aufgebaute Verbindung übernehmen
+            if preconnect is not None:
+                ntrip_client, connected = preconnect_client, preconnect.result()
+                preconnect = None
+            else:
+                # NTRIP Client initialisieren
+                ntrip_client = NTRIPClient(
+                    ntrip_caster,
+                    ntrip_port,
+                    ntrip_username,
+                    ntrip_password,
+                    ntrip_mountpoint,
+                    ntrip_version,
+                    keepalive=keepalive,
+                    user_timeout=tcp_user_timeout,
+                    resolver=startup
+                )
+                
+                # Verbindung zum NTRIP Caster herstellen
+                connected = ntrip_client.connect()
+                if connected:
+                    startup.mark('caster_connected')
             
-            # Verbindung zum NTRIP Caster herstellen
-            if ntrip_client.connect():
+            if connected:
+                connected_at = time.monotonic()
                 # Stream-Modus starten
-                result = stream_mode(ntrip_client, uart)
+                if engine:
+                    result = engine.run(ntrip_client)
+                else:
+                    result = stream_mode(ntrip_client, uart, framer, fanout, uart_coalesce, capture, gga_scheduler,
+                                         cadence, startup, selector, watchdog)
                 
                 if result:  # Benutzer-Interrupt
                     break
+                backoff.connection_ended(time.monotonic() - connected_at)
             
             # Cleanup
             ntrip_client.close()
             
-            # Reconnect nach Verzögerung
-            logger.info(f"Reconnect in {reconnect_delay} Sekunden...")
-            time.sleep(reconnect_delay)
+            # Erster Versuch sofort, danach exponentiell mit Jitter
+            delay = backoff.next_delay()
+            if delay:
+                logger.info(f"Reconnect in {delay:.1f} Sekunden...")
+                time.sleep(delay)
+            else:
+                logger.info("Reconnect...")
+        
+        if exporter:
+            exporter.stop()
+        if control:
+            control.stop()
+        if fanout:
+            fanout.stop()
+        if engine:
+            # Laufende UART Lesezugriffe abwarten, bevor uart.close() den Port schließt
+            engine.close(wait=True)
+        if capture:
+            uart.capture = None
+            capture.close()
     
     else:
         logger.error(f"Unbekannter Betriebsmodus: {operation_mode}")
-        logger.error("Erlaubte Modi: 'config', 'stream'")
+        logger.error("Erlaubte Modi: 'config', 'stream', 'supervisor'")
         sys.exit(1)
     
     # Cleanup
@@ -487,4 +6344,5 @@ def main():
 
 
 if __name__ == "__main__":
+    setup_logging()
     main()
@@ -4,6 +4,10 @@
 mosaic-H RTK Optimization Script
 
 Optimiert die mosaic-H Einstellungen für bessere RTK Performance.
+Kommandos laufen über die MosaicCommandEngine aus ntrip_client.py (Antwortende per
+Prompt, NMEA zwischen den Antworten stört nicht). Mit MOSAIC_CONTROL=socket://127.0.0.1:<port>
+geht alles über den Kontroll-Port des laufenden Containers (CONTROL_PORT) - die RTCM
+Weiterleitung wird nicht unterbrochen.
 Verwendung: python3 optimize_rtk.py
 """
 
@@ -12,24 +16,40 @@ import time
 import sys
 import os
 
+from ntrip_client import MosaicCommandEngine
+
 # UART Konfiguration
 UART_DEVICE = os.getenv('UART_DEVICE', "/dev/ttyACM0")
 UART_BAUDRATE = 115200
 UART_TIMEOUT = 2
 
+# Kontroll-Port des laufenden Containers, leer = UART direkt öffnen
+MOSAIC_CONTROL = os.getenv('MOSAIC_CONTROL', "")  # z.B. "socket://127.0.0.1:28784"
+
 
 class MosaicOptimizer:
     """Optimierungs-Klasse für mosaic-H RTK Settings"""
     
-    def __init__(self, port, baudrate=115200, timeout=2):
+    def __init__(self, port, baudrate=115200, timeout=2, control=None):
         self.port = port
         self.baudrate = baudrate
         self.timeout = timeout
+        self.control = control
         self.ser = None
+        self.commands = None
     
     def connect(self):
         """Verbindung zum mosaic-H herstellen"""
         try:
+            if self.control:
+                # Kontroll-Port des Stream-Modus: der Container behält den UART
+                self.ser = serial.serial_for_url(self.control, timeout=self.timeout)
+                print(f"✓ Verbunden mit Kontroll-Port {self.control}")
+                self.commands = MosaicCommandEngine(self.ser, timeout=self.timeout)
+                if not self.commands.sync():
+                    print("✗ Kein Prompt erhalten - läuft der Stream-Modus?")
+                return True
+            
             self.ser = serial.Serial(
                 port=self.port,
                 baudrate=self.baudrate,
@@ -39,13 +59,12 @@ class MosaicOptimizer:
                 stopbits=serial.STOPBITS_ONE
             )
             print(f"✓ Verbunden mit {self.port} @ {self.baudrate} baud")
-            time.sleep(0.5)
+            self.commands = MosaicCommandEngine(self.ser, timeout=self.timeout)
             
             # COM2 in Command-Modus zwingen
             print("Setze COM2 in Command-Modus...")
-            self.ser.write(b"SSSSSSSSSS\r\n")
-            time.sleep(0.5)
-            self.ser.reset_input_buffer()
+            if not self.commands.sync(force=True):
+                print("✗ Kein Prompt erhalten - versuche trotzdem fortzufahren")
             
             return True
         except serial.SerialException as e:
@@ -63,44 +82,17 @@ class MosaicOptimizer:
             return None
         
         try:
-            self.ser.reset_input_buffer()
-            cmd = f"{command}\r\n"
-            self.ser.write(cmd.encode('ascii'))
-            
-            response_lines = []
-            start_time = time.time()
-            
-            while time.time() - start_time < self.timeout:
-                if self.ser.in_waiting:
-                    line = self.ser.readline().decode('ascii', errors='ignore').strip()
-                    if line:
-                        response_lines.append(line)
-                        if line.startswith("COM") and ">" in line:
-                            break
-                else:
-                    time.sleep(0.1)
-            
-            return '\n'.join(response_lines)
+            reply = self.commands.command(command)
+            return '\n'.join(line.strip() for line in reply.text.splitlines() if line.strip())
         except Exception as e:
             print(f"Fehler bei '{command}': {e}")
             return None
     
-    def disable_gga(self):
-        """GGA Output temporär deaktivieren für saubere Command-Antworten"""
-        print("Deaktiviere GGA Output...")
-        self.ser.reset_input_buffer()
-        self.ser.write(b"setDataInOut,COM2,,SBF\r\n")
-        time.sleep(0.5)
-        self.ser.reset_input_buffer()  # Verbleibende GGA Strings löschen
-        print("✓ GGA Output deaktiviert")
-    
     def restore_nmea_mode(self):
         """COM2 zurück in NMEA-Output Modus"""
-        self.ser.reset_input_buffer()
-        self.ser.write(b"setDataInOut,COM2,,+NMEA\r\n")
-        time.sleep(0.5)
-        self.ser.write(b"setNMEAOutput,Stream1,COM2,GGA,sec1\r\n")
-        time.sleep(0.5)
+        for reply in self.commands.execute(["setDataInOut,COM2,,+NMEA", "setNMEAOutput,Stream1,COM2,GGA,sec1"]):
+            if not reply.ok:
+                print(f"✗ {reply.command}: {reply.error}")
     
     def optimize(self):
         """RTK-Optimierungen durchführen"""
@@ -108,9 +100,6 @@ class MosaicOptimizer:
         print("  mosaic-H RTK OPTIMIERUNG")
         print("="*70)
         
-        # GGA Output deaktivieren für saubere Command-Kommunikation
-        self.disable_gga()
-        
         # Aktuelle Einstellungen lesen
         print("\n→ Lese aktuelle Einstellungen...")
         response = self.send_command("getElevationMask")
@@ -182,7 +171,10 @@ class MosaicOptimizer:
         print("  OPTIMIERUNG ABGESCHLOSSEN")
         print("="*70)
         print("\nEmpfehlungen:")
-        print("  1. Docker Container neu starten: docker-compose up -d")
+        if self.control:
+            print("  1. Container läuft weiter - kein Neustart nötig")
+        else:
+            print("  1. Docker Container neu starten: docker-compose up -d")
         print("  2. RTK-Fix-Zeit beobachten (sollte schneller sein)")
         print("  3. Satellitenanzahl in QGC/PX4 prüfen (sollte höher sein)")
         print("\nWeitere Performance-Faktoren:")
@@ -191,7 +183,9 @@ class MosaicOptimizer:
         print("  - RTCM-Alter: Sollte < 2 Sekunden sein")
         print("  - Baseline-Distanz: VRS funktioniert bis ~70km")
         
-        # COM2 zurück in NMEA-Modus
+        # COM2 zurück in NMEA-Modus (über den Kontroll-Port bleibt COM2 unverändert)
+        if self.control:
+            return
         print("\n" + "="*70)
         print("  COM2 wird zurück in NMEA-Modus gesetzt...")
         print("="*70)
@@ -204,12 +198,17 @@ def main():
     print("\n" + "="*70)
     print("  mosaic-H RTK Optimization Tool")
     print("="*70)
-    print(f"\nVerbinde mit: {UART_DEVICE}")
-    print(f"Baudrate: {UART_BAUDRATE}")
-    print("\nHinweis: Docker Container muss gestoppt sein!")
-    print("         → docker-compose down\n")
+    if MOSAIC_CONTROL:
+        print(f"\nVerbinde mit Kontroll-Port: {MOSAIC_CONTROL}")
+        print("Container läuft weiter, RTCM Weiterleitung wird nicht unterbrochen\n")
+    else:
+        print(f"\nVerbinde mit: {UART_DEVICE}")
+        print(f"Baudrate: {UART_BAUDRATE}")
+        print("\nHinweis: Docker Container muss gestoppt sein!")
+        print("         → docker-compose down")
+        print("         (oder CONTROL_PORT setzen und MOSAIC_CONTROL nutzen)\n")
     
-    optimizer = MosaicOptimizer(UART_DEVICE, UART_BAUDRATE, UART_TIMEOUT)
+    optimizer = MosaicOptimizer(UART_DEVICE, UART_BAUDRATE, UART_TIMEOUT, MOSAIC_CONTROL)
     
     if not optimizer.connect():
         sys.exit(1)
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+mosaic-H NTRIP Mitschnitt Replay
+
+Spielt einen Mitschnitt des Clients (CAPTURE_FILE, siehe CaptureWriter in
+ntrip_client.py) wieder ab - in Originalzeit (--speed 1), beschleunigt oder
+so schnell wie möglich (--speed max). Der Mitschnitt wird per mmap gelesen,
+mit --start/--duration wird über die Index-Records direkt in die Datei
+gesprungen.
+
+  info    Dauer, Records und Bytes pro Art
+  caster  Ersatz-Caster, der die aufgezeichneten Caster-Nutzdaten ausliefert
+          (NTRIP_CASTER=<host> NTRIP_PORT=<port> auf einen laufenden Client)
+  run     Client (StreamEngine) im Prozess gegen den Mitschnitt: Caster-Daten
+          über einen lokalen Ersatz-Caster, UART RX (NMEA/SBF) über ein pty.
+          Ergebnis (Durchsatz, CPU, Frames, Prüfsumme der UART Ausgabe) als
+          JSON zum Vergleich zwischen zwei Versionen.
+
+Verwendung:
+  python3 replay_capture.py info capture.mntc
+  python3 replay_capture.py caster capture.mntc --port 2101 --speed 1
+  python3 replay_capture.py run capture.mntc --speed max --json > result.json
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import pty
+import resource
+import select
+import socket
+import sys
+import threading
+import time
+import tty
+
+import serial
+
+import ntrip_client
+from ntrip_client import CaptureReader, CaptureWriter
+
+
+def parse_speed(text):
+    """'max' → 0 (ohne Pausen), sonst Faktor gegenüber der Originalzeit"""
+    if text.lower() == 'max':
+        return 0.0
+    speed = float(text)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("--speed muss > 0 oder 'max' sein")
+    return speed
+
+
+def paced(records, speed, started):
+    """Records zum (skalierten) Originalzeitpunkt ab started (monotonic) liefern"""
+    first = None
+    for record in records:
+        if speed:
+            first = record[0] if first is None else first
+            delay = started + (record[0] - first) / 1e9 / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        yield record
+
+
+class ReplayCaster:
+    """Ersatz-Caster: liefert die CASTER_RX Records eines Kanals an jeden Client
+
+    Beantwortet jeden Mountpoint (v1: ICY 200 OK, v2: HTTP/1.1 200 OK ohne
+    chunked), zählt empfangene GGA und schließt die Verbindung linger
+    Sekunden nach dem letzten Record.
+    """
+
+    def __init__(self, path, speed=1.0, channel=0, start_ns=0, end_ns=None, port=0, bind='127.0.0.1',
+                 linger=0.5, on_start=None):
+        self.path = path
+        self.speed = speed
+        self.channel = channel
+        self.start_ns = start_ns
+        self.end_ns = end_ns
+        self.linger = linger
+        # Aufruf mit dem Startzeitpunkt (monotonic), sobald ein Client verbunden ist
+        self.on_start = on_start
+        self.sessions = 0
+        self.bytes_sent = 0
+        self.gga_received = []
+        self.finished = threading.Event()
+        self._server = socket.create_server((bind, port))
+        self.port = self._server.getsockname()[1]
+
+    def start(self):
+        threading.Thread(target=self.serve, daemon=True).start()
+        return self
+
+    def serve(self):
+        """Verbindungen annehmen (je Verbindung ein Thread)"""
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._session, args=(conn,), daemon=True).start()
+
+    def close(self):
+        self._server.close()
+
+    def _session(self, conn):
+        try:
+            request = b''
+            while b'\r\n\r\n' not in request:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    return
+                request += chunk
+            header, _, rest = request.partition(b'\r\n\r\n')
+            if b'ntrip-version: ntrip/2.0' in header.lower():
+                conn.sendall(b"HTTP/1.1 200 OK\r\nNtrip-Version: Ntrip/2.0\r\nContent-Type: gnss/data\r\n\r\n")
+            else:
+                conn.sendall(b"ICY 200 OK\r\n\r\n")
+            self.sessions += 1
+            threading.Thread(target=self._read_gga, args=(conn, rest), daemon=True).start()
+
+            started = time.monotonic()
+            if self.on_start:
+                self.on_start(started)
+            with CaptureReader(self.path) as reader:
+                records = reader.records(self.start_ns, self.end_ns, {CaptureWriter.CASTER_RX})
+                for _, _, channel, data in paced(records, self.speed, started):
+                    if channel == self.channel:
+                        conn.sendall(data)
+                        self.bytes_sent += len(data)
+            time.sleep(self.linger)
+        except OSError:
+            pass
+        finally:
+            try:
+                # shutdown() statt nur close(): der GGA Leser blockiert sonst das FIN
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+            self.finished.set()
+
+    def _read_gga(self, conn, pending):
+        """GGA Sätze des Clients mitlesen"""
+        while True:
+            *lines, pending = pending.split(b'\n')
+            self.gga_received += [line.strip() for line in lines if b'GGA' in line]
+            try:
+                chunk = conn.recv(4096)
+            except OSError:
+                return
+            if not chunk:
+                return
+            pending += chunk
+
+
+def inject_uart_rx(path, fd, speed, started, start_ns=0, end_ns=None):
+    """UART_RX Records (NMEA, SBF, Antworten des mosaic-H) auf den pty Master schreiben"""
+    with CaptureReader(path) as reader:
+        records = reader.records(start_ns, end_ns, {CaptureWriter.UART_RX})
+        for _, _, _, data in paced(records, speed, started):
+            os.write(fd, data)
+
+
+def _replay_peer(args, start_ns, end_ns, master, conn):
+    """Gegenseite des Clients im eigenen Prozess: Ersatz-Caster, UART RX Einspeisung, UART TX Prüfsumme
+
+    Läuft getrennt vom Client, damit dessen CPU-Zeit nur den Client enthält.
+    """
+    digest = hashlib.sha256()
+    received = [0]
+    last_rx = [time.monotonic()]
+
+    def drain():
+        while True:
+            readable, _, _ = select.select([master], [], [], 0.2)
+            if not readable:
+                continue
+            try:
+                data = os.read(master, 65536)
+            except OSError:
+                return
+            digest.update(data)
+            received[0] += len(data)
+            last_rx[0] = time.monotonic()
+
+    def on_start(started):
+        threading.Thread(target=inject_uart_rx, args=(args.capture, master, args.speed, started, start_ns, end_ns),
+                         daemon=True).start()
+
+    caster = ReplayCaster(args.capture, args.speed, args.channel, start_ns, end_ns, linger=args.linger,
+                          on_start=on_start).start()
+    threading.Thread(target=drain, daemon=True).start()
+    conn.send(caster.port)
+    conn.recv()  # Client fertig
+    # UART Ausgabe vollständig lesen
+    while time.monotonic() - last_rx[0] < 0.3:
+        time.sleep(0.05)
+    conn.send({
+        'caster_bytes': caster.bytes_sent,
+        'gga_received': len(caster.gga_received),
+        'uart_bytes': received[0],
+        'uart_sha256': digest.hexdigest(),
+    })
+
+
+def window(reader, args):
+    """--start/--duration (Sekunden ab Aufnahmebeginn) als Zeitbereich in ns"""
+    first = reader.first_timestamp or 0
+    start_ns = first + int(args.start * 1e9) if args.start else 0
+    end_ns = (start_ns or first) + int(args.duration * 1e9) if args.duration else None
+    return start_ns, end_ns
+
+
+def cmd_info(args):
+    """Übersicht eines Mitschnitts"""
+    with CaptureReader(args.capture) as reader:
+        return reader.summary()
+
+
+def cmd_caster(args):
+    """Ersatz-Caster bis Ctrl+C"""
+    with CaptureReader(args.capture) as reader:
+        start_ns, end_ns = window(reader, args)
+    caster = ReplayCaster(args.capture, args.speed, args.channel, start_ns, end_ns, args.port, args.bind).start()
+    print(f"Replay Caster auf {args.bind}:{caster.port} (Kanal {args.channel}, "
+          f"{'max' if not args.speed else f'{args.speed:g}x'}) - Ctrl+C zum Beenden")
+    try:
+        while True:
+            caster.finished.wait()
+            caster.finished.clear()
+            print(f"Replay beendet: {caster.bytes_sent} bytes gesendet, {len(caster.gga_received)} GGA empfangen")
+    except KeyboardInterrupt:
+        caster.close()
+    return None
+
+
+def cmd_run(args):
+    """Client im Prozess gegen den Mitschnitt laufen lassen"""
+    with CaptureReader(args.capture) as reader:
+        start_ns, end_ns = window(reader, args)
+        summary = reader.summary()
+        # Erwartete UART Ausgabe: aufgezeichnete UART TX im selben Zeitbereich
+        expected = hashlib.sha256()
+        expected_bytes = 0
+        for _, _, _, data in reader.records(start_ns, end_ns, {CaptureWriter.UART_TX}):
+            expected.update(data)
+            expected_bytes += len(data)
+
+    master, slave = pty.openpty()
+    tty.setraw(master)
+    tty.setraw(slave)
+    ctx = multiprocessing.get_context('fork')
+    conn, peer_conn = ctx.Pipe()
+    peer = ctx.Process(target=_replay_peer, args=(args, start_ns, end_ns, master, peer_conn), daemon=True)
+    peer.start()
+    port = conn.recv()
+
+    uart = ntrip_client.MosaicUARTInterface(os.ttyname(slave), 115200)
+    uart.serial = serial.Serial(os.ttyname(slave), 115200, timeout=1)
+    framer = ntrip_client.RTCM3Framer() if args.validate else None
+    rewriter = None
+    if framer and (args.exclude or args.msm4):
+        exclude_systems, exclude_signals = ntrip_client.parse_rtcm_exclude(args.exclude)
+        rewriter = ntrip_client.RTCMRewriter(exclude_systems, exclude_signals, args.msm4)
+    engine = ntrip_client.StreamEngine(uart, framer=framer, zero_copy=True, rewriter=rewriter,
+                                       coalesce=args.coalesce / 1000, gga_interval=args.gga_interval)
+    client = ntrip_client.NTRIPClient('127.0.0.1', port, 'replay', 'replay', 'REPLAY')
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.perf_counter()
+    if not client.connect():
+        raise SystemExit("Verbindung zum Replay Caster fehlgeschlagen")
+    engine.run(client)
+    wall = time.perf_counter() - started
+    usage_end = resource.getrusage(resource.RUSAGE_SELF)
+    client.close()
+    engine.close(wait=True)
+    cpu = (usage_end.ru_utime - usage.ru_utime) + (usage_end.ru_stime - usage.ru_stime)
+
+    conn.send('done')
+    peer_results = conn.recv()
+    peer.join(timeout=5)
+    uart.close()
+    os.close(slave)
+    os.close(master)
+
+    results = {
+        'capture': args.capture,
+        'speed': 'max' if not args.speed else args.speed,
+        'capture_duration_s': summary['duration_s'],
+        'wall_s': wall,
+        'cpu_s': cpu,
+        'caster_bytes': peer_results['caster_bytes'],
+        'cpu_us_per_kbyte': cpu / (peer_results['caster_bytes'] / 1000) * 1e6 if peer_results['caster_bytes'] else None,
+        'bytes_forwarded': engine.bytes_forwarded,
+        'uart_writes': engine.chunks_forwarded,
+        'mean_latency_ms': engine.mean_latency * 1000 if engine.mean_latency is not None else None,
+        'max_latency_ms': engine.max_latency * 1000,
+        'gga_uploads': engine.gga_uploads,
+        'gga_received': peer_results['gga_received'],
+        'uart_bytes': peer_results['uart_bytes'],
+        'uart_sha256': peer_results['uart_sha256'],
+        # Nur mit uart_tx im Mitschnitt, ohne --start/--duration (Epochen an den Grenzen) und
+        # gleicher Pipeline-Konfiguration aussagekräftig - sonst uart_sha256 zweier Läufe vergleichen
+        'uart_tx_match': (peer_results['uart_sha256'] == expected.hexdigest()
+                          if expected_bytes and not (args.start or args.duration) else None),
+    }
+    if framer:
+        results.update({
+            'frames': framer.frames,
+            'crc_errors': framer.crc_errors,
+            'discarded_bytes': framer.discarded_bytes,
+        })
+    return results
+
+
+def print_results(results):
+    """Ergebnisse formatiert ausgeben"""
+    for key, value in results.items():
+        if isinstance(value, dict):
+            print(f"\n  {key}:")
+            for sub_key, sub_value in value.items():
+                if isinstance(sub_value, dict):
+                    sub_value = ", ".join(f"{name} {count}" for name, count in sub_value.items())
+                print(f"    {sub_key:<20} {sub_value}")
+        else:
+            if isinstance(value, float):
+                value = f"{value:.4g}"
+            print(f"  {key:<22} {value}")
+
+
+def main():
+    """Hauptprogramm"""
+    parser = argparse.ArgumentParser(description="mosaic-H NTRIP Mitschnitt Replay")
+    parser.add_argument('command', choices=['info', 'caster', 'run'])
+    parser.add_argument('capture', help="Mitschnitt (CAPTURE_FILE)")
+    parser.add_argument('--speed', type=parse_speed, default=None,
+                        help="Faktor gegenüber Originalzeit oder 'max' (caster: 1, run: max)")
+    parser.add_argument('--start', type=float, default=0.0, help="Start in s ab Aufnahmebeginn")
+    parser.add_argument('--duration', type=float, default=0.0, help="Dauer in s (0 = bis zum Ende)")
+    parser.add_argument('--channel', type=int, default=0, help="Caster-Kanal (0 = primärer Caster)")
+    parser.add_argument('--port', type=int, default=2101, help="Port des Replay Casters (caster)")
+    parser.add_argument('--bind', default='127.0.0.1', help="Adresse des Replay Casters (caster)")
+    parser.add_argument('--linger', type=float, default=0.5, help="Wartezeit nach dem letzten Record in s (run)")
+    parser.add_argument('--no-validate', dest='validate', action='store_false', help="Ohne RTCM3Framer (run)")
+    parser.add_argument('--coalesce', type=float, default=5.0, help="UART_COALESCE_MS (run)")
+    parser.add_argument('--msm4', action='store_true', help="RTCM_MSM4 (run)")
+    parser.add_argument('--exclude', default='', help="RTCM_EXCLUDE (run)")
+    parser.add_argument('--gga-interval', type=float, default=5.0, help="GGA Intervall der Engine in s (run)")
+    parser.add_argument('--json', action='store_true', help="Ergebnis als JSON ausgeben")
+    args = parser.parse_args()
+    if args.speed is None:
+        args.speed = 1.0 if args.command == 'caster' else 0.0
+
+    logging.getLogger().setLevel(logging.DEBUG if os.getenv('LOG_LEVEL') == 'DEBUG' else logging.WARNING)
+    try:
+        results = {'info': cmd_info, 'caster': cmd_caster, 'run': cmd_run}[args.command](args)
+    except (OSError, ValueError) as e:
+        print(f"Fehler: {e}", file=sys.stderr)
+        sys.exit(1)
+    if results is None:
+        return
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main()
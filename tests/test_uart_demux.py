@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests für UARTDemux: Kommando-Antworten neben NMEA und SBF, Störbytes
+
+Verwendung: python3 -m pytest tests  (oder python3 -m unittest discover tests)
+"""
+
+import binascii
+import os
+import struct
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import ntrip_client
+
+GGA = b"$GPGGA,120000.00,4800.0000000,N,01100.0000000,E,4,20,0.7,500.000,M,47.000,M,1.0,0012*5E\r\n"
+REPLY = b"$R: getPPSParameters\r\n  PPSParameters, sec1, Low2High, 0.00, RxClock, 60, 1.000\r\nCOM2>"
+
+
+def sbf_block(block_id=4007, body=b'\x00' * 12):
+    """SBF Block mit gültiger CRC (Länge auf ein Vielfaches von 4 aufgefüllt)"""
+    body += b'\x00' * (-len(body) % 4)
+    tail = struct.pack('<HH', block_id, 8 + len(body)) + body
+    return b'$@' + struct.pack('<H', binascii.crc_hqx(tail, 0)) + tail
+
+
+class TestUARTDemux(unittest.TestCase):
+
+    def setUp(self):
+        self.nmea, self.replies, self.events, self.sbf = [], [], [], []
+        self.demux = ntrip_client.UARTDemux(on_nmea=self.nmea.append, on_reply=self.replies.append,
+                                            on_event=self.events.append,
+                                            on_sbf=lambda block_id, data: self.sbf.append(block_id))
+
+    def test_reply_between_nmea_and_sbf(self):
+        self.demux.feed(GGA + REPLY[:10])
+        self.demux.feed(REPLY[10:] + sbf_block() + GGA)
+        self.assertEqual(self.replies, [REPLY])
+        self.assertEqual(len(self.nmea), 2)
+        self.assertEqual(self.sbf, [4007])
+
+    def test_reply_after_sbf_block(self):
+        self.demux.feed(sbf_block() + REPLY)
+        self.assertEqual(self.replies, [REPLY])
+
+    def test_stray_reply_start_after_noise(self):
+        # Störbyte vor "$R" (z.B. Rest eines kaputten Frames): keine Antwort, NMEA läuft weiter
+        self.demux.feed(b'\x00$R\x13garbage')
+        for _ in range(100):
+            self.demux.feed(GGA)
+        self.assertEqual(len(self.nmea), 100)
+        self.assertEqual(self.replies, [])
+        self.assertLess(len(self.demux._buf), len(GGA))
+
+    def test_stray_reply_start_at_line_start(self):
+        # "$R" am Zeilenanfang ohne Prompt: aufgeben, sobald ein vollständiger NMEA Satz folgt
+        self.demux.feed(GGA + b'$R\x13garbage')
+        for _ in range(10):
+            self.demux.feed(GGA)
+        self.assertEqual(len(self.nmea), 11)
+        self.assertEqual(self.replies, [])
+
+    def test_stray_event_before_sbf(self):
+        self.demux.feed(b'$T\xff' + sbf_block() + sbf_block(4027))
+        self.assertEqual(self.sbf, [4007, 4027])
+        self.assertEqual(self.events, [])
+
+    def test_reply_timeout(self):
+        self.demux.REPLY_TIMEOUT = 0.0
+        self.demux.feed(b'$R noise without prompt')
+        self.demux.feed(b' more noise')
+        # Nur ein möglicher angeschnittener Prompt bleibt im Puffer
+        self.assertLessEqual(len(self.demux._buf), self.demux.PROMPT_TAIL)
+        self.demux.feed(GGA)
+        self.assertEqual(len(self.nmea), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()